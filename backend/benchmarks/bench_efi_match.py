@@ -0,0 +1,203 @@
+"""
+Benchmark: EFIService.match_failure, staged engine vs the legacy query pattern.
+
+Replays recorded symptom queries against synthetic failure cards and
+platform patterns in an in-memory database that charges a simulated
+network latency per round trip, and compares:
+
+  legacy  — the previous shape: signature query, subsystem query and
+            platform-pattern keyword query (+ vehicle-only fallback)
+            issued one after another, each stage refetching cards
+  staged  — FailureMatchEngine: signature lookup, one projected candidate
+            query and one pattern query in parallel, stages scored in
+            memory, later stages gathered
+
+Queries come from --queries (JSONL: one FailureMatchRequest per line, or
+event_log documents whose data.query holds a recorded match query) or a
+built-in sample. Vector / hybrid stages need their services configured
+and are not exercised here; the $text keyword stage fails fast without a
+text index, as it does on a database without one.
+
+Usage:
+    cd backend
+    python benchmarks/bench_efi_match.py [--cards 5000] [--patterns 300] [--latency-ms 1.0] [--queries FILE]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from mem_db import MemDatabase
+from models.failure_intelligence import FailureMatchRequest
+from services import failure_intelligence_service as fis
+
+SUBSYSTEMS = ("battery", "motor", "controller", "charger", "bms", "display", "brakes")
+MAKES = {"Ather": ("450X", "Rizta"), "Ola": ("S1 Pro", "S1 Air"), "TVS": ("iQube",), "Bajaj": ("Chetak",)}
+SYMPTOM_WORDS = ("battery", "charging", "not", "motor", "noise", "vibration", "display", "error",
+                 "slow", "hot", "brake", "stuck", "loose", "smoke", "fail")
+ERROR_CODES = [f"E{i:02d}" for i in range(40)]
+
+RECORDED_QUERIES = [
+    {"symptom_text": "battery not charging after overnight plug in", "vehicle_make": "Ather",
+     "vehicle_model": "450X"},
+    {"symptom_text": "motor noise and vibration at high speed", "subsystem_hint": "motor"},
+    {"symptom_text": "display blank, error E12 on startup", "error_codes": ["E12"]},
+    {"symptom_text": "charging very slow with fast charger", "vehicle_make": "Ola"},
+    {"symptom_text": "brake stuck and hot after ride", "subsystem_hint": "brakes", "vehicle_make": "TVS",
+     "vehicle_model": "iQube"},
+    {"symptom_text": "bms error cell imbalance", "error_codes": ["E07", "E21"], "subsystem_hint": "bms"},
+    {"symptom_text": "controller fail limp mode", "vehicle_make": "Bajaj", "vehicle_model": "Chetak"},
+    {"symptom_text": "smoke from battery pack", "subsystem_hint": "battery", "error_codes": ["E03"]},
+    {"symptom_text": "scooter loose handle rattle"},
+    {"symptom_text": "range drops quickly, battery hot", "vehicle_make": "Ather", "vehicle_model": "Rizta"},
+]
+
+
+def load_queries(path):
+    if not path:
+        return [FailureMatchRequest(**q) for q in RECORDED_QUERIES]
+    queries = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "data" in record and "query" in record["data"]:
+                record = {"symptom_text": record["data"]["query"]}
+            queries.append(FailureMatchRequest(**record))
+    return queries
+
+
+def seed(db, n_cards, n_patterns, queries):
+    rng = random.Random(11)
+    signatures = [fis.MatchContext.build(q).signature_hash for q in queries]
+    for i in range(n_cards):
+        make = rng.choice(list(MAKES))
+        db.failure_cards.docs.append({
+            "failure_id": f"fc_{i}",
+            "title": " ".join(rng.sample(SYMPTOM_WORDS, 3)),
+            "status": rng.choice(("approved", "approved", "draft", "deprecated")),
+            "subsystem_category": rng.choice(SUBSYSTEMS),
+            "error_codes": rng.sample(ERROR_CODES, 2),
+            "keywords": rng.sample(SYMPTOM_WORDS, 4),
+            "vehicle_models": [{"make": make, "model": rng.choice(MAKES[make])}],
+            "signature_hash": signatures[i % len(signatures)] if i % 997 == 0 else f"sig_{i}",
+            "description": "x" * 800,
+            "embedding_vector": [0.0] * 256,
+            "confidence_score": rng.random(),
+            "effectiveness_score": rng.random(),
+        })
+    for i in range(n_patterns):
+        make = rng.choice(list(MAKES))
+        db.efi_platform_patterns.docs.append({
+            "pattern_id": f"pat_{i}",
+            "title": " ".join(rng.sample(SYMPTOM_WORDS, 3)),
+            "vehicle_make": make,
+            "vehicle_model": rng.choice(MAKES[make]),
+            "fault_category": rng.choice(("battery", "motor", "controller", "charging", "electrical")),
+            "symptoms": rng.sample(SYMPTOM_WORDS, 3),
+            "status": "active",
+            "confidence_score": rng.random(),
+        })
+
+
+class LegacyMatchEngine(fis.FailureMatchEngine):
+    """The previous query pattern: per-stage card queries, keyword-filtered pattern query + fallback"""
+
+    async def fetch_signature(self, ctx):
+        return await self.db.failure_cards.find(
+            {"signature_hash": ctx.signature_hash, "status": {"$in": fis.MATCH_STATUSES}},
+            {"_id": 0, "embedding_vector": 0}
+        ).limit(5).to_list(5)
+
+    async def fetch_candidates(self, ctx):
+        stage2_query = {"status": {"$in": fis.MATCH_STATUSES}}
+        if ctx.subsystem:
+            stage2_query["subsystem_category"] = ctx.subsystem
+        return await self.db.failure_cards.find(
+            stage2_query, {"_id": 0, "embedding_vector": 0}
+        ).limit(20).to_list(20)
+
+    async def fetch_patterns(self, ctx):
+        vehicle = {"status": "active"}
+        if ctx.data.vehicle_make:
+            vehicle["vehicle_make"] = {"$regex": ctx.data.vehicle_make, "$options": "i"}
+        if ctx.data.vehicle_model:
+            vehicle["vehicle_model"] = {"$regex": ctx.data.vehicle_model, "$options": "i"}
+        conditions = []
+        if ctx.keywords:
+            conditions += [{"symptoms": {"$in": ctx.keywords}}, {"keywords": {"$in": ctx.keywords}}]
+        if ctx.matched_category:
+            conditions.append({"fault_category": ctx.matched_category})
+        patterns = await self.db.efi_platform_patterns.find(
+            {**vehicle, "$or": conditions} if conditions else vehicle, {"_id": 0}
+        ).limit(15).to_list(15)
+        if not patterns:
+            patterns = await self.db.efi_platform_patterns.find(
+                vehicle, {"_id": 0}
+            ).sort("confidence_score", -1).limit(10).to_list(10)
+        return patterns
+
+
+async def replay(engine_cls, queries, args):
+    db = MemDatabase(latency_ms=args.latency_ms)
+    seed(db, args.cards, args.patterns, queries)
+    engine = engine_cls(db, embedding_service=None, search_service=None)
+
+    gather = asyncio.gather
+    if engine_cls is LegacyMatchEngine:
+        async def gather(*aws):
+            return [await a for a in aws]
+
+    with patch.object(fis, "EMBEDDINGS_AVAILABLE", False), \
+         patch.object(fis, "ADVANCED_SEARCH_AVAILABLE", False), \
+         patch("services.failure_intelligence_service.asyncio.gather", new=gather):
+        await engine.match(queries[0])
+        db.round_trips = 0
+        latencies, stages = [], defaultdict(list)
+        for _ in range(args.rounds):
+            for query in queries:
+                start = time.perf_counter()
+                response = await engine.match(query)
+                latencies.append((time.perf_counter() - start) * 1000)
+                for stage, ms in response.stage_timings_ms.items():
+                    stages[stage].append(ms)
+    return db.round_trips / len(latencies), latencies, stages
+
+
+def main(args):
+    logging.getLogger("services.failure_intelligence_service").setLevel(logging.ERROR)
+    queries = load_queries(args.queries)
+    print(f"{len(queries)} queries x {args.rounds} rounds, {args.cards} cards, {args.patterns} patterns, "
+          f"{args.latency_ms} ms simulated latency per round trip")
+    print(f"{'path':<8} {'round trips/query':>18} {'mean ms':>8} {'p95 ms':>8}")
+    all_stages = {}
+    for label, cls in (("legacy", LegacyMatchEngine), ("staged", fis.FailureMatchEngine)):
+        round_trips, latencies, stages = asyncio.run(replay(cls, queries, args))
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        print(f"{label:<8} {round_trips:>18.2f} {statistics.mean(latencies):>8.2f} {p95:>8.2f}")
+        all_stages[label] = stages
+    print("\nstaged, per-stage median ms:")
+    for stage, values in all_stages["staged"].items():
+        print(f"  {stage:<24} {statistics.median(values):>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cards", type=int, default=5000)
+    parser.add_argument("--patterns", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--queries", default=None)
+    main(parser.parse_args())
@@ -0,0 +1,125 @@
+"""
+Benchmark: peak memory of a bulk invoice export (CSV and Excel).
+
+Exports N invoices and records the peak Python heap (tracemalloc) and wall
+time of each path. Invoices come from a generator standing in for a Mongo
+cursor, so the documents themselves are only resident when a path keeps
+them.
+
+  legacy  — to_list() every invoice, build the whole CSV string / a
+            regular openpyxl workbook in memory, return the bytes
+  current — cursor rows fed through utils.streaming_export (CSV flushed
+            every CSV_FLUSH_ROWS rows, write_only workbook streamed from
+            a temp file); the response body is drained chunk by chunk
+
+Usage:
+    cd backend
+    python benchmarks/bench_export_memory.py [--invoices 100000] [--formats csv,excel]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import openpyxl
+
+from routes.export import BULK_INVOICE_HEADER, _bulk_workbook_response, _invoice_export_row
+from utils.streaming_export import csv_response
+
+
+def invoice(i):
+    return {
+        "invoice_id": f"inv_{i:08d}", "invoice_number": f"INV-{i:06d}", "date": "2026-03-01",
+        "customer_id": f"cust_{i % 500}", "customer_name": f"Customer {i % 500}, Pvt Ltd",
+        "sub_total": 1000.0 + i % 97, "tax_total": 180.0, "total": 1180.0 + i % 97,
+        "balance": float(i % 3) * 100, "status": "sent", "organization_id": "org-bench",
+        "line_items": [{"name": "Battery service", "quantity": 1, "rate": 1000.0}],
+    }
+
+
+async def cursor(n):
+    for i in range(n):
+        yield invoice(i)
+        if i % 1000 == 0:
+            await asyncio.sleep(0)
+
+
+async def drain(response):
+    size = 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+    return size
+
+
+async def legacy_csv(n):
+    invoices = [inv async for inv in cursor(n)]
+    lines = [",".join(BULK_INVOICE_HEADER)]
+    for inv in invoices:
+        lines.append(",".join(str(v).replace(",", "") for v in _invoice_export_row(inv)))
+    return len("\n".join(lines).encode())
+
+
+async def current_csv(n):
+    rows = (_invoice_export_row(inv) async for inv in cursor(n))
+    return await drain(csv_response("invoices.csv", BULK_INVOICE_HEADER, rows))
+
+
+async def legacy_excel(n):
+    invoices = [inv async for inv in cursor(n)]
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(BULK_INVOICE_HEADER)
+    for inv in invoices:
+        ws.append(_invoice_export_row(inv))
+    output = BytesIO()
+    wb.save(output)
+    return len(output.getvalue())
+
+
+async def current_excel(n):
+    rows = (_invoice_export_row(inv) async for inv in cursor(n))
+    return await drain(await _bulk_workbook_response("Invoices", BULK_INVOICE_HEADER, rows, (3, 4, 5, 6),
+                                                     "invoices.xlsx"))
+
+
+PATHS = {
+    "csv": (legacy_csv, current_csv),
+    "excel": (legacy_excel, current_excel),
+}
+
+
+def measure(fn, n):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = asyncio.run(fn(n))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / (1024 * 1024), elapsed, size / (1024 * 1024)
+
+
+def main(n, formats):
+    print(f"{n} invoices")
+    print(f"{'format':<7} {'path':<8} {'peak MiB':>9} {'seconds':>8} {'output MiB':>11}")
+    for fmt in formats:
+        peaks = {}
+        for label, fn in zip(("legacy", "current"), PATHS[fmt]):
+            peak, elapsed, size = measure(fn, n)
+            peaks[label] = peak
+            print(f"{fmt:<7} {label:<8} {peak:>9.1f} {elapsed:>8.2f} {size:>11.1f}")
+        print(f"{fmt:<7} peak memory reduction: {peaks['legacy'] / peaks['current']:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--invoices", type=int, default=100000)
+    parser.add_argument("--formats", default="csv,excel")
+    args = parser.parse_args()
+    main(args.invoices, [f for f in args.formats.split(",") if f])
@@ -0,0 +1,117 @@
+"""
+Benchmark: failure card similarity search, pure Python vs the vector index.
+
+Synthetic cards (random unit vectors, 5 subsystems, 3 statuses) at each
+size. For every size:
+
+  build     — cursor-sized batches into one IndexSnapshot, as a full
+              load() ingests them
+  legacy    — the previous fallback: a pure-Python cosine per card
+              and a full sort; timed on 2,000 cards and scaled to the size
+              (the old code only ever saw the first 500 / 1,000 cards)
+  index     — top-10 over every card: one mat-vec + argpartition
+  filtered  — top-10 with a subsystem + status pre-filter mask
+
+Usage:
+    cd backend
+    python benchmarks/bench_failure_card_index.py [--sizes 10000,100000,1000000] [--dims 256] [--queries 20]
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.failure_card_index import BATCH_SIZE, FailureCardVectorIndex, IndexSnapshot
+
+SUBSYSTEMS = ("battery", "motor", "controller", "electrical", "charger")
+STATUSES = ("approved", "draft", "deprecated")
+LEGACY_SAMPLE = 2000
+
+
+def build_index(size, dims, rng):
+    index = FailureCardVectorIndex()
+    snapshot = IndexSnapshot()
+    for start in range(0, size, BATCH_SIZE):
+        n = min(BATCH_SIZE, size - start)
+        vectors = rng.standard_normal((n, dims), dtype=np.float32).tolist()
+        snapshot._add_cards({
+            "failure_id": f"fc_{start + i}",
+            "embedding_vector": vectors[i],
+            "subsystem_category": SUBSYSTEMS[(start + i) % len(SUBSYSTEMS)],
+            "status": STATUSES[(start + i) % len(STATUSES)],
+        } for i in range(n))
+    index._snapshot = snapshot._seal()
+    return index
+
+
+def legacy_cosine(vec1, vec2):
+    dot_product = sum(a * b for a, b in zip(vec1, vec2))
+    norm1 = math.sqrt(sum(a * a for a in vec1))
+    norm2 = math.sqrt(sum(b * b for b in vec2))
+    return dot_product / (norm1 * norm2) if norm1 and norm2 else 0.0
+
+
+def legacy_search(query, cards, limit=10):
+    scored = []
+    for card in cards:
+        score = legacy_cosine(query, card["embedding_vector"])
+        if score >= 0.1:
+            scored.append((card["failure_id"], score))
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return scored[:limit]
+
+
+def _time_ms(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main(sizes, dims, queries):
+    rng = np.random.default_rng(42)
+    query_vectors = rng.standard_normal((queries, dims), dtype=np.float32)
+    sample = [{"failure_id": f"s{i}", "embedding_vector": v}
+              for i, v in enumerate(rng.standard_normal((LEGACY_SAMPLE, dims)).tolist())]
+    q_list = query_vectors[0].tolist()
+    legacy_per_card = _time_ms(lambda: legacy_search(q_list, sample), 3) / LEGACY_SAMPLE
+
+    print(f"{'cards':>9} {'matrix MB':>10} {'build s':>8} {'legacy ms':>11} {'index ms':>9} "
+          f"{'filtered ms':>12} {'speedup':>9}")
+    for size in sizes:
+        start = time.perf_counter()
+        index = build_index(size, dims, rng)
+        build_s = time.perf_counter() - start
+        matrix_mb = index.segments[dims].matrix.nbytes / 2 ** 20
+
+        mask = index.mask(dims, subsystem=["battery"], statuses=["approved", "draft"])
+        counter = iter(range(10 ** 9))
+
+        def search():
+            index.search(query_vectors[next(counter) % queries], 10)
+
+        def filtered():
+            index.search(query_vectors[next(counter) % queries], 10, mask=mask)
+
+        index_ms = _time_ms(search, queries)
+        filtered_ms = _time_ms(filtered, queries)
+        legacy_ms = legacy_per_card * size
+        print(f"{size:>9} {matrix_mb:>10.1f} {build_s:>8.2f} {legacy_ms:>11.1f} {index_ms:>9.2f} "
+              f"{filtered_ms:>12.2f} {legacy_ms / index_ms:>8.0f}x")
+        del index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+    main([int(s) for s in args.sizes.split(",")], args.dims, args.queries)
@@ -0,0 +1,142 @@
+"""
+Benchmark: DoubleEntryService.create_journal_entry round trips and throughput.
+
+Posts invoice-shaped journal entries (N revenue lines + CGST + SGST + AR) against
+an in-memory database that charges a simulated network latency per round
+trip, and compares:
+
+  legacy  — one find_one per SYSTEM_ACCOUNT per posting, one find_one per
+            line for account resolution, one update_one per line for
+            balances, audit writes issued one after another
+  current — memoized system-account check, one `$in` query through the
+            chart-of-accounts cache, one bulk_write for balances, audit
+            writes issued concurrently
+
+Usage:
+    cd backend
+    python benchmarks/bench_journal_posting.py [--postings 200] [--lines 10] [--latency-ms 1.0]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from mem_db import MemDatabase
+from services.chart_of_accounts_cache import get_chart_of_accounts_cache
+from services.double_entry_service import DoubleEntryService, SYSTEM_ACCOUNTS
+
+ORG = "org-bench"
+
+
+class LegacyDoubleEntryService(DoubleEntryService):
+    """The pre-batching posting path (per-account / per-line round trips)"""
+
+    async def ensure_system_accounts(self, organization_id):
+        for account_def in SYSTEM_ACCOUNTS.values():
+            existing = await self.chart_of_accounts.find_one({
+                "organization_id": organization_id, "account_code": account_def["code"]})
+            if not existing:
+                raise RuntimeError("benchmark seeds every system account")
+
+    async def resolve_accounts(self, organization_id, account_ids=(), codes=()):
+        by_id, by_code = {}, {}
+        for account_id in account_ids:
+            account = await self.chart_of_accounts.find_one(
+                {"organization_id": organization_id, "account_id": account_id, "is_active": True},
+                {"_id": 0})
+            if account:
+                by_id[account_id] = account
+        for code in codes:
+            if code and code not in by_code:
+                account = await self.chart_of_accounts.find_one(
+                    {"organization_id": organization_id, "account_code": code, "is_active": True},
+                    {"_id": 0})
+                if account:
+                    by_code[code] = account
+        return by_id, by_code
+
+    async def _sync_account_balances_from_entry(self, organization_id, entry_lines, session=None):
+        for line in entry_lines:
+            change = line.debit_amount - line.credit_amount
+            if line.account_type.lower() not in ("asset", "expense"):
+                change = -change
+            await self.chart_of_accounts.update_one(
+                {"account_id": line.account_id, "organization_id": organization_id},
+                {"$inc": {"current_balance": change, "balance": change}})
+
+
+def seed(db, n_revenue_accounts):
+    accounts = [
+        {"account_id": f"acc_{d['code']}", "account_name": d["name"], "account_code": d["code"],
+         "account_type": d["type"].value, "is_active": True, "organization_id": ORG}
+        for d in SYSTEM_ACCOUNTS.values()
+    ]
+    for i in range(n_revenue_accounts):
+        accounts.append({"account_id": f"acc_rev_{i}", "account_name": f"Revenue {i}",
+                         "account_code": f"47{i:02d}", "account_type": "Income",
+                         "is_active": True, "organization_id": ORG})
+    db.chart_of_accounts.docs.extend(accounts)
+
+
+def invoice_lines(n_lines):
+    lines = [{"account_id": f"acc_rev_{i}", "debit_amount": 0, "credit_amount": 100}
+             for i in range(n_lines)]
+    lines.append({"account_code": "2210", "debit_amount": 0, "credit_amount": 9 * n_lines})
+    lines.append({"account_code": "2220", "debit_amount": 0, "credit_amount": 9 * n_lines})
+    lines.append({"account_code": "1100", "debit_amount": 118 * n_lines, "credit_amount": 0})
+    return lines
+
+
+async def run(service_cls, postings, n_lines, latency_ms):
+    get_chart_of_accounts_cache().clear()
+    db = MemDatabase(latency_ms=latency_ms)
+    seed(db, n_lines)
+    lines = invoice_lines(n_lines)
+    service = service_cls(db)
+
+    async def audit(**kwargs):
+        await db.audit_log.insert_one(dict(kwargs))
+
+    legacy = service_cls is LegacyDoubleEntryService
+    gather = asyncio.gather
+    if legacy:
+        async def gather(*aws):
+            return [await a for a in aws]
+
+    with patch("services.double_entry_service.log_financial_action", new=audit), \
+         patch("services.double_entry_service.asyncio.gather", new=gather), \
+         patch("utils.period_lock.check_period_locked", new=lambda *a, **k: asyncio.sleep(0)):
+        await service.create_journal_entry(ORG, "2026-03-01", "warmup", lines)
+        db.round_trips = 0
+        start = time.perf_counter()
+        for i in range(postings):
+            ok, msg, _ = await service.create_journal_entry(ORG, "2026-03-01", f"INV-{i}", lines)
+            assert ok, msg
+        elapsed = time.perf_counter() - start
+    return db.round_trips / postings, postings / elapsed
+
+
+def main(postings, n_lines, latency_ms):
+    print(f"{postings} postings x {n_lines + 3} lines, {latency_ms} ms simulated latency per round trip")
+    print(f"{'path':<8} {'round trips/posting':>20} {'postings/sec':>13}")
+    results = {}
+    for label, cls in (("legacy", LegacyDoubleEntryService), ("current", DoubleEntryService)):
+        results[label] = asyncio.run(run(cls, postings, n_lines, latency_ms))
+        trips, rate = results[label]
+        print(f"{label:<8} {trips:>20.1f} {rate:>13.1f}")
+    print(f"speedup: {results['current'][1] / results['legacy'][1]:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--postings", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    args = parser.parse_args()
+    main(args.postings, args.lines, args.latency_ms)
@@ -0,0 +1,201 @@
+"""
+Micro-benchmark: per-request middleware overhead.
+
+Compares the legacy stack (six BaseHTTPMiddleware layers + two
+@app.middleware("http") functions) against the single pure-ASGI
+RequestPipelineMiddleware. Both run the same stage logic against a
+trivial Starlette app, so the difference is the layering overhead
+(task hops, response wrapping, per-layer path resolution).
+
+Requests are driven straight through the ASGI interface (no HTTP client)
+and MongoDB is replaced by an in-memory stub, so no server or database
+is needed.
+
+Usage:
+    cd backend
+    python benchmarks/bench_middleware_pipeline.py [--requests 5000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("JWT_SECRET", "benchmark-secret-" + "x" * 32)
+# Rate limiting would start returning 429 after a few hundred requests
+os.environ["TESTING"] = "1"
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+class _StubCollection:
+    def __init__(self, doc):
+        self._doc = doc
+
+    async def find_one(self, *args, **kwargs):
+        return self._doc
+
+
+class _StubDB:
+    organization_users = _StubCollection({"_id": "m1", "organization_id": "org-bench"})
+    organizations = _StubCollection({"is_active": True, "plan_type": "enterprise"})
+
+
+async def _endpoint(request):
+    if request.method == "POST":
+        await request.body()
+    return JSONResponse({"ok": True})
+
+
+def _routes():
+    return [
+        Route("/api/v1/health", _endpoint),
+        Route("/api/v1/tickets", _endpoint, methods=["GET", "POST"]),
+    ]
+
+
+def build_legacy_app():
+    """Pre-pipeline layering: one BaseHTTPMiddleware per stage"""
+    from core.tenant.guard import TenantGuardMiddleware
+    from middleware.csrf import CSRFMiddleware
+    from middleware.rate_limit import RateLimitMiddleware
+    from middleware.rbac import RBACMiddleware
+    from middleware.plan_enforcement import PlanEnforcementMiddleware
+    from middleware.sanitization import SanitizationMiddleware
+    from middleware.pipeline import SecurityHeadersStage, rewrite_legacy_paths
+
+    app = Starlette(routes=_routes())
+    app.add_middleware(SanitizationMiddleware)
+    app.add_middleware(PlanEnforcementMiddleware)
+    app.add_middleware(RBACMiddleware)
+    app.add_middleware(TenantGuardMiddleware)
+    app.add_middleware(RateLimitMiddleware)
+    app.add_middleware(CSRFMiddleware)
+
+    # The two former @app.middleware("http") functions (decorator form is the
+    # same BaseHTTPMiddleware(dispatch=...) wrapper)
+    async def rewrite_efi_to_evfi(request: Request, call_next):
+        rewrite_legacy_paths(request.scope)
+        return await call_next(request)
+
+    headers_stage = SecurityHeadersStage()
+
+    async def add_security_headers(request: Request, call_next):
+        response = await call_next(request)
+        headers_stage.after(request, None, response.headers)
+        return response
+
+    app.add_middleware(BaseHTTPMiddleware, dispatch=rewrite_efi_to_evfi)
+    app.add_middleware(BaseHTTPMiddleware, dispatch=add_security_headers)
+
+    return app
+
+
+def build_pipeline_app():
+    from middleware.pipeline import RequestPipelineMiddleware
+
+    app = Starlette(routes=_routes())
+    app.add_middleware(RequestPipelineMiddleware)
+    return app
+
+
+def _scope(method, path, headers):
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+        "state": {},
+    }
+
+
+async def _call(app, method, path, headers, body=b""):
+    status = {}
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+
+    await app(_scope(method, path, headers), receive, send)
+    return status.get("code")
+
+
+async def _run_scenario(app, method, path, headers, body, n):
+    # Warm-up (builds middleware stack, compiles route trie, fills caches)
+    for _ in range(50):
+        code = await _call(app, method, path, headers, body)
+    start = time.perf_counter()
+    for _ in range(n):
+        await _call(app, method, path, headers, body)
+    elapsed = time.perf_counter() - start
+    return code, elapsed / n * 1e6
+
+
+async def main(n):
+    from core.tenant.guard import TenantGuardMiddleware
+    from core.tenant.access_cache import get_tenant_access_cache
+    from middleware.plan_enforcement import set_plan_enforcement_db
+    from utils.auth import create_token
+
+    TenantGuardMiddleware.set_db(_StubDB())
+    set_plan_enforcement_db(_StubDB())
+    get_tenant_access_cache().clear()
+
+    token = create_token("user-bench", "bench@example.com", "owner", org_id="org-bench")
+    auth = {"Authorization": f"Bearer {token}"}
+    invoice = json.dumps({
+        "customer_id": "CUST-1",
+        "line_items": [{"item_id": f"I-{i}", "name": f"Part {i}", "quantity": 1, "rate": 450.0}
+                       for i in range(20)],
+    }).encode()
+
+    scenarios = [
+        ("public GET /api/v1/health", "GET", "/api/v1/health", {}, b""),
+        ("auth GET /api/v1/tickets", "GET", "/api/v1/tickets", auth, b""),
+        ("auth POST /api/v1/tickets (JSON)", "POST", "/api/v1/tickets",
+         {**auth, "Content-Type": "application/json"}, invoice),
+    ]
+
+    apps = {"legacy stack": build_legacy_app(), "pipeline": build_pipeline_app()}
+
+    print(f"{'scenario':<36} {'legacy µs':>10} {'pipeline µs':>12} {'speedup':>8}")
+    for label, method, path, headers, body in scenarios:
+        results = {}
+        for name, app in apps.items():
+            code, us = await _run_scenario(app, method, path, headers, body, n)
+            results[name] = (code, us)
+        legacy_code, legacy_us = results["legacy stack"]
+        pipe_code, pipe_us = results["pipeline"]
+        assert legacy_code == pipe_code, f"{label}: status mismatch {legacy_code} vs {pipe_code}"
+        print(f"{label:<36} {legacy_us:>10.1f} {pipe_us:>12.1f} {legacy_us / pipe_us:>7.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,133 @@
+"""
+Benchmark: SanitizationMiddleware on invoice payloads.
+
+Compares the previous behaviour (bleach.clean on every string, then a
+json.loads / json.dumps round trip) with the current fast paths, on
+realistic invoice bodies of increasing size:
+
+  clean   — typical invoice, no markup anywhere
+  mixed   — same invoice with a few fields containing tags / '&'
+
+Usage:
+    cd backend
+    python benchmarks/bench_sanitization.py [--repeat 20]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import bleach
+
+from middleware.pipeline import resolve_route
+from middleware.sanitization import (
+    SanitizationMiddleware, SKIP_FIELDS, ALLOWED_HTML_FIELDS, SAFE_TAGS, SAFE_ATTRS,
+)
+
+
+def legacy_sanitize(value, key=None):
+    """The pre-fast-path recursive sanitizer"""
+    if key and key.lower() in SKIP_FIELDS:
+        return value, 0
+    if isinstance(value, str):
+        if key and key.lower() in ALLOWED_HTML_FIELDS:
+            cleaned = bleach.clean(value, tags=SAFE_TAGS, attributes=SAFE_ATTRS, strip=True)
+        else:
+            cleaned = bleach.clean(value, tags=[], attributes={}, strip=True)
+        return cleaned, 1 if cleaned != value else 0
+    if isinstance(value, dict):
+        total, out = 0, {}
+        for k, v in value.items():
+            out[k], count = legacy_sanitize(v, key=k)
+            total += count
+        return out, total
+    if isinstance(value, list):
+        total, out = 0, []
+        for item in value:
+            sanitized, count = legacy_sanitize(item)
+            out.append(sanitized)
+            total += count
+        return out, total
+    return value, 0
+
+
+def legacy_before(raw_body):
+    data = json.loads(raw_body)
+    sanitized, _ = legacy_sanitize(data)
+    return json.dumps(sanitized).encode("utf-8")
+
+
+def invoice_payload(n_lines, dirty=False):
+    lines = []
+    for i in range(n_lines):
+        lines.append({
+            "item_id": f"ITM-{i:05d}",
+            "name": f"Lithium cell 3.7V 2600mAh (batch {i % 17})",
+            "description": "Replacement cell, tested" if not (dirty and i % 50 == 0)
+                           else "<p>Replacement cell, <strong>tested</strong></p>",
+            "hsn_code": "85076000",
+            "quantity": str(1 + i % 4),
+            "rate": f"{450 + i % 90}.00",
+            "discount_percent": "0",
+            "tax_rate": "18",
+            "unit": "pcs",
+        })
+    return {
+        "customer_id": "CUST-000123",
+        "customer_name": "Sharma & Sons EV Service" if dirty else "Sharma Sons EV Service",
+        "invoice_date": "2026-03-31",
+        "due_date": "2026-04-30",
+        "reference_number": "PO-7781",
+        "place_of_supply": "MH",
+        "notes": "Thank you for your business",
+        "terms": "Payment due within 30 days",
+        "line_items": lines,
+    }
+
+
+def _time(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main(repeat):
+    stage = SanitizationMiddleware(app=None)
+    route = resolve_route("/api/v1/invoices-enhanced")
+    loop = asyncio.new_event_loop()
+
+    def current_before(raw_body):
+        request = MagicMock()
+        request.method = "POST"
+        request.headers = {"content-type": "application/json"}
+
+        async def body():
+            return raw_body
+        request.body = body
+        loop.run_until_complete(stage.before(request, route))
+
+    print(f"{'payload':<18} {'bytes':>8} {'legacy ms':>10} {'current ms':>11} {'speedup':>8}")
+    for n_lines in (10, 100, 1000):
+        for dirty in (False, True):
+            raw = json.dumps(invoice_payload(n_lines, dirty)).encode()
+            legacy_ms = _time(lambda: legacy_before(raw), repeat)
+            current_ms = _time(lambda: current_before(raw), repeat)
+            label = f"{n_lines} lines {'mixed' if dirty else 'clean'}"
+            print(f"{label:<18} {len(raw):>8} {legacy_ms:>10.2f} {current_ms:>11.3f} "
+                  f"{legacy_ms / current_ms:>7.1f}x")
+    loop.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.repeat)
@@ -0,0 +1,281 @@
+"""
+In-memory stand-in for a Motor database, for benchmarks only.
+
+Implements the subset of the collection API the benchmarked services use
+(find / find_one / insert / update / bulk_write / find_one_and_update /
+count_documents) with simple query matching, and simulates network
+latency: every awaited operation sleeps `latency_ms` and is counted as
+one round trip. This makes "round trips per operation" visible without a
+MongoDB server. Set MONGO_URL to benchmark against a real database instead.
+"""
+
+import asyncio
+import copy
+import re
+from collections import defaultdict
+
+
+def _get(doc, path):
+    for part in path.split("."):
+        if isinstance(doc, dict):
+            doc = doc.get(part)
+        else:
+            return None
+    return doc
+
+
+def _match_value(value, cond):
+    if isinstance(value, list) and (not isinstance(cond, dict) or set(cond) <= {"$in", "$regex", "$options"}):
+        # Array fields match equality / $in / $regex when any element does
+        return any(_match_value(v, cond) for v in value) or value == cond
+    if isinstance(cond, dict) and any(k.startswith("$") for k in cond):
+        for op, arg in cond.items():
+            if op == "$in" and value not in arg:
+                return False
+            if op == "$nin" and value in arg:
+                return False
+            if op == "$ne" and value == arg:
+                return False
+            if op == "$gte" and not (value is not None and value >= arg):
+                return False
+            if op == "$gt" and not (value is not None and value > arg):
+                return False
+            if op == "$lte" and not (value is not None and value <= arg):
+                return False
+            if op == "$lt" and not (value is not None and value < arg):
+                return False
+            if op == "$exists" and (value is not None) != bool(arg):
+                return False
+            if op == "$regex":
+                flags = re.I if "i" in cond.get("$options", "") else 0
+                if not (isinstance(value, str) and re.search(arg, value, flags)):
+                    return False
+        return True
+    return value == cond
+
+
+def matches(doc, query):
+    for key, cond in query.items():
+        if key == "$text":
+            raise RuntimeError("text index required for $text query")
+        if key == "$or":
+            if not any(matches(doc, q) for q in cond):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, q) for q in cond):
+                return False
+        elif not _match_value(_get(doc, key), cond):
+            return False
+    return True
+
+
+def _apply_update(doc, update, inserting=False):
+    for op, fields in update.items():
+        if op == "$set":
+            doc.update(fields)
+        elif op == "$inc":
+            for k, v in fields.items():
+                doc[k] = doc.get(k, 0) + v
+        elif op == "$setOnInsert" and inserting:
+            doc.update(fields)
+        elif op == "$unset":
+            for k in fields:
+                doc.pop(k, None)
+        elif op == "$push":
+            for k, v in fields.items():
+                doc.setdefault(k, []).append(v)
+
+
+class _Result:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class MemCursor:
+    """Matches lazily, so limit() without sort() stops at the first n matches like a server scan"""
+
+    def __init__(self, collection, docs, projection=None, query=None):
+        self._collection = collection
+        self._source = docs
+        self._query = query
+        self._matched = None
+        self._limit = None
+        self._projection = projection
+
+    @property
+    def _docs(self):
+        if self._matched is None:
+            found = (d for d in self._source if self._query is None or matches(d, self._query))
+            if self._limit:
+                found = (d for _, d in zip(range(self._limit), found))
+            self._matched = list(found)
+        return self._matched
+
+    @_docs.setter
+    def _docs(self, docs):
+        self._matched = docs
+
+    def sort(self, key, direction=1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for k, d in reversed(keys):
+            self._docs.sort(key=lambda doc: (_get(doc, k) is None, _get(doc, k)), reverse=d < 0)
+        return self
+
+    def skip(self, n):
+        self._docs = self._docs[n:]
+        return self
+
+    def limit(self, n):
+        if n:
+            if self._matched is None:
+                self._limit = n
+            else:
+                self._docs = self._docs[:n]
+        return self
+
+    def _results(self, length=None):
+        # Copies are made after sort / skip / limit, like a server returning only the batch
+        docs = self._docs if length is None else self._docs[:length]
+        return [MemCollection._project(d, self._projection) for d in docs]
+
+    async def to_list(self, length=None):
+        await self._collection._round_trip()
+        return self._results(length)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await self._collection._round_trip()
+        for doc in self._results():
+            yield doc
+
+
+class MemCollection:
+    def __init__(self, db, name):
+        self._db = db
+        self.name = name
+        self.docs = []
+
+    async def _round_trip(self):
+        self._db.round_trips += 1
+        if self._db.latency:
+            await asyncio.sleep(self._db.latency)
+
+    @staticmethod
+    def _project(doc, projection):
+        if projection and any(v == 1 for k, v in projection.items() if k != "_id"):
+            doc = {k: copy.deepcopy(v) for k, v in doc.items() if projection.get(k) == 1 or k == "_id"}
+        else:
+            doc = copy.deepcopy(doc)
+            for k, v in (projection or {}).items():
+                if v == 0:
+                    doc.pop(k, None)
+        if projection and projection.get("_id") == 0:
+            doc.pop("_id", None)
+        return doc
+
+    def find(self, query=None, projection=None, **kwargs):
+        return MemCursor(self, self.docs, projection, query or {})
+
+    async def find_one(self, query=None, projection=None, sort=None, **kwargs):
+        await self._round_trip()
+        docs = self.docs
+        if sort:
+            docs = MemCursor(self, list(docs)).sort(sort)._docs
+        for doc in docs:
+            if matches(doc, query or {}):
+                return self._project(doc, projection)
+        return None
+
+    async def count_documents(self, query, **kwargs):
+        await self._round_trip()
+        return sum(1 for d in self.docs if matches(d, query))
+
+    async def insert_one(self, doc, session=None):
+        await self._round_trip()
+        doc.setdefault("_id", len(self.docs) + 1)
+        self.docs.append(copy.deepcopy(doc))
+        return _Result(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs, ordered=True, session=None):
+        await self._round_trip()
+        for doc in docs:
+            doc.setdefault("_id", len(self.docs) + 1)
+            self.docs.append(copy.deepcopy(doc))
+        return _Result(inserted_ids=[d["_id"] for d in docs])
+
+    def _update(self, query, update, upsert=False):
+        for doc in self.docs:
+            if matches(doc, query):
+                _apply_update(doc, update)
+                return doc
+        if upsert:
+            doc = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+            _apply_update(doc, update, inserting=True)
+            doc.setdefault("_id", len(self.docs) + 1)
+            self.docs.append(doc)
+            return doc
+        return None
+
+    async def update_one(self, query, update, upsert=False, session=None):
+        await self._round_trip()
+        doc = self._update(query, update, upsert)
+        return _Result(matched_count=1 if doc else 0, modified_count=1 if doc else 0)
+
+    async def update_many(self, query, update, session=None):
+        await self._round_trip()
+        n = 0
+        for doc in self.docs:
+            if matches(doc, query):
+                _apply_update(doc, update)
+                n += 1
+        return _Result(matched_count=n, modified_count=n)
+
+    async def bulk_write(self, requests, ordered=True, session=None):
+        await self._round_trip()
+        for op in requests:
+            self._update(op._filter, op._doc, getattr(op, "_upsert", False) or False)
+        return _Result(bulk_api_result={}, modified_count=len(requests))
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=False,
+                                  projection=None, session=None, **kwargs):
+        await self._round_trip()
+        before = None
+        for doc in self.docs:
+            if matches(doc, query):
+                before = copy.deepcopy(doc)
+                break
+        doc = self._update(query, update, upsert)
+        if doc is None:
+            return None
+        return self._project(doc if return_document else before, projection) if (doc if return_document else before) else None
+
+    async def delete_many(self, query, session=None):
+        await self._round_trip()
+        keep = [d for d in self.docs if not matches(d, query)]
+        deleted = len(self.docs) - len(keep)
+        self.docs = keep
+        return _Result(deleted_count=deleted)
+
+    async def create_index(self, *args, **kwargs):
+        return "index"
+
+
+class MemDatabase:
+    """Attribute / item access returns (and creates) a MemCollection"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000.0
+        self.round_trips = 0
+        self._collections = defaultdict(lambda: None)
+
+    def __getitem__(self, name):
+        if self._collections[name] is None:
+            self._collections[name] = MemCollection(self, name)
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
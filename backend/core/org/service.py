@@ -15,6 +15,7 @@ from .models import (
     OrganizationContext, OrgUserRole, OrgUserStatus, PlanType,
     get_role_permissions, ROLE_PERMISSIONS
 )
+from core.tenant.access_cache import invalidate_membership
 
 logger = logging.getLogger(__name__)
 
@@ -216,6 +217,8 @@ class OrganizationService:
         )
         
         await self.org_users.insert_one(membership.model_dump())
+        if membership.user_id:
+            invalidate_membership(membership.user_id, org_id)
         
         # Update org user count
         await self._update_org_stats(org_id)
@@ -240,6 +243,7 @@ class OrganizationService:
             return_document=True,
             projection={"_id": 0}
         )
+        invalidate_membership(user_id, org_id)
         
         return OrganizationUser(**result) if result else None
     
@@ -264,6 +268,7 @@ class OrganizationService:
             "organization_id": org_id,
             "user_id": user_id
         })
+        invalidate_membership(user_id, org_id)
         
         if result.deleted_count > 0:
             await self._update_org_stats(org_id)
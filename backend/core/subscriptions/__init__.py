@@ -32,6 +32,14 @@ from .entitlement import (
     SubscriptionExpired
 )
 
+from .plan_snapshot import (
+    OrgPlanSnapshot,
+    OrgPlanCache,
+    get_org_plan_cache,
+    get_org_plan_snapshot,
+    invalidate_org_plan
+)
+
 __all__ = [
     # Models
     "Plan", "PlanCode", "PlanFeatures", "PlanLimits", "FeatureLimit",
@@ -55,5 +63,12 @@ __all__ = [
     "FeatureNotAvailable",
     "UsageLimitExceeded",
     "SubscriptionRequired",
-    "SubscriptionExpired"
+    "SubscriptionExpired",
+    
+    # Org Plan Snapshot Cache
+    "OrgPlanSnapshot",
+    "OrgPlanCache",
+    "get_org_plan_cache",
+    "get_org_plan_snapshot",
+    "invalidate_org_plan"
 ]
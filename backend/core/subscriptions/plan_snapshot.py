@@ -0,0 +1,158 @@
+"""
+Org Plan Snapshot Cache
+=======================
+
+One cached read of the plan fields on the `organizations` document, shared
+by everything that gates on plan:
+
+- middleware/plan_enforcement.py      — minimum plan for write routes
+- utils/plan_limits.check_record_limit — free-trial record limits
+- services/ai_token_service            — monthly AI token allocation
+- routes/reports, routes/gst           — trial watermark on PDFs
+- routes/ai_guidance                   — daily EVFI limit
+
+Without it a single write request could fetch the same org document two or
+three times just to read `plan_type`.
+
+Invalidation (invalidate_org_plan):
+- SubscriptionService.create_subscription / update_subscription
+- POST /api/platform/organizations/{org_id}/plan
+- signup flow resetting plan_type to free_trial
+
+The cache is per-process; ORG_PLAN_CACHE_TTL_SECONDS (default 60s) bounds
+staleness across uvicorn workers.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_TTL_SECONDS = float(os.environ.get("ORG_PLAN_CACHE_TTL_SECONDS", "60"))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("ORG_PLAN_CACHE_MAX_ENTRIES", "10000"))
+
+PLAN_PROJECTION = {"_id": 0, "plan": 1, "plan_type": 1, "created_at": 1}
+
+
+@dataclass(frozen=True)
+class OrgPlanSnapshot:
+    """Plan fields of an organizations document (raw values, None if missing)"""
+    org_id: str
+    exists: bool
+    plan_type: Optional[str] = None
+    plan: Optional[str] = None
+    created_at: Any = None
+
+    @classmethod
+    def from_doc(cls, org_id: str, doc: Optional[dict]) -> "OrgPlanSnapshot":
+        if not doc:
+            return cls(org_id=org_id, exists=False)
+        return cls(
+            org_id=org_id,
+            exists=True,
+            plan_type=doc.get("plan_type"),
+            plan=doc.get("plan"),
+            created_at=doc.get("created_at"),
+        )
+
+
+class OrgPlanCache:
+    """LRU + TTL cache of org_id → OrgPlanSnapshot"""
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def get(self, org_id: str) -> Optional[OrgPlanSnapshot]:
+        with self._lock:
+            entry = self._entries.get(org_id)
+            if entry is None:
+                self._misses += 1
+                return None
+            snapshot, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[org_id]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(org_id)
+            self._hits += 1
+            return snapshot
+
+    def set(self, snapshot: OrgPlanSnapshot) -> None:
+        # Unknown orgs are not cached so a just-created org is seen immediately
+        if not self.enabled or not snapshot.exists:
+            return
+        with self._lock:
+            self._entries[snapshot.org_id] = (snapshot, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(snapshot.org_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, org_id: str) -> bool:
+        with self._lock:
+            removed = self._entries.pop(org_id, None) is not None
+            if removed:
+                self._invalidations += 1
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+# Process-wide singleton
+_org_plan_cache = OrgPlanCache()
+
+
+def get_org_plan_cache() -> OrgPlanCache:
+    """Get the process-wide org plan cache"""
+    return _org_plan_cache
+
+
+async def get_org_plan_snapshot(db, org_id: str) -> OrgPlanSnapshot:
+    """Cached plan fields for an org (one organizations.find_one on a miss)"""
+    snapshot = _org_plan_cache.get(org_id)
+    if snapshot is not None:
+        return snapshot
+    doc = await db.organizations.find_one({"organization_id": org_id}, PLAN_PROJECTION)
+    snapshot = OrgPlanSnapshot.from_doc(org_id, doc)
+    _org_plan_cache.set(snapshot)
+    return snapshot
+
+
+def invalidate_org_plan(org_id: str) -> bool:
+    """Drop the cached snapshot after a plan change"""
+    return _org_plan_cache.invalidate(org_id)
@@ -17,6 +17,7 @@ from .models import (
     SubscriptionStatus, BillingCycle, UsageRecord,
     DEFAULT_PLANS, get_default_plan
 )
+from .plan_snapshot import invalidate_org_plan
 
 logger = logging.getLogger(__name__)
 
@@ -160,6 +161,7 @@ class SubscriptionService:
                 }
             }
         )
+        invalidate_org_plan(organization_id)
         
         logger.info(f"Created subscription {subscription.subscription_id} for org {organization_id} on plan {data.plan_code.value}")
         
@@ -206,6 +208,7 @@ class SubscriptionService:
                     {"organization_id": organization_id},
                     {"$set": {"plan_type": data.plan_code.value}}
                 )
+                invalidate_org_plan(organization_id)
         
         # Billing cycle change
         if data.billing_cycle:
@@ -40,6 +40,13 @@ from .guard import (
     enforce_tenant_isolation,
 )
 
+from .access_cache import (
+    TenantAccessCache,
+    get_tenant_access_cache,
+    invalidate_membership,
+    invalidate_org,
+)
+
 from .repository import (
     TenantRepository,
     TenantQueryBuilder,
@@ -114,6 +121,11 @@ __all__ = [
     "TenantGuardMiddleware",
     "tenant_boundary_check",
     "enforce_tenant_isolation",
+    # Access cache
+    "TenantAccessCache",
+    "get_tenant_access_cache",
+    "invalidate_membership",
+    "invalidate_org",
     # Repository
     "TenantRepository",
     "TenantQueryBuilder",
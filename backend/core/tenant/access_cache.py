@@ -0,0 +1,162 @@
+"""
+Tenant Access Cache
+===================
+
+Bounded, TTL-based in-process cache for the two checks TenantGuardMiddleware
+runs on every authenticated request:
+
+1. Membership   — organization_users.find_one(user_id, organization_id, status=active)
+2. Org status   — organizations.find_one(organization_id).is_active
+
+Entries are keyed by (user_id, org_id). Only confirmed memberships are cached;
+a failed membership check always goes back to MongoDB so newly-added users are
+never locked out by a stale negative entry.
+
+Invalidation:
+- invalidate_membership(user_id, org_id) — member added / removed / status change
+- invalidate_org(org_id)                 — org suspended / activated by platform admin
+
+The cache is per-process. The TTL bounds staleness across uvicorn workers,
+so keep it short (TENANT_ACCESS_CACHE_TTL_SECONDS, default 30s).
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_TTL_SECONDS = float(os.environ.get("TENANT_ACCESS_CACHE_TTL_SECONDS", "30"))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("TENANT_ACCESS_CACHE_MAX_ENTRIES", "10000"))
+
+
+@dataclass(frozen=True)
+class TenantAccessEntry:
+    """Cached result of the membership + org-status checks"""
+    is_member: bool
+    org_active: bool
+    expires_at: float
+
+
+class TenantAccessCache:
+    """
+    LRU + TTL cache of (user_id, org_id) → TenantAccessEntry.
+
+    Thread-safe (a lock guards the OrderedDict) so it can be shared with
+    sync code paths, although the middleware only uses it from the event loop.
+    """
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], TenantAccessEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def get(self, user_id: str, org_id: str) -> Optional[TenantAccessEntry]:
+        """Return a live entry or None (counts a hit or a miss)"""
+        key = (user_id, org_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def set(self, user_id: str, org_id: str, is_member: bool, org_active: bool) -> None:
+        """Store the result of a successful membership check"""
+        if not self.enabled or not is_member:
+            return
+        key = (user_id, org_id)
+        entry = TenantAccessEntry(
+            is_member=is_member,
+            org_active=org_active,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate_membership(self, user_id: str, org_id: Optional[str] = None) -> int:
+        """Drop cached access for a user (in one org, or in every org)"""
+        with self._lock:
+            if org_id is not None:
+                removed = 1 if self._entries.pop((user_id, org_id), None) else 0
+            else:
+                keys = [k for k in self._entries if k[0] == user_id]
+                for k in keys:
+                    del self._entries[k]
+                removed = len(keys)
+            self._invalidations += removed
+        return removed
+
+    def invalidate_org(self, org_id: str) -> int:
+        """Drop every cached entry for an organization"""
+        with self._lock:
+            keys = [k for k in self._entries if k[1] == org_id]
+            for k in keys:
+                del self._entries[k]
+            self._invalidations += len(keys)
+        if keys:
+            logger.debug(f"Tenant access cache: invalidated {len(keys)} entries for org {org_id}")
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+# Process-wide singleton
+_tenant_access_cache = TenantAccessCache()
+
+
+def get_tenant_access_cache() -> TenantAccessCache:
+    """Get the process-wide tenant access cache"""
+    return _tenant_access_cache
+
+
+def invalidate_membership(user_id: str, org_id: Optional[str] = None) -> int:
+    """Invalidate cached membership after organization_users writes"""
+    return _tenant_access_cache.invalidate_membership(user_id, org_id)
+
+
+def invalidate_org(org_id: str) -> int:
+    """Invalidate cached org status after suspend / activate"""
+    return _tenant_access_cache.invalidate_org(org_id)
@@ -20,10 +20,11 @@ from fastapi import Request, HTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
 import logging
-import re
 import os
 
+from middleware.pipeline import PipelineStage, RouteInfo, resolve_route
 from .context import TenantContext, get_tenant_context
+from .access_cache import get_tenant_access_cache
 from .exceptions import (
     TenantBoundaryViolation,
     TenantDataLeakAttempt,
@@ -381,7 +382,7 @@ def get_tenant_guard() -> TenantGuard:
     return _tenant_guard
 
 
-class TenantGuardMiddleware(BaseHTTPMiddleware):
+class TenantGuardMiddleware(PipelineStage, BaseHTTPMiddleware):
     """
     FastAPI middleware that ENFORCES tenant context on ALL requests.
     
@@ -493,7 +494,7 @@ class TenantGuardMiddleware(BaseHTTPMiddleware):
         "/api/v1/platform/version",
     }
     
-    # Patterns for public endpoints
+    # Patterns for public endpoints (compiled into the shared route trie)
     PUBLIC_PATTERNS = [
         r"^/api/public/.*",
         r"^/api/v1/public/.*",
@@ -529,18 +530,18 @@ class TenantGuardMiddleware(BaseHTTPMiddleware):
         """Set database reference"""
         cls._db = db
     
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
+    async def before(self, request: Request, route: RouteInfo):
+        path = route.path
         method = request.method
         
         # Skip OPTIONS requests (CORS preflight)
         if method == "OPTIONS":
-            return await call_next(request)
+            return None
         
         # Skip public endpoints
-        if self._is_public(path):
+        if route.tenant_public:
             logger.debug(f"Public route, skipping tenant check: {path}")
-            return await call_next(request)
+            return None
         
         # === ENFORCEMENT MODE: All other routes MUST have tenant context ===
         
@@ -557,16 +558,15 @@ class TenantGuardMiddleware(BaseHTTPMiddleware):
             
             # Platform admin routes: validate JWT but skip org context requirement.
             # Platform admins operate across all orgs and may not belong to any.
-            _platform_prefix = (path.startswith("/api/platform/") or
-                                path.startswith("/api/v1/platform/"))
-            if _platform_prefix and user_role == "platform_admin":
+            if route.is_platform and user_role == "platform_admin":
                 request.state.tenant_org_id = None
                 request.state.tenant_user_id = user_id
                 request.state.tenant_user_role = user_role
+                request.state.tenant_guard_enforced = True
                 logger.debug(
                     f"TENANT GUARD: Platform admin pass-through for {user_id} on {path}"
                 )
-                return await call_next(request)
+                return None
 
             # Resolve organization_id
             org_id = await self._resolve_org_id(request, user_id, token_org_id)
@@ -582,7 +582,8 @@ class TenantGuardMiddleware(BaseHTTPMiddleware):
                 )
             
             # CRITICAL: Validate user is member of this organization
-            is_member = await self._validate_membership(user_id, org_id)
+            # (membership + org status served from the TTL access cache when warm)
+            is_member, org_active = await self._check_access(user_id, org_id)
             
             if not is_member:
                 logger.error(
@@ -598,24 +599,21 @@ class TenantGuardMiddleware(BaseHTTPMiddleware):
                 )
 
             # Check org suspension status
-            if self._db is not None:
-                org_doc = await self._db.organizations.find_one(
-                    {"organization_id": org_id}, {"_id": 0, "is_active": 1}
+            if not org_active:
+                logger.warning(f"TENANT GUARD: Suspended org {org_id} access attempt by {user_id}")
+                return JSONResponse(
+                    status_code=403,
+                    content={
+                        "detail": "Your organization has been suspended. Please contact support.",
+                        "code": "ORG_SUSPENDED"
+                    }
                 )
-                if org_doc and not org_doc.get("is_active", True):
-                    logger.warning(f"TENANT GUARD: Suspended org {org_id} access attempt by {user_id}")
-                    return JSONResponse(
-                        status_code=403,
-                        content={
-                            "detail": "Your organization has been suspended. Please contact support.",
-                            "code": "ORG_SUSPENDED"
-                        }
-                    )
             
             # Set tenant context on request state for downstream handlers
             request.state.tenant_org_id = org_id
             request.state.tenant_user_id = user_id
             request.state.tenant_user_role = user_role or "viewer"
+            request.state.tenant_guard_enforced = True
             
             # Also try to build full TenantContext for routes that use it
             try:
@@ -642,23 +640,31 @@ class TenantGuardMiddleware(BaseHTTPMiddleware):
                 logger.debug(f"Could not build full TenantContext: {e}")
             
             logger.debug(f"TENANT GUARD: Authorized - org={org_id}, user={user_id}, path={path}")
-            
-            # Continue to route handler
-            response = await call_next(request)
-            
-            # Add tenant headers for debugging
-            response.headers["X-Tenant-ID"] = org_id
-            
-            return response
+            return None
             
         except HTTPException as e:
             return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
         except Exception as e:
-            logger.exception(f"TENANT GUARD ERROR: {e}")
-            return JSONResponse(
-                status_code=500,
-                content={"detail": "Internal server error during tenant validation"}
-            )
+            return self._internal_error(e)
+    
+    def after(self, request: Request, route: RouteInfo, headers):
+        # Add tenant headers for debugging
+        org_id = getattr(request.state, "tenant_org_id", None)
+        if org_id and getattr(request.state, "tenant_guard_enforced", False):
+            headers["X-Tenant-ID"] = org_id
+    
+    def on_error(self, request: Request, route: RouteInfo, exc: Exception):
+        # Unhandled errors on tenant-enforced routes get the guard's JSON 500
+        if getattr(request.state, "tenant_guard_enforced", False):
+            return self._internal_error(exc)
+        return None
+    
+    def _internal_error(self, exc: Exception) -> JSONResponse:
+        logger.exception(f"TENANT GUARD ERROR: {exc}")
+        return JSONResponse(
+            status_code=500,
+            content={"detail": "Internal server error during tenant validation"}
+        )
     
     async def _extract_jwt_claims(self, request: Request) -> tuple:
         """Extract user_id, org_id, role from JWT"""
@@ -729,6 +735,37 @@ class TenantGuardMiddleware(BaseHTTPMiddleware):
         
         return None
     
+    async def _check_access(self, user_id: str, org_id: str) -> tuple:
+        """
+        Return (is_member, org_active) for user_id in org_id.
+        
+        Served from the tenant access cache when possible; on a miss both
+        checks hit MongoDB and a positive result is cached until its TTL
+        expires or it is explicitly invalidated.
+        """
+        cache = get_tenant_access_cache()
+        entry = cache.get(user_id, org_id)
+        if entry is not None:
+            return entry.is_member, entry.org_active
+        
+        is_member = await self._validate_membership(user_id, org_id)
+        if not is_member:
+            return False, True
+        
+        org_active = await self._check_org_active(org_id)
+        cache.set(user_id, org_id, is_member=True, org_active=org_active)
+        return True, org_active
+    
+    async def _check_org_active(self, org_id: str) -> bool:
+        """Check org suspension status (missing org doc counts as active)"""
+        if self._db is None:
+            return True
+        
+        org_doc = await self._db.organizations.find_one(
+            {"organization_id": org_id}, {"_id": 0, "is_active": 1}
+        )
+        return not (org_doc and not org_doc.get("is_active", True))
+    
     async def _validate_membership(self, user_id: str, org_id: str) -> bool:
         """CRITICAL: Validate user is member of organization"""
         if self._db is None:
@@ -739,20 +776,13 @@ class TenantGuardMiddleware(BaseHTTPMiddleware):
             "user_id": user_id,
             "organization_id": org_id,
             "status": "active"
-        })
+        }, {"_id": 1})
         
         return membership is not None
     
     def _is_public(self, path: str) -> bool:
         """Check if path is public"""
-        if path in self.PUBLIC_ENDPOINTS:
-            return True
-        
-        for pattern in self.PUBLIC_PATTERNS:
-            if re.match(pattern, path):
-                return True
-        
-        return False
+        return resolve_route(path).tenant_public
 
 
 def tenant_boundary_check(collection: str):
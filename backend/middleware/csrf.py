@@ -16,10 +16,13 @@ How it works:
 import secrets
 import logging
 import os
+from starlette.datastructures import MutableHeaders
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import Response, JSONResponse
 
+from middleware.pipeline import PipelineStage, RouteInfo
+
 logger = logging.getLogger(__name__)
 
 SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
@@ -73,29 +76,25 @@ CSRF_COOKIE = "csrftoken"
 CSRF_HEADER = "x-csrf-token"
 
 
-class CSRFMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+class CSRFMiddleware(PipelineStage, BaseHTTPMiddleware):
+    async def before(self, request: Request, route: RouteInfo):
         method = request.method.upper()
 
-        # Safe methods — skip validation, ensure cookie is set
+        # Safe methods — skip validation, cookie is ensured in after()
         if method in SAFE_METHODS:
-            response = await call_next(request)
-            _ensure_csrf_cookie(request, response)
-            return response
+            return None
 
         # Bypass: Bearer-token auth (JWT clients, no CSRF risk)
         auth_header = request.headers.get("authorization", "")
         if auth_header.startswith("Bearer "):
-            response = await call_next(request)
-            return response
+            return None
 
         # Bypass: explicitly exempt paths
-        path = request.url.path
-        if path in CSRF_EXEMPT_PATHS or any(path.startswith(p) for p in CSRF_EXEMPT_PREFIXES):
-            response = await call_next(request)
-            return response
+        if route.csrf_exempt:
+            return None
 
         # --- State-changing request without Bearer → validate CSRF ---
+        path = route.path
         cookie_token = request.cookies.get(CSRF_COOKIE)
         header_token = request.headers.get(CSRF_HEADER)
 
@@ -114,16 +113,21 @@ class CSRFMiddleware(BaseHTTPMiddleware):
             )
 
         # Valid — proceed
-        response = await call_next(request)
-        _ensure_csrf_cookie(request, response)
-        return response
+        return None
+
+    def after(self, request: Request, route: RouteInfo, headers: MutableHeaders):
+        # Safe methods — ensure cookie is set. (A validated write already
+        # carries the cookie; Bearer and exempt writes never touch it.)
+        if request.method.upper() in SAFE_METHODS:
+            _ensure_csrf_cookie(request, headers)
 
 
-def _ensure_csrf_cookie(request: Request, response: Response):
+def _ensure_csrf_cookie(request: Request, headers: MutableHeaders):
     """Set the CSRF cookie if the client doesn't already have one."""
     if not request.cookies.get(CSRF_COOKIE):
         token = secrets.token_hex(32)
-        response.set_cookie(
+        cookie = Response()
+        cookie.set_cookie(
             key=CSRF_COOKIE,
             value=token,
             httponly=False,
@@ -131,3 +135,4 @@ def _ensure_csrf_cookie(request: Request, response: Response):
             samesite="lax",
             path="/",
         )
+        headers.append("set-cookie", cookie.headers["set-cookie"])
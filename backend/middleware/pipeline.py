@@ -0,0 +1,496 @@
+"""
+Request Pipeline — single pure-ASGI middleware
+===============================================
+
+Replaces the stack of six BaseHTTPMiddleware layers plus the two
+@app.middleware("http") functions that used to live in server.py.
+
+Each BaseHTTPMiddleware layer cost a task hop and a response wrap, and each
+one re-parsed the path and walked its own regex list. The pipeline instead:
+
+1. Applies the legacy /efi → /evfi path rewrite (once, on the scope).
+2. Resolves the route ONCE against a single compiled prefix trie that holds
+   every routing table (TenantGuard / RBAC public lists, RBAC role map,
+   rate-limit categories, CSRF exemptions, plan gating, sanitization
+   exemptions) and produces a RouteInfo.
+3. Runs each stage's ``before(request, route)`` in order. A stage may
+   short-circuit by returning a Response.
+4. Calls the app once, applying each entered stage's
+   ``after(request, route, headers)`` in reverse order on
+   ``http.response.start`` (onion semantics, same as the old stack).
+
+Stage order (request flow) is unchanged:
+    CORS → SecurityHeaders → CSRF → RateLimit → TenantGuard(Auth) → RBAC
+         → PlanEnforcement → Sanitization → FinancialVersion → Route
+
+FinancialVersion only has an after-hook (report cache invalidation).
+
+The stage classes (CSRFMiddleware, RateLimitMiddleware, ...) remain
+BaseHTTPMiddleware subclasses, so any one of them can still be mounted on
+its own; their ``dispatch`` is the generic adapter in PipelineStage.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Route trie
+# ---------------------------------------------------------------------------
+
+# Match kinds stored on trie nodes
+EXACT = "exact"        # path == literal
+PREFIX = "prefix"      # path.startswith(literal)
+SEGMENT = "segment"    # literal + one non-empty path segment (no further "/")
+
+# Table resolution modes
+FIRST = "first"        # lowest registration priority wins (regex list / dict order)
+LONGEST = "longest"    # longest matching literal wins (PLAN_GATED_ROUTES)
+ANY = "any"            # boolean: any match
+
+_LITERAL_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789/_-.")
+
+
+def _expand_optional_chars(body: str) -> List[str]:
+    """Expand single-character optionals ("e?v?fi") into literal variants"""
+    variants = [""]
+    i = 0
+    while i < len(body):
+        ch = body[i]
+        if ch not in _LITERAL_CHARS:
+            raise ValueError(f"Unsupported pattern character {ch!r} in {body!r}")
+        if i + 1 < len(body) and body[i + 1] == "?":
+            variants = [v + suffix for v in variants for suffix in ("", ch)]
+            i += 2
+        else:
+            variants = [v + ch for v in variants]
+            i += 1
+    return variants
+
+
+def compile_route_pattern(pattern: str) -> List[Tuple[str, str]]:
+    """
+    Translate one of the anchored route regexes used by the middleware tables
+    into (kind, literal) trie entries.
+
+    Supported forms (all must start with "^"):
+        ^LIT$          → exact
+        ^LIT.*$ / ^LIT.*  / ^LIT  (re.match without "$") → prefix
+        ^LIT(/.*)?$    → exact LIT + prefix LIT/
+        ^LIT[^/]+$     → LIT followed by exactly one segment
+    LIT may contain single-character optionals ("e?v?fi").
+
+    Raises ValueError for anything else so a new table entry that the trie
+    cannot represent fails at startup instead of silently never matching.
+    """
+    if not pattern.startswith("^"):
+        raise ValueError(f"Route pattern must be anchored: {pattern!r}")
+    body = pattern[1:]
+
+    if body.endswith("(/.*)?$"):
+        literals = _expand_optional_chars(body[: -len("(/.*)?$")])
+        return [(EXACT, lit) for lit in literals] + [(PREFIX, lit + "/") for lit in literals]
+    if body.endswith("[^/]+$"):
+        return [(SEGMENT, lit) for lit in _expand_optional_chars(body[: -len("[^/]+$")])]
+    if body.endswith(".*$"):
+        return [(PREFIX, lit) for lit in _expand_optional_chars(body[: -len(".*$")])]
+    if body.endswith(".*"):
+        return [(PREFIX, lit) for lit in _expand_optional_chars(body[: -len(".*")])]
+    if body.endswith("$"):
+        return [(EXACT, lit) for lit in _expand_optional_chars(body[:-1])]
+    return [(PREFIX, lit) for lit in _expand_optional_chars(body)]
+
+
+class _TrieNode:
+    __slots__ = ("children", "entries")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        # (table, priority, kind, value)
+        self.entries: List[Tuple[str, int, str, Any]] = []
+
+
+class RouteTrie:
+    """
+    Character-level prefix trie shared by every routing table.
+
+    A single walk over the path collects the matches for all tables at once;
+    each table is then resolved according to its mode.
+    """
+
+    def __init__(self):
+        self._root = _TrieNode()
+        self._modes: Dict[str, str] = {}
+        self._defaults: Dict[str, Any] = {}
+        self._next_priority: Dict[str, int] = {}
+
+    def add_table(self, table: str, mode: str, default: Any = None) -> None:
+        self._modes[table] = mode
+        self._defaults[table] = default
+        self._next_priority.setdefault(table, 0)
+
+    def add(self, table: str, kind: str, literal: str, value: Any = True, priority: Optional[int] = None) -> None:
+        if table not in self._modes:
+            raise KeyError(f"Unknown route table {table!r}")
+        if priority is None:
+            priority = self._next_priority[table]
+        self._next_priority[table] = max(self._next_priority[table], priority + 1)
+        node = self._root
+        for ch in literal:
+            node = node.children.setdefault(ch, _TrieNode())
+        node.entries.append((table, priority, kind, value))
+
+    def add_pattern(self, table: str, pattern: str, value: Any = True) -> None:
+        """Register a regex-style pattern (see compile_route_pattern) as one priority slot"""
+        priority = self._next_priority[table]
+        for kind, literal in compile_route_pattern(pattern):
+            self.add(table, kind, literal, value, priority=priority)
+
+    def match(self, path: str) -> Dict[str, Any]:
+        """Resolve every table for a path in a single walk"""
+        best: Dict[str, Tuple[int, Any]] = {}
+        modes = self._modes
+        node = self._root
+        depth = 0
+        path_len = len(path)
+
+        while True:
+            if node.entries:
+                at_end = depth == path_len
+                for table, priority, kind, value in node.entries:
+                    if kind == PREFIX:
+                        pass
+                    elif kind == EXACT:
+                        if not at_end:
+                            continue
+                    elif at_end or "/" in path[depth:]:  # SEGMENT
+                        continue
+                    mode = modes[table]
+                    current = best.get(table)
+                    if current is None:
+                        best[table] = (priority, value)
+                    elif mode == FIRST and priority < current[0]:
+                        best[table] = (priority, value)
+                    elif mode == LONGEST:
+                        best[table] = (priority, value)  # deeper node == longer literal
+            if depth == path_len:
+                break
+            node = node.children.get(path[depth])
+            if node is None:
+                break
+            depth += 1
+
+        result = dict(self._defaults)
+        for table, (_, value) in best.items():
+            result[table] = value
+        return result
+
+
+# ---------------------------------------------------------------------------
+# Route resolution
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class RouteInfo:
+    """Everything the pipeline stages need to know about a path"""
+    path: str
+    tenant_public: bool = False
+    rbac_public: bool = False
+    allowed_roles: Optional[List[str]] = None
+    rate_category: str = "standard"
+    csrf_exempt: bool = False
+    plan_skip: bool = False
+    min_plan: Optional[str] = None
+    sanitize_exempt: bool = False
+    is_platform: bool = False
+
+
+_V1 = "/api/v1/"
+
+
+def _add_rbac_pattern(trie: RouteTrie, pattern: str, roles: List[str]) -> None:
+    """
+    RBAC role patterns are written against /api/... and matched after
+    stripping /v1 (/api/v1/x → /api/x). Register each literal under both
+    spellings so the raw path can be matched directly.
+    """
+    priority = trie._next_priority["allowed_roles"]
+    for kind, literal in compile_route_pattern(pattern):
+        if not literal.startswith("/api/"):
+            raise ValueError(f"RBAC pattern must start with /api/: {pattern!r}")
+        trie.add("allowed_roles", kind, _V1 + literal[len("/api/"):], roles, priority=priority)
+        # The literal itself is only reachable when it cannot overlap /api/v1/...
+        if not literal.startswith(_V1) and not _V1.startswith(literal):
+            trie.add("allowed_roles", kind, literal, roles, priority=priority)
+
+
+def build_route_trie() -> RouteTrie:
+    """Compile every middleware routing table into one trie"""
+    from core.tenant.guard import TenantGuardMiddleware
+    from middleware.rbac import RBACMiddleware, ROUTE_PERMISSIONS
+    from middleware.rate_limit import RateLimitMiddleware
+    from middleware.csrf import CSRF_EXEMPT_PATHS, CSRF_EXEMPT_PREFIXES
+    from middleware.plan_enforcement import PLAN_GATED_ROUTES, SKIP_PREFIXES
+    from middleware.sanitization import EXEMPT_PATHS as SANITIZE_EXEMPT_PATHS
+
+    trie = RouteTrie()
+    trie.add_table("tenant_public", ANY, False)
+    trie.add_table("rbac_public", ANY, False)
+    trie.add_table("allowed_roles", FIRST, None)
+    trie.add_table("rate_category", FIRST, "standard")
+    trie.add_table("csrf_exempt", ANY, False)
+    trie.add_table("plan_skip", ANY, False)
+    trie.add_table("min_plan", LONGEST, None)
+    trie.add_table("sanitize_exempt", ANY, False)
+
+    # TenantGuard public routes (exact set + re.match patterns)
+    for path in TenantGuardMiddleware.PUBLIC_ENDPOINTS:
+        trie.add("tenant_public", EXACT, path)
+    for pattern in TenantGuardMiddleware.PUBLIC_PATTERNS:
+        trie.add_pattern("tenant_public", pattern)
+
+    # RBAC public routes + role map
+    for path in RBACMiddleware.PUBLIC_ENDPOINTS:
+        trie.add("rbac_public", EXACT, path)
+    for pattern in RBACMiddleware.PUBLIC_PATTERNS:
+        trie.add_pattern("rbac_public", pattern)
+    for pattern, roles in ROUTE_PERMISSIONS.items():
+        _add_rbac_pattern(trie, pattern, roles)
+
+    # Rate-limit categories: exempt paths, then auth → ai → public
+    for path in RateLimitMiddleware.EXEMPT_PATHS:
+        trie.add("rate_category", EXACT, path, "exempt", priority=0)
+    for pattern, category in RateLimitMiddleware.AUTH_PATTERNS:
+        trie.add_pattern("rate_category", pattern, category)
+    for pattern in RateLimitMiddleware.AI_PATTERNS:
+        trie.add_pattern("rate_category", pattern, "ai")
+    for pattern in RateLimitMiddleware.PUBLIC_PATTERNS:
+        trie.add_pattern("rate_category", pattern, "public")
+
+    # CSRF exemptions
+    for path in CSRF_EXEMPT_PATHS:
+        trie.add("csrf_exempt", EXACT, path)
+    for prefix in CSRF_EXEMPT_PREFIXES:
+        trie.add("csrf_exempt", PREFIX, prefix)
+
+    # Plan gating (longest prefix wins)
+    for prefix in SKIP_PREFIXES:
+        trie.add("plan_skip", PREFIX, prefix)
+    for prefix, plan in PLAN_GATED_ROUTES.items():
+        trie.add("min_plan", PREFIX, prefix, plan)
+
+    # Sanitization exemptions
+    for prefix in SANITIZE_EXEMPT_PATHS:
+        trie.add("sanitize_exempt", PREFIX, prefix)
+
+    logger.info("Route trie compiled")
+    return trie
+
+
+_route_trie: Optional[RouteTrie] = None
+
+
+def get_route_trie() -> RouteTrie:
+    """Get (building on first use) the shared route trie"""
+    global _route_trie
+    if _route_trie is None:
+        _route_trie = build_route_trie()
+    return _route_trie
+
+
+def resolve_route(path: str) -> RouteInfo:
+    """Resolve a request path against every middleware table in one walk"""
+    tables = get_route_trie().match(path)
+    return RouteInfo(
+        path=path,
+        is_platform=path.startswith("/api/platform/") or path.startswith("/api/v1/platform/"),
+        **tables,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------------
+
+class PipelineStage:
+    """
+    Base for pipeline stages.
+
+    before()   — run on the way in; return a Response to short-circuit.
+    after()    — run on the way out on whatever response passes back
+                 through this stage (including short-circuits from later
+                 stages); may mutate headers.
+    on_error() — the app raised before sending a response; return a
+                 fallback Response to swallow the error.
+
+    ``dispatch`` lets a stage still be mounted on its own as a
+    BaseHTTPMiddleware.
+    """
+
+    async def before(self, request: Request, route: RouteInfo) -> Optional[Response]:
+        return None
+
+    def after(self, request: Request, route: RouteInfo, headers: MutableHeaders) -> None:
+        return None
+
+    def on_error(self, request: Request, route: RouteInfo, exc: Exception) -> Optional[Response]:
+        return None
+
+    async def dispatch(self, request: Request, call_next):
+        route = resolve_route(request.url.path)
+        early = await self.before(request, route)
+        if early is not None:
+            return early
+        try:
+            response = await call_next(request)
+        except Exception as exc:
+            fallback = self.on_error(request, route, exc)
+            if fallback is None:
+                raise
+            return fallback
+        self.after(request, route, response.headers)
+        return response
+
+
+class SecurityHeadersStage(PipelineStage):
+    """Adds the standard security headers to every response"""
+
+    HEADERS = {
+        "X-Content-Type-Options": "nosniff",
+        "X-Frame-Options": "DENY",
+        "Strict-Transport-Security": "max-age=31536000; includeSubDomains",
+        "X-XSS-Protection": "1; mode=block",
+        "Referrer-Policy": "strict-origin-when-cross-origin",
+        "Content-Security-Policy": "default-src 'self'; connect-src 'self' https://*.emergentagent.com https://*.emergent.host https://*.battwheels.com; frame-ancestors 'none';",
+    }
+
+    def after(self, request: Request, route: RouteInfo, headers: MutableHeaders) -> None:
+        for name, value in self.HEADERS.items():
+            headers[name] = value
+
+
+class FinancialVersionStage(PipelineStage):
+    """
+    Bumps the org's financial data version (services/report_cache.py) on the
+    way out of a write to an invoice / payment / bill / ledger route, so
+    cached dashboards and reports recompute. Error responses bump too; an
+    extra recompute is cheaper than a missed invalidation.
+    """
+
+    def after(self, request: Request, route: RouteInfo, headers: MutableHeaders) -> None:
+        from services.report_cache import is_financial_write, bump_financial_version
+
+        if is_financial_write(request.method, route.path):
+            bump_financial_version(getattr(request.state, "tenant_org_id", None))
+
+
+def rewrite_legacy_paths(scope: Dict[str, Any]) -> None:
+    """Rewrite old /efi paths to /evfi for backward compatibility."""
+    path = scope.get("path", "")
+    if "/efi" in path and "/evfi" not in path:
+        scope["path"] = path.replace("/efi-guided", "/evfi-guided").replace("/efi", "/evfi")
+
+
+def default_stages() -> List[PipelineStage]:
+    """The production stage list, in request-flow order"""
+    from core.tenant.guard import TenantGuardMiddleware
+    from middleware.csrf import CSRFMiddleware
+    from middleware.rate_limit import RateLimitMiddleware
+    from middleware.rbac import RBACMiddleware
+    from middleware.plan_enforcement import PlanEnforcementMiddleware
+    from middleware.sanitization import SanitizationMiddleware
+
+    return [
+        SecurityHeadersStage(),
+        CSRFMiddleware(app=None),
+        RateLimitMiddleware(app=None),
+        TenantGuardMiddleware(app=None),
+        RBACMiddleware(app=None),
+        PlanEnforcementMiddleware(app=None),
+        SanitizationMiddleware(app=None),
+        FinancialVersionStage(),
+    ]
+
+
+# ---------------------------------------------------------------------------
+# ASGI middleware
+# ---------------------------------------------------------------------------
+
+def _replay_body(body: bytes, receive):
+    """Receive callable that replays an already-read (possibly rewritten) body"""
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
+
+
+class RequestPipelineMiddleware:
+    """Single pure-ASGI middleware running every request stage in order"""
+
+    def __init__(self, app, stages: Optional[Sequence[PipelineStage]] = None):
+        self.app = app
+        self.stages = list(stages) if stages is not None else default_stages()
+        get_route_trie()  # compile at startup, fail loudly on bad tables
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rewrite_legacy_paths(scope)
+        request = Request(scope, receive)
+        route = resolve_route(scope["path"])
+
+        entered: List[PipelineStage] = []
+        for stage in self.stages:
+            early = await stage.before(request, route)
+            if early is not None:
+                await self._respond(early, entered, request, route, send)
+                return
+            entered.append(stage)
+
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                headers = MutableHeaders(scope=message)
+                for stage in reversed(entered):
+                    stage.after(request, route, headers)
+            await send(message)
+
+        body = getattr(request, "_body", None)
+        app_receive = _replay_body(body, receive) if body is not None else receive
+
+        try:
+            await self.app(scope, app_receive, send_wrapper)
+        except Exception as exc:
+            if response_started:
+                raise
+            for i in range(len(entered) - 1, -1, -1):
+                fallback = entered[i].on_error(request, route, exc)
+                if fallback is not None:
+                    await self._respond(fallback, entered[:i], request, route, send)
+                    return
+            raise
+
+    async def _respond(self, response: Response, stages: List[PipelineStage], request: Request,
+                       route: RouteInfo, send) -> None:
+        """Send a stage-generated response through the after-hooks of the outer stages"""
+        for stage in reversed(stages):
+            stage.after(request, route, response.headers)
+        await response(request.scope, request.receive, send)
@@ -9,6 +9,9 @@ import logging
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
 
+from middleware.pipeline import PipelineStage, RouteInfo
+from core.subscriptions.plan_snapshot import get_org_plan_snapshot
+
 logger = logging.getLogger(__name__)
 
 # route_prefix → minimum plan required
@@ -75,47 +78,35 @@ def set_plan_enforcement_db(db):
     global _db
     _db = db
 
-class PlanEnforcementMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
+class PlanEnforcementMiddleware(PipelineStage, BaseHTTPMiddleware):
+    async def before(self, request, route: RouteInfo):
         # Only gate write operations
         if request.method in ("GET", "OPTIONS", "HEAD"):
-            return await call_next(request)
-
-        path = request.url.path
+            return None
 
         # Skip public endpoints
-        if any(path.startswith(p) for p in SKIP_PREFIXES):
-            return await call_next(request)
+        if route.plan_skip:
+            return None
 
-        # Check if route is gated
-        matched_prefix = None
-        min_plan = None
-        for route_prefix, required_plan in PLAN_GATED_ROUTES.items():
-            if path.startswith(route_prefix):
-                if matched_prefix is None or len(route_prefix) > len(matched_prefix):
-                    matched_prefix = route_prefix
-                    min_plan = required_plan
-
-        if not matched_prefix:
-            return await call_next(request)
+        # Check if route is gated (longest matching prefix, resolved by the route trie)
+        min_plan = route.min_plan
+        if not min_plan:
+            return None
 
         # Get org_id from tenant middleware
         org_id = getattr(request.state, "tenant_org_id", None)
         if not org_id:
-            return await call_next(request)
+            return None
 
         if _db is None:
-            return await call_next(request)
+            return None
 
-        # Fetch org's plan
+        # Fetch org's plan (shared snapshot cache)
         try:
-            org = await _db.organizations.find_one(
-                {"organization_id": org_id},
-                {"_id": 0, "plan_type": 1}
-            )
-            user_plan = (org.get("plan_type", "free_trial") if org else "free_trial").lower()
+            snapshot = await get_org_plan_snapshot(_db, org_id)
+            user_plan = (snapshot.plan_type or "free_trial").lower()
         except Exception:
-            return await call_next(request)
+            return None
 
         user_level = PLAN_HIERARCHY.get(user_plan, 0)
         required_level = PLAN_HIERARCHY.get(min_plan, 0)
@@ -132,4 +123,4 @@ class PlanEnforcementMiddleware(BaseHTTPMiddleware):
                 }
             )
 
-        return await call_next(request)
+        return None
@@ -2,7 +2,9 @@
 Battwheels OS - Rate Limiting Middleware
 =========================================
 
-Protects against abuse and controls AI costs using slowapi.
+Protects against abuse and controls AI costs. RateLimitMiddleware checks a
+GCRA token bucket per key in a pluggable store (middleware/rate_limit_store.py),
+shared across workers via MongoDB; slowapi decorators remain for route-level limits.
 
 Rate limit tiers:
 - Auth endpoints: 5/min per IP (login), 3/hour per IP (register)
@@ -20,7 +22,9 @@ from slowapi.middleware import SlowAPIMiddleware
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
-import re
+
+from middleware.pipeline import PipelineStage, RouteInfo, resolve_route
+from middleware.rate_limit_store import RateLimitRule, get_rate_limit_store
 
 logger = logging.getLogger(__name__)
 
@@ -74,10 +78,23 @@ RATE_LIMITS = {
 }
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+# Enforced by RateLimitMiddleware (token bucket: `limit` per `window` seconds)
+CATEGORY_RULES = {
+    "ai": RateLimitRule(limit=20, window=60),
+    "auth_login": RateLimitRule(limit=10, window=60),
+    "auth_register": RateLimitRule(limit=3, window=3600),
+    "public": RateLimitRule(limit=60, window=60),
+    "standard": RateLimitRule(limit=300, window=60),
+}
+
+
+class RateLimitMiddleware(PipelineStage, BaseHTTPMiddleware):
     """
     Middleware that applies rate limiting based on route patterns.
     Works with slowapi but provides custom categorization.
+    
+    The pattern lists below are compiled into the shared route trie
+    (middleware/pipeline.py); RouteInfo.rate_category carries the result.
     """
     
     # Route patterns and their rate limit categories
@@ -105,80 +122,57 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         r"^/api/book-demo$",
     ]
     
+    # Never rate limited (health checks / docs)
+    EXEMPT_PATHS = ("/api/health", "/", "/docs", "/openapi.json")
+    
     def __init__(self, app, redis_url: str = None):
         super().__init__(app)
         self.redis_url = redis_url
-        # In-memory rate limit tracking (use Redis in production)
-        self._request_counts = {}
         logger.info("RateLimitMiddleware initialized")
     
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
-        method = request.method
-        
+    async def before(self, request: Request, route: RouteInfo):
         # Skip OPTIONS
-        if method == "OPTIONS":
-            return await call_next(request)
+        if request.method == "OPTIONS":
+            return None
         
         # Skip health checks
-        if path in ["/api/health", "/", "/docs", "/openapi.json"]:
-            return await call_next(request)
+        category = route.rate_category
+        if category == "exempt":
+            return None
         
         # Bypass rate limiting entirely during test runs
         if os.environ.get("TESTING") == "1":
-            return await call_next(request)
-        
-        # Determine rate limit category
-        category = self._get_category(path)
-        
-        if category:
-            # Check rate limit
-            is_allowed, retry_after = await self._check_rate_limit(request, category)
-            
-            if not is_allowed:
-                logger.warning(f"Rate limit exceeded: {path} - category: {category}")
-                return JSONResponse(
-                    status_code=429,
-                    content={
-                        "error": "rate_limit_exceeded",
-                        "retry_after": retry_after,
-                        "message": "Too many requests. Please wait before retrying."
-                    },
-                    headers={"Retry-After": str(retry_after)}
-                )
-        
-        return await call_next(request)
+            return None
+        
+        # Check rate limit
+        is_allowed, retry_after = await self._check_rate_limit(request, category)
+        
+        if not is_allowed:
+            logger.warning(f"Rate limit exceeded: {route.path} - category: {category}")
+            return JSONResponse(
+                status_code=429,
+                content={
+                    "error": "rate_limit_exceeded",
+                    "retry_after": retry_after,
+                    "message": "Too many requests. Please wait before retrying."
+                },
+                headers={"Retry-After": str(retry_after)}
+            )
+        
+        return None
     
     def _get_category(self, path: str) -> str:
         """Determine rate limit category for a path"""
-        # Check auth patterns
-        for pattern, category in self.AUTH_PATTERNS:
-            if re.match(pattern, path):
-                return category
-        
-        # Check AI patterns
-        for pattern in self.AI_PATTERNS:
-            if re.match(pattern, path):
-                return "ai"
-        
-        # Check public patterns
-        for pattern in self.PUBLIC_PATTERNS:
-            if re.match(pattern, path):
-                return "public"
-        
-        # Default to standard
-        return "standard"
+        return resolve_route(path).rate_category
     
     async def _check_rate_limit(self, request: Request, category: str) -> tuple:
         """
         Check if request is within rate limits.
         Returns (is_allowed, retry_after_seconds)
         
-        Note: This is a simple in-memory implementation.
-        For production, use Redis with slowapi.
+        One GCRA step against the active store (middleware/rate_limit_store.py),
+        shared across workers when the Mongo backend is enabled.
         """
-        import time
-        
         # Get appropriate key
         if category in ["auth_login", "auth_register", "auth_password_reset", "public"]:
             key = get_remote_address(request)
@@ -187,46 +181,8 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         else:
             key = get_rate_limit_key(request)
         
-        # Get limits
-        if category == "ai":
-            max_per_minute = 20
-            window = 60
-        elif category == "auth_login":
-            max_per_minute = 10
-            window = 60
-        elif category == "auth_register":
-            max_per_minute = 3
-            window = 3600  # per hour
-        elif category == "public":
-            max_per_minute = 60
-            window = 60
-        else:
-            max_per_minute = 300
-            window = 60
-        
-        # Simple rate limiting with sliding window
-        now = time.time()
-        cache_key = f"{category}:{key}"
-        
-        if cache_key not in self._request_counts:
-            self._request_counts[cache_key] = []
-        
-        # Clean old entries
-        self._request_counts[cache_key] = [
-            t for t in self._request_counts[cache_key]
-            if now - t < window
-        ]
-        
-        # Check limit
-        if len(self._request_counts[cache_key]) >= max_per_minute:
-            # Calculate retry_after
-            oldest = min(self._request_counts[cache_key])
-            retry_after = int(window - (now - oldest)) + 1
-            return False, retry_after
-        
-        # Record this request
-        self._request_counts[cache_key].append(now)
-        return True, 0
+        rule = CATEGORY_RULES.get(category, CATEGORY_RULES["standard"])
+        return await get_rate_limit_store().check(f"{category}:{key}", rule)
 
 
 def setup_rate_limiting(app):
@@ -0,0 +1,206 @@
+"""
+Rate Limit Stores — GCRA token bucket
+=====================================
+
+Backends for RateLimitMiddleware. Every check is a single GCRA
+(generic cell rate algorithm) step: each key stores one number, the
+"theoretical arrival time" (TAT), so a check is O(1) in time and memory
+regardless of the limit size — no per-request timestamp lists.
+
+For a rule of `limit` requests per `window` seconds:
+    interval  = window / limit          (one token refills every interval)
+    new_tat   = max(tat, now) + interval
+    allowed   = new_tat - now <= window (bucket holds at most `limit` tokens)
+    retry     = new_tat - window - now  (when denied)
+
+Stores:
+- InMemoryRateLimitStore — per-process, LRU-bounded (RATE_LIMIT_MAX_KEYS)
+- MongoRateLimitStore    — shared across uvicorn workers; one atomic
+                           find_one_and_update per check on the
+                           rate_limit_buckets collection, expired buckets
+                           removed by a TTL index (same lazy-index pattern
+                           as ip_rate_limits in middleware/rate_limiter.py)
+
+Backend selection (RATE_LIMIT_BACKEND):
+- "mongo"  (default) — shared store once init_rate_limit_store(db) is called
+- "memory"           — per-process store only
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "mongo").lower()
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """`limit` requests per `window` seconds"""
+    limit: int
+    window: float
+
+    @property
+    def interval(self) -> float:
+        return self.window / self.limit
+
+
+def _retry_after(seconds: float) -> int:
+    """Whole seconds for the Retry-After header (never 0 on a denial)"""
+    return max(1, int(math.ceil(seconds)))
+
+
+class InMemoryRateLimitStore:
+    """
+    Per-process GCRA store: key → TAT in an LRU-bounded OrderedDict.
+
+    When full, the least recently checked key is evicted. An evicted key
+    simply starts with a full bucket, which is the same state it would
+    reach by idling for one window.
+    """
+
+    def __init__(self, max_keys: int = DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._allowed = 0
+        self._denied = 0
+        self._evictions = 0
+
+    def hit(self, key: str, rule: RateLimitRule, now: Optional[float] = None) -> Tuple[bool, int]:
+        """Synchronous GCRA step. Returns (is_allowed, retry_after_seconds)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            tat = self._tats.get(key, now)
+            new_tat = max(tat, now) + rule.interval
+            if new_tat - now > rule.window:
+                self._tats.move_to_end(key)
+                self._denied += 1
+                return False, _retry_after(new_tat - rule.window - now)
+
+            self._tats[key] = new_tat
+            self._tats.move_to_end(key)
+            while len(self._tats) > self.max_keys:
+                self._tats.popitem(last=False)
+                self._evictions += 1
+            self._allowed += 1
+            return True, 0
+
+    async def check(self, key: str, rule: RateLimitRule) -> Tuple[bool, int]:
+        return self.hit(key, rule)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tats.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "keys": len(self._tats),
+                "max_keys": self.max_keys,
+                "allowed": self._allowed,
+                "denied": self._denied,
+                "evictions": self._evictions,
+            }
+
+
+class MongoRateLimitStore:
+    """
+    Shared GCRA store on MongoDB.
+
+    Each check is one find_one_and_update with an aggregation-pipeline
+    update, so the read-compute-write of the TAT is atomic per key across
+    all workers. Documents:
+        {_id: key, tat: <epoch seconds>, allowed: bool, expires_at: <date>}
+
+    If MongoDB is unavailable the check falls back to the in-process store,
+    so a database blip degrades to per-worker limits instead of failing
+    every request.
+    """
+
+    COLLECTION = "rate_limit_buckets"
+
+    def __init__(self, db, fallback: Optional[InMemoryRateLimitStore] = None):
+        self._db = db
+        self._fallback = fallback or InMemoryRateLimitStore()
+        self._ttl_index_created = False
+        self._errors = 0
+
+    async def _ensure_ttl_index(self):
+        """Create TTL index on first use (async)."""
+        if not self._ttl_index_created:
+            await self._db[self.COLLECTION].create_index("expires_at", expireAfterSeconds=0)
+            self._ttl_index_created = True
+
+    @staticmethod
+    def build_update(rule: RateLimitRule, now: float) -> list:
+        """Pipeline update implementing one GCRA step against the stored TAT"""
+        new_tat = {"$add": [{"$max": [{"$ifNull": ["$tat", now]}, now]}, rule.interval]}
+        allowed = {"$lte": [{"$subtract": [new_tat, now]}, rule.window]}
+        return [
+            {"$set": {"allowed": allowed}},
+            {"$set": {
+                "tat": {"$cond": ["$allowed", new_tat, {"$ifNull": ["$tat", now]}]},
+            }},
+            {"$set": {
+                # Bucket is full again (and the doc is droppable) once TAT has passed
+                "expires_at": {"$toDate": {"$multiply": [{"$max": ["$tat", now]}, 1000]}},
+            }},
+        ]
+
+    async def check(self, key: str, rule: RateLimitRule) -> Tuple[bool, int]:
+        now = time.time()
+        try:
+            await self._ensure_ttl_index()
+            doc = await self._db[self.COLLECTION].find_one_and_update(
+                {"_id": key},
+                self.build_update(rule, now),
+                upsert=True,
+                return_document=True,
+                projection={"tat": 1, "allowed": 1},
+            )
+        except Exception as e:
+            self._errors += 1
+            logger.warning(f"Shared rate limit store unavailable, using in-process limits: {e}")
+            return self._fallback.hit(key, rule, now)
+
+        if doc.get("allowed"):
+            return True, 0
+        return False, _retry_after(doc["tat"] + rule.interval - rule.window - now)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "mongo",
+            "collection": self.COLLECTION,
+            "errors": self._errors,
+            "fallback": self._fallback.get_stats(),
+        }
+
+
+# Process-wide store; replaced by init_rate_limit_store() at startup
+_store = InMemoryRateLimitStore()
+
+
+def init_rate_limit_store(db=None):
+    """Select the rate limit backend (called from server startup)."""
+    global _store
+    if RATE_LIMIT_BACKEND == "mongo" and db is not None:
+        _store = MongoRateLimitStore(db)
+    else:
+        _store = InMemoryRateLimitStore()
+    logger.info(f"Rate limit store initialized ({type(_store).__name__})")
+    return _store
+
+
+def get_rate_limit_store():
+    """Get the active rate limit store"""
+    return _store
@@ -15,11 +15,13 @@ Security Principles:
 
 import re
 import logging
-from typing import List, Dict, Callable, Optional
+from typing import List, Dict, Optional
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from middleware.pipeline import PipelineStage, RouteInfo, resolve_route
+
 logger = logging.getLogger(__name__)
 
 # Role hierarchy (higher roles inherit lower role permissions)
@@ -119,6 +121,8 @@ ROUTE_PERMISSIONS: Dict[str, List[str]] = {
     r"^/api/documents(/.*)?$":         ["org_admin", "admin", "owner", "manager", "technician"],
     r"^/api/uploads(/.*)?$":           ["org_admin", "admin", "owner", "manager", "technician", "accountant"],
     r"^/api/pdf-templates(/.*)?$":     ["org_admin", "admin", "owner", "accountant"],
+    # Union of the job sources' roles; each job is checked against its document type (routes/pdf_jobs.py)
+    r"^/api/pdf-jobs(/.*)?$":          ["org_admin", "admin", "owner", "accountant", "manager", "hr"],
     
     # ============ INTEGRATIONS ============
     r"^/api/razorpay(/.*)?$":          ["org_admin", "admin", "owner", "accountant"],
@@ -236,16 +240,13 @@ ROUTE_PERMISSIONS: Dict[str, List[str]] = {
     r"^/api/v1/gst(/.*)?$":                 ["org_admin", "admin", "owner", "accountant", "manager"],
 }
 
-# Compiled patterns for performance
-_PERMISSION_PATTERNS = [(re.compile(pattern), roles) for pattern, roles in ROUTE_PERMISSIONS.items()]
+# ROUTE_PERMISSIONS is compiled into the shared route trie (middleware/pipeline.py)
+# under both /api/ and /api/v1/ spellings; first entry in dict order wins.
 
 
 def get_allowed_roles(path: str) -> Optional[List[str]]:
     """Get list of allowed roles for a route path"""
-    for pattern, roles in _PERMISSION_PATTERNS:
-        if pattern.match(path):
-            return roles
-    return None
+    return resolve_route(path).allowed_roles
 
 
 def expand_role(role: str) -> List[str]:
@@ -275,7 +276,7 @@ def check_role_permission(user_role: str, allowed_roles: List[str]) -> bool:
     return False
 
 
-class RBACMiddleware(BaseHTTPMiddleware):
+class RBACMiddleware(PipelineStage, BaseHTTPMiddleware):
     """
     Role-Based Access Control Middleware.
     
@@ -351,25 +352,20 @@ class RBACMiddleware(BaseHTTPMiddleware):
     
     def _is_public(self, path: str) -> bool:
         """Check if path is public"""
-        if path in self.PUBLIC_ENDPOINTS:
-            return True
-        for pattern in self.PUBLIC_PATTERNS:
-            if re.match(pattern, path):
-                return True
-        return False
+        return resolve_route(path).rbac_public
     
-    async def dispatch(self, request: Request, call_next: Callable):
+    async def before(self, request: Request, route: RouteInfo):
         """Check role permissions for each request"""
-        path = request.url.path
+        path = route.path
         method = request.method
         
         # Skip OPTIONS (CORS)
         if method == "OPTIONS":
-            return await call_next(request)
+            return None
         
         # Skip public routes
-        if self._is_public(path):
-            return await call_next(request)
+        if route.rbac_public:
+            return None
         
         # Get user role from request state (set by TenantGuardMiddleware)
         user_role = getattr(request.state, "tenant_user_role", None)
@@ -378,11 +374,8 @@ class RBACMiddleware(BaseHTTPMiddleware):
         logger.info(f"RBAC CHECK: path={path}, role={user_role}, user={user_id}")
         
         if not user_role:
-            # No role means not authenticated through TenantGuard.
-            # Check if this path is in OUR public list.
-            if self._is_public(path):
-                return await call_next(request)
-            # Otherwise DENY — do not pass through silently.
+            # No role means not authenticated through TenantGuard — DENY,
+            # do not pass through silently.
             logger.warning(
                 "RBAC DENIED: No role set for %s %s. "
                 "TenantGuard may have skipped auth.",
@@ -396,14 +389,12 @@ class RBACMiddleware(BaseHTTPMiddleware):
                 }
             )
         
-        # Normalize path: strip /v1 prefix so /api/v1/hr/... matches /api/hr/... patterns
-        normalized_path = re.sub(r'^/api/v1/', '/api/', path)
-        
-        # Check route permissions
-        allowed_roles = get_allowed_roles(normalized_path)
+        # Check route permissions (/api/v1/... resolves like /api/...)
+        allowed_roles = route.allowed_roles
         
         if allowed_roles is None:
             # DENY by default — unmapped routes are blocked
+            normalized_path = re.sub(r'^/api/v1/', '/api/', path)
             logger.warning(
                 f"RBAC DENIED: Route {path} (normalized: {normalized_path}) "
                 f"not in permission map. User {user_id} role={user_role}"
@@ -434,7 +425,7 @@ class RBACMiddleware(BaseHTTPMiddleware):
             )
         
         logger.info(f"RBAC ALLOWED: {user_role} accessing {path}")
-        return await call_next(request)
+        return None
 
 
 def require_roles(*allowed_roles: str):
@@ -14,16 +14,29 @@ Allowed-HTML fields get the SAFE mode instead of STRICT.
 
 Starlette body caching: after sanitizing, the body is re-cached
 so downstream route handlers read the sanitized version.
+
+Fast paths (output is identical to running bleach on every string):
+  - bleach only changes strings containing & < > or C0 control characters
+    other than tab/newline, so strings without them are returned as-is
+    without an html5lib parse.
+  - A raw body with none of those bytes (and no JSON escapes) cannot
+    contain such a string, so it is passed through without json.loads.
+  - A body where no field changed is passed through as the original bytes
+    instead of being re-encoded with json.dumps.
+  - Results of bleach.clean are memoized for short, repeated values.
 """
 
 import json
 import logging
+import re
+from functools import lru_cache
 from typing import Any
 
 import bleach
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
-from starlette.responses import Response
+
+from middleware.pipeline import PipelineStage, RouteInfo
 
 logger = logging.getLogger(__name__)
 
@@ -78,10 +91,45 @@ SAFE_ATTRS = {
     "div": ["class"],
 }
 
+# Characters bleach.clean can rewrite: & < > (escaped / parsed as markup),
+# C0 controls other than \t and \n (dropped or normalized by html5lib) and
+# lone surrogates (json.loads can produce them from \ud800 escapes).
+_NEEDS_CLEAN = re.compile(r"[\x00-\x08\x0b-\x1f&<>\ud800-\udfff]")
+
+# Same test on the raw body. Any backslash means a JSON escape that could
+# decode to one of the characters above; \xed[\xa0-\xbf] is a UTF-8 encoded
+# surrogate (json.loads decodes with surrogatepass).
+_BODY_NEEDS_CLEAN = re.compile(rb"[\x00-\x08\x0b-\x1f&<>\\]|\xed[\xa0-\xbf]")
+
+# Only memoize values up to this length (long rich-text bodies are rarely repeated)
+_MEMO_MAX_LENGTH = 256
+
 # ---------------------------------------------------------------------------
 # Recursive sanitizer
 # ---------------------------------------------------------------------------
 
+@lru_cache(maxsize=4096)
+def _clean_memo(value: str, safe_html: bool) -> str:
+    return _clean(value, safe_html)
+
+
+def _clean(value: str, safe_html: bool) -> str:
+    if safe_html:
+        return bleach.clean(
+            value, tags=SAFE_TAGS, attributes=SAFE_ATTRS, strip=True,
+        )
+    return bleach.clean(value, tags=[], attributes={}, strip=True)
+
+
+def _sanitize_string(value: str, safe_html: bool) -> str:
+    """bleach.clean, skipped for plain text and memoized for short values"""
+    if not _NEEDS_CLEAN.search(value):
+        return value
+    if len(value) <= _MEMO_MAX_LENGTH:
+        return _clean_memo(value, safe_html)
+    return _clean(value, safe_html)
+
+
 def _sanitize_value(value: Any, key: str | None = None) -> Any:
     """Recursively sanitize every string in a JSON-compatible structure.
 
@@ -91,12 +139,8 @@ def _sanitize_value(value: Any, key: str | None = None) -> Any:
         return value, 0
 
     if isinstance(value, str):
-        if key and key.lower() in ALLOWED_HTML_FIELDS:
-            cleaned = bleach.clean(
-                value, tags=SAFE_TAGS, attributes=SAFE_ATTRS, strip=True,
-            )
-        else:
-            cleaned = bleach.clean(value, tags=[], attributes={}, strip=True)
+        safe_html = bool(key) and key.lower() in ALLOWED_HTML_FIELDS
+        cleaned = _sanitize_string(value, safe_html)
         changed = 1 if cleaned != value else 0
         return cleaned, changed
 
@@ -124,13 +168,11 @@ def _sanitize_value(value: Any, key: str | None = None) -> Any:
 # Middleware
 # ---------------------------------------------------------------------------
 
-class SanitizationMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next) -> Response:
-        path = request.url.path
-
+class SanitizationMiddleware(PipelineStage, BaseHTTPMiddleware):
+    async def before(self, request: Request, route: RouteInfo) -> None:
         # Exempt paths — pass through untouched
-        if any(path.startswith(prefix) for prefix in EXEMPT_PATHS):
-            return await call_next(request)
+        if route.sanitize_exempt:
+            return None
 
         content_type = request.headers.get("content-type", "")
 
@@ -138,20 +180,24 @@ class SanitizationMiddleware(BaseHTTPMiddleware):
             request.method in ("POST", "PUT", "PATCH")
             and "application/json" in content_type
         ):
+            path = route.path
             try:
                 raw_body = await request.body()
-                if raw_body:
+                # Nothing bleach would change — leave the body untouched
+                if raw_body and _BODY_NEEDS_CLEAN.search(raw_body):
                     data = json.loads(raw_body)
                     sanitized, fields_cleaned = _sanitize_value(data)
+                    if not fields_cleaned:
+                        return None
                     sanitized_bytes = json.dumps(sanitized).encode("utf-8")
 
-                    if fields_cleaned:
-                        logger.debug(
-                            "Sanitized %d field(s) on %s %s",
-                            fields_cleaned, request.method, path,
-                        )
+                    logger.debug(
+                        "Sanitized %d field(s) on %s %s",
+                        fields_cleaned, request.method, path,
+                    )
 
                     # Starlette body-caching fix: override receive + cached body
+                    # (the pipeline replays request._body to the route)
                     async def receive():
                         return {"type": "http.request", "body": sanitized_bytes}
 
@@ -163,4 +209,4 @@ class SanitizationMiddleware(BaseHTTPMiddleware):
             except Exception as e:
                 logger.warning("Sanitization error on %s: %s", path, e)
 
-        return await call_next(request)
+        return None
@@ -601,6 +601,7 @@ class FailureMatchResponse(BaseModel):
     processing_time_ms: float
     model_used: str
     matching_stages_used: List[str] = []
+    stage_timings_ms: Dict[str, float] = {}
 
 # ==================== KNOWLEDGE GRAPH MODELS (ENHANCED) ====================
 
@@ -16,6 +16,7 @@ from services.ai_guidance_service import (
 )
 from services.visual_spec_service import VisualSpecService, EVDiagnosticTemplates
 from services.feature_flags import FeatureFlagService
+from core.subscriptions.plan_snapshot import get_org_plan_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -143,10 +144,8 @@ async def generate_guidance(
     
     # ── Rate Limit (per day by plan) ──
     today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    org_doc = await db.organizations.find_one(
-        {"organization_id": org_id}, {"_id": 0, "plan_type": 1}
-    )
-    plan_code = (org_doc or {}).get("plan_type", "starter")
+    snapshot = await get_org_plan_snapshot(db, org_id)
+    plan_code = snapshot.plan_type or "starter"
     daily_limit = EFI_DAILY_LIMITS.get(plan_code, 20)
 
     if daily_limit != -1:
@@ -22,6 +22,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 from utils.database import db
+from services.chart_of_accounts_cache import invalidate_chart_of_accounts
 
 router = APIRouter(prefix="/banking", tags=["Banking & Accountant"])
 
@@ -538,6 +539,7 @@ async def create_chart_account(account: ChartOfAccountCreate):
     }
     
     await chart_of_accounts_col.insert_one(account_doc)
+    invalidate_chart_of_accounts(account.organization_id)
     account_doc.pop("_id", None)
     
     return {"code": 0, "account": account_doc}
@@ -594,6 +596,7 @@ async def create_journal_entry(entry: JournalEntryCreate):
             {"account_id": account_id},
             {"$inc": {"balance": net_change}}
         )
+    invalidate_chart_of_accounts(entry.organization_id)
     
     entry_doc.pop("_id", None)
     return {"code": 0, "journal_entry": entry_doc}
@@ -11,6 +11,7 @@ import logging
 # Import double-entry posting hooks
 from services.posting_hooks import post_bill_journal_entry, post_bill_payment_journal_entry
 from services.inventory_service import get_inventory_service
+from services.gst_ledger import sync_gst_document
 
 logger = logging.getLogger(__name__)
 
@@ -256,6 +257,13 @@ async def update_bill_status(bill_id: str):
     if new_status != bill.get("status"):
         await bills_collection.update_one({"bill_id": bill_id}, {"$set": {"status": new_status}})
 
+async def sync_bill_gst_lines(bill_id: str):
+    """Refresh the bill's lines in the GST tax line ledger (GSTR-3B ITC)"""
+    try:
+        await sync_gst_document(db, "bills", bill_id)
+    except Exception as e:
+        logger.warning(f"GST ledger update failed for bill {bill_id}: {e}")
+
 # ========================= SUMMARY =========================
 
 @router.get("/summary")
@@ -768,6 +776,7 @@ async def delete_bill(bill_id: str, force: bool = False):
         if force:
             await bills_collection.update_one({"bill_id": bill_id}, {"$set": {"status": "void", "balance_due": 0}})
             await add_bill_history(bill_id, "voided", "Bill voided")
+            await sync_bill_gst_lines(bill_id)
             await update_vendor_balance(bill["vendor_id"])
             return {"code": 0, "message": "Bill voided (has payments)", "voided": True}
         raise HTTPException(status_code=400, detail="Cannot delete bill with payments. Use force=true to void.")
@@ -776,6 +785,7 @@ async def delete_bill(bill_id: str, force: bool = False):
         if force:
             await bills_collection.update_one({"bill_id": bill_id}, {"$set": {"status": "void"}})
             await add_bill_history(bill_id, "voided", "Bill voided")
+            await sync_bill_gst_lines(bill_id)
             await update_vendor_balance(bill["vendor_id"])
             return {"code": 0, "message": "Bill voided", "voided": True}
         raise HTTPException(status_code=400, detail="Only draft bills can be deleted. Use force=true to void.")
@@ -798,6 +808,7 @@ async def open_bill(bill_id: str):
     
     await bills_collection.update_one({"bill_id": bill_id}, {"$set": {"status": "open", "updated_time": datetime.now(timezone.utc).isoformat()}})
     await add_bill_history(bill_id, "opened", "Bill marked as open")
+    await sync_bill_gst_lines(bill_id)
     await update_vendor_balance(bill["vendor_id"])
     
     org_id = bill.get("organization_id", "")
@@ -842,6 +853,7 @@ async def void_bill(bill_id: str, reason: str = ""):
     
     await bills_collection.update_one({"bill_id": bill_id}, {"$set": {"status": "void", "balance_due": 0, "void_reason": reason}})
     await add_bill_history(bill_id, "voided", f"Bill voided. Reason: {reason or 'Not specified'}")
+    await sync_bill_gst_lines(bill_id)
     await update_vendor_balance(bill["vendor_id"])
     
     return {"code": 0, "message": "Bill voided"}
@@ -953,6 +953,9 @@ async def create_contact(contact: ContactCreate, background_tasks: BackgroundTas
         contact_doc["organization_id"] = org_id
     
     await contacts_collection.insert_one(contact_doc)
+    if org_id:
+        from utils.plan_limits import record_created
+        await record_created(org_id, "contacts")
     
     # Create contact persons
     for person in contact.persons:
@@ -20,6 +20,8 @@ from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from utils.audit_log import log_financial_action
+from services.pdf_renderer import render_pdf, PdfRenderError
+from services.gst_ledger import sync_gst_document
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/credit-notes", tags=["credit-notes"])
@@ -226,6 +228,12 @@ async def create_credit_note(request: Request, body: CreateCreditNoteRequest):
     await db.credit_notes.insert_one(credit_note)
     credit_note.pop("_id", None)
     
+    # GST tax line ledger (GSTR-1 CDNR, GSTR-3B adjustments)
+    try:
+        await sync_gst_document(db, "credit_notes", cn_id)
+    except Exception as e:
+        logger.warning(f"GST ledger update failed for credit note {cn_number}: {e}")
+    
     # 11. Post journal entries via double-entry service
     journal_result = await post_credit_note_journal(db, org_id, credit_note, is_paid, user_id or "")
     
@@ -315,7 +323,7 @@ async def download_credit_note_pdf(request: Request, credit_note_id: str):
     # Fetch org settings for company info
     org = await db.organizations.find_one({"organization_id": org_id}, {"_id": 0})
     
-    pdf_bytes = generate_credit_note_pdf(cn, org)
+    pdf_bytes = await generate_credit_note_pdf(cn, org)
     
     return StreamingResponse(
         BytesIO(pdf_bytes),
@@ -423,7 +431,7 @@ async def post_credit_note_journal(db, org_id: str, cn: dict, is_paid: bool, use
 
 # ========================= PDF GENERATION =========================
 
-def generate_credit_note_pdf(cn: dict, org: dict = None) -> bytes:
+async def generate_credit_note_pdf(cn: dict, org: dict = None) -> bytes:
     """Generate a GST-compliant Credit Note PDF using WeasyPrint."""
     company = {}
     if org:
@@ -559,8 +567,9 @@ def generate_credit_note_pdf(cn: dict, org: dict = None) -> bytes:
 </body></html>'''
     
     try:
-        from weasyprint import HTML
-        return HTML(string=html).write_pdf()
+        return await render_pdf(html, cache=True)
+    except PdfRenderError:
+        raise
     except Exception as e:
         logger.warning(f"WeasyPrint PDF generation failed: {e}, returning HTML")
         return html.encode("utf-8")
@@ -28,6 +28,9 @@ router = APIRouter(prefix="/estimates-enhanced", tags=["Estimates Enhanced"])
 # Database connection - shared instance from utils.database
 from utils.database import db
 from services.posting_hooks import post_invoice_journal_entry
+from services.account_period_balances import apply_journal_entry
+from services.pdf_renderer import render_pdf, PdfRenderError
+from services.pdf_cache import generated_stamp
 
 # Collections - Use main collections with Zoho-synced data
 estimates_collection = db["estimates"]
@@ -765,7 +768,7 @@ def generate_pdf_html(estimate: dict, line_items: list, template: str = "standar
         {f'<div class="terms"><div class="terms-title">Notes</div><div>{estimate.get("notes", "")}</div></div>' if estimate.get('notes') else ''}
         
         <div class="footer">
-            <p>Generated by {company_name} &bull; {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M')} UTC</p>
+            <p>Generated by {company_name} &bull; {generated_stamp('%Y-%m-%d %H:%M', utc=True)} UTC</p>
         </div>
     </body>
     </html>
@@ -1198,6 +1201,9 @@ async def create_estimate(estimate: EstimateCreate, background_tasks: Background
     await estimates_collection.insert_one(estimate_doc)
     if processed_items:
         await estimate_items_collection.insert_many(processed_items)
+    if org_id:
+        from utils.plan_limits import record_created
+        await record_created(org_id, "estimates")
     
     # Add history entry
     await add_estimate_history(estimate_id, "created", f"Estimate {estimate_number} created")
@@ -2269,7 +2275,6 @@ async def update_estimate_status(estimate_id: str, status_update: StatusUpdate,
 async def send_estimate(request: Request, estimate_id: str, email_to: Optional[str] = None, message: str = ""):
     """Send estimate to customer via email with PDF attachment"""
     from services.email_service import EmailService
-    from weasyprint import HTML
     
     org_id = await get_org_id(request)
     
@@ -2296,9 +2301,7 @@ async def send_estimate(request: Request, estimate_id: str, email_to: Optional[s
     ).sort("line_number", 1).to_list(100)
     
     html_content = generate_pdf_html(estimate, line_items, org_settings=org_settings)
-    pdf_buffer = io.BytesIO()
-    HTML(string=html_content).write_pdf(pdf_buffer)
-    pdf_content = pdf_buffer.getvalue()
+    pdf_content = await render_pdf(html_content, cache=True)
     
     customer_name_safe = (estimate.get('customer_name', '') or 'Customer').replace(' ', '_')[:30]
     pdf_filename = f"EST-{estimate.get('estimate_number', estimate_id)}-{customer_name_safe}.pdf"
@@ -2555,7 +2558,7 @@ async def convert_to_invoice(request: Request, estimate_id: str):
             # 3. COGS journal entry (DR COGS, CR Inventory)
             if total_cost > 0:
                 cogs_entry_id = f"je_{uuid.uuid4().hex[:12]}"
-                await db["journal_entries"].insert_one({
+                cogs_entry = {
                     "entry_id": cogs_entry_id,
                     "entry_date": today,
                     "reference_number": movement_id,
@@ -2592,7 +2595,9 @@ async def convert_to_invoice(request: Request, estimate_id: str):
                     ],
                     "created_at": datetime.now(timezone.utc).isoformat(),
                     "updated_at": datetime.now(timezone.utc).isoformat()
-                })
+                }
+                await db["journal_entries"].insert_one(cogs_entry)
+                await apply_journal_entry(db, cogs_entry)
                 logger.info(f"COGS journal posted: {cogs_entry_id} for {item_name} ₹{total_cost}")
         except Exception as e:
             logger.error(f"Inventory/COGS error for item {inv_item_id}: {e}")
@@ -3006,8 +3011,7 @@ async def generate_pdf(request: Request, estimate_id: str):
     
     # Try to use WeasyPrint for PDF generation
     try:
-        from weasyprint import HTML
-        pdf_bytes = HTML(string=html_content).write_pdf()
+        pdf_bytes = await render_pdf(html_content, cache=True)
         
         return StreamingResponse(
             io.BytesIO(pdf_bytes),
@@ -3016,6 +3020,8 @@ async def generate_pdf(request: Request, estimate_id: str):
                 "Content-Disposition": f"attachment; filename=Estimate_{estimate.get('estimate_number', estimate_id)}.pdf"
             }
         )
+    except PdfRenderError:
+        raise
     except ImportError:
         # WeasyPrint not available - return HTML for client-side rendering
         logger.warning("WeasyPrint not available, returning HTML for client-side PDF generation")
@@ -3058,8 +3064,7 @@ async def generate_pdf_with_template(request: Request, estimate_id: str, templat
     html_content = generate_pdf_html(estimate, line_items, template_id, org_settings=org_settings)
     
     try:
-        from weasyprint import HTML
-        pdf_bytes = HTML(string=html_content).write_pdf()
+        pdf_bytes = await render_pdf(html_content, cache=True)
         
         return StreamingResponse(
             io.BytesIO(pdf_bytes),
@@ -3068,6 +3073,8 @@ async def generate_pdf_with_template(request: Request, estimate_id: str, templat
                 "Content-Disposition": f"attachment; filename=Estimate_{estimate.get('estimate_number', estimate_id)}_{template_id}.pdf"
             }
         )
+    except PdfRenderError:
+        raise
     except Exception as e:
         logger.warning(f"PDF generation with template failed: {e}")
         return JSONResponse({
@@ -3276,7 +3283,7 @@ async def get_public_pdf(share_token: str):
     if expires_at < datetime.now(timezone.utc):
         raise HTTPException(status_code=410, detail="Share link has expired")
     
-    return await generate_pdf(share_link["estimate_id"])
+    return await generate_pdf(None, share_link["estimate_id"])
 
 @router.get("/public/{share_token}/attachment/{attachment_id}")
 async def download_public_attachment(share_token: str, attachment_id: str):
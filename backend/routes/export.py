@@ -15,6 +15,7 @@ import uuid
 import logging
 from fastapi import Request
 from utils.database import require_org_id, org_query
+from utils.streaming_export import csv_response, new_workbook, SheetWriter, workbook_response
 
 
 logger = logging.getLogger(__name__)
@@ -496,72 +497,77 @@ def format_date_for_tally(date_str: str) -> str:
 
 # ============== BULK EXPORT ==============
 
-@router.get("/bulk/invoices")
-async def bulk_export_invoices(request: Request, format: str = "csv", start_date: str = "", end_date: str = ""):
-    org_id = require_org_id(request)
-    """Export invoices in CSV or Excel format"""
-    db = get_db()
-    
-    query = {}
+BULK_INVOICE_HEADER = ["Invoice Number", "Date", "Customer", "Subtotal", "Tax", "Total", "Balance", "Status"]
+BULK_EXPENSE_HEADER = ["Date", "Account", "Vendor", "Amount", "Tax", "Total", "Description"]
+# JSON responses are for previews; csv / excel stream every row
+BULK_JSON_LIMIT = 10000
+
+
+def _bulk_query(org_id: str, start_date: str, end_date: str) -> Dict:
+    query = {"organization_id": org_id}
     if start_date:
         query["date"] = {"$gte": start_date}
     if end_date:
         query.setdefault("date", {})["$lte"] = end_date
-    
-    invoices = await db.invoices.find(query, {"_id": 0}).to_list(length=10000)
+    return query
+
+
+def _invoice_export_row(inv: Dict) -> list:
+    return [inv.get("invoice_number", ""), inv.get("date", ""), inv.get("customer_name") or "",
+            inv.get("sub_total", 0), inv.get("tax_total", 0), inv.get("total", 0),
+            inv.get("balance", 0), inv.get("status", "")]
+
+
+def _expense_export_row(exp: Dict) -> list:
+    return [exp.get("date", ""), exp.get("expense_account_name") or "", exp.get("vendor_name") or "",
+            exp.get("amount", 0), exp.get("tax_amount", 0), exp.get("total", 0),
+            exp.get("description") or ""]
+
+
+async def _bulk_workbook_response(title: str, header: list, rows, money_cols, filename: str):
+    wb = new_workbook()
+    sheet = SheetWriter(wb, title, widths={chr(ord("A") + i): 18 for i in range(len(header))})
+    sheet.header(header)
+    async for row in rows:
+        sheet.row(row, money_cols=money_cols)
+    return await workbook_response(wb, filename)
+
+
+@router.get("/bulk/invoices")
+async def bulk_export_invoices(request: Request, format: str = "csv", start_date: str = "", end_date: str = ""):
+    """Export invoices in CSV or Excel format (streamed from the cursor, no row cap)"""
+    org_id = require_org_id(request)
+    db = get_db()
+    query = _bulk_query(org_id, start_date, end_date)
+    stamp = datetime.now().strftime("%Y%m%d")
     
     if format == "csv":
-        # Generate CSV
-        csv_lines = ["Invoice Number,Date,Customer,Subtotal,Tax,Total,Balance,Status"]
-        for inv in invoices:
-            csv_lines.append(
-                f'{inv.get("invoice_number","")},{inv.get("date","")},{inv.get("customer_name","").replace(",","")},'
-                f'{inv.get("sub_total",0)},{inv.get("tax_total",0)},{inv.get("total",0)},{inv.get("balance",0)},{inv.get("status","")}'
-            )
-        
-        csv_content = "\n".join(csv_lines)
-        
-        return Response(
-            content=csv_content,
-            media_type="text/csv",
-            headers={
-                "Content-Disposition": f'attachment; filename="invoices_export_{datetime.now().strftime("%Y%m%d")}.csv"'
-            }
-        )
+        rows = (_invoice_export_row(inv) async for inv in db.invoices.find(query, {"_id": 0}))
+        return csv_response(f"invoices_export_{stamp}.csv", BULK_INVOICE_HEADER, rows)
+    elif format == "excel":
+        rows = (_invoice_export_row(inv) async for inv in db.invoices.find(query, {"_id": 0}))
+        return await _bulk_workbook_response("Invoices", BULK_INVOICE_HEADER, rows, (3, 4, 5, 6),
+                                             f"invoices_export_{stamp}.xlsx")
     else:
         # Return JSON
+        invoices = await db.invoices.find(query, {"_id": 0}).to_list(length=BULK_JSON_LIMIT)
         return {"code": 0, "invoices": invoices, "count": len(invoices)}
 
 @router.get("/bulk/expenses")
 async def bulk_export_expenses(request: Request, format: str = "csv", start_date: str = "", end_date: str = ""):
+    """Export expenses in CSV or Excel format (streamed from the cursor, no row cap)"""
     org_id = require_org_id(request)
-    """Export expenses in CSV format"""
     db = get_db()
-    
-    query = {}
-    if start_date:
-        query["date"] = {"$gte": start_date}
-    if end_date:
-        query.setdefault("date", {})["$lte"] = end_date
-    
-    expenses = await db.expenses.find(query, {"_id": 0}).to_list(length=10000)
+    query = _bulk_query(org_id, start_date, end_date)
+    stamp = datetime.now().strftime("%Y%m%d")
     
     if format == "csv":
-        csv_lines = ["Date,Account,Vendor,Amount,Tax,Total,Description"]
-        for exp in expenses:
-            csv_lines.append(
-                f'{exp.get("date","")},{(exp.get("expense_account_name") or "").replace(",","")},{(exp.get("vendor_name") or "").replace(",","")},'
-                f'{exp.get("amount",0)},{exp.get("tax_amount",0)},{exp.get("total",0)},{(exp.get("description") or "").replace(",","")}'
-            )
-        
-        csv_content = "\n".join(csv_lines)
-        
-        return Response(
-            content=csv_content,
-            media_type="text/csv",
-            headers={
-                "Content-Disposition": f'attachment; filename="expenses_export_{datetime.now().strftime("%Y%m%d")}.csv"'
-            }
-        )
+        rows = (_expense_export_row(exp) async for exp in db.expenses.find(query, {"_id": 0}))
+        return csv_response(f"expenses_export_{stamp}.csv", BULK_EXPENSE_HEADER, rows)
+    elif format == "excel":
+        rows = (_expense_export_row(exp) async for exp in db.expenses.find(query, {"_id": 0}))
+        return await _bulk_workbook_response("Expenses", BULK_EXPENSE_HEADER, rows, (3, 4, 5),
+                                             f"expenses_export_{stamp}.xlsx")
     else:
+        expenses = await db.expenses.find(query, {"_id": 0}).to_list(length=BULK_JSON_LIMIT)
         return {"code": 0, "expenses": expenses, "count": len(expenses)}
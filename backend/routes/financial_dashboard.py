@@ -13,6 +13,7 @@ router = APIRouter(prefix="/dashboard/financial", tags=["Financial Dashboard"])
 
 # Database connection
 from utils.database import db
+from services.report_cache import cached_report
 
 async def get_org_id(request: Request) -> Optional[str]:
     """Get organization ID from request state (validated by TenantGuardMiddleware)"""
@@ -20,6 +21,7 @@ async def get_org_id(request: Request) -> Optional[str]:
 
 
 @router.get("/summary")
+@cached_report("financial.summary", get_org_id)
 async def get_financial_summary(request: Request):
     """
     Get comprehensive financial summary for dashboard
@@ -153,6 +155,7 @@ async def get_financial_summary(request: Request):
 
 
 @router.get("/cash-flow")
+@cached_report("financial.cash_flow", get_org_id)
 async def get_cash_flow(request: Request, period: str = "fiscal_year"):
     """
     Get cash flow data for chart visualization
@@ -300,6 +303,7 @@ async def get_cash_flow(request: Request, period: str = "fiscal_year"):
 
 
 @router.get("/income-expense")
+@cached_report("financial.income_expense", get_org_id)
 async def get_income_expense(request: Request, period: str = "fiscal_year", method: str = "accrual"):
     """
     Get income vs expense comparison data
@@ -618,6 +622,7 @@ async def get_projects_watchlist(request: Request, limit: int = 5):
 
 
 @router.get("/quick-stats")
+@cached_report("financial.quick_stats", get_org_id)
 async def get_quick_stats(request: Request):
     """
     Get quick statistics for dashboard header
@@ -20,32 +20,29 @@ import openpyxl
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
 from fastapi import Request
 from utils.database import require_org_id, org_query, db as _gst_db
-
-
-# Soft import for PDF service (may not be available in all environments)
-PDF_SERVICE_AVAILABLE = False
-generate_pdf_from_html = None
-try:
-    from services.pdf_service import generate_pdf_from_html
-    PDF_SERVICE_AVAILABLE = True
-except Exception:
-    pass
+from core.subscriptions.plan_snapshot import get_org_plan_snapshot
+from services.pdf_renderer import render_pdf
+from services.pdf_cache import generated_stamp
+from services.gst_ledger import ensure_gst_ledger, grouped_tax_lines, is_intra_state, split_tax
 
 router = APIRouter(prefix="/gst", tags=["GST Compliance"])
 
 
 async def _is_trial_plan_gst(org_id: str) -> bool:
     """Check if org is on free/trialing plan (for PDF watermark)."""
-    db = _gst_db
-    org = await db.organizations.find_one(
-        {"organization_id": org_id}, {"_id": 0, "plan_type": 1}
-    )
-    return (org or {}).get("plan_type", "starter") in ("free", "trialing", "starter")
+    snapshot = await get_org_plan_snapshot(_gst_db, org_id)
+    return (snapshot.plan_type or "starter") in ("free", "trialing", "starter")
 
 # Database connection
 def get_db():
     return _gst_db
 
+
+def _org_state(org_settings: dict) -> str:
+    """Organization's GST state code: configured place of supply, else from its GSTIN"""
+    gstin = org_settings.get("gstin") or ""
+    return org_settings.get("place_of_supply") or gstin[:2] or "06"
+
 # ============== INDIAN STATES ==============
 INDIAN_STATES = {
     "01": "Jammu and Kashmir",
@@ -386,89 +383,79 @@ async def get_gstr1_report(request: Request, month: str = "", # Format: YYYY-MM
     
     try:
         year, mon = month.split("-")
-        start_date = f"{year}-{mon}-01"
-        # Get last day of month
-        if int(mon) == 12:
-            end_date = f"{int(year)+1}-01-01"
-        else:
-            end_date = f"{year}-{int(mon)+1:02d}-01"
+        period = f"{int(year):04d}-{int(mon):02d}"
     except:
         raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM")
     
-    # Fetch invoices for the period — from invoices_enhanced (primary collection), org-scoped
     org_id = require_org_id(request)
-    inv_query = org_query(org_id, {
-        "invoice_date": {"$gte": start_date, "$lt": end_date},
-        "status": {"$in": ["sent", "paid", "partial", "overdue"]}
-    })
-    invoices = await db.invoices_enhanced.find(inv_query, {"_id": 0}).to_list(5000)  # SPRINT-2B: hard-cap unbounded query
-    
-    # Also fetch from legacy invoices collection (Zoho-synced)
-    legacy_query = org_query(org_id, {
-        "date": {"$gte": start_date, "$lt": end_date},
-        "status": {"$in": ["sent", "paid", "partial", "overdue"]}
-    })
-    legacy_invoices = await db.invoices.find(legacy_query, {"_id": 0}).to_list(5000)  # SPRINT-2B: hard-cap unbounded query
-    
-    # Get organization settings — org-scoped
     org_settings = await db.organization_settings.find_one(
         org_query(org_id, {}), {"_id": 0}
     ) or {}
-    org_state = org_settings.get("place_of_supply", "06")
-    
-    # Merge enhanced + legacy invoices
-    all_invoices = list(invoices) + list(legacy_invoices)
-    for inv in all_invoices:
-        if "invoice_date" not in inv:
-            inv["invoice_date"] = inv.get("date", "")
+    org_state = _org_state(org_settings)
+    
+    # Per-document totals from the GST tax line ledger — grouped, uncapped (services/gst_ledger.py)
+    await ensure_gst_ledger(db, org_id, period)
+    documents = await grouped_tax_lines(
+        db, org_id, period, {"source_type": {"$in": ["invoice", "credit_note"]}},
+        ("source_type", "source_id"),
+        first=("document_number", "doc_date", "party_name", "party_gstin", "place_of_supply", "category", "meta"),
+    )
+    documents.sort(key=lambda d: (d.get("doc_date") or "", d.get("document_number") or ""))
     
-    # Categorize invoices
+    # Categorize invoices; split credit notes by registered/unregistered (P1-09)
     b2b_invoices = []
     b2c_large = []
     b2c_small = []
+    cdnr_entries = []
+    cdnr_unregistered_entries = []
     
-    for inv in all_invoices:
-        customer_gstin = inv.get("customer_gstin", "") or inv.get("gst_no", "")
-        customer_state = inv.get("place_of_supply", org_state)
-        
-        # Extract state from GSTIN if available
-        if customer_gstin and len(customer_gstin) >= 2:
-            customer_state = customer_gstin[:2]
+    for doc in documents:
+        customer_state = doc.get("place_of_supply") or org_state
+        tax = split_tax(doc, org_state)
         
-        is_intra_state = customer_state == org_state
-        subtotal = inv.get("sub_total", 0) or inv.get("subtotal", 0) or 0
-        total = inv.get("total", 0)
-        tax_total = inv.get("tax_total", 0) or (total - subtotal)
-        
-        # Calculate CGST/SGST/IGST
-        if is_intra_state:
-            cgst = round(tax_total / 2, 2)
-            sgst = round(tax_total / 2, 2)
-            igst = 0
-        else:
-            cgst = 0
-            sgst = 0
-            igst = round(tax_total, 2)
+        if doc["source_type"] == "credit_note":
+            meta = doc.get("meta") or {}
+            cn_data = {
+                "credit_note_number": doc.get("document_number", ""),
+                "credit_note_date": doc.get("doc_date", ""),
+                "original_invoice_number": meta.get("original_invoice_number", ""),
+                "customer_name": doc.get("party_name", ""),
+                "customer_gstin": doc.get("party_gstin", ""),
+                "reason": meta.get("reason", ""),
+                "taxable_value": round(doc["taxable_value"], 2),
+                "cgst": round(tax["cgst"], 2),
+                "sgst": round(tax["sgst"], 2),
+                "igst": round(tax["igst"], 2),
+                "total_tax": round(doc["tax"], 2),
+                "note_value": round(doc["value"], 2),
+                "note_type": "Credit Note",
+                "gst_treatment": meta.get("gst_treatment", "cgst_sgst"),
+            }
+            if doc.get("category") == "cdnr":
+                cdnr_entries.append(cn_data)
+            else:
+                cdnr_unregistered_entries.append(cn_data)
+            continue
         
         inv_data = {
-            "invoice_number": inv.get("invoice_number", ""),
-            "invoice_date": inv.get("date", ""),
-            "customer_name": inv.get("customer_name", ""),
-            "customer_gstin": customer_gstin,
+            "invoice_number": doc.get("document_number", ""),
+            "invoice_date": doc.get("doc_date", ""),
+            "customer_name": doc.get("party_name", ""),
+            "customer_gstin": doc.get("party_gstin", ""),
             "place_of_supply": customer_state,
             "state_name": INDIAN_STATES.get(customer_state, "Unknown"),
-            "taxable_value": subtotal,
-            "cgst": cgst,
-            "sgst": sgst,
-            "igst": igst,
-            "total_tax": tax_total,
-            "invoice_value": total,
-            "is_intra_state": is_intra_state
+            "taxable_value": round(doc["taxable_value"], 2),
+            "cgst": round(tax["cgst"], 2),
+            "sgst": round(tax["sgst"], 2),
+            "igst": round(tax["igst"], 2),
+            "total_tax": round(doc["tax"], 2),
+            "invoice_value": round(doc["value"], 2),
+            "is_intra_state": is_intra_state(doc, org_state)
         }
         
-        if customer_gstin and validate_gstin(customer_gstin)["valid"]:
+        if doc.get("category") == "b2b":
             b2b_invoices.append(inv_data)
-        elif total > 250000:
+        elif doc.get("category") == "b2cl":
             b2c_large.append(inv_data)  # B2CL: no GSTIN, value > 2.5L
         else:
             b2c_small.append(inv_data)  # B2CS: no GSTIN, value <= 2.5L
@@ -485,39 +472,6 @@ async def get_gstr1_report(request: Request, month: str = "", # Format: YYYY-MM
             "invoice_value": sum(i["invoice_value"] for i in inv_list)
         }
     
-    # Credit/Debit Notes for CDNR (Section 9A/34 of GSTR-1) — org-scoped
-    cn_query = org_query(org_id, {
-        "created_at": {"$gte": start_date, "$lt": end_date},
-        "status": {"$ne": "cancelled"}
-    })
-    credit_notes = await db.credit_notes.find(cn_query, {"_id": 0}).to_list(1000)
-    
-    # Build CDNR entries with proper GST breakdown — split by registered/unregistered (P1-09)
-    cdnr_entries = []
-    cdnr_unregistered_entries = []
-    for cn in credit_notes:
-        cn_data = {
-            "credit_note_number": cn.get("credit_note_number", ""),
-            "credit_note_date": cn.get("created_at", "")[:10],
-            "original_invoice_number": cn.get("original_invoice_number", ""),
-            "customer_name": cn.get("customer_name", ""),
-            "customer_gstin": cn.get("customer_gstin", ""),
-            "reason": cn.get("reason", ""),
-            "taxable_value": cn.get("subtotal", 0),
-            "cgst": cn.get("cgst_amount", 0),
-            "sgst": cn.get("sgst_amount", 0),
-            "igst": cn.get("igst_amount", 0),
-            "total_tax": cn.get("gst_amount", 0),
-            "note_value": cn.get("total", 0),
-            "note_type": "Credit Note",
-            "gst_treatment": cn.get("gst_treatment", "cgst_sgst"),
-        }
-        buyer_gstin = cn.get("customer_gstin", "")
-        if buyer_gstin and validate_gstin(buyer_gstin)["valid"]:
-            cdnr_entries.append(cn_data)
-        else:
-            cdnr_unregistered_entries.append(cn_data)
-    
     cdnr_summary = {
         "count": len(cdnr_entries),
         "taxable_value": sum(e["taxable_value"] for e in cdnr_entries),
@@ -538,11 +492,15 @@ async def get_gstr1_report(request: Request, month: str = "", # Format: YYYY-MM
         "total_value": sum(e["note_value"] for e in cdnr_unregistered_entries),
     }
     
-    # B2CS summary by state+rate (P1-09 — Table 7 GSTR-1)
+    # B2CS summary by state+rate (P1-09 — Table 7 GSTR-1), from line-level rates
     b2cs_by_state_rate = {}
-    for inv in b2c_small:
-        state = inv.get("state_name", "Unknown")
-        rate = inv.get("gst_rate", 0)
+    b2cs_documents = {}
+    for row in await grouped_tax_lines(
+        db, org_id, period, {"source_type": "invoice", "category": "b2cs"},
+        ("place_of_supply", "gst_rate"), documents=True,
+    ):
+        state = INDIAN_STATES.get(row.get("place_of_supply") or org_state, "Unknown")
+        rate = row.get("gst_rate") or 0
         key = f"{state}_{rate}"
         if key not in b2cs_by_state_rate:
             b2cs_by_state_rate[key] = {
@@ -552,54 +510,35 @@ async def get_gstr1_report(request: Request, month: str = "", # Format: YYYY-MM
                 "total_tax": 0, "count": 0
             }
         entry = b2cs_by_state_rate[key]
-        entry["taxable_value"] += inv.get("taxable_value", 0)
-        entry["cgst"] += inv.get("cgst", 0)
-        entry["sgst"] += inv.get("sgst", 0)
-        entry["igst"] += inv.get("igst", 0)
-        entry["total_tax"] += inv.get("total_tax", 0)
-        entry["count"] += 1
+        tax = split_tax(row, org_state)
+        entry["taxable_value"] += row["taxable_value"]
+        entry["cgst"] += tax["cgst"]
+        entry["sgst"] += tax["sgst"]
+        entry["igst"] += tax["igst"]
+        entry["total_tax"] += row["tax"]
+        b2cs_documents.setdefault(key, set()).update(row["documents"])
+        entry["count"] = len(b2cs_documents[key])
     
     # HSN summary by hsn_code + gst_rate (P1-09 — Table 12 GSTR-1)
-    # Build from original invoice line_items (not the summarised inv_data dicts)
     hsn_by_code_rate = {}
-    for inv in all_invoices:
-        customer_gstin = inv.get("customer_gstin", "") or inv.get("gst_no", "")
-        customer_state = inv.get("place_of_supply", org_state)
-        if customer_gstin and len(customer_gstin) >= 2:
-            customer_state = customer_gstin[:2]
-        is_intra = customer_state == org_state
-
-        for li in inv.get("line_items", []):
-            hsn = (li.get("hsn_sac_code") or li.get("hsn_or_sac") or
-                   li.get("hsn_sac") or li.get("hsn_code") or "9987")
-            rate = li.get("tax_rate", 0) or 0
-            qty = li.get("quantity", 1) or 1
-            li_amount = (li.get("amount") or li.get("taxable_amount") or
-                         (qty * (li.get("rate", 0) or 0)))
-            li_tax = li.get("tax_amount", 0) or round(li_amount * rate / 100, 2)
-
-            if is_intra:
-                li_cgst = round(li_tax / 2, 2)
-                li_sgst = li_tax - li_cgst
-                li_igst = 0
-            else:
-                li_cgst = 0
-                li_sgst = 0
-                li_igst = li_tax
-
-            key = f"{hsn}_{rate}"
-            if key not in hsn_by_code_rate:
-                hsn_by_code_rate[key] = {
-                    "hsn_code": hsn, "gst_rate": rate,
-                    "taxable_value": 0, "cgst": 0, "sgst": 0, "igst": 0,
-                    "total_quantity": 0, "uom": li.get("unit", "NOS")
-                }
-            entry = hsn_by_code_rate[key]
-            entry["taxable_value"] += li_amount
-            entry["cgst"] += li_cgst
-            entry["sgst"] += li_sgst
-            entry["igst"] += li_igst
-            entry["total_quantity"] += qty
+    for row in await grouped_tax_lines(
+        db, org_id, period, {"source_type": "invoice"},
+        ("hsn_code", "gst_rate", "place_of_supply"), first=("uqc",),
+    ):
+        key = f"{row['hsn_code']}_{row['gst_rate']}"
+        if key not in hsn_by_code_rate:
+            hsn_by_code_rate[key] = {
+                "hsn_code": row["hsn_code"], "gst_rate": row["gst_rate"],
+                "taxable_value": 0, "cgst": 0, "sgst": 0, "igst": 0,
+                "total_quantity": 0, "uom": row.get("uqc") or "NOS"
+            }
+        entry = hsn_by_code_rate[key]
+        tax = split_tax(row, org_state)
+        entry["taxable_value"] += row["taxable_value"]
+        entry["cgst"] += tax["cgst"]
+        entry["sgst"] += tax["sgst"]
+        entry["igst"] += tax["igst"]
+        entry["total_quantity"] += row["quantity"]
     
     # Net adjustments: grand_total should subtract credit note amounts
     cn_taxable = cdnr_summary["taxable_value"] + cdnr_unreg_summary["taxable_value"]
@@ -800,13 +739,13 @@ async def generate_gstr1_pdf(data: dict, month: str, org_settings: dict, org_id:
         </div>
         
         <div style="margin-top: 20px; text-align: center; font-size: 8pt; color: #999;">
-            Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')} | This is a computer-generated document
+            Generated on {generated_stamp()} | This is a computer-generated document
         </div>
     </body>
     </html>
     """
     
-    pdf_bytes = generate_pdf_from_html(html, is_trial=await _is_trial_plan_gst(org_id))
+    pdf_bytes = await render_pdf(html, is_trial=await _is_trial_plan_gst(org_id), cache=True)
     return Response(
         content=pdf_bytes,
         media_type="application/pdf",
@@ -834,7 +773,8 @@ async def get_gstr3b_report(request: Request, month: str = "", # Format: YYYY-MM
     
     try:
         year, mon = month.split("-")
-        start_date = f"{year}-{mon}-01"
+        period = f"{int(year):04d}-{int(mon):02d}"
+        start_date = f"{period}-01"
         if int(mon) == 12:
             end_date = f"{int(year)+1}-01-01"
         else:
@@ -849,26 +789,22 @@ async def get_gstr3b_report(request: Request, month: str = "", # Format: YYYY-MM
     org_settings = await db.organization_settings.find_one(
         org_query(org_id, {}), {"_id": 0}
     ) or {}
-    org_state = org_settings.get("place_of_supply", "27")
+    org_state = _org_state(org_settings)
     
-    # OUTWARD SUPPLIES (Invoices) — org-scoped from both collections
-    inv_query = org_query(org_id, {
-        "invoice_date": {"$gte": start_date, "$lt": end_date},
-        "status": {"$in": ["sent", "paid", "partial", "overdue"]}
-    })
-    invoices_enh = await db.invoices_enhanced.find(inv_query, {"_id": 0}).to_list(5000)  # SPRINT-2B: hard-cap unbounded query
+    # Sections 3.1, 3.2 and 4 are grouped sums over the GST tax line ledger — uncapped (services/gst_ledger.py)
+    await ensure_gst_ledger(db, org_id, period)
     
-    legacy_query = org_query(org_id, {
-        "date": {"$gte": start_date, "$lt": end_date},
-        "status": {"$in": ["sent", "paid", "partial", "overdue"]}
-    })
-    invoices_leg = await db.invoices.find(legacy_query, {"_id": 0}).to_list(5000)  # SPRINT-2B: hard-cap unbounded query
-    all_3b_invoices = list(invoices_enh) + list(invoices_leg)
+    # OUTWARD SUPPLIES (Invoices)
+    outward_rows = await grouped_tax_lines(
+        db, org_id, period, {"source_type": "invoice"},
+        ("category", "place_of_supply", "supply_type"),
+    )
     
     outward_taxable = 0
     outward_cgst = 0
     outward_sgst = 0
     outward_igst = 0
+    total_exempt_value = 0
     
     # B2C tracking for Section 3.2 (P1-10: inter-state vs intra-state split)
     b2c_interstate_taxable = 0
@@ -878,51 +814,40 @@ async def get_gstr3b_report(request: Request, month: str = "", # Format: YYYY-MM
     b2c_intrastate_cgst = 0
     b2c_intrastate_sgst = 0
     
-    for inv in all_3b_invoices:
-        subtotal = inv.get("sub_total", 0) or inv.get("subtotal", 0) or 0
-        tax_total = inv.get("tax_total", 0) or (inv.get("total", 0) - subtotal)
-        customer_gstin = inv.get("customer_gstin", "") or inv.get("gst_no", "")
-        customer_state = customer_gstin[:2] if customer_gstin and len(customer_gstin) >= 2 else org_state
-        is_intra = customer_state == org_state
-        
-        outward_taxable += subtotal
+    for row in outward_rows:
+        tax = split_tax(row, org_state)
+        customer_state = row.get("place_of_supply") or org_state
         
-        if is_intra:
-            outward_cgst += tax_total / 2
-            outward_sgst += tax_total / 2
-        else:
-            outward_igst += tax_total
+        outward_taxable += row["taxable_value"]
+        outward_cgst += tax["cgst"]
+        outward_sgst += tax["sgst"]
+        outward_igst += tax["igst"]
+        if row.get("supply_type") == "exempt":
+            total_exempt_value += row["taxable_value"]
         
         # B2C split (Section 3.2 / Table 3.2) — invoices without valid GSTIN
-        is_b2c = not (customer_gstin and validate_gstin(customer_gstin).get("valid"))
-        if is_b2c:
-            if not is_intra:
-                b2c_interstate_taxable += subtotal
-                b2c_interstate_igst += tax_total
-                state_name = INDIAN_STATES.get(customer_state, "Unknown")
+        if row.get("category") != "b2b":
+            if not is_intra_state(row, org_state):
+                b2c_interstate_taxable += row["taxable_value"]
+                b2c_interstate_igst += tax["igst"]
                 if customer_state not in b2c_interstate_by_state:
                     b2c_interstate_by_state[customer_state] = {
                         "place_of_supply": customer_state,
-                        "state_name": state_name,
+                        "state_name": INDIAN_STATES.get(customer_state, "Unknown"),
                         "taxable_value": 0, "igst": 0
                     }
-                b2c_interstate_by_state[customer_state]["taxable_value"] += subtotal
-                b2c_interstate_by_state[customer_state]["igst"] += tax_total
+                b2c_interstate_by_state[customer_state]["taxable_value"] += row["taxable_value"]
+                b2c_interstate_by_state[customer_state]["igst"] += tax["igst"]
             else:
-                b2c_intrastate_taxable += subtotal
-                b2c_intrastate_cgst += tax_total / 2
-                b2c_intrastate_sgst += tax_total / 2
-    
-    # INPUT TAX CREDIT (Bills + Expenses) — org-scoped
-    bills = await db.bills.find(
-        org_query(org_id, {"date": {"$gte": start_date, "$lt": end_date}}),
-        {"_id": 0}
-    ).to_list(5000)  # SPRINT-2B: hard-cap unbounded query
-    
-    expenses = await db.expenses.find(
-        org_query(org_id, {"expense_date": {"$gte": start_date, "$lt": end_date}}),
-        {"_id": 0}
-    ).to_list(5000)  # SPRINT-2B: hard-cap unbounded query
+                b2c_intrastate_taxable += row["taxable_value"]
+                b2c_intrastate_cgst += tax["cgst"]
+                b2c_intrastate_sgst += tax["sgst"]
+    
+    # INPUT TAX CREDIT (Bills + Expenses)
+    inward_rows = await grouped_tax_lines(
+        db, org_id, period, {"source_type": {"$in": ["bill", "expense"]}},
+        ("itc_category", "place_of_supply", "reverse_charge", "blocked_credit"), documents=True,
+    )
     
     input_taxable = 0
     input_cgst = 0
@@ -935,60 +860,50 @@ async def get_gstr3b_report(request: Request, month: str = "", # Format: YYYY-MM
     itc_rcm = {"cgst": 0, "sgst": 0, "igst": 0}
     itc_isd = {"cgst": 0, "sgst": 0, "igst": 0}
     itc_all_other = {"cgst": 0, "sgst": 0, "igst": 0}
+    itc_by_category = {
+        "import_goods": itc_import_goods,
+        "import_services": itc_import_services,
+        "rcm": itc_rcm,
+        "isd": itc_isd,
+        "other": itc_all_other,
+    }
     
-    for bill in bills:
-        subtotal = bill.get("sub_total", 0) or bill.get("subtotal", 0) or 0
-        tax_total = bill.get("tax_total", 0) or (bill.get("total", 0) - subtotal)
-        vendor_gstin = bill.get("vendor_gstin", "") or bill.get("gst_no", "")
-        vendor_state = vendor_gstin[:2] if vendor_gstin and len(vendor_gstin) >= 2 else org_state
-        
-        input_taxable += subtotal
-        
-        if vendor_state == org_state:
-            bill_cgst = tax_total / 2
-            bill_sgst = tax_total / 2
-            bill_igst = 0
-        else:
-            bill_cgst = 0
-            bill_sgst = 0
-            bill_igst = tax_total
+    # TABLE 4D — Ineligible ITC: bills flagged is_blocked_credit (Section 17(5) blocked inputs)
+    itc_ineligible_cgst = 0
+    itc_ineligible_sgst = 0
+    itc_ineligible_igst = 0
+    
+    # SECTION 3.1(d) — Inward supplies liable to reverse charge
+    rcm_taxable = 0
+    rcm_cgst = 0
+    rcm_sgst = 0
+    rcm_igst = 0
+    rcm_bills = set()
+    
+    for row in inward_rows:
+        tax = split_tax(row, org_state)
         
-        input_cgst += bill_cgst
-        input_sgst += bill_sgst
-        input_igst += bill_igst
+        input_taxable += row["taxable_value"]
+        input_cgst += tax["cgst"]
+        input_sgst += tax["sgst"]
+        input_igst += tax["igst"]
         
-        # Categorize ITC (Table 4A — P1-10)
-        gst_treatment = bill.get("gst_treatment", "")
-        is_import = bill.get("is_import", False) or gst_treatment in ("import", "overseas")
-        is_rcm = bill.get("reverse_charge", False)
-        is_isd = bill.get("is_isd", False) or gst_treatment == "isd"
-        is_service = bill.get("is_service", False) or bill.get("supply_type") == "service"
+        target = itc_by_category.get(row.get("itc_category"), itc_all_other)
+        target["cgst"] += tax["cgst"]
+        target["sgst"] += tax["sgst"]
+        target["igst"] += tax["igst"]
         
-        if is_import and is_service:
-            target = itc_import_services
-        elif is_import:
-            target = itc_import_goods
-        elif is_rcm:
-            target = itc_rcm
-        elif is_isd:
-            target = itc_isd
-        else:
-            target = itc_all_other
+        if row.get("blocked_credit"):
+            itc_ineligible_cgst += tax["cgst"]
+            itc_ineligible_sgst += tax["sgst"]
+            itc_ineligible_igst += tax["igst"]
         
-        target["cgst"] += bill_cgst
-        target["sgst"] += bill_sgst
-        target["igst"] += bill_igst
-    
-    for exp in expenses:
-        amount = exp.get("amount", 0)
-        tax_amount = exp.get("tax_amount", 0) or amount * 0.18  # Assume 18% if not specified
-        exp_cgst = tax_amount / 2
-        exp_sgst = tax_amount / 2
-        input_taxable += amount
-        input_cgst += exp_cgst
-        input_sgst += exp_sgst
-        itc_all_other["cgst"] += exp_cgst
-        itc_all_other["sgst"] += exp_sgst
+        if row.get("reverse_charge"):
+            rcm_taxable += row["taxable_value"]
+            rcm_cgst += tax["cgst"]
+            rcm_sgst += tax["sgst"]
+            rcm_igst += tax["igst"]
+            rcm_bills.update(row["documents"])
     
     # TABLE 4B — ITC Reversed (Sprint 4B-04)
     # vendor_credits schema: {amount, line_items: [{rate, tax_rate, amount}], status, date, organization_id}
@@ -999,7 +914,19 @@ async def get_gstr3b_report(request: Request, month: str = "", # Format: YYYY-MM
     })
     vendor_credits_list = await db.vendor_credits.find(
         vendor_credit_query, {"_id": 0}
-    ).to_list(1000)
+    ).to_list(None)
+    
+    # Vendor state of every linked bill in one query
+    linked_bill_ids = list({vc["linked_bill_id"] for vc in vendor_credits_list if vc.get("linked_bill_id")})
+    linked_bill_states = {}
+    if linked_bill_ids:
+        async for linked_bill in db.bills.find(
+            {"bill_id": {"$in": linked_bill_ids}, "organization_id": org_id},
+            {"bill_id": 1, "vendor_gstin": 1, "_id": 0}
+        ):
+            vg = linked_bill.get("vendor_gstin", "")
+            if vg and len(vg) >= 2:
+                linked_bill_states[linked_bill["bill_id"]] = vg[:2]
 
     itc_reversed_cgst = 0
     itc_reversed_sgst = 0
@@ -1011,19 +938,8 @@ async def get_gstr3b_report(request: Request, month: str = "", # Format: YYYY-MM
             item_amount = li.get("amount", 0) or (li.get("quantity", 0) * li.get("rate", 0))
             item_tax_rate = li.get("tax_rate", 0) or 0
             vc_tax += item_amount * (item_tax_rate / 100)
-        # If no line_items, estimate from total amount with zero tax
-        # Determine intra/inter from linked bill's vendor GSTIN
-        linked_bill_id = vc.get("linked_bill_id")
-        vendor_state = org_state  # default to intra-state
-        if linked_bill_id:
-            linked_bill = await db.bills.find_one(
-                {"bill_id": linked_bill_id, "organization_id": org_id},
-                {"vendor_gstin": 1, "_id": 0}
-            )
-            if linked_bill:
-                vg = linked_bill.get("vendor_gstin", "")
-                if vg and len(vg) >= 2:
-                    vendor_state = vg[:2]
+        # Determine intra/inter from linked bill's vendor GSTIN (default intra-state)
+        vendor_state = linked_bill_states.get(vc.get("linked_bill_id"), org_state)
         if vendor_state == org_state:
             itc_reversed_cgst += vc_tax / 2
             itc_reversed_sgst += vc_tax / 2
@@ -1042,16 +958,6 @@ async def get_gstr3b_report(request: Request, month: str = "", # Format: YYYY-MM
     # If an org has NO exempt supplies (most EV workshops), the ratio is 0
     # and the reversal is correctly zero — this is not a gap, it's the
     # expected result under Rule 42/43 when 100% of supplies are taxable.
-    exempt_invoices_query = org_query(org_id, {
-        "invoice_date": {"$gte": start_date, "$lt": end_date},
-        "supply_type": "exempt"
-    })
-    exempt_invoices = await db.invoices_enhanced.find(
-        exempt_invoices_query, {"_id": 0, "sub_total": 1}
-    ).to_list(5000)
-    total_exempt_value = sum(
-        inv.get("sub_total", 0) for inv in exempt_invoices
-    )
     total_supply_value = outward_taxable  # total taxable outward (before CN)
 
     if total_exempt_value > 0 and total_supply_value > 0:
@@ -1073,32 +979,6 @@ async def get_gstr3b_report(request: Request, month: str = "", # Format: YYYY-MM
     itc_reversed_total_sgst = itc_reversed_rule42_43["sgst"] + itc_reversed_others["sgst"]
     itc_reversed_total_igst = itc_reversed_rule42_43["igst"] + itc_reversed_others["igst"]
 
-    # TABLE 4D — Ineligible ITC (Sprint 4B-04)
-    # Query bills where is_blocked_credit = True (Section 17(5) blocked inputs)
-    blocked_bills_query = org_query(org_id, {
-        "date": {"$gte": start_date, "$lt": end_date},
-        "is_blocked_credit": True
-    })
-    blocked_bills = await db.bills.find(
-        blocked_bills_query, {"_id": 0}
-    ).to_list(1000)
-    # NOTE: Requires is_blocked_credit flag on bill documents.
-    # Currently zero if flag not set — correct default.
-    # Bill schema: {sub_total, tax_total, total, vendor_gstin} — compute CGST/SGST/IGST from state
-
-    itc_ineligible_cgst = 0
-    itc_ineligible_sgst = 0
-    itc_ineligible_igst = 0
-    for b in blocked_bills:
-        b_tax = b.get("tax_total", 0) or (b.get("total", 0) - (b.get("sub_total", 0) or b.get("subtotal", 0) or 0))
-        b_vendor_gstin = b.get("vendor_gstin", "") or b.get("gst_no", "")
-        b_vendor_state = b_vendor_gstin[:2] if b_vendor_gstin and len(b_vendor_gstin) >= 2 else org_state
-        if b_vendor_state == org_state:
-            itc_ineligible_cgst += b_tax / 2
-            itc_ineligible_sgst += b_tax / 2
-        else:
-            itc_ineligible_igst += b_tax
-
     itc_ineligible_17_5 = {
         "cgst": itc_ineligible_cgst,
         "sgst": itc_ineligible_sgst,
@@ -1114,55 +994,24 @@ async def get_gstr3b_report(request: Request, month: str = "", # Format: YYYY-MM
     net_itc_cgst = input_cgst - itc_reversed_total_cgst - itc_ineligible_total_cgst
     net_itc_sgst = input_sgst - itc_reversed_total_sgst - itc_ineligible_total_sgst
     net_itc_igst = input_igst - itc_reversed_total_igst - itc_ineligible_total_igst
-
-    # NET TAX LIABILITY (uses net ITC after reversals and ineligible deductions)
-    net_cgst = max(0, outward_cgst - net_itc_cgst)
-    net_sgst = max(0, outward_sgst - net_itc_sgst)
-    net_igst = max(0, outward_igst - net_itc_igst)
-    
-    # Credit Notes (reduce output liability) — org-scoped, proper GST breakdown
-    cn_query_3b = org_query(org_id, {
-        "created_at": {"$gte": start_date, "$lt": end_date},
-        "status": {"$ne": "cancelled"}
-    })
-    cn_list = await db.credit_notes.find(cn_query_3b, {"_id": 0}).to_list(1000)
-    cn_taxable = sum(cn.get("subtotal", 0) for cn in cn_list)
-    cn_cgst = sum(cn.get("cgst_amount", 0) for cn in cn_list)
-    cn_sgst = sum(cn.get("sgst_amount", 0) for cn in cn_list)
-    cn_igst = sum(cn.get("igst_amount", 0) for cn in cn_list)
+    
+    # Credit Notes (reduce output liability) — proper GST breakdown from the notes
+    cn_rows = await grouped_tax_lines(
+        db, org_id, period, {"source_type": "credit_note"}, ("source_type",), documents=True,
+    )
+    cn_taxable = sum(r["taxable_value"] for r in cn_rows)
+    cn_cgst = sum(split_tax(r, org_state)["cgst"] for r in cn_rows)
+    cn_sgst = sum(split_tax(r, org_state)["sgst"] for r in cn_rows)
+    cn_igst = sum(split_tax(r, org_state)["igst"] for r in cn_rows)
     cn_tax_total = cn_cgst + cn_sgst + cn_igst
-    cn_value = sum(cn.get("total", 0) for cn in cn_list)
+    cn_value = sum(r["value"] for r in cn_rows)
+    cn_count = sum(len(r["documents"]) for r in cn_rows)
     
-    # Adjust net liability by deducting CN tax
+    # NET TAX LIABILITY (net ITC after reversals and ineligible deductions, less CN tax)
     net_cgst = max(0, outward_cgst - net_itc_cgst - cn_cgst)
     net_sgst = max(0, outward_sgst - net_itc_sgst - cn_sgst)
     net_igst = max(0, outward_igst - net_itc_igst - cn_igst)
     
-    # SECTION 3.1(d) — Inward supplies liable to reverse charge — org-scoped
-    rcm_bill_query = org_query(org_id, {
-        "date": {"$gte": start_date, "$lt": end_date},
-        "reverse_charge": True
-    })
-    rcm_bills = await db.bills.find(rcm_bill_query, {"_id": 0}).to_list(5000)  # SPRINT-2B: hard-cap unbounded query
-    
-    rcm_taxable = 0
-    rcm_cgst = 0
-    rcm_sgst = 0
-    rcm_igst = 0
-    
-    for bill in rcm_bills:
-        subtotal = bill.get("sub_total", 0) or bill.get("subtotal", 0) or 0
-        tax_total = bill.get("tax_total", 0) or (bill.get("total", 0) - subtotal)
-        vendor_gstin = bill.get("vendor_gstin", "") or bill.get("gst_no", "")
-        vendor_state = vendor_gstin[:2] if vendor_gstin and len(vendor_gstin) >= 2 else org_state
-        
-        rcm_taxable += subtotal
-        if vendor_state == org_state:
-            rcm_cgst += tax_total / 2
-            rcm_sgst += tax_total / 2
-        else:
-            rcm_igst += tax_total
-    
     rcm_total_tax = rcm_cgst + rcm_sgst + rcm_igst
     
     # Add RCM to net tax liability (RCM is payable ON TOP of forward charge)
@@ -1269,7 +1118,7 @@ async def get_gstr3b_report(request: Request, month: str = "", # Format: YYYY-MM
         },
         "adjustments": {
             "credit_notes": {
-                "count": len(cn_list),  # Pattern B: len() on already-fetched list (acceptable)
+                "count": cn_count,
                 "taxable_value": round(cn_taxable, 2),
                 "cgst": round(cn_cgst, 2),
                 "sgst": round(cn_sgst, 2),
@@ -1416,13 +1265,13 @@ async def generate_gstr3b_pdf(data: dict, month: str, org_settings: dict, org_id
         </div>
         
         <div style="margin-top: 20px; text-align: center; font-size: 8pt; color: #999;">
-            Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')} | This is a computer-generated document
+            Generated on {generated_stamp()} | This is a computer-generated document
         </div>
     </body>
     </html>
     """
     
-    pdf_bytes = generate_pdf_from_html(html, is_trial=await _is_trial_plan_gst(org_id))
+    pdf_bytes = await render_pdf(html, is_trial=await _is_trial_plan_gst(org_id), cache=True)
     return Response(
         content=pdf_bytes,
         media_type="application/pdf",
@@ -1446,47 +1295,44 @@ async def get_hsn_summary(request: Request, month: str = "", format: str = Query
     
     try:
         year, mon = month.split("-")
-        start_date = f"{year}-{mon}-01"
-        if int(mon) == 12:
-            end_date = f"{int(year)+1}-01-01"
-        else:
-            end_date = f"{year}-{int(mon)+1:02d}-01"
+        period = f"{int(year):04d}-{int(mon):02d}"
     except:
         raise HTTPException(status_code=400, detail="Invalid month format")
     
-    # Get all invoice line items with HSN codes — org-scoped (Sprint 2C carry-forward)
-    invoices = await db.invoices.find(
-        {"organization_id": org_id, "date": {"$gte": start_date, "$lt": end_date}},
-        {"_id": 0, "line_items": 1}
-    ).to_list(5000)  # SPRINT-2B: hard-cap unbounded query
+    org_settings = await db.organization_settings.find_one(
+        org_query(org_id, {}), {"_id": 0}
+    ) or {}
+    org_state = _org_state(org_settings)
+    
+    # Invoice lines grouped by HSN from the GST tax line ledger — org-scoped, uncapped
+    await ensure_gst_ledger(db, org_id, period)
+    rows = await grouped_tax_lines(
+        db, org_id, period, {"source_type": "invoice"},
+        ("hsn_code", "place_of_supply"), first=("description", "uqc"),
+    )
     
     hsn_data = {}
     
-    for inv in invoices:
-        for item in inv.get("line_items", []):
-            hsn = item.get("hsn_or_sac", "") or item.get("hsn_code", "") or "N/A"
-            if hsn not in hsn_data:
-                hsn_data[hsn] = {
-                    "hsn_code": hsn,
-                    "description": item.get("description", "") or item.get("name", ""),
-                    "uqc": item.get("unit", "NOS"),
-                    "quantity": 0,
-                    "taxable_value": 0,
-                    "cgst": 0,
-                    "sgst": 0,
-                    "igst": 0
-                }
-            
-            qty = item.get("quantity", 1)
-            rate = item.get("rate", 0)
-            tax_rate = item.get("tax_percentage", 18) or 18
-            amount = qty * rate
-            tax = amount * (tax_rate / 100)
-            
-            hsn_data[hsn]["quantity"] += qty
-            hsn_data[hsn]["taxable_value"] += amount
-            hsn_data[hsn]["cgst"] += tax / 2
-            hsn_data[hsn]["sgst"] += tax / 2
+    for row in sorted(rows, key=lambda r: r["hsn_code"]):
+        hsn = row["hsn_code"]
+        if hsn not in hsn_data:
+            hsn_data[hsn] = {
+                "hsn_code": hsn,
+                "description": row.get("description") or "",
+                "uqc": row.get("uqc") or "NOS",
+                "quantity": 0,
+                "taxable_value": 0,
+                "cgst": 0,
+                "sgst": 0,
+                "igst": 0
+            }
+        
+        tax = split_tax(row, org_state)
+        hsn_data[hsn]["quantity"] += row["quantity"]
+        hsn_data[hsn]["taxable_value"] += row["taxable_value"]
+        hsn_data[hsn]["cgst"] += tax["cgst"]
+        hsn_data[hsn]["sgst"] += tax["sgst"]
+        hsn_data[hsn]["igst"] += tax["igst"]
     
     hsn_list = list(hsn_data.values())
     
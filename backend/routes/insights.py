@@ -9,10 +9,14 @@ All endpoints:
   - Return real aggregated data from MongoDB
 """
 from fastapi import APIRouter, Request, Query
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 from typing import Optional
 import logging
 
+from utils.time_series import time_series
+from services.report_cache import cached_report
+from services.technician_daily_stats import get_technician_totals, averages as technician_averages
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/insights", tags=["Data Insights"])
@@ -82,6 +86,7 @@ def safe(val, default=0):
 # ======================== REVENUE INTELLIGENCE ========================
 
 @router.get("/revenue")
+@cached_report("insights.revenue", get_org_id)
 async def get_revenue_insights(request: Request, date_from: Optional[str] = Query(None),
     date_to: Optional[str] = Query(None),
 ):
@@ -102,27 +107,24 @@ async def get_revenue_insights(request: Request, date_from: Optional[str] = Quer
     match = inv_match(start, end)
     prev_match = inv_match(prev_start, prev_end)
 
-    # Current period paid revenue
-    paid_agg = await db.invoices_enhanced.aggregate([
-        {"$match": {**match, "status": "paid"}},
-        {"$group": {"_id": None, "revenue": {"$sum": "$grand_total"}, "count": {"$sum": 1}}},
-    ]).to_list(1)
-    paid_data = paid_agg[0] if paid_agg else {}
-    revenue = safe(paid_data.get("revenue"), 0)
-    paid_count = safe(paid_data.get("count"), 0)
+    # Current period paid revenue, bucketed by day for the trend
+    trend = await time_series(
+        db.invoices_enhanced,
+        {"organization_id": org_id, "status": "paid"},
+        date_field="invoice_date", unit="day",
+        start=date.fromisoformat(start), end=date.fromisoformat(end),
+        accumulators={"revenue": {"$sum": "$grand_total"}, "count": {"$sum": 1}},
+    )
+    revenue = sum(t["revenue"] for t in trend)
+    paid_count = sum(t["count"] for t in trend)
 
     # Previous period
     prev_agg = await db.invoices_enhanced.aggregate([
         {"$match": {**prev_match, "status": "paid"}},
-        {"$group": {"_id": None, "revenue": {"$sum": "$grand_total"}}},
+        {"$group": {"_id": None, "revenue": {"$sum": "$grand_total"}, "count": {"$sum": 1}}},
     ]).to_list(1)
     prev_revenue = safe(prev_agg[0]["revenue"] if prev_agg else 0)
-
-    # Previous avg invoice
-    prev_paid_count = 0
-    if prev_agg:
-        prev_paid_count_agg = await db.invoices_enhanced.count_documents({**prev_match, "status": "paid"})
-        prev_paid_count = prev_paid_count_agg
+    prev_paid_count = safe(prev_agg[0]["count"] if prev_agg else 0)
 
     # Total invoices (for collection rate)
     total_count = await db.invoices_enhanced.count_documents(match)
@@ -134,13 +136,6 @@ async def get_revenue_insights(request: Request, date_from: Optional[str] = Quer
     ]).to_list(1)
     ar = safe(ar_agg[0]["ar"] if ar_agg else 0)
 
-    # Daily revenue trend
-    trend_agg = await db.invoices_enhanced.aggregate([
-        {"$match": {**match, "status": "paid"}},
-        {"$group": {"_id": "$invoice_date", "revenue": {"$sum": "$grand_total"}}},
-        {"$sort": {"_id": 1}},
-    ]).to_list(200)
-
     # Revenue by service type (lookup item_type from items)
     type_agg = await db.invoices_enhanced.aggregate([
         {"$match": {**match, "status": "paid", "line_items": {"$exists": True, "$ne": []}}},
@@ -188,8 +183,8 @@ async def get_revenue_insights(request: Request, date_from: Optional[str] = Quer
             "total_count": total_count,
         },
         "trend": [
-            {"date": t["_id"], "revenue": round(t["revenue"], 2)}
-            for t in trend_agg if t["_id"]
+            {"date": t["bucket"].isoformat(), "revenue": round(t["revenue"], 2)}
+            for t in trend
         ],
         "by_type": [
             {"type": t["_id"] or "Other", "revenue": round(t["revenue"], 2)}
@@ -201,6 +196,7 @@ async def get_revenue_insights(request: Request, date_from: Optional[str] = Quer
 # ======================== WORKSHOP OPERATIONS ========================
 
 @router.get("/operations")
+@cached_report("insights.operations", get_org_id)
 async def get_operations_insights(request: Request, date_from: Optional[str] = Query(None),
     date_to: Optional[str] = Query(None),
 ):
@@ -312,6 +308,7 @@ async def get_operations_insights(request: Request, date_from: Optional[str] = Q
 # ======================== TECHNICIAN PERFORMANCE ========================
 
 @router.get("/technicians")
+@cached_report("insights.technicians", get_org_id)
 async def get_technician_insights(request: Request, date_from: Optional[str] = Query(None),
     date_to: Optional[str] = Query(None),
 ):
@@ -319,119 +316,37 @@ async def get_technician_insights(request: Request, date_from: Optional[str] = Q
     org_id = await get_org_id(request)
     start, end, _, _ = get_date_range(date_from, date_to)
 
-    closed_match = {
-        "organization_id": org_id,
-        "status": {"$in": ["closed", "resolved"]},
-        "created_at": {"$gte": start + "T00:00:00", "$lte": end + "T23:59:59"},
-        "assigned_technician_id": {"$exists": True, "$ne": None},
-    }
-
-    # Technician aggregation
-    tech_agg = await db.tickets.aggregate([
-        {"$match": closed_match},
-        {"$project": {
-            "tech_id": "$assigned_technician_id",
-            "tech_name": "$assigned_technician_name",
-            "vehicle_type": 1,
-            "res_hours": {
-                "$cond": [
-                    {"$and": [
-                        {"$ifNull": ["$closed_at", False]},
-                        {"$ifNull": ["$created_at", False]},
-                    ]},
-                    {"$divide": [
-                        {"$subtract": [{"$toDate": "$closed_at"}, {"$toDate": "$created_at"}]},
-                        3600000,
-                    ]},
-                    None,
-                ]
-            },
-            "sla_ok": {
-                "$cond": [
-                    {"$and": [
-                        {"$ifNull": ["$sla_resolution_due_at", False]},
-                        {"$ifNull": ["$closed_at", False]},
-                    ]},
-                    {"$lte": ["$closed_at", "$sla_resolution_due_at"]},
-                    None,
-                ]
-            },
-        }},
-        {"$group": {
-            "_id": "$tech_id",
-            "name": {"$first": "$tech_name"},
-            "tickets_closed": {"$sum": 1},
-            "avg_hours": {"$avg": "$res_hours"},
-            "sla_ok": {"$sum": {"$cond": [{"$eq": ["$sla_ok", True]}, 1, 0]}},
-            "sla_total": {"$sum": {"$cond": [{"$ne": ["$sla_ok", None]}, 1, 0]}},
-            "vehicle_types": {"$push": "$vehicle_type"},
-        }},
-        {"$sort": {"tickets_closed": -1}},
-        {"$limit": 20},
-    ]).to_list(20)
-
-    # Ratings
-    ratings_agg = await db.ticket_reviews.aggregate([
-        {"$match": {
-            "organization_id": org_id,
-            "completed": True,
-            "completed_at": {"$gte": start + "T00:00:00", "$lte": end + "T23:59:59"},
-        }},
-        {"$lookup": {
-            "from": "tickets",
-            "localField": "ticket_id",
-            "foreignField": "ticket_id",
-            "as": "tkt",
-        }},
-        {"$unwind": {"path": "$tkt", "preserveNullAndEmptyArrays": True}},
-        {"$group": {
-            "_id": "$tkt.assigned_technician_id",
-            "avg_rating": {"$avg": "$rating"},
-            "review_count": {"$sum": 1},
-        }},
-    ]).to_list(50)
-    ratings = {r["_id"]: r for r in ratings_agg}
+    # Daily rollups (services/technician_daily_stats.py): tickets closed in the range
+    totals = await get_technician_totals(db, org_id, start, end)
+    closers = sorted((t for t in totals.values() if t["closed"]), key=lambda t: t["closed"], reverse=True)
 
     leaderboard = []
-    for tech in tech_agg:
-        tid = tech["_id"]
-        rd = ratings.get(tid, {})
-        sla_pct = round(tech["sla_ok"] / tech["sla_total"] * 100, 1) if tech["sla_total"] > 0 else None
+    for tech in closers[:20]:
+        means = technician_averages(tech)
         leaderboard.append({
-            "id": tid,
-            "name": tech["name"] or "Unknown",
-            "tickets_closed": tech["tickets_closed"],
-            "avg_hours": round(tech["avg_hours"], 1) if tech["avg_hours"] is not None else None,
-            "avg_rating": round(rd["avg_rating"], 1) if rd.get("avg_rating") else None,
-            "review_count": rd.get("review_count", 0),
-            "sla_compliance": sla_pct,
+            "id": tech["technician_id"],
+            "name": tech["technician_name"] or "Unknown",
+            "tickets_closed": tech["closed"],
+            "avg_hours": round(tech["resolution_minutes"] / tech["resolution_count"] / 60, 1)
+            if tech["resolution_count"] else None,
+            "avg_rating": means["avg_rating"],
+            "review_count": tech["rating_count"],
+            "sla_compliance": means["sla_compliance_pct"],
         })
 
     # Specialisation heatmap
-    heatmap_agg = await db.tickets.aggregate([
-        {"$match": {
-            **closed_match,
-            "vehicle_type": {"$ne": None, "$exists": True},
-        }},
-        {"$group": {
-            "_id": {"tech": "$assigned_technician_id", "vtype": "$vehicle_type"},
-            "name": {"$first": "$assigned_technician_name"},
-            "count": {"$sum": 1},
-        }},
-        {"$sort": {"count": -1}},
-        {"$limit": 200},
-    ]).to_list(200)
-
     techs_map = {}
     vtypes = set()
     matrix = {}
-    for row in heatmap_agg:
-        tid = row["_id"]["tech"]
-        vt = (row["_id"]["vtype"] or "unknown").replace("_", " ").title()
-        if tid not in techs_map:
-            techs_map[tid] = row.get("name") or tid
-        vtypes.add(vt)
-        matrix[(tid, vt)] = row["count"]
+    for tech in closers:
+        for vtype, count in tech["by_vehicle_type"].items():
+            if vtype == "unknown" or not count:
+                continue
+            tid = tech["technician_id"]
+            vt = vtype.replace("_", " ").title()
+            techs_map[tid] = tech["technician_name"] or tid
+            vtypes.add(vt)
+            matrix[(tid, vt)] = matrix.get((tid, vt), 0) + count
 
     heatmap_rows = []
     for tid, tname in techs_map.items():
@@ -450,6 +365,7 @@ async def get_technician_insights(request: Request, date_from: Optional[str] = Q
 # ======================== EVFI INTELLIGENCE ========================
 
 @router.get("/evfi")
+@cached_report("insights.evfi", get_org_id)
 async def get_efi_insights(request: Request, date_from: Optional[str] = Query(None),
     date_to: Optional[str] = Query(None),
 ):
@@ -552,6 +468,7 @@ async def get_efi_insights(request: Request, date_from: Optional[str] = Query(No
 # ======================== CUSTOMER INTELLIGENCE ========================
 
 @router.get("/customers")
+@cached_report("insights.customers", get_org_id)
 async def get_customer_insights(request: Request, date_from: Optional[str] = Query(None),
     date_to: Optional[str] = Query(None),
 ):
@@ -677,6 +594,7 @@ async def get_customer_insights(request: Request, date_from: Optional[str] = Que
 # ======================== INVENTORY INTELLIGENCE ========================
 
 @router.get("/inventory")
+@cached_report("insights.inventory", get_org_id)
 async def get_inventory_insights(request: Request, date_from: Optional[str] = Query(None),
     date_to: Optional[str] = Query(None),
 ):
@@ -19,6 +19,7 @@ import logging
 from fastapi import Request
 from utils.database import require_org_id, org_query
 from services.double_entry_service import DoubleEntryService, EntryType
+from services.pdf_renderer import render_pdf, PdfRenderError
 
 
 logger = logging.getLogger(__name__)
@@ -1289,13 +1290,14 @@ async def generate_pdf(request: Request, adjustment_id: str):
     html_content = generate_adjustment_html(adj)
 
     try:
-        from weasyprint import HTML
-        pdf_bytes = HTML(string=html_content).write_pdf()
+        pdf_bytes = await render_pdf(html_content)
         return StreamingResponse(
             io.BytesIO(pdf_bytes),
             media_type="application/pdf",
             headers={"Content-Disposition": f"attachment; filename=Adjustment_{adj.get('reference_number', adjustment_id)}.pdf"}
         )
+    except PdfRenderError:
+        raise
     except ImportError:
         return {"code": 1, "message": "WeasyPrint not available", "html": html_content}
     except Exception as e:
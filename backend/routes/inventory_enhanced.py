@@ -17,6 +17,7 @@ router = APIRouter(prefix="/inventory-enhanced", tags=["Inventory Enhanced"])
 
 # Database connection - shared instance from utils.database
 from utils.database import db, require_org_id, org_query
+from services.inventory_valuation import value_inventory
 
 # Collections
 items_collection = db["items"]  # Use same collection as items_enhanced route
@@ -1088,67 +1089,34 @@ async def list_adjustments(request: Request, item_id: Optional[str] = None, ware
 # ========================= REPORTS =========================
 
 @router.get("/reports/stock-summary")
-async def stock_summary_report(request: Request, warehouse_id: Optional[str] = None):
+async def stock_summary_report(request: Request, warehouse_id: Optional[str] = None, valuation_method: str = "unit_price"):
     org_id = require_org_id(request)
     """Stock summary report"""
     match = {"organization_id": org_id, "status": "active"}
     
-    pipeline = [
-        {"$match": match},
-        {"$lookup": {
-            "from": "item_stock_locations",
-            "let": {"item_id": "$item_id"},
-            "pipeline": [
-                {"$match": {"$expr": {"$eq": ["$item_id", "$$item_id"]}}},
-                *([{"$match": {"warehouse_id": warehouse_id}}] if warehouse_id else [])
-            ],
-            "as": "stock"
-        }},
-        {"$addFields": {
-            "total_stock": {"$sum": "$stock.available_stock"},
-            "total_reserved": {"$sum": "$stock.reserved_stock"},
-            "purchase_rate_num": {
-                "$cond": {
-                    "if": {"$or": [
-                        {"$eq": ["$purchase_rate", ""]},
-                        {"$eq": ["$purchase_rate", None]},
-                        {"$not": {"$isNumber": "$purchase_rate"}}
-                    ]},
-                    "then": 0,
-                    "else": {"$toDouble": "$purchase_rate"}
-                }
-            },
-            "reorder_level_num": {
-                "$cond": {
-                    "if": {"$or": [
-                        {"$eq": ["$reorder_level", ""]},
-                        {"$eq": ["$reorder_level", None]},
-                        {"$not": {"$isNumber": "$reorder_level"}}
-                    ]},
-                    "then": 0,
-                    "else": {"$toDouble": "$reorder_level"}
-                }
-            }
-        }},
-        {"$project": {
-            "_id": 0,
-            "item_id": 1,
-            "name": 1,
-            "sku": 1,
-            "purchase_rate": "$purchase_rate_num",
-            "sales_rate": 1,
-            "total_stock": 1,
-            "total_reserved": 1,
-            "reorder_level": "$reorder_level_num",
-            "stock_value": {"$multiply": ["$total_stock", "$purchase_rate_num"]}
-        }}
-    ]
-    
-    items = await items_collection.aggregate(pipeline).to_list(1000)
-    
-    total_value = sum(i.get("stock_value", 0) for i in items)
-    total_units = sum(i.get("total_stock", 0) for i in items)
-    low_stock = [i for i in items if i.get("total_stock", 0) < i.get("reorder_level", 0)]
+    try:
+        valuation = await value_inventory(
+            db, org_id, match,
+            method=valuation_method,
+            fields=("name", "sku", "sales_rate", "reorder_level"),
+            stock_source="locations",
+            warehouse_id=warehouse_id,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    reorder_level = valuation.values("reorder_level")
+    items = [{
+        "item_id": item.get("item_id"),
+        "name": item.get("name"),
+        "sku": item.get("sku"),
+        "purchase_rate": float(valuation.unit_cost[i]),
+        "sales_rate": item.get("sales_rate"),
+        "total_stock": float(valuation.qty[i]),
+        "total_reserved": float(valuation.reserved[i]),
+        "reorder_level": float(reorder_level[i]),
+        "stock_value": float(valuation.value[i])
+    } for i, item in enumerate(valuation.docs)]
     
     return {
         "code": 0,
@@ -1156,10 +1124,12 @@ async def stock_summary_report(request: Request, warehouse_id: Optional[str] = N
             "items": items,
             "summary": {
                 "total_items": len(items),
-                "total_units": round_qty(total_units),
-                "total_value": round(total_value, 2),
-                "low_stock_count": len(low_stock)
-            }
+                "total_units": round_qty(valuation.total_qty),
+                "total_value": round(valuation.total_value, 2),
+                "low_stock_count": int((valuation.qty < reorder_level).sum()),
+                "valuation_method": valuation.method
+            },
+            "warehouses": valuation.warehouses
         }
     }
 
@@ -1210,28 +1180,25 @@ async def low_stock_report(request: Request):
     return {"code": 0, "report": {"low_stock_items": items, "total": len(items)}}
 
 @router.get("/reports/valuation")
-async def inventory_valuation_report(request: Request):
+async def inventory_valuation_report(request: Request, valuation_method: str = "unit_price"):
     org_id = require_org_id(request)
     """Inventory valuation report"""
-    pipeline = [
-        {"$match": {"organization_id": org_id, "status": "active"}},
-        {"$lookup": {
-            "from": "item_stock_locations",
-            "localField": "item_id",
-            "foreignField": "item_id",
-            "as": "stock"
-        }},
-        {"$addFields": {"total_stock": {"$sum": "$stock.available_stock"}}},
-        {"$group": {
-            "_id": "$item_type",
-            "item_count": {"$sum": 1},
-            "total_units": {"$sum": "$total_stock"},
-            "purchase_value": {"$sum": {"$multiply": ["$total_stock", {"$ifNull": ["$purchase_rate", 0]}]}},
-            "sales_value": {"$sum": {"$multiply": ["$total_stock", {"$ifNull": ["$sales_rate", 0]}]}}
-        }}
-    ]
-    
-    by_type = await items_collection.aggregate(pipeline).to_list(10)
+    try:
+        valuation = await value_inventory(
+            db, org_id, {"organization_id": org_id, "status": "active"},
+            method=valuation_method,
+            fields=("item_type", "sales_rate"),
+            stock_source="locations",
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    by_type = valuation.group_by(
+        "item_type",
+        total_units=valuation.qty,
+        purchase_value=valuation.value,
+        sales_value=valuation.qty * valuation.values("sales_rate"),
+    )
     
     totals = {
         "total_items": sum(t.get("item_count", 0) for t in by_type),
@@ -1240,7 +1207,8 @@ async def inventory_valuation_report(request: Request):
         "total_sales_value": round(sum(t.get("sales_value", 0) for t in by_type), 2)
     }
     
-    return {"code": 0, "report": {"by_type": by_type, "totals": totals}}
+    return {"code": 0, "report": {"by_type": by_type, "totals": totals, "warehouses": valuation.warehouses,
+                                  "valuation_method": valuation.method}}
 
 @router.get("/reports/movement")
 async def stock_movement_report(request: Request, item_id: Optional[str] = None, days: int = 30):
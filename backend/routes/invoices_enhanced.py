@@ -14,6 +14,7 @@ import logging
 import secrets
 import base64
 import io
+import json
 
 # Import invoice validation
 from services.invoice_validation import pre_save_validation, validate_and_correct_invoice
@@ -23,6 +24,9 @@ from core.tenant.context import TenantContext, tenant_context_required, optional
 
 # Import double-entry posting hooks
 from services.posting_hooks import post_invoice_journal_entry
+from services.aging_report import aging_summary, stream_aging, BALANCE_DUE as AGING_BALANCE_DUE
+from services.pdf_renderer import render_pdf, PdfRenderError
+from services.gst_ledger import sync_gst_document
 from utils.audit_log import log_financial_action
 
 logger = logging.getLogger(__name__)
@@ -433,6 +437,13 @@ async def update_invoice_status(invoice_id: str):
         )
         await add_invoice_history(invoice_id, "status_changed", f"Status changed from {current_status} to {new_status}")
 
+async def sync_invoice_gst_lines(invoice_id: str):
+    """Refresh the invoice's lines in the GST tax line ledger (GSTR-1 / GSTR-3B)"""
+    try:
+        await sync_gst_document(db, "invoices", invoice_id)
+    except Exception as e:
+        logger.warning(f"GST ledger update failed for invoice {invoice_id}: {e}")
+
 def mock_send_email(to_emails: List[str], subject: str, body: str, attachment_name: str = ""):
     """Mock email sending"""
     logger.info(f"[MOCK EMAIL] To: {', '.join(to_emails)}")
@@ -627,57 +638,45 @@ async def get_invoices_summary(request: Request, period: str = "all"):
 # ========================= REPORTS (Must be before /{invoice_id}) =========================
 
 @router.get("/reports/aging")
-async def get_aging_report(request: Request):
-    """Get receivables aging report"""
+async def get_aging_report(
+    request: Request,
+    drilldown: bool = Query(False, description="Stream every invoice (NDJSON), grouped by customer"),
+    customer_id: Optional[str] = Query(None, description="Drilldown for one customer")
+):
+    """Get receivables aging report (exact bucket totals per customer; drilldown streams invoices)"""
     org_id = await get_org_id(request)
-    today = datetime.now(timezone.utc).date()
-    
-    invoices = await invoices_collection.find(
-        {"organization_id": org_id, "status": {"$in": ["sent", "overdue", "partially_paid"]}, "$or": [{"balance_due": {"$gt": 0}}, {"amount_due": {"$gt": 0}}]},
-        {"_id": 0, "invoice_id": 1, "invoice_number": 1, "customer_id": 1, "customer_name": 1, 
-         "due_date": 1, "grand_total": 1, "total_amount": 1, "balance_due": 1, "amount_due": 1}
-    ).to_list(1000)
+    match = {"organization_id": org_id, "status": {"$in": ["sent", "overdue", "partially_paid"]}, "$or": [{"balance_due": {"$gt": 0}}, {"amount_due": {"$gt": 0}}]}
     
-    aging = {"current": 0, "1_30": 0, "31_60": 0, "61_90": 0, "over_90": 0}
-    aged_invoices = {"current": [], "1_30": [], "31_60": [], "61_90": [], "over_90": []}
-    
-    for inv in invoices:
-        due_date_str = inv.get("due_date", "")
-        if not due_date_str:
-            continue
+    if drilldown:
+        records = stream_aging(
+            invoices_collection, match, ("invoice_id", "invoice_number", "customer_name", "due_date"),
+            amount=AGING_BALANCE_DUE, party_id=customer_id
+        )
         
-        try:
-            due_date = datetime.fromisoformat(due_date_str.replace('Z', '+00:00')).date()
-            days_overdue = (today - due_date).days
-            balance = inv.get("balance_due") or inv.get("amount_due") or 0
-            
-            if days_overdue <= 0:
-                bucket = "current"
-            elif days_overdue <= 30:
-                bucket = "1_30"
-            elif days_overdue <= 60:
-                bucket = "31_60"
-            elif days_overdue <= 90:
-                bucket = "61_90"
-            else:
-                bucket = "over_90"
-            
-            aging[bucket] += balance
-            aged_invoices[bucket].append({
-                "invoice_number": inv.get("invoice_number"),
-                "customer_name": inv.get("customer_name"),
-                "balance_due": balance,
-                "days_overdue": days_overdue
-            })
-        except:
-            continue
+        async def body():
+            async for record in records:
+                yield json.dumps(record, default=str) + "\n"
+        
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+    
+    summary = await aging_summary(invoices_collection, match, amount=AGING_BALANCE_DUE)
     
     return {
         "code": 0,
         "report": {
-            "totals": {k: round_currency(v) for k, v in aging.items()},
-            "grand_total": round_currency(sum(aging.values())),
-            "invoices": aged_invoices
+            "totals": {k: round_currency(v) for k, v in summary["totals"].items()},
+            "counts": summary["counts"],
+            "grand_total": round_currency(summary["total"]),
+            "customers": [
+                {
+                    "customer_id": p["party_id"],
+                    "customer_name": p["party_name"],
+                    **{k: round_currency(p[k]) for k in summary["totals"]},
+                    "total": round_currency(p["total"]),
+                    "invoice_count": p["document_count"]
+                }
+                for p in summary["parties"]
+            ]
         }
     }
 
@@ -918,6 +917,9 @@ async def create_invoice(invoice: InvoiceCreate, background_tasks: BackgroundTas
     logger.info(f"Invoice {invoice_number} validated before save")
     
     await invoices_collection.insert_one(invoice_doc)
+    if org_id:
+        from utils.plan_limits import record_created
+        await record_created(org_id, "invoices")
     
     # Store line items separately for reporting
     for item in calculated_items:
@@ -948,6 +950,8 @@ async def create_invoice(invoice: InvoiceCreate, background_tasks: BackgroundTas
         )
         await add_invoice_history(invoice_id, "sent", f"Invoice emailed to {', '.join(recipients)}")
     
+    await sync_invoice_gst_lines(invoice_id)
+    
     # Update contact balance
     if invoice_doc["status"] != "draft":
         await update_contact_balance(invoice.customer_id)
@@ -1118,7 +1122,6 @@ async def get_invoice_pdf(request: Request, invoice_id: str):
     - If B2C or e-invoicing DISABLED: Generate standard PDF without IRN block
     """
     from services.pdf_service import generate_gst_invoice_html
-    from weasyprint import HTML
     
     # Get org context
     org_id = await get_org_id(request)
@@ -1225,10 +1228,8 @@ async def get_invoice_pdf(request: Request, invoice_id: str):
             survey_qr_url=survey_qr_url # Survey feedback QR code
         )
         
-        # Generate PDF
-        pdf_buffer = io.BytesIO()
-        HTML(string=html_content).write_pdf(pdf_buffer)
-        pdf_buffer.seek(0)
+        # Generate PDF (off the event loop)
+        pdf_buffer = io.BytesIO(await render_pdf(html_content, cache=True))
         
         # File naming per 4E spec: INV-{invoice_number}-{customer_name}.pdf
         customer_name_safe = (invoice.get('customer_name', '') or 'Customer').replace(' ', '_')[:30]
@@ -1241,7 +1242,7 @@ async def get_invoice_pdf(request: Request, invoice_id: str):
                 "Content-Disposition": f"attachment; filename={filename}"
             }
         )
-    except HTTPException:
+    except (HTTPException, PdfRenderError):
         raise
     except Exception as e:
         logger.error(f"PDF generation failed: {e}")
@@ -1317,6 +1318,7 @@ async def update_invoice(invoice_id: str, update: InvoiceUpdate, request: Reques
         await invoices_collection.update_one({"invoice_id": invoice_id}, {"$set": update_dict})
     
     await add_invoice_history(invoice_id, "updated", "Invoice details updated")
+    await sync_invoice_gst_lines(invoice_id)
     
     updated = await invoices_collection.find_one({"invoice_id": invoice_id}, {"_id": 0})
 
@@ -1355,6 +1357,7 @@ async def delete_invoice(invoice_id: str, force: bool = False):
                 }}
             )
             await add_invoice_history(invoice_id, "voided", "Invoice voided")
+            await sync_invoice_gst_lines(invoice_id)
             await update_contact_balance(invoice["customer_id"])
             return {"code": 0, "message": "Invoice voided (has payments)", "voided": True}
         else:
@@ -1371,6 +1374,7 @@ async def delete_invoice(invoice_id: str, force: bool = False):
                 }}
             )
             await add_invoice_history(invoice_id, "voided", "Invoice voided")
+            await sync_invoice_gst_lines(invoice_id)
             await update_contact_balance(invoice["customer_id"])
             return {"code": 0, "message": "Invoice voided", "voided": True}
         else:
@@ -1380,6 +1384,7 @@ async def delete_invoice(invoice_id: str, force: bool = False):
     await invoice_line_items_collection.delete_many({"invoice_id": invoice_id})
     await invoice_history_collection.delete_many({"invoice_id": invoice_id})
     await invoices_collection.delete_one({"invoice_id": invoice_id})
+    await sync_invoice_gst_lines(invoice_id)
     
     return {"code": 0, "message": "Invoice deleted"}
 
@@ -1401,7 +1406,6 @@ async def send_invoice(request: Request, invoice_id: str, email_to: Optional[str
     """
     from services.pdf_service import generate_gst_invoice_html
     from services.email_service import EmailService
-    from weasyprint import HTML
     
     # Get org context
     org_id = await get_org_id(request)
@@ -1496,14 +1500,14 @@ async def send_invoice(request: Request, invoice_id: str, email_to: Optional[str
             bank_details=bank_details
         )
         
-        pdf_buffer = io.BytesIO()
-        HTML(string=html_content).write_pdf(pdf_buffer)
-        pdf_content = pdf_buffer.getvalue()
+        pdf_content = await render_pdf(html_content, cache=True)
         
         # File naming
         customer_name_safe = (invoice.get('customer_name', '') or 'Customer').replace(' ', '_')[:30]
         pdf_filename = f"INV-{invoice.get('invoice_number', invoice_id)}-{customer_name_safe}.pdf"
         
+    except PdfRenderError:
+        raise
     except Exception as e:
         logger.error(f"PDF generation failed for invoice {invoice_id}: {e}")
         raise HTTPException(status_code=500, detail=f"PDF generation failed. Fix PDF issue before sending: {str(e)}")
@@ -1623,6 +1627,8 @@ async def send_invoice(request: Request, invoice_id: str, email_to: Optional[str
         }}
     )
 
+    await sync_invoice_gst_lines(invoice_id)
+
     # Post journal entry for double-entry bookkeeping (only when transitioning from draft)
     if was_draft:
         if org_id:
@@ -1682,6 +1688,7 @@ async def mark_invoice_sent(invoice_id: str):
             logger.warning(f"Failed to post journal entry for invoice {invoice.get('invoice_number')}: {e}")
     
     await add_invoice_history(invoice_id, "sent", "Invoice marked as sent manually")
+    await sync_invoice_gst_lines(invoice_id)
     await update_contact_balance(invoice["customer_id"])
     
     return {"code": 0, "message": "Invoice marked as sent"}
@@ -1716,6 +1723,7 @@ async def void_invoice(invoice_id: str, reason: str = "", request: Request = Non
     )
     
     await add_invoice_history(invoice_id, "voided", f"Invoice voided. Reason: {reason or 'Not specified'}")
+    await sync_invoice_gst_lines(invoice_id)
     await update_contact_balance(invoice["customer_id"])
     
     # Audit log: invoice VOID
@@ -1935,6 +1943,7 @@ async def write_off_balance(invoice_id: str, amount: Optional[float] = None, rea
     )
     
     await add_invoice_history(invoice_id, "write_off", f"₹{write_off_amount:,.2f} written off as bad debt. Reason: {reason or 'Not specified'}")
+    await sync_invoice_gst_lines(invoice_id)
     await update_contact_balance(invoice["customer_id"])
     
     return {"code": 0, "message": f"₹{write_off_amount:,.2f} written off", "new_balance": new_balance}
@@ -2006,6 +2015,9 @@ async def bulk_invoice_action(request: BulkActionRequest, background_tasks: Back
             else:
                 results["errors"].append(f"Unknown action: {action}")
                 results["failed"] += 1
+                continue
+            
+            await sync_invoice_gst_lines(invoice_id)
         
         except Exception as e:
             results["errors"].append(f"{invoice_id}: {str(e)}")
@@ -28,6 +28,7 @@ import base64
 # Import tenant context for multi-tenant scoping
 from core.tenant.context import TenantContext, tenant_context_required, optional_tenant_context
 from utils.database import require_org_id, db as _items_db
+from services.inventory_valuation import value_inventory
 
 router = APIRouter(prefix="/items-enhanced", tags=["Items Enhanced"])
 
@@ -875,6 +876,8 @@ async def create_enhanced_item(item: ItemCreate, request: Request):
     
     await db.items.insert_one(item_dict)
     del item_dict["_id"]
+    from utils.plan_limits import record_created
+    await record_created(org_id, "items")
     
     # Initialize stock locations for inventory items
     if item.item_type == "inventory" or item.track_inventory:
@@ -2185,51 +2188,54 @@ async def get_inventory_valuation_report(
     warehouse_id: str = "",
     as_of_date: str = ""
 ):
-    """Inventory valuation report with FIFO/LIFO tracking"""
+    """Inventory valuation report - FIFO / weighted average / unit price"""
     db = get_db()
     org_id = require_org_id(request)
     
     query = {"organization_id": org_id, "item_type": {"$in": ["inventory", "sales_and_purchases"]}, "is_active": True}
     
-    # H-02: hard cap, Sprint 3 for cursor pagination
-    items = await db.items.find(query, {"_id": 0}).to_list(500)
+    try:
+        valuation = await value_inventory(
+            db, org_id, query,
+            method=valuation_method,
+            rate_fields=("purchase_rate", "opening_stock_rate"),
+            fields=("name", "sku", "unit"),
+            stock_source="locations" if warehouse_id else "item",
+            warehouse_id=warehouse_id or None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Recent purchase lots, five per item, from one query
+    recent_lots: Dict[str, list] = {}
+    item_ids = [item.get("item_id") for item in valuation.docs if item.get("item_id")]
+    if item_ids:
+        cursor = db.item_adjustments.find(
+            {"item_id": {"$in": item_ids}, "adjustment_type": "add", "organization_id": org_id},
+            {"_id": 0, "item_id": 1, "date": 1, "created_time": 1, "quantity": 1, "rate_per_unit": 1}
+        ).sort("created_time", -1)
+        async for adj in cursor:
+            lots = recent_lots.setdefault(adj.get("item_id"), [])
+            if len(lots) < 5:
+                lots.append(adj)
     
     valuation_items = []
-    total_value = 0
-    
-    for item in items:
-        stock = item.get("stock_on_hand", 0) or item.get("available_stock", 0)
-        if isinstance(stock, str):
-            stock = float(stock) if stock else 0
-        
-        # Get cost rate (purchase rate or opening stock rate)
-        cost_rate = item.get("purchase_rate", 0) or item.get("opening_stock_rate", 0)
-        if isinstance(cost_rate, str):
-            cost_rate = float(cost_rate) if cost_rate else 0
-        
-        stock_value = stock * cost_rate
-        total_value += stock_value
-        
-        # Get recent purchase lots for FIFO display
-        recent_adjustments = await db.item_adjustments.find(
-            {"item_id": item.get("item_id"), "adjustment_type": "add", "organization_id": org_id},
-            {"_id": 0}
-        ).sort("created_time", -1).limit(5).to_list(5)
-        
+    for i, item in enumerate(valuation.docs):
+        cost_rate = float(valuation.unit_cost[i])
         valuation_items.append({
             "item_id": item.get("item_id"),
             "item_name": item.get("name"),
             "sku": item.get("sku"),
-            "stock_on_hand": stock,
+            "stock_on_hand": float(valuation.qty[i]),
             "unit": item.get("unit", "pcs"),
             "cost_rate": round(cost_rate, 2),
-            "stock_value": round(stock_value, 2),
-            "valuation_method": item.get("inventory_valuation_method", valuation_method),
+            "stock_value": round(float(valuation.value[i]), 2),
+            "valuation_method": valuation.method,
             "recent_lots": [{
                 "date": adj.get("date", adj.get("created_time", ""))[:10],
                 "quantity": adj.get("quantity", 0),
                 "rate": adj.get("rate_per_unit", cost_rate)
-            } for adj in recent_adjustments]
+            } for adj in recent_lots.get(item.get("item_id"), [])]
         })
     
     valuation_items.sort(key=lambda x: x["stock_value"], reverse=True)
@@ -2239,12 +2245,13 @@ async def get_inventory_valuation_report(
         "report": {
             "title": "Inventory Valuation",
             "as_of_date": as_of_date or datetime.now(timezone.utc).strftime("%Y-%m-%d"),
-            "valuation_method": valuation_method.upper(),
+            "valuation_method": valuation.method.upper(),
             "summary": {
                 "total_items": len(valuation_items),
-                "total_stock_value": round(total_value, 2)
+                "total_stock_value": round(valuation.total_value, 2)
             },
-            "items": valuation_items
+            "items": valuation_items,
+            "warehouses": valuation.warehouses
         }
     }
 
@@ -2360,106 +2367,92 @@ async def get_item_movement_report(
 # ============== INVENTORY REPORTS (MUST BE BEFORE /{item_id}) ==============
 
 @router.get("/reports/stock-summary")
-async def get_stock_summary(request: Request, warehouse_id: str = ""):
+async def get_stock_summary(request: Request, warehouse_id: str = "", valuation_method: str = "unit_price"):
     """Get stock summary report"""
     db = get_db()
     org_id = require_org_id(request)
     
     match_stage = {"organization_id": org_id, "item_type": {"$in": ["inventory", "sales_and_purchases"]}}
     
-    # H-02: hard cap, Sprint 3 for cursor pagination
-    items = await db.items.find(match_stage, {"_id": 0}).to_list(500)
+    try:
+        valuation = await value_inventory(
+            db, org_id, match_stage,
+            method=valuation_method,
+            rate_fields=("purchase_rate", "sales_rate"),
+            fields=("name", "sku", "reorder_level"),
+            stock_source="locations" if warehouse_id else "item",
+            warehouse_id=warehouse_id or None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    summary = {
-        "total_items": len(items),
-        "total_stock_value": 0,
-        "low_stock_count": 0,
-        "out_of_stock_count": 0,
-        "items": []
-    }
+    stock = valuation.qty
+    reorder_level = valuation.values("reorder_level")
+    is_low_stock = stock < reorder_level
+    is_out_of_stock = stock <= 0
     
-    for item in items:
-        stock = item.get("stock_on_hand", 0) or item.get("available_stock", 0)
-        if isinstance(stock, str):
-            stock = float(stock) if stock else 0
-        rate = item.get("purchase_rate", 0) or item.get("sales_rate", 0)
-        if isinstance(rate, str):
-            rate = float(rate) if rate else 0
-        reorder_level = item.get("reorder_level", 0)
-        if isinstance(reorder_level, str):
-            reorder_level = float(reorder_level) if reorder_level else 0
-        value = stock * rate
-        
-        item_summary = {
+    summary = {
+        "total_items": len(valuation),
+        "total_stock_value": round(valuation.total_value, 2),
+        "low_stock_count": int(is_low_stock.sum()),
+        "out_of_stock_count": int(is_out_of_stock.sum()),
+        "valuation_method": valuation.method,
+        "items": [{
             "item_id": item.get("item_id"),
             "name": item.get("name"),
             "sku": item.get("sku"),
-            "stock": stock,
-            "reorder_level": reorder_level,
-            "rate": rate,
-            "value": round(value, 2),
-            "is_low_stock": stock < reorder_level,
-            "is_out_of_stock": stock <= 0
-        }
-        
-        summary["items"].append(item_summary)
-        summary["total_stock_value"] += value
-        
-        if item_summary["is_low_stock"]:
-            summary["low_stock_count"] += 1
-        if item_summary["is_out_of_stock"]:
-            summary["out_of_stock_count"] += 1
-    
-    summary["total_stock_value"] = round(summary["total_stock_value"], 2)
+            "stock": float(stock[i]),
+            "reorder_level": float(reorder_level[i]),
+            "rate": float(valuation.unit_cost[i]),
+            "value": round(float(valuation.value[i]), 2),
+            "is_low_stock": bool(is_low_stock[i]),
+            "is_out_of_stock": bool(is_out_of_stock[i])
+        } for i, item in enumerate(valuation.docs)],
+        "warehouses": valuation.warehouses
+    }
     
     return {"code": 0, "stock_summary": summary}
 
 @router.get("/reports/valuation")
-async def get_inventory_valuation(request: Request):
+async def get_inventory_valuation(request: Request, valuation_method: str = "unit_price"):
     """Get inventory valuation report"""
     db = get_db()
     org_id = require_org_id(request)
     
-    pipeline = [
-        {"$match": {"organization_id": org_id, "item_type": {"$in": ["inventory", "sales_and_purchases"]}}},
-        {"$project": {
-            "_id": 0,
-            "item_id": 1,
-            "name": 1,
-            "sku": 1,
-            "stock_on_hand": {"$ifNull": ["$stock_on_hand", {"$ifNull": ["$available_stock", 0]}]},
-            "purchase_rate": {"$ifNull": ["$purchase_rate", "$sales_rate"]},
-            "sales_rate": 1
-        }},
-        {"$addFields": {
-            "purchase_value": {"$multiply": ["$stock_on_hand", "$purchase_rate"]},
-            "sales_value": {"$multiply": ["$stock_on_hand", "$sales_rate"]}
-        }},
-        {"$group": {
-            "_id": None,
-            "items": {"$push": "$$ROOT"},
-            "total_purchase_value": {"$sum": "$purchase_value"},
-            "total_sales_value": {"$sum": "$sales_value"},
-            "total_items": {"$sum": 1},
-            "total_stock": {"$sum": "$stock_on_hand"}
-        }}
-    ]
+    query = {"organization_id": org_id, "item_type": {"$in": ["inventory", "sales_and_purchases"]}}
     
-    result = await db.items.aggregate(pipeline).to_list(1)
-    
-    if result:
-        return {
-            "code": 0,
-            "valuation": {
-                "total_items": result[0].get("total_items", 0),
-                "total_stock": result[0].get("total_stock", 0),
-                "total_purchase_value": round(result[0].get("total_purchase_value", 0), 2),
-                "total_sales_value": round(result[0].get("total_sales_value", 0), 2),
-                "items": result[0].get("items", [])
-            }
-        }
+    try:
+        valuation = await value_inventory(
+            db, org_id, query,
+            method=valuation_method,
+            rate_fields=("purchase_rate", "sales_rate"),
+            fields=("name", "sku", "sales_rate"),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    sales_value = valuation.qty * valuation.values("sales_rate")
     
-    return {"code": 0, "valuation": {"total_items": 0, "total_stock": 0, "total_purchase_value": 0, "total_sales_value": 0, "items": []}}
+    return {
+        "code": 0,
+        "valuation": {
+            "total_items": len(valuation),
+            "total_stock": valuation.total_qty,
+            "total_purchase_value": round(valuation.total_value, 2),
+            "total_sales_value": round(float(sales_value.sum()), 2),
+            "valuation_method": valuation.method,
+            "items": [{
+                "item_id": item.get("item_id"),
+                "name": item.get("name"),
+                "sku": item.get("sku"),
+                "stock_on_hand": float(valuation.qty[i]),
+                "purchase_rate": float(valuation.unit_cost[i]),
+                "sales_rate": item.get("sales_rate"),
+                "purchase_value": float(valuation.value[i]),
+                "sales_value": float(sales_value[i])
+            } for i, item in enumerate(valuation.docs)]
+        }
+    }
 
 # ============== BULK ACTIONS (MUST BE BEFORE /{item_id}) ==============
 
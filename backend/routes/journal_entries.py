@@ -16,6 +16,7 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime, timezone, timedelta
 import os
 import logging
+import json
 from io import BytesIO
 import csv
 
@@ -391,20 +392,57 @@ async def export_trial_balance_csv(request: Request, as_of_date: str = Query(Non
 
 @router.get("/accounts/{account_id}/ledger")
 async def get_account_ledger(request: Request, account_id: str, start_date: str = Query(None),
-    end_date: str = Query(None)
+    end_date: str = Query(None),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=5000, description="Journal entries per page"),
+    format: str = Query("json", pattern="^(json|ndjson)$")
 ):
     """
     Get ledger (all transactions) for a specific account with running balance.
+    
+    - default: the whole period in one response
+    - limit / cursor: keyset pages; follow next_cursor while has_more
+    - format=ndjson: streamed header, one record per line, then a summary
     """
     org_id = await get_org_id(request)
     service = get_service()
     
-    result = await service.get_account_ledger(
-        organization_id=org_id,
-        account_id=account_id,
-        start_date=start_date,
-        end_date=end_date
-    )
+    if format == "ndjson":
+        stream = service.stream_account_ledger(
+            organization_id=org_id, account_id=account_id,
+            start_date=start_date, end_date=end_date
+        )
+        try:
+            first = await stream.__anext__()  # header; also resolves the account
+        except StopAsyncIteration:
+            raise HTTPException(status_code=404, detail="Account not found")
+        
+        async def body():
+            yield json.dumps(first, default=str) + "\n"
+            async for record in stream:
+                yield json.dumps(record, default=str) + "\n"
+        
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+    
+    if cursor or limit:
+        try:
+            result = await service.get_account_ledger_page(
+                organization_id=org_id,
+                account_id=account_id,
+                start_date=start_date,
+                end_date=end_date,
+                cursor=cursor,
+                limit=limit or 500
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        result = await service.get_account_ledger(
+            organization_id=org_id,
+            account_id=account_id,
+            start_date=start_date,
+            end_date=end_date
+        )
     
     if "error" in result:
         raise HTTPException(status_code=404, detail=result["error"])
@@ -553,7 +591,9 @@ async def get_account_types():
 # ==================== BALANCE SYNC ====================
 
 @router.post("/accounts/sync-balances")
-async def sync_account_balances(request: Request):
+async def sync_account_balances(request: Request,
+    incremental: bool = Query(False, description="Only accounts touched since the last sync")
+):
     """
     Recalculate all account balances from journal entries.
     
@@ -565,6 +605,6 @@ async def sync_account_balances(request: Request):
     org_id = await get_org_id(request)
     service = get_service()
     
-    result = await service.sync_all_account_balances(org_id)
+    result = await service.sync_all_account_balances(org_id, incremental=incremental)
     
     return {"code": 0, "message": "Account balances synced from journal entries", **result}
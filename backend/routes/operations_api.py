@@ -1185,6 +1185,7 @@ async def submit_satisfaction_survey(survey_token: str, request: Request):
     if not rating or not (1 <= int(rating) <= 5):
         raise HTTPException(status_code=400, detail="Rating must be 1-5")
     from datetime import datetime, timezone
+    completed_at = datetime.now(timezone.utc).isoformat()
     await db.ticket_reviews.update_one(
         {"survey_token": survey_token},
         {"$set": {
@@ -1192,9 +1193,14 @@ async def submit_satisfaction_survey(survey_token: str, request: Request):
             "review_text": body.get("review_text", ""),
             "would_recommend": body.get("would_recommend", True),
             "completed": True,
-            "completed_at": datetime.now(timezone.utc).isoformat()
+            "completed_at": completed_at
         }}
     )
+    try:
+        from services.technician_daily_stats import record_rating
+        await record_rating(db, review, int(rating), completed_at)
+    except Exception as e:
+        logger.warning(f"Technician stats rating update failed for {survey_token}: {e}")
     return {"code": 0, "message": "Thank you for your feedback!"}
 
 @router.get("/reports/satisfaction")
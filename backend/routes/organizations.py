@@ -20,6 +20,8 @@ import logging
 import bcrypt
 
 from core.tenant.context import TenantContext, tenant_context_required, optional_tenant_context
+from core.tenant.access_cache import invalidate_membership
+from core.subscriptions.plan_snapshot import invalidate_org_plan
 
 logger = logging.getLogger(__name__)
 
@@ -353,6 +355,7 @@ async def signup_organization(data: OrganizationCreate, request: Request):
             {"organization_id": org_id},
             {"$set": {"plan_type": "free_trial"}}
         )
+        invalidate_org_plan(org_id)
     except Exception as e:
         logger.warning(f"Failed to create subscription: {e}")
     
@@ -715,6 +718,7 @@ async def accept_invitation(data: InviteAccept):
         "updated_at": now
     }
     await db.organization_users.insert_one(membership_doc)
+    invalidate_membership(user_id, invite["organization_id"])
     
     # Update invitation status
     await db.organization_invites.update_one(
@@ -864,6 +868,7 @@ async def remove_member(request: Request, user_id: str, ctx: TenantContext = Dep
         "organization_id": ctx.org_id,
         "user_id": user_id
     })
+    invalidate_membership(user_id, ctx.org_id)
     
     # Deactivate the user immediately (invalidates their JWT via is_active check)
     await db.users.update_one(
@@ -14,6 +14,7 @@ import os
 
 # Import double-entry posting hooks
 from services.posting_hooks import post_payment_received_journal_entry
+from services.pdf_renderer import render_pdf, PdfRenderError
 
 from utils.database import db
 
@@ -1340,12 +1341,9 @@ async def get_payment_receipt_pdf(payment_id: str):
     """
     
     try:
-        from weasyprint import HTML
         from fastapi.responses import StreamingResponse
         
-        pdf_buffer = BytesIO()
-        HTML(string=html_content).write_pdf(pdf_buffer)
-        pdf_buffer.seek(0)
+        pdf_buffer = BytesIO(await render_pdf(html_content))
         
         return StreamingResponse(
             pdf_buffer,
@@ -1354,6 +1352,8 @@ async def get_payment_receipt_pdf(payment_id: str):
                 "Content-Disposition": f"attachment; filename=Receipt_{payment.get('payment_number', payment_id)}.pdf"
             }
         )
+    except PdfRenderError:
+        raise
     except Exception as e:
         # Return HTML if WeasyPrint not available
         from fastapi.responses import HTMLResponse
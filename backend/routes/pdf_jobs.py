@@ -0,0 +1,120 @@
+"""
+Battwheels OS - Bulk PDF Job Routes
+Render many documents (invoices, Form 16s) into one zip or merged PDF in the background
+"""
+# TENANT GUARD: Every MongoDB query in this file MUST include {"organization_id": org_id} — no exceptions.
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from typing import Any, Dict
+import os
+import logging
+
+from utils.database import require_org_id
+from middleware.rbac import check_role_permission, get_allowed_roles
+from core.subscriptions.entitlement import get_entitlement_service
+from services.bulk_pdf_jobs import BulkPdfError, BulkPdfJobService, PDF_JOB_ACCESS, PDF_JOB_SOURCES
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/pdf-jobs", tags=["Bulk PDF Jobs"])
+
+_service: BulkPdfJobService = None
+
+
+def init_router(database):
+    global _service
+    _service = BulkPdfJobService(database)
+    return router
+
+
+def get_service() -> BulkPdfJobService:
+    if _service is None:
+        raise HTTPException(status_code=500, detail="Bulk PDF service not initialized")
+    return _service
+
+
+def _role_allows(request: Request, document_type: str) -> bool:
+    route = (PDF_JOB_ACCESS.get(document_type) or {}).get("route")
+    if not route:
+        return True
+    return check_role_permission(getattr(request.state, "tenant_user_role", None) or "", get_allowed_roles(route) or [])
+
+
+async def require_document_access(request: Request, org_id: str, document_type: str) -> None:
+    """The roles and plan feature of the document type's own routes (403 otherwise)"""
+    if not _role_allows(request, document_type):
+        raise HTTPException(status_code=403, detail=f"Access denied to '{document_type}' documents for your role")
+    feature = (PDF_JOB_ACCESS.get(document_type) or {}).get("feature")
+    if feature:
+        await get_entitlement_service().check_feature_access(org_id, feature)
+
+
+class PdfJobCreate(BaseModel):
+    document_type: str  # invoice, form16
+    filters: Dict[str, Any] = {}
+    output: str = "zip"  # zip, merged
+
+
+@router.post("")
+async def create_pdf_job(request: Request, data: PdfJobCreate, background_tasks: BackgroundTasks):
+    """
+    Start a bulk PDF job.
+
+    Filters: invoice → customer_id, status, date_from, date_to, invoice_ids;
+    form16 → fy (e.g. "2024-25"). Poll GET /pdf-jobs/{job_id} for progress,
+    then download from /pdf-jobs/{job_id}/download.
+    """
+    org_id = require_org_id(request)
+    service = get_service()
+    await require_document_access(request, org_id, data.document_type)
+    try:
+        job = await service.create_job(
+            org_id, data.document_type, data.filters, output=data.output,
+            created_by=getattr(request.state, "tenant_user_id", None),
+        )
+    except BulkPdfError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    background_tasks.add_task(service.run_job, job["job_id"])
+    return {"code": 0, "job": job}
+
+
+@router.get("")
+async def list_pdf_jobs(request: Request):
+    """Recent bulk PDF jobs of the organization, of the document types the caller's role may see"""
+    org_id = require_org_id(request)
+    jobs = await get_service().list_jobs(org_id)
+    return {
+        "code": 0,
+        "jobs": [job for job in jobs if _role_allows(request, job.get("document_type"))],
+        "document_types": sorted(t for t in PDF_JOB_SOURCES if _role_allows(request, t)),
+    }
+
+
+@router.get("/{job_id}")
+async def get_pdf_job(request: Request, job_id: str):
+    """Job status and progress"""
+    org_id = require_org_id(request)
+    job = await get_service().get_job(org_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    await require_document_access(request, org_id, job["document_type"])
+    return {"code": 0, "job": job}
+
+
+@router.get("/{job_id}/download")
+async def download_pdf_job(request: Request, job_id: str):
+    """Download the zip / merged PDF of a completed job"""
+    org_id = require_org_id(request)
+    service = get_service()
+    job = await service.get_job(org_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    await require_document_access(request, org_id, job["document_type"])
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    path = service.output_path(job)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=410, detail="Job output has expired")
+    media_type = "application/zip" if job["output"] == "zip" else "application/pdf"
+    return FileResponse(path, media_type=media_type, filename=job["filename"])
@@ -15,6 +15,7 @@ Endpoints:
   POST /api/platform/organizations/:id/activate
   PUT  /api/platform/organizations/:id/plan
   GET  /api/platform/metrics           — Platform-wide KPIs
+  GET  /api/platform/cache-stats       — In-process cache hit/miss and PDF render pool counters
   POST /api/platform/run-audit         — Run 103-test production audit
   GET  /api/platform/audit-status      — Last audit result
   POST /api/platform/users/make-admin  — Grant platform admin
@@ -35,6 +36,13 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/platform", tags=["Platform Admin"])
 
 from utils.database import db
+from core.tenant.access_cache import invalidate_org, get_tenant_access_cache
+from core.subscriptions.plan_snapshot import invalidate_org_plan, get_org_plan_cache
+from middleware.rate_limit_store import get_rate_limit_store
+from services.chart_of_accounts_cache import get_chart_of_accounts_cache
+from services.report_cache import get_report_cache
+from services.pdf_renderer import get_pdf_renderer
+from services.pdf_cache import get_pdf_cache
 
 
 # ==================== AUTH ====================
@@ -181,6 +189,7 @@ async def suspend_organization(request: Request, org_id: str, _=Depends(require_
             "suspension_reason": "Suspended by platform admin",
         }}
     )
+    invalidate_org(org_id)
     logger.warning(f"[PLATFORM] Organisation {org_id} suspended by platform admin")
     return {"success": True, "message": f"Organisation '{org.get('name')}' suspended"}
 
@@ -197,6 +206,7 @@ async def activate_organization(request: Request, org_id: str, _=Depends(require
         {"organization_id": org_id},
         {"$set": {"is_active": True}, "$unset": {"suspended_at": "", "suspension_reason": ""}}
     )
+    invalidate_org(org_id)
     logger.info(f"[PLATFORM] Organisation {org_id} activated by platform admin")
     return {"success": True, "message": f"Organisation '{org.get('name')}' activated"}
 
@@ -222,6 +232,7 @@ async def change_organization_plan(request: Request, org_id: str, data: ChangePl
         {"organization_id": org_id},
         {"$set": {"plan_code": data.plan_type, "status": "active"}}
     )
+    invalidate_org_plan(org_id)
     logger.info(f"[PLATFORM] Organisation {org_id} plan changed to {data.plan_type}")
     return {"success": True, "message": f"Plan updated to {data.plan_type}"}
 
@@ -370,6 +381,22 @@ async def get_platform_activity(request: Request, _=Depends(require_platform_adm
     return {"runs": runs, "total": len(runs)}
 
 
+@router.get("/cache-stats")
+async def get_cache_stats(request: Request, _=Depends(require_platform_admin),
+):
+    """Hit/miss counters for the in-process caches and the PDF render pool (this worker only)"""
+    return {
+        "pid": os.getpid(),
+        "tenant_access": get_tenant_access_cache().get_stats(),
+        "org_plan": get_org_plan_cache().get_stats(),
+        "rate_limit": get_rate_limit_store().get_stats(),
+        "chart_of_accounts": get_chart_of_accounts_cache().get_stats(),
+        "reports": get_report_cache().get_stats(),
+        "pdf_render": get_pdf_renderer().get_stats(),
+        "pdf_cache": get_pdf_cache().get_stats(),
+    }
+
+
 @router.get("/audit-status")
 async def get_audit_status(request: Request, _=Depends(require_platform_admin),
 ):
@@ -837,61 +864,66 @@ async def fix_empty_failure_cards_endpoint(request: Request, _=Depends(require_p
 
 
 @router.post("/efi/regenerate-embeddings")
-async def regenerate_truncated_embeddings_endpoint(request: Request, _=Depends(require_platform_admin)):
+async def regenerate_truncated_embeddings_endpoint(
+    request: Request,
+    restart: bool = Query(False),
+    _=Depends(require_platform_admin)
+):
     """
     Sprint 6A-04: Find failure cards with truncated embeddings
     (last 10 values all 0.0) and regenerate them using the
     current embedding service.
+
+    Runs as a resumable embedding pipeline job: an interrupted run
+    continues where it stopped unless restart=true.
     """
     try:
         from services.efi_embedding_service import EFIEmbeddingManager
+        from services.embedding_pipeline import EmbeddingPipeline
         emb_mgr = EFIEmbeddingManager(db)
+        service = emb_mgr.embedding_service
 
-        cards = await db.failure_cards.find(
-            {"embedding_vector": {"$exists": True}}
-        ).to_list(1000)
-
-        truncated = []
-        for card in cards:
-            vec = card.get("embedding_vector", [])
-            if len(vec) >= 10 and all(v == 0.0 for v in vec[-10:]):
-                truncated.append(card)
+        def is_truncated(vec):
+            return len(vec) >= 10 and all(v == 0.0 for v in vec[-10:])
 
-        regenerated = 0
-        failed_ids = []
-        for card in truncated:
-            card_text = " ".join(filter(None, [
+        def card_text(card):
+            return " ".join(filter(None, [
                 card.get("title", ""),
                 card.get("description", ""),
                 card.get("symptom_text", ""),
                 card.get("subsystem_category", ""),
                 card.get("failure_mode", ""),
             ]))
-            if not card_text.strip():
-                failed_ids.append(card.get("card_id", "unknown"))
-                continue
 
-            result = await emb_mgr.generate_complaint_embedding(card_text)
-            if result and result.get("embedding"):
-                vec = result["embedding"]
-                if not all(v == 0.0 for v in vec[-10:]):
-                    await db.failure_cards.update_one(
-                        {"card_id": card["card_id"]},
-                        {"$set": {
-                            "embedding_vector": vec,
-                            "embedding_regenerated_at": datetime.now(timezone.utc).isoformat()
-                        }}
-                    )
-                    regenerated += 1
-                else:
-                    failed_ids.append(card.get("card_id", "unknown"))
-            else:
-                failed_ids.append(card.get("card_id", "unknown"))
+        async def embed(texts):
+            responses = await service.embed_batch(texts)
+            return [r if r and r.embedding and not is_truncated(r.embedding) else None
+                    for r in responses]
+
+        pipeline = EmbeddingPipeline(
+            db,
+            embed,
+            job_id="failure_cards:regenerate-truncated",
+            key="card_id",
+            model="hybrid-semantic+text",
+            dimensions=service.get_dimensions(),
+            build_text=card_text,
+            query={"embedding_vector": {"$exists": True}},
+            select=lambda card: is_truncated(card.get("embedding_vector") or []),
+            projection={"_id": 0, "card_id": 1, "embedding_vector": 1, "title": 1, "description": 1,
+                        "symptom_text": 1, "subsystem_category": 1, "failure_mode": 1},
+            batch_size=20,
+            concurrency=2,
+            timestamp_fields=("embedding_updated_at", "embedding_regenerated_at"),
+        )
+        result = await pipeline.run(restart=restart)
 
         return {
-            "truncated_found": len(truncated),
-            "regenerated": regenerated,
-            "failed_ids": failed_ids
+            "truncated_found": result["selected"],
+            "regenerated": result["processed"],
+            "failed_ids": [e["card_id"] for e in result["errors"]],
+            "cache_hits": result["cache_hits"],
+            "resumed": result["resumed"],
         }
     except Exception as e:
         logger.error(f"Embedding regeneration failed: {e}")
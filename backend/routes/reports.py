@@ -11,34 +11,33 @@ Provides comprehensive financial reports with PDF and Excel export capabilities
 from fastapi import APIRouter, HTTPException, Query, Request, Depends
 from fastapi.responses import Response, StreamingResponse
 from datetime import datetime, timezone, timedelta
-from io import BytesIO
+from typing import Optional
+import json
 import os
-import openpyxl
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-from openpyxl.utils import get_column_letter
+from openpyxl.styles import Font
 
 from utils.database import db as _reports_db, require_org_id
 from core.subscriptions.entitlement import require_feature
-
-# Soft import for PDF service (may not be available in all environments)
-PDF_SERVICE_AVAILABLE = False
-generate_pdf_from_html = None
-try:
-    from services.pdf_service import generate_pdf_from_html
-    PDF_SERVICE_AVAILABLE = True
-except Exception:
-    pass
+from core.subscriptions.plan_snapshot import get_org_plan_snapshot
+from services.account_period_balances import get_account_totals
+from utils.streaming_export import new_workbook, SheetWriter, workbook_response
+from services.aging_report import BUCKETS as AGING_BUCKETS, aging_summary, iter_aging_details, stream_aging
+from services.technician_daily_stats import get_technician_totals, averages as technician_averages
+from services.inventory_valuation import value_inventory
+from services.pdf_renderer import render_pdf
+from services.pdf_cache import generated_stamp
 
 router = APIRouter(prefix="/reports", tags=["Financial Reports"])
 
+# Invoices / bills listed in the aging web view and PDF (Excel and drilldowns list all)
+AGING_PREVIEW_ROWS = 20
+AGING_PDF_ROWS = 50
+
 
 async def _is_trial_plan(org_id: str) -> bool:
     """Check if org is on free/trialing plan (for PDF watermark)."""
-    db = get_db()
-    org = await db.organizations.find_one(
-        {"organization_id": org_id}, {"_id": 0, "plan_type": 1}
-    )
-    return (org or {}).get("plan_type", "starter") in ("free", "trialing", "starter")
+    snapshot = await get_org_plan_snapshot(get_db(), org_id)
+    return (snapshot.plan_type or "starter") in ("free", "trialing", "starter")
 
 # Database connection
 def get_db():
@@ -166,7 +165,7 @@ def generate_profit_loss_html(data: dict, org_settings: dict = None) -> str:
         </table>
         
         <div class="footer">
-            Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')} | {company_name}
+            Generated on {generated_stamp()} | {company_name}
         </div>
     </body>
     </html>
@@ -274,7 +273,7 @@ def generate_balance_sheet_html(data: dict, org_settings: dict = None) -> str:
         </table>
         
         <div class="footer">
-            Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')} | {company_name}
+            Generated on {generated_stamp()} | {company_name}
         </div>
     </body>
     </html>
@@ -398,7 +397,7 @@ def generate_ar_aging_html(data: dict, org_settings: dict = None) -> str:
         </table>
         
         <div class="footer">
-            Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')} | {company_name}
+            Generated on {generated_stamp()} | {company_name}
         </div>
     </body>
     </html>
@@ -479,7 +478,7 @@ def generate_sales_by_customer_html(data: dict, org_settings: dict = None) -> st
         </table>
         
         <div class="footer">
-            Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')} | {company_name}
+            Generated on {generated_stamp()} | {company_name}
         </div>
     </body>
     </html>
@@ -487,254 +486,126 @@ def generate_sales_by_customer_html(data: dict, org_settings: dict = None) -> st
     return html
 
 # ============== EXCEL GENERATORS ==============
+# Write-only workbooks (utils/streaming_export.py): rows are flushed as they
+# are appended, so detail sections can come straight from a cursor.
 
-def create_styled_workbook():
-    """Create a workbook with standard styles"""
-    wb = openpyxl.Workbook()
-    return wb
-
-def style_header_row(ws, row_num, num_cols):
-    """Apply header styling to a row"""
-    header_fill = PatternFill(start_color="22EDA9", end_color="22EDA9", fill_type="solid")
-    header_font = Font(bold=True, color="000000")
-    header_border = Border(
-        bottom=Side(style='medium', color='000000')
-    )
-    for col in range(1, num_cols + 1):
-        cell = ws.cell(row=row_num, column=col)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = header_border
-        cell.alignment = Alignment(horizontal='center')
-
-def style_total_row(ws, row_num, num_cols):
-    """Apply total row styling"""
-    total_fill = PatternFill(start_color="F0F0F0", end_color="F0F0F0", fill_type="solid")
-    total_font = Font(bold=True)
-    for col in range(1, num_cols + 1):
-        cell = ws.cell(row=row_num, column=col)
-        cell.fill = total_fill
-        cell.font = total_font
-
-def generate_profit_loss_excel(data: dict) -> bytes:
-    """Generate Excel for Profit & Loss report"""
-    wb = create_styled_workbook()
-    ws = wb.active
-    ws.title = "Profit & Loss"
-    
-    # Title
-    ws.append([f"Profit & Loss Statement"])
-    ws.merge_cells('A1:B1')
-    ws['A1'].font = Font(bold=True, size=14)
-    ws.append([f"Period: {data['period']['start_date']} to {data['period']['end_date']}"])
-    ws.append([])
-    
-    # Headers
-    ws.append(['Account', 'Amount'])
-    style_header_row(ws, 4, 2)
+def build_profit_loss_workbook(data: dict):
+    """Write-only workbook for the Profit & Loss report"""
+    wb = new_workbook()
+    sheet = SheetWriter(wb, "Profit & Loss", widths={"A": 35, "B": 20})
+    
+    sheet.title("Profit & Loss Statement")
+    sheet.line(f"Period: {data['period']['start_date']} to {data['period']['end_date']}")
+    sheet.line()
+    sheet.header(['Account', 'Amount'])
     
     # Income
-    ws.append(['INCOME', ''])
-    ws['A5'].font = Font(bold=True)
-    ws.append(['  Operating Income', data['total_income']])
-    ws.append(['Total Income', data['total_income']])
-    style_total_row(ws, 7, 2)
+    sheet.section('INCOME', '')
+    sheet.row(['  Operating Income', data['total_income']], money_cols=(1,))
+    sheet.total(['Total Income', data['total_income']], money_cols=(1,))
     
     # COGS
-    ws.append([])
-    ws.append(['COST OF GOODS SOLD', ''])
-    ws['A9'].font = Font(bold=True)
-    ws.append(['  Direct Costs', data['total_cogs']])
-    ws.append(['Gross Profit', data['gross_profit']])
-    style_total_row(ws, 11, 2)
+    sheet.line()
+    sheet.section('COST OF GOODS SOLD', '')
+    sheet.row(['  Direct Costs', data['total_cogs']], money_cols=(1,))
+    sheet.total(['Gross Profit', data['gross_profit']], money_cols=(1,))
     
     # Operating Expenses
-    ws.append([])
-    ws.append(['OPERATING EXPENSES', ''])
-    ws['A13'].font = Font(bold=True)
-    row = 14
+    sheet.line()
+    sheet.section('OPERATING EXPENSES', '')
     for cat, amt in data.get('expenses_breakdown', {}).items():
-        ws.append([f"  {cat}", amt])
-        row += 1
-    ws.append(['Total Expenses', data['total_expenses']])
-    style_total_row(ws, row, 2)
+        sheet.row([f"  {cat}", amt], money_cols=(1,))
+    sheet.total(['Total Expenses', data['total_expenses']], money_cols=(1,))
     
     # Net Profit
-    ws.append([])
-    ws.append(['NET PROFIT', data['net_profit']])
-    last_row = ws.max_row
-    ws[f'A{last_row}'].font = Font(bold=True, size=12)
-    ws[f'B{last_row}'].font = Font(bold=True, size=12)
-    
-    # Column widths
-    ws.column_dimensions['A'].width = 35
-    ws.column_dimensions['B'].width = 20
-    
-    # Format numbers
-    for row in ws.iter_rows(min_row=5, max_col=2):
-        for cell in row:
-            if isinstance(cell.value, (int, float)) and cell.value != '':
-                cell.number_format = '₹#,##0.00'
-    
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    return buffer.getvalue()
-
-def generate_balance_sheet_excel(data: dict) -> bytes:
-    """Generate Excel for Balance Sheet report"""
-    wb = create_styled_workbook()
-    ws = wb.active
-    ws.title = "Balance Sheet"
-    
-    ws.append(['Balance Sheet'])
-    ws.merge_cells('A1:B1')
-    ws['A1'].font = Font(bold=True, size=14)
-    ws.append([f"As of: {data['as_of_date']}"])
-    ws.append([])
-    
-    ws.append(['Account', 'Amount'])
-    style_header_row(ws, 4, 2)
+    sheet.line()
+    sheet.total(['NET PROFIT', data['net_profit']], money_cols=(1,), font=Font(bold=True, size=12), fill=None)
+    return wb
+
+def build_balance_sheet_workbook(data: dict):
+    """Write-only workbook for the Balance Sheet report"""
+    wb = new_workbook()
+    sheet = SheetWriter(wb, "Balance Sheet", widths={"A": 30, "B": 20})
+    
+    sheet.title('Balance Sheet')
+    sheet.line(f"As of: {data['as_of_date']}")
+    sheet.line()
+    sheet.header(['Account', 'Amount'])
     
     # Assets
-    ws.append(['ASSETS', ''])
-    ws['A5'].font = Font(bold=True)
-    ws.append(['  Accounts Receivable', data['assets']['accounts_receivable']])
-    ws.append(['  Bank Balance', data['assets']['bank_balance']])
-    ws.append(['  Inventory Value', data['assets']['inventory_value']])
-    ws.append(['Total Assets', data['assets']['total']])
-    style_total_row(ws, 9, 2)
+    sheet.section('ASSETS', '')
+    sheet.row(['  Accounts Receivable', data['assets']['accounts_receivable']], money_cols=(1,))
+    sheet.row(['  Bank Balance', data['assets']['bank_balance']], money_cols=(1,))
+    sheet.row(['  Inventory Value', data['assets']['inventory_value']], money_cols=(1,))
+    sheet.total(['Total Assets', data['assets']['total']], money_cols=(1,))
     
     # Liabilities
-    ws.append([])
-    ws.append(['LIABILITIES', ''])
-    ws['A11'].font = Font(bold=True)
-    ws.append(['  Accounts Payable', data['liabilities']['accounts_payable']])
-    ws.append(['Total Liabilities', data['liabilities']['total']])
-    style_total_row(ws, 13, 2)
+    sheet.line()
+    sheet.section('LIABILITIES', '')
+    sheet.row(['  Accounts Payable', data['liabilities']['accounts_payable']], money_cols=(1,))
+    sheet.total(['Total Liabilities', data['liabilities']['total']], money_cols=(1,))
     
     # Equity
-    ws.append([])
-    ws.append(['EQUITY', ''])
-    ws['A15'].font = Font(bold=True)
-    ws.append(['  Retained Earnings', data['equity']['retained_earnings']])
-    ws.append(['Total Equity', data['equity']['total']])
-    style_total_row(ws, 17, 2)
-    
-    ws.column_dimensions['A'].width = 30
-    ws.column_dimensions['B'].width = 20
-    
-    for row in ws.iter_rows(min_row=5, max_col=2):
-        for cell in row:
-            if isinstance(cell.value, (int, float)) and cell.value != '':
-                cell.number_format = '₹#,##0.00'
-    
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    return buffer.getvalue()
-
-def generate_ar_aging_excel(data: dict) -> bytes:
-    """Generate Excel for AR Aging report"""
-    wb = create_styled_workbook()
-    ws = wb.active
-    ws.title = "AR Aging"
-    
-    ws.append(['Accounts Receivable Aging Report'])
-    ws.merge_cells('A1:E1')
-    ws['A1'].font = Font(bold=True, size=14)
-    ws.append([f"As of: {data['as_of_date']}"])
-    ws.append([])
+    sheet.line()
+    sheet.section('EQUITY', '')
+    sheet.row(['  Retained Earnings', data['equity']['retained_earnings']], money_cols=(1,))
+    sheet.total(['Total Equity', data['equity']['total']], money_cols=(1,))
+    return wb
+
+async def _build_aging_workbook(data: dict, title: str, heading: str, detail_heading: str,
+                                columns: list, rows, total: float):
+    wb = new_workbook()
+    sheet = SheetWriter(wb, title, widths={"A": 18, "B": 30, "C": 15, "D": 15, "E": 18})
+    
+    sheet.title(heading)
+    sheet.line(f"As of: {data['as_of_date']}")
+    sheet.line()
     
     # Aging Summary
     aging_data = data.get('aging_data', {})
-    ws.append(['Aging Summary'])
-    ws['A4'].font = Font(bold=True)
-    ws.append(['Current', '1-30 Days', '31-60 Days', '61-90 Days', 'Over 90 Days'])
-    style_header_row(ws, 5, 5)
-    ws.append([
-        aging_data.get('current', 0),
-        aging_data.get('1_30', 0),
-        aging_data.get('31_60', 0),
-        aging_data.get('61_90', 0),
-        aging_data.get('over_90', 0)
-    ])
-    for col in range(1, 6):
-        ws.cell(row=6, column=col).number_format = '₹#,##0.00'
-    
-    ws.append([])
-    ws.append(['Invoice Details'])
-    ws['A8'].font = Font(bold=True)
-    
-    ws.append(['Invoice Number', 'Customer', 'Due Date', 'Days Overdue', 'Balance'])
-    style_header_row(ws, 9, 5)
-    
-    for inv in data.get('invoices', []):
-        ws.append([
-            inv.get('invoice_number', '-'),
-            inv.get('customer_name', '-'),
-            inv.get('due_date', '-'),
-            inv.get('days_overdue', 0),
-            inv.get('balance', 0)
-        ])
-    
-    ws.append(['Total', '', '', '', data['total_ar']])
-    style_total_row(ws, ws.max_row, 5)
-    
-    ws.column_dimensions['A'].width = 18
-    ws.column_dimensions['B'].width = 30
-    ws.column_dimensions['C'].width = 15
-    ws.column_dimensions['D'].width = 15
-    ws.column_dimensions['E'].width = 18
-    
-    for row in ws.iter_rows(min_row=10, max_col=5):
-        if row[4].value and isinstance(row[4].value, (int, float)):
-            row[4].number_format = '₹#,##0.00'
-    
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    return buffer.getvalue()
-
-def generate_sales_by_customer_excel(data: dict) -> bytes:
-    """Generate Excel for Sales by Customer report"""
-    wb = create_styled_workbook()
-    ws = wb.active
-    ws.title = "Sales by Customer"
-    
-    ws.append(['Sales by Customer Report'])
-    ws.merge_cells('A1:D1')
-    ws['A1'].font = Font(bold=True, size=14)
-    ws.append([f"Period: {data['period']['start_date']} to {data['period']['end_date']}"])
-    ws.append([])
-    
-    ws.append(['#', 'Customer Name', 'Invoice Count', 'Total Sales'])
-    style_header_row(ws, 4, 4)
+    sheet.section('Aging Summary')
+    sheet.header(['Current', '1-30 Days', '31-60 Days', '61-90 Days', 'Over 90 Days'])
+    sheet.row([aging_data.get(b, 0) for b in AGING_BUCKETS], money_cols=range(5))
     
-    for idx, item in enumerate(data.get('sales_data', []), 1):
-        ws.append([
-            idx,
-            item.get('customer_name', 'Unknown'),
-            item.get('invoice_count', 0),
-            item.get('total_sales', 0)
-        ])
-    
-    ws.append(['', 'TOTAL', data.get('total_invoices', 0), data.get('total_sales', 0)])
-    style_total_row(ws, ws.max_row, 4)
-    
-    ws.column_dimensions['A'].width = 8
-    ws.column_dimensions['B'].width = 35
-    ws.column_dimensions['C'].width = 15
-    ws.column_dimensions['D'].width = 20
-    
-    for row in ws.iter_rows(min_row=5, max_col=4):
-        if row[3].value and isinstance(row[3].value, (int, float)):
-            row[3].number_format = '₹#,##0.00'
-    
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    return buffer.getvalue()
+    sheet.line()
+    sheet.section(detail_heading)
+    sheet.header(columns)
+    async for row in rows:
+        sheet.row(row, money_cols=(4,))
+    
+    sheet.total(['Total', '', '', '', total], money_cols=(4,))
+    return wb
+
+async def build_ar_aging_workbook(data: dict, invoices):
+    """Write-only workbook for AR Aging; `invoices` is an async iterator of detail rows"""
+    rows = ([inv.get('invoice_number', '-'), inv.get('customer_name', '-'), inv.get('due_date', '-'),
+             inv.get('days_overdue', 0), inv.get('balance', 0)] async for inv in invoices)
+    return await _build_aging_workbook(
+        data, "AR Aging", 'Accounts Receivable Aging Report', 'Invoice Details',
+        ['Invoice Number', 'Customer', 'Due Date', 'Days Overdue', 'Balance'], rows, data['total_ar']
+    )
+
+async def build_sales_by_customer_workbook(data: dict, sales_rows):
+    """Write-only workbook for Sales by Customer; `sales_rows` is the aggregation cursor"""
+    wb = new_workbook()
+    sheet = SheetWriter(wb, "Sales by Customer", widths={"A": 8, "B": 35, "C": 15, "D": 20})
+    
+    sheet.title('Sales by Customer Report')
+    sheet.line(f"Period: {data['period']['start_date']} to {data['period']['end_date']}")
+    sheet.line()
+    sheet.header(['#', 'Customer Name', 'Invoice Count', 'Total Sales'])
+    
+    total_sales = 0
+    total_invoices = 0
+    idx = 0
+    async for item in sales_rows:
+        idx += 1
+        sheet.row([idx, item["_id"] or 'Unknown', item["invoice_count"], item["total_sales"]], money_cols=(3,))
+        total_sales += item["total_sales"]
+        total_invoices += item["invoice_count"]
+    
+    sheet.total(['', 'TOTAL', total_invoices, total_sales], money_cols=(3,))
+    return wb
 
 # ============== API ENDPOINTS ==============
 
@@ -806,7 +677,7 @@ async def get_profit_loss_report(
     if format == "pdf":
         org_settings = await db.organization_settings.find_one({}, {"_id": 0}) or {}
         html_content = generate_profit_loss_html(report_data, org_settings)
-        pdf_bytes = generate_pdf_from_html(html_content, is_trial=await _is_trial_plan(org_id))
+        pdf_bytes = await render_pdf(html_content, is_trial=await _is_trial_plan(org_id), cache=True)
         return Response(
             content=pdf_bytes,
             media_type="application/pdf",
@@ -814,11 +685,8 @@ async def get_profit_loss_report(
         )
     
     elif format == "excel":
-        excel_bytes = generate_profit_loss_excel(report_data)
-        return Response(
-            content=excel_bytes,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename=profit_loss_{start_date}_to_{end_date}.xlsx"}
+        return await workbook_response(
+            build_profit_loss_workbook(report_data), f"profit_loss_{start_date}_to_{end_date}.xlsx"
         )
     
     return {"code": 0, "report": "profit_and_loss", **report_data}
@@ -909,7 +777,7 @@ async def get_balance_sheet_report(
     if format == "pdf":
         org_settings = await db.organization_settings.find_one({}, {"_id": 0}) or {}
         html_content = generate_balance_sheet_html(report_data, org_settings)
-        pdf_bytes = generate_pdf_from_html(html_content, is_trial=await _is_trial_plan(org_id))
+        pdf_bytes = await render_pdf(html_content, is_trial=await _is_trial_plan(org_id), cache=True)
         return Response(
             content=pdf_bytes,
             media_type="application/pdf",
@@ -917,110 +785,113 @@ async def get_balance_sheet_report(
         )
     
     elif format == "excel":
-        excel_bytes = generate_balance_sheet_excel(report_data)
-        return Response(
-            content=excel_bytes,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename=balance_sheet_{as_of_date}.xlsx"}
+        return await workbook_response(
+            build_balance_sheet_workbook(report_data), f"balance_sheet_{as_of_date}.xlsx"
         )
     
     return {"code": 0, "report": "balance_sheet", **report_data}
 
+def _aged_invoice_row(doc: dict) -> dict:
+    return {
+        "invoice_number": doc.get("invoice_number", "-"),
+        "customer_name": doc.get("customer_name", "-"),
+        "due_date": doc.get("due_date", "-"),
+        "days_overdue": max(0, doc["days_overdue"]),
+        "balance": doc.get("balance", 0)
+    }
+
+
+def _aged_bill_row(doc: dict) -> dict:
+    return {
+        "bill_number": doc.get("bill_number", "-"),
+        "vendor_name": doc.get("vendor_name", "-"),
+        "due_date": doc.get("due_date", "-"),
+        "days_overdue": max(0, doc["days_overdue"]),
+        "balance": doc.get("balance", 0)
+    }
+
+
+def _aging_party_rows(summary: dict, id_key: str, name_key: str) -> list:
+    return [
+        {id_key: p["party_id"], name_key: p["party_name"] or "-",
+         **{b: p[b] for b in AGING_BUCKETS}, "total": p["total"], "count": p["document_count"]}
+        for p in summary["parties"]
+    ]
+
+
+def _aging_ndjson(records, row_type: str, to_row) -> StreamingResponse:
+    """NDJSON drilldown: summary, then each party followed by its documents"""
+    async def body():
+        async for record in records:
+            if record["type"] == row_type:
+                record = {"type": row_type, "bucket": record["bucket"], **to_row(record)}
+            yield json.dumps(record, default=str) + "\n"
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
 @router.get("/ar-aging")
 async def get_ar_aging_report(
     request: Request,
     as_of_date: str = "",
-    format: str = Query("json", enum=["json", "pdf", "excel"])
+    format: str = Query("json", enum=["json", "pdf", "excel"]),
+    drilldown: bool = Query(False, description="Stream every invoice (NDJSON), grouped by customer"),
+    customer_id: Optional[str] = Query(None, description="Drilldown for one customer")
 ):
     """
     Accounts Receivable Aging Report
-    Group unpaid invoices by age buckets.
+    Group unpaid invoices by age buckets (exact totals, computed in MongoDB).
+    JSON carries per-customer totals and the most overdue invoices;
+    drilldown=true streams every invoice.
     Exports: JSON (web view), PDF, Excel
     """
     db = get_db()
     org_id = require_org_id(request)
-    org_filter = {"organization_id": org_id}
     
     if not as_of_date:
         as_of_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
     
-    as_of_datetime = datetime.strptime(as_of_date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    match = {"organization_id": org_id, "balance": {"$gt": 0},
+             "status": {"$in": ["sent", "partial", "overdue", "draft"]}}
+    fields = ("invoice_number", "customer_name", "due_date")
     
-    # Get unpaid invoices (limited for performance)
-    invoices = await db.invoices.find(
-        {**org_filter, "balance": {"$gt": 0}, "status": {"$in": ["sent", "partial", "overdue", "draft"]}},
-        {"_id": 0}
-    ).to_list(length=1000)
+    if drilldown:
+        return _aging_ndjson(
+            stream_aging(db.invoices, match, fields, as_of=as_of_date, party_id=customer_id),
+            "invoice", _aged_invoice_row
+        )
     
-    aging_data = {
-        "current": 0,
-        "1_30": 0,
-        "31_60": 0,
-        "61_90": 0,
-        "over_90": 0
-    }
+    summary = await aging_summary(db.invoices, match, as_of=as_of_date)
     
-    invoice_details = []
-    
-    for inv in invoices:
-        try:
-            due_date = datetime.strptime(inv.get("due_date", ""), "%Y-%m-%d").replace(tzinfo=timezone.utc)
-        except (ValueError, TypeError):
-            continue
-        
-        days_overdue = (as_of_datetime - due_date).days
-        balance = inv.get("balance", 0)
-        
-        inv_detail = {
-            "invoice_number": inv.get("invoice_number", "-"),
-            "customer_name": inv.get("customer_name", "-"),
-            "due_date": inv.get("due_date", "-"),
-            "days_overdue": max(0, days_overdue),
-            "balance": balance
-        }
-        invoice_details.append(inv_detail)
-        
-        if days_overdue <= 0:
-            aging_data["current"] += balance
-        elif days_overdue <= 30:
-            aging_data["1_30"] += balance
-        elif days_overdue <= 60:
-            aging_data["31_60"] += balance
-        elif days_overdue <= 90:
-            aging_data["61_90"] += balance
-        else:
-            aging_data["over_90"] += balance
-    
-    # Sort by days overdue descending
-    invoice_details.sort(key=lambda x: x["days_overdue"], reverse=True)
-    
-    total_ar = sum(aging_data.values())
+    def details(limit=None):
+        return (_aged_invoice_row(doc) async for doc in iter_aging_details(
+            db.invoices, match, fields, as_of=as_of_date, oldest_first=True, limit=limit))
     
     report_data = {
         "as_of_date": as_of_date,
-        "aging_data": aging_data,
-        "total_ar": total_ar,
-        "invoices": invoice_details
+        "aging_data": summary["totals"],
+        "total_ar": summary["total"],
+        "invoice_count": summary["document_count"],
+        "customers": _aging_party_rows(summary, "customer_id", "customer_name")
     }
     
+    if format == "excel":
+        # Every invoice, written row by row from the cursor
+        wb = await build_ar_aging_workbook(report_data, details())
+        return await workbook_response(wb, f"ar_aging_{as_of_date}.xlsx")
+    
+    # The web view and the PDF list only the most overdue invoices
+    report_data["invoices"] = [row async for row in details(AGING_PDF_ROWS if format == "pdf" else AGING_PREVIEW_ROWS)]
+    
     if format == "pdf":
         org_settings = await db.organization_settings.find_one({}, {"_id": 0}) or {}
         html_content = generate_ar_aging_html(report_data, org_settings)
-        pdf_bytes = generate_pdf_from_html(html_content, is_trial=await _is_trial_plan(org_id))
+        pdf_bytes = await render_pdf(html_content, is_trial=await _is_trial_plan(org_id), cache=True)
         return Response(
             content=pdf_bytes,
             media_type="application/pdf",
             headers={"Content-Disposition": f"attachment; filename=ar_aging_{as_of_date}.pdf"}
         )
     
-    elif format == "excel":
-        excel_bytes = generate_ar_aging_excel(report_data)
-        return Response(
-            content=excel_bytes,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename=ar_aging_{as_of_date}.xlsx"}
-        )
-    
     return {"code": 0, "report": "ar_aging", **report_data}
 
 @router.get("/sales-by-customer")
@@ -1055,7 +926,14 @@ async def get_sales_by_customer_report(
         {"$sort": {"total_sales": -1}}
     ]
     
-    sales_result = await db.invoices.aggregate(sales_pipeline).to_list(1000)
+    if format == "excel":
+        wb = await build_sales_by_customer_workbook(
+            {"period": {"start_date": start_date, "end_date": end_date}},
+            db.invoices.aggregate(sales_pipeline, allowDiskUse=True)
+        )
+        return await workbook_response(wb, f"sales_by_customer_{start_date}_to_{end_date}.xlsx")
+    
+    sales_result = await db.invoices.aggregate(sales_pipeline).to_list(None)
     
     sales_data = []
     total_sales = 0
@@ -1080,119 +958,82 @@ async def get_sales_by_customer_report(
     if format == "pdf":
         org_settings = await db.organization_settings.find_one({}, {"_id": 0}) or {}
         html_content = generate_sales_by_customer_html(report_data, org_settings)
-        pdf_bytes = generate_pdf_from_html(html_content, is_trial=await _is_trial_plan(org_id))
+        pdf_bytes = await render_pdf(html_content, is_trial=await _is_trial_plan(org_id), cache=True)
         return Response(
             content=pdf_bytes,
             media_type="application/pdf",
             headers={"Content-Disposition": f"attachment; filename=sales_by_customer_{start_date}_to_{end_date}.pdf"}
         )
     
-    elif format == "excel":
-        excel_bytes = generate_sales_by_customer_excel(report_data)
-        return Response(
-            content=excel_bytes,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename=sales_by_customer_{start_date}_to_{end_date}.xlsx"}
-        )
-    
     return {"code": 0, "report": "sales_by_customer", **report_data}
 
 @router.get("/ap-aging")
 async def get_ap_aging_report(
     request: Request,
     as_of_date: str = "",
-    format: str = Query("json", enum=["json", "pdf", "excel"])
+    format: str = Query("json", enum=["json", "pdf", "excel"]),
+    drilldown: bool = Query(False, description="Stream every bill (NDJSON), grouped by vendor"),
+    vendor_id: Optional[str] = Query(None, description="Drilldown for one vendor")
 ):
     """
     Accounts Payable Aging Report
-    Group unpaid bills by age buckets.
+    Group unpaid bills by age buckets (exact totals, computed in MongoDB).
+    JSON carries per-vendor totals and the most overdue bills;
+    drilldown=true streams every bill.
     Exports: JSON (web view), PDF, Excel
     """
     db = get_db()
     org_id = require_org_id(request)
-    org_filter = {"organization_id": org_id}
     
     if not as_of_date:
         as_of_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
     
-    as_of_datetime = datetime.strptime(as_of_date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    match = {"organization_id": org_id, "balance": {"$gt": 0}}
+    fields = ("bill_number", "vendor_name", "due_date")
+    vendor_fields = {"party_id_field": "vendor_id", "party_name_field": "vendor_name"}
     
-    # Get unpaid bills
-    bills = await db.bills.find(
-        {**org_filter, "balance": {"$gt": 0}},
-        {"_id": 0}
-    ).to_list(length=10000)
+    if drilldown:
+        return _aging_ndjson(
+            stream_aging(db.bills, match, fields, as_of=as_of_date, party_id=vendor_id,
+                         document_type="bill", **vendor_fields),
+            "bill", _aged_bill_row
+        )
     
-    aging_data = {
-        "current": 0,
-        "1_30": 0,
-        "31_60": 0,
-        "61_90": 0,
-        "over_90": 0
-    }
+    summary = await aging_summary(db.bills, match, as_of=as_of_date, **vendor_fields)
     
-    bill_details = []
-    
-    for bill in bills:
-        try:
-            due_date = datetime.strptime(bill.get("due_date", ""), "%Y-%m-%d").replace(tzinfo=timezone.utc)
-        except (ValueError, TypeError):
-            continue
-        
-        days_overdue = (as_of_datetime - due_date).days
-        balance = bill.get("balance", 0)
-        
-        bill_detail = {
-            "bill_number": bill.get("bill_number", "-"),
-            "vendor_name": bill.get("vendor_name", "-"),
-            "due_date": bill.get("due_date", "-"),
-            "days_overdue": max(0, days_overdue),
-            "balance": balance
-        }
-        bill_details.append(bill_detail)
-        
-        if days_overdue <= 0:
-            aging_data["current"] += balance
-        elif days_overdue <= 30:
-            aging_data["1_30"] += balance
-        elif days_overdue <= 60:
-            aging_data["31_60"] += balance
-        elif days_overdue <= 90:
-            aging_data["61_90"] += balance
-        else:
-            aging_data["over_90"] += balance
-    
-    bill_details.sort(key=lambda x: x["days_overdue"], reverse=True)
-    total_ap = sum(aging_data.values())
+    def details(limit=None):
+        return (_aged_bill_row(doc) async for doc in iter_aging_details(
+            db.bills, match, fields, as_of=as_of_date, party_id_field="vendor_id",
+            oldest_first=True, limit=limit))
     
     report_data = {
         "as_of_date": as_of_date,
-        "aging_data": aging_data,
-        "total_ap": total_ap,
-        "bills": bill_details
+        "aging_data": summary["totals"],
+        "total_ap": summary["total"],
+        "bill_count": summary["document_count"],
+        "vendors": _aging_party_rows(summary, "vendor_id", "vendor_name")
     }
     
+    if format == "excel":
+        # Every bill, written row by row from the cursor
+        wb = await build_ap_aging_workbook(report_data, details())
+        return await workbook_response(wb, f"ap_aging_{as_of_date}.xlsx")
+    
+    # The web view and the PDF list only the most overdue bills
+    report_data["bills"] = [row async for row in details(AGING_PDF_ROWS if format == "pdf" else AGING_PREVIEW_ROWS)]
+    
     if format == "json":
         return {"code": 0, "report": "ap_aging", **report_data}
     
-    # For PDF/Excel, reuse similar logic as AR aging
     elif format == "pdf":
         org_settings = await db.organization_settings.find_one({}, {"_id": 0}) or {}
         html_content = generate_ap_aging_html(report_data, org_settings)
-        pdf_bytes = generate_pdf_from_html(html_content, is_trial=await _is_trial_plan(org_id))
+        pdf_bytes = await render_pdf(html_content, is_trial=await _is_trial_plan(org_id), cache=True)
         return Response(
             content=pdf_bytes,
             media_type="application/pdf",
             headers={"Content-Disposition": f"attachment; filename=ap_aging_{as_of_date}.pdf"}
         )
-    
-    elif format == "excel":
-        excel_bytes = generate_ap_aging_excel(report_data)
-        return Response(
-            content=excel_bytes,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename=ap_aging_{as_of_date}.xlsx"}
-        )
 
 def generate_ap_aging_html(data: dict, org_settings: dict = None) -> str:
     """Generate HTML for AP Aging report"""
@@ -1257,59 +1098,20 @@ def generate_ap_aging_html(data: dict, org_settings: dict = None) -> str:
                 <tr class="grand-total"><td colspan="4">Total Outstanding</td><td class="amount">{format_currency(data['total_ap'])}</td></tr>
             </tbody>
         </table>
-        <div class="footer">Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')} | {company_name}</div>
+        <div class="footer">Generated on {generated_stamp()} | {company_name}</div>
     </body>
     </html>
     """
     return html
 
-def generate_ap_aging_excel(data: dict) -> bytes:
-    """Generate Excel for AP Aging report"""
-    wb = create_styled_workbook()
-    ws = wb.active
-    ws.title = "AP Aging"
-    
-    ws.append(['Accounts Payable Aging Report'])
-    ws.merge_cells('A1:E1')
-    ws['A1'].font = Font(bold=True, size=14)
-    ws.append([f"As of: {data['as_of_date']}"])
-    ws.append([])
-    
-    aging_data = data.get('aging_data', {})
-    ws.append(['Aging Summary'])
-    ws['A4'].font = Font(bold=True)
-    ws.append(['Current', '1-30 Days', '31-60 Days', '61-90 Days', 'Over 90 Days'])
-    style_header_row(ws, 5, 5)
-    ws.append([aging_data.get('current', 0), aging_data.get('1_30', 0), aging_data.get('31_60', 0), aging_data.get('61_90', 0), aging_data.get('over_90', 0)])
-    for col in range(1, 6):
-        ws.cell(row=6, column=col).number_format = '₹#,##0.00'
-    
-    ws.append([])
-    ws.append(['Bill Details'])
-    ws['A8'].font = Font(bold=True)
-    ws.append(['Bill Number', 'Vendor', 'Due Date', 'Days Overdue', 'Balance'])
-    style_header_row(ws, 9, 5)
-    
-    for bill in data.get('bills', []):
-        ws.append([bill.get('bill_number', '-'), bill.get('vendor_name', '-'), bill.get('due_date', '-'), bill.get('days_overdue', 0), bill.get('balance', 0)])
-    
-    ws.append(['Total', '', '', '', data['total_ap']])
-    style_total_row(ws, ws.max_row, 5)
-    
-    ws.column_dimensions['A'].width = 18
-    ws.column_dimensions['B'].width = 30
-    ws.column_dimensions['C'].width = 15
-    ws.column_dimensions['D'].width = 15
-    ws.column_dimensions['E'].width = 18
-    
-    for row in ws.iter_rows(min_row=10, max_col=5):
-        if row[4].value and isinstance(row[4].value, (int, float)):
-            row[4].number_format = '₹#,##0.00'
-    
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    return buffer.getvalue()
+async def build_ap_aging_workbook(data: dict, bills):
+    """Write-only workbook for AP Aging; `bills` is an async iterator of detail rows"""
+    rows = ([bill.get('bill_number', '-'), bill.get('vendor_name', '-'), bill.get('due_date', '-'),
+             bill.get('days_overdue', 0), bill.get('balance', 0)] async for bill in bills)
+    return await _build_aging_workbook(
+        data, "AP Aging", 'Accounts Payable Aging Report', 'Bill Details',
+        ['Bill Number', 'Vendor', 'Due Date', 'Days Overdue', 'Balance'], rows, data['total_ap']
+    )
 
 
 # ============== TECHNICIAN PERFORMANCE REPORT ==============
@@ -1362,106 +1164,34 @@ async def get_technician_performance(
     end_iso = end_dt.isoformat()
 
     db = get_db()
-    org_id = require_org_id(request) if request else None
+    org_id = require_org_id(request)
 
-    # Build query
-    query = {
-        "assigned_technician_id": {"$exists": True, "$ne": None},
-        "created_at": {"$gte": start_iso, "$lte": end_iso}
-    }
-    if org_id:
-        query["organization_id"] = org_id
-
-    tickets = await db.tickets.find(query, {
-        "_id": 0,
-        "ticket_id": 1,
-        "assigned_technician_id": 1,
-        "assigned_technician_name": 1,
-        "status": 1,
-        "priority": 1,
-        "created_at": 1,
-        "resolved_at": 1,
-        "first_response_at": 1,
-        "sla_response_due_at": 1,
-        "sla_resolution_due_at": 1,
-        "sla_response_breached": 1,
-        "sla_resolution_breached": 1,
-    }).to_list(5000)
-
-    # Group by technician
-    tech_map = {}
-    for t in tickets:
-        tid = t.get("assigned_technician_id")
-        if not tid:
-            continue
-        if tid not in tech_map:
-            tech_map[tid] = {
-                "technician_id": tid,
-                "technician_name": t.get("assigned_technician_name") or "Unknown",
-                "tickets": []
-            }
-        tech_map[tid]["tickets"].append(t)
-
-    # Also fetch technician names from users collection
-    if tech_map:
+    # Daily rollups (services/technician_daily_stats.py): O(days), not O(tickets)
+    totals = await get_technician_totals(db, org_id, start_dt.date().isoformat(), end_dt.date().isoformat())
+
+    # Current technician names from users collection
+    if totals:
         tech_users = await db.users.find(
-            {"user_id": {"$in": list(tech_map.keys())}},
+            {"user_id": {"$in": list(totals.keys())}},
             {"_id": 0, "user_id": 1, "name": 1}
         ).to_list(200)
         for u in tech_users:
-            if u["user_id"] in tech_map:
-                tech_map[u["user_id"]]["technician_name"] = u.get("name") or tech_map[u["user_id"]]["technician_name"]
-
-    resolved_statuses = {"resolved", "closed"}
+            if u["user_id"] in totals and u.get("name"):
+                totals[u["user_id"]]["technician_name"] = u["name"]
 
     results = []
-    for tid, data in tech_map.items():
-        tkts = data["tickets"]
-        total = len(tkts)
-        resolved = [t for t in tkts if t.get("status") in resolved_statuses]
-        total_resolved = len(resolved)
+    for tid, t in totals.items():
+        means = technician_averages(t)
+        total_resolved = t["resolved"]
+        # Tickets resolved in the period may have been assigned before it
+        total = max(t["assigned"], total_resolved)
         resolution_rate = round((total_resolved / total * 100), 1) if total > 0 else 0.0
-
-        # Response time (minutes)
-        response_times = []
-        for t in tkts:
-            if t.get("first_response_at") and t.get("created_at"):
-                try:
-                    c = datetime.fromisoformat(t["created_at"].replace("Z", "+00:00"))
-                    r = datetime.fromisoformat(t["first_response_at"].replace("Z", "+00:00"))
-                    if c.tzinfo is None:
-                        c = c.replace(tzinfo=timezone.utc)
-                    if r.tzinfo is None:
-                        r = r.replace(tzinfo=timezone.utc)
-                    response_times.append((r - c).total_seconds() / 60)
-                except Exception:
-                    pass
-
-        # Resolution time (minutes)
-        resolution_times = []
-        for t in resolved:
-            if t.get("resolved_at") and t.get("created_at"):
-                try:
-                    c = datetime.fromisoformat(t["created_at"].replace("Z", "+00:00"))
-                    r = datetime.fromisoformat(t["resolved_at"].replace("Z", "+00:00"))
-                    if c.tzinfo is None:
-                        c = c.replace(tzinfo=timezone.utc)
-                    if r.tzinfo is None:
-                        r = r.replace(tzinfo=timezone.utc)
-                    resolution_times.append((r - c).total_seconds() / 60)
-                except Exception:
-                    pass
-
-        avg_response = round(sum(response_times) / len(response_times), 1) if response_times else None
-        avg_resolution = round(sum(resolution_times) / len(resolution_times), 1) if resolution_times else None
+        avg_response = means["avg_response_minutes"]
+        avg_resolution = means["avg_resolution_minutes"]
 
         # SLA metrics
-        sla_breach_response = sum(1 for t in tkts if t.get("sla_response_breached"))
-        sla_breach_resolution = sum(1 for t in tkts if t.get("sla_resolution_breached"))
-        total_with_sla = sum(1 for t in tkts if t.get("sla_resolution_due_at"))
-        sla_breached_total = sum(1 for t in tkts if t.get("sla_response_breached") or t.get("sla_resolution_breached"))
-        within_sla = total_with_sla - sla_breached_total
-        sla_compliance = round((within_sla / total_with_sla * 100), 1) if total_with_sla > 0 else 100.0
+        within_sla = t["sla_tracked"] - t["sla_breached"]
+        sla_compliance = means["sla_compliance_pct"] if means["sla_compliance_pct"] is not None else 100.0
 
         # Ranking score: resolution_rate(0.4) + sla_compliance(0.4) + speed(0.2)
         speed_score = 0.0
@@ -1470,7 +1200,7 @@ async def get_technician_performance(
             speed_score = min(1.0, 480 / avg_resolution)  # 480 min = 8h benchmark
         score = (resolution_rate / 100 * 0.4) + (sla_compliance / 100 * 0.4) + (speed_score * 0.2)
 
-        name = data["technician_name"]
+        name = t["technician_name"] or "Unknown"
         initials = "".join(w[0].upper() for w in name.split() if w)[:2]
 
         results.append({
@@ -1482,11 +1212,12 @@ async def get_technician_performance(
             "resolution_rate_pct": resolution_rate,
             "avg_response_time_minutes": avg_response,
             "avg_resolution_time_minutes": avg_resolution,
-            "sla_breaches_response": sla_breach_response,
-            "sla_breaches_resolution": sla_breach_resolution,
+            "sla_breaches_response": t["sla_response_breaches"],
+            "sla_breaches_resolution": t["sla_resolution_breaches"],
             "sla_compliance_rate_pct": sla_compliance,
             "tickets_within_sla": within_sla,
-            "customer_satisfaction_score": None,
+            "customer_satisfaction_score": means["avg_rating"],
+            "revenue_attributed": round(t["revenue"], 2),
             "_score": round(score, 4),
         })
 
@@ -1512,6 +1243,7 @@ async def get_technician_performance(
 @router.get("/inventory-valuation")
 async def get_inventory_valuation(
     request: Request,
+    valuation_method: str = Query("unit_price", description="unit_price, weighted_average or fifo"),
 ):
     """
     GET /api/reports/inventory-valuation
@@ -1524,33 +1256,32 @@ async def get_inventory_valuation(
 
     query: dict = {"organization_id": raw_org_id}
 
-    items = await db.inventory.find(query, {"_id": 0}).to_list(10000)
-
-    valuation_items = []
-    total_value = 0.0
-    low_stock_count = 0
-
-    for item in items:
-        qty = float(item.get("quantity", 0))
-        avg_cost = float(item.get("cost_price") or item.get("unit_price", 0))
-        item_value = qty * avg_cost
-        total_value += item_value
-
-        reorder = float(item.get("reorder_level", 10))
-        if qty <= reorder:
-            low_stock_count += 1
-
-        valuation_items.append({
-            "item_id": item.get("item_id", ""),
-            "item_name": item.get("name", ""),
-            "sku": item.get("sku", ""),
-            "category": item.get("category", ""),
-            "current_stock_qty": qty,
-            "avg_cost": round(avg_cost, 2),
-            "total_value": round(item_value, 2),
-            "reorder_level": reorder,
-            "is_low_stock": qty <= reorder,
-        })
+    try:
+        valuation = await value_inventory(
+            db, raw_org_id, query,
+            method=valuation_method,
+            collection="inventory",
+            qty_fields=("quantity",),
+            rate_fields=("cost_price", "unit_price"),
+            fields=("name", "sku", "category", "reorder_level"),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    reorder = valuation.values("reorder_level", default=10)
+    low_stock = valuation.qty <= reorder
+
+    valuation_items = [{
+        "item_id": item.get("item_id", ""),
+        "item_name": item.get("name", ""),
+        "sku": item.get("sku", ""),
+        "category": item.get("category", ""),
+        "current_stock_qty": float(valuation.qty[i]),
+        "avg_cost": round(float(valuation.unit_cost[i]), 2),
+        "total_value": round(float(valuation.value[i]), 2),
+        "reorder_level": float(reorder[i]),
+        "is_low_stock": bool(low_stock[i]),
+    } for i, item in enumerate(valuation.docs)]
 
     # Sort by total_value descending
     valuation_items.sort(key=lambda x: x["total_value"], reverse=True)
@@ -1559,10 +1290,11 @@ async def get_inventory_valuation(
         "code": 0,
         "report": "inventory_valuation",
         "as_of_date": datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+        "valuation_method": valuation.method,
         "summary": {
-            "total_inventory_value": round(total_value, 2),
+            "total_inventory_value": round(valuation.total_value, 2),
             "item_count": len(valuation_items),
-            "low_stock_count": low_stock_count,
+            "low_stock_count": int(low_stock.sum()),
         },
         "items": valuation_items,
     }
@@ -1596,35 +1328,20 @@ async def get_trial_balance(request: Request, as_of_date: str = Query(None, desc
     else:
         cutoff = datetime.now(timezone.utc)
 
-    match_stage = {
-        "organization_id": org_id,
-        "is_posted": True,
-    }
-    # Apply date filter if journal entry date is stored as string (ISO) or datetime
-    # We use $or to support both formats
-    match_stage["$or"] = [
-        {"entry_date": {"$lte": cutoff.isoformat()}},
-        {"entry_date": {"$lte": cutoff}},
-    ]
-
-    pipeline = [
-        {"$match": match_stage},
-        {"$unwind": "$lines"},
-        {
-            "$group": {
-                "_id": {
-                    "account_name": "$lines.account_name",
-                    "account_code": "$lines.account_code",
-                    "account_type": "$lines.account_type",
-                },
-                "total_debit": {"$sum": "$lines.debit_amount"},
-                "total_credit": {"$sum": "$lines.credit_amount"},
-            }
-        },
-        {"$sort": {"_id.account_code": 1}},
-    ]
-
-    raw_accounts = await db.journal_entries.aggregate(pipeline).to_list(5000)
+    # Monthly account rollups + raw lines of the partial month, regrouped by
+    # (name, code, type) — account_id is not part of this report's key
+    totals = await get_account_totals(db, org_id, end_date=cutoff.isoformat())
+    grouped = {}
+    for row in totals:
+        key = tuple(row["_id"].get(f) for f in ("account_name", "account_code", "account_type"))
+        acc = grouped.setdefault(key, {
+            "_id": {f: v for f, v in zip(("account_name", "account_code", "account_type"), key) if v is not None},
+            "total_debit": 0.0,
+            "total_credit": 0.0,
+        })
+        acc["total_debit"] += row["total_debit"]
+        acc["total_credit"] += row["total_credit"]
+    raw_accounts = list(grouped.values())
 
     accounts = []
     grand_debit = 0.0
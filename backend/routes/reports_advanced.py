@@ -3,11 +3,14 @@
 
 from fastapi import APIRouter, HTTPException, Query, Request, Depends
 from typing import Optional, List
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 from calendar import monthrange
 
 from core.subscriptions.entitlement import require_feature
 from utils.database import db, require_org_id, org_query
+from utils.time_series import time_series, shift_months
+from services.report_cache import cached_report
+from services.aging_report import aging_summary, BALANCE_DUE as AGING_BALANCE_DUE
 
 
 router = APIRouter(
@@ -28,6 +31,15 @@ items_collection = db["items"]
 def round_currency(val: float) -> float:
     return round(val, 2)
 
+# Invoice amount expressions shared by the revenue charts
+INVOICE_TOTAL = {"$ifNull": ["$grand_total", "$total_amount"]}
+BALANCE_DUE = {"$ifNull": ["$balance_due", "$amount_due"]}
+INVOICED_COLLECTED = {
+    "invoiced": {"$sum": INVOICE_TOTAL},
+    "collected": {"$sum": {"$subtract": [INVOICE_TOTAL, BALANCE_DUE]}},
+    "count": {"$sum": 1},
+}
+
 # ========================= REVENUE REPORTS =========================
 
 @router.get("/revenue/monthly")
@@ -37,49 +49,26 @@ async def get_monthly_revenue(request: Request, year: int = None, months: int =
     if not year:
         year = datetime.now(timezone.utc).year
     
-    # Calculate date range
+    # Window ends at the current month of `year`
     current_month = datetime.now(timezone.utc).month
-    
-    results = []
-    for i in range(months):
-        # Calculate month/year going backwards
-        month = current_month - i
-        y = year
-        while month <= 0:
-            month += 12
-            y -= 1
-        
-        start_date = f"{y}-{month:02d}-01"
-        _, last_day = monthrange(y, month)
-        end_date = f"{y}-{month:02d}-{last_day}"
-        
-        # Get invoices
-        pipeline = [
-            {"$match": {
-                "organization_id": org_id,
-                "invoice_date": {"$gte": start_date, "$lte": end_date},
-                "status": {"$nin": ["draft", "void"]}
-            }},
-            {"$group": {
-                "_id": None,
-                "invoiced": {"$sum": {"$ifNull": ["$grand_total", "$total_amount"]}},
-                "collected": {"$sum": {"$subtract": [{"$ifNull": ["$grand_total", "$total_amount"]}, {"$ifNull": ["$balance_due", "$amount_due"]}]}},
-                "count": {"$sum": 1}
-            }}
-        ]
-        
-        data = await invoices_collection.aggregate(pipeline).to_list(1)
-        values = data[0] if data else {"invoiced": 0, "collected": 0, "count": 0}
-        
-        results.append({
-            "month": f"{y}-{month:02d}",
-            "month_name": datetime(y, month, 1).strftime("%b %Y"),
-            "invoiced": round_currency(values.get("invoiced", 0)),
-            "collected": round_currency(values.get("collected", 0)),
-            "invoice_count": values.get("count", 0)
-        })
-    
-    results.reverse()  # Chronological order
+    last_month = date(year, current_month, 1)
+    end_date = date(year, current_month, monthrange(year, current_month)[1])
+    
+    series = await time_series(
+        invoices_collection,
+        {"organization_id": org_id, "status": {"$nin": ["draft", "void"]}},
+        date_field="invoice_date", unit="month",
+        start=shift_months(last_month, -(months - 1)), end=end_date,
+        accumulators=INVOICED_COLLECTED,
+    )
+    
+    results = [{
+        "month": b["bucket"].strftime("%Y-%m"),
+        "month_name": b["bucket"].strftime("%b %Y"),
+        "invoiced": round_currency(b["invoiced"]),
+        "collected": round_currency(b["collected"]),
+        "invoice_count": b["count"]
+    } for b in series]
     
     return {
         "code": 0,
@@ -99,39 +88,21 @@ async def get_quarterly_revenue(request: Request, year: int = None):
     if not year:
         year = datetime.now(timezone.utc).year
     
-    quarters = [
-        {"q": "Q1", "start": f"{year}-01-01", "end": f"{year}-03-31"},
-        {"q": "Q2", "start": f"{year}-04-01", "end": f"{year}-06-30"},
-        {"q": "Q3", "start": f"{year}-07-01", "end": f"{year}-09-30"},
-        {"q": "Q4", "start": f"{year}-10-01", "end": f"{year}-12-31"}
-    ]
+    series = await time_series(
+        invoices_collection,
+        {"organization_id": org_id, "status": {"$nin": ["draft", "void"]}},
+        date_field="invoice_date", unit="quarter",
+        start=date(year, 1, 1), end=date(year, 12, 31),
+        accumulators={**INVOICED_COLLECTED, "outstanding": {"$sum": BALANCE_DUE}},
+    )
     
-    results = []
-    for q in quarters:
-        pipeline = [
-            {"$match": {
-                "organization_id": org_id,
-                "invoice_date": {"$gte": q["start"], "$lte": q["end"]},
-                "status": {"$nin": ["draft", "void"]}
-            }},
-            {"$group": {
-                "_id": None,
-                "invoiced": {"$sum": {"$ifNull": ["$grand_total", "$total_amount"]}},
-                "collected": {"$sum": {"$subtract": [{"$ifNull": ["$grand_total", "$total_amount"]}, {"$ifNull": ["$balance_due", "$amount_due"]}]}},
-                "outstanding": {"$sum": {"$ifNull": ["$balance_due", "$amount_due"]}}
-            }}
-        ]
-        
-        data = await invoices_collection.aggregate(pipeline).to_list(1)
-        values = data[0] if data else {"invoiced": 0, "collected": 0, "outstanding": 0}
-        
-        results.append({
-            "quarter": q["q"],
-            "year": year,
-            "invoiced": round_currency(values.get("invoiced", 0)),
-            "collected": round_currency(values.get("collected", 0)),
-            "outstanding": round_currency(values.get("outstanding", 0))
-        })
+    results = [{
+        "quarter": f"Q{(b['bucket'].month - 1) // 3 + 1}",
+        "year": year,
+        "invoiced": round_currency(b["invoiced"]),
+        "collected": round_currency(b["collected"]),
+        "outstanding": round_currency(b["outstanding"])
+    } for b in series]
     
     return {
         "code": 0,
@@ -151,32 +122,21 @@ async def get_yearly_comparison(request: Request, years: int = 3):
     org_id = require_org_id(request)
     """Compare revenue across years"""
     current_year = datetime.now(timezone.utc).year
-    results = []
-    
-    for y in range(current_year - years + 1, current_year + 1):
-        pipeline = [
-            {"$match": {
-                "organization_id": org_id,
-                "invoice_date": {"$gte": f"{y}-01-01", "$lte": f"{y}-12-31"},
-                "status": {"$nin": ["draft", "void"]}
-            }},
-            {"$group": {
-                "_id": None,
-                "total_invoiced": {"$sum": {"$ifNull": ["$grand_total", "$total_amount"]}},
-                "total_collected": {"$sum": {"$subtract": [{"$ifNull": ["$grand_total", "$total_amount"]}, {"$ifNull": ["$balance_due", "$amount_due"]}]}},
-                "invoice_count": {"$sum": 1}
-            }}
-        ]
-        
-        data = await invoices_collection.aggregate(pipeline).to_list(1)
-        values = data[0] if data else {"total_invoiced": 0, "total_collected": 0, "invoice_count": 0}
-        
-        results.append({
-            "year": y,
-            "invoiced": round_currency(values.get("total_invoiced", 0)),
-            "collected": round_currency(values.get("total_collected", 0)),
-            "invoices": values.get("invoice_count", 0)
-        })
+    
+    series = await time_series(
+        invoices_collection,
+        {"organization_id": org_id, "status": {"$nin": ["draft", "void"]}},
+        date_field="invoice_date", unit="year",
+        start=date(current_year - years + 1, 1, 1), end=date(current_year, 12, 31),
+        accumulators=INVOICED_COLLECTED,
+    )
+    
+    results = [{
+        "year": b["bucket"].year,
+        "invoiced": round_currency(b["invoiced"]),
+        "collected": round_currency(b["collected"]),
+        "invoices": b["count"]
+    } for b in series]
     
     return {
         "code": 0,
@@ -191,50 +151,23 @@ async def get_yearly_comparison(request: Request, years: int = 3):
 async def get_receivables_aging_chart(request: Request):
     org_id = require_org_id(request)
     """Get receivables aging for pie/bar chart"""
-    today = datetime.now(timezone.utc).date()
-    
-    invoices = await invoices_collection.find(
+    summary = await aging_summary(
+        invoices_collection,
         {"organization_id": org_id, "status": {"$in": ["sent", "overdue", "partially_paid"]}, "$or": [{"balance_due": {"$gt": 0}}, {"amount_due": {"$gt": 0}}]},
-        {"_id": 0, "due_date": 1, "balance_due": 1, "amount_due": 1}
-    ).to_list(2000)
+        amount=AGING_BALANCE_DUE,
+    )
     
     buckets = {
-        "current": {"label": "Current", "amount": 0, "count": 0, "color": "#22C55E"},
-        "1_30": {"label": "1-30 Days", "amount": 0, "count": 0, "color": "#F59E0B"},
-        "31_60": {"label": "31-60 Days", "amount": 0, "count": 0, "color": "#F97316"},
-        "61_90": {"label": "61-90 Days", "amount": 0, "count": 0, "color": "#EF4444"},
-        "over_90": {"label": "90+ Days", "amount": 0, "count": 0, "color": "#991B1B"}
+        "current": {"label": "Current", "color": "#22C55E"},
+        "1_30": {"label": "1-30 Days", "color": "#F59E0B"},
+        "31_60": {"label": "31-60 Days", "color": "#F97316"},
+        "61_90": {"label": "61-90 Days", "color": "#EF4444"},
+        "over_90": {"label": "90+ Days", "color": "#991B1B"}
     }
     
-    for inv in invoices:
-        due_date_str = inv.get("due_date", "")
-        if not due_date_str:
-            continue
-        
-        try:
-            due_date = datetime.fromisoformat(due_date_str.replace('Z', '+00:00')).date()
-            days = (today - due_date).days
-            balance = inv.get("balance_due") or inv.get("amount_due") or 0
-            
-            if days <= 0:
-                bucket = "current"
-            elif days <= 30:
-                bucket = "1_30"
-            elif days <= 60:
-                bucket = "31_60"
-            elif days <= 90:
-                bucket = "61_90"
-            else:
-                bucket = "over_90"
-            
-            buckets[bucket]["amount"] += balance
-            buckets[bucket]["count"] += 1
-        except:
-            continue
-    
     # Format for chart
     chart_data = [
-        {"bucket": k, "label": v["label"], "amount": round_currency(v["amount"]), "count": v["count"], "color": v["color"]}
+        {"bucket": k, "label": v["label"], "amount": round_currency(summary["totals"][k]), "count": summary["counts"][k], "color": v["color"]}
         for k, v in buckets.items()
     ]
     
@@ -254,42 +187,24 @@ async def get_receivables_aging_chart(request: Request):
 async def get_receivables_trend(request: Request, months: int = 6):
     org_id = require_org_id(request)
     """Get receivables trend over time"""
-    current = datetime.now(timezone.utc)
-    results = []
-    
-    for i in range(months):
-        month = current.month - i
-        year = current.year
-        while month <= 0:
-            month += 12
-            year -= 1
-        
-        _, last_day = monthrange(year, month)
-        as_of_date = f"{year}-{month:02d}-{last_day}"
-        
-        # Get outstanding as of end of month
-        pipeline = [
-            {"$match": {
-                "organization_id": org_id,
-                "invoice_date": {"$lte": as_of_date},
-                "status": {"$nin": ["draft", "void", "paid"]}
-            }},
-            {"$group": {
-                "_id": None,
-                "total_outstanding": {"$sum": {"$ifNull": ["$balance_due", "$amount_due"]}}
-            }}
-        ]
-        
-        data = await invoices_collection.aggregate(pipeline).to_list(1)
-        outstanding = data[0].get("total_outstanding", 0) if data else 0
-        
-        results.append({
-            "month": f"{year}-{month:02d}",
-            "month_name": datetime(year, month, 1).strftime("%b %Y"),
-            "outstanding": round_currency(outstanding)
-        })
-    
-    results.reverse()
+    current = datetime.now(timezone.utc).date()
+    
+    # Outstanding as of each month end: running total over invoice months
+    series = await time_series(
+        invoices_collection,
+        {"organization_id": org_id, "status": {"$nin": ["draft", "void", "paid"]}},
+        date_field="invoice_date", unit="month",
+        start=shift_months(current, -(months - 1)),
+        end=current.replace(day=monthrange(current.year, current.month)[1]),
+        accumulators={"total_outstanding": {"$sum": BALANCE_DUE}},
+        cumulative=True,
+    )
+    
+    results = [{
+        "month": b["bucket"].strftime("%Y-%m"),
+        "month_name": b["bucket"].strftime("%b %Y"),
+        "outstanding": round_currency(b["total_outstanding"])
+    } for b in series]
     
     return {
         "code": 0,
@@ -377,33 +292,22 @@ async def get_top_customers_by_outstanding(request: Request, limit: int = 10):
 async def get_customer_acquisition(request: Request, months: int = 12):
     org_id = require_org_id(request)
     """Get new customer acquisition over time"""
-    current = datetime.now(timezone.utc)
-    results = []
-    
-    for i in range(months):
-        month = current.month - i
-        year = current.year
-        while month <= 0:
-            month += 12
-            year -= 1
-        
-        start = f"{year}-{month:02d}-01"
-        _, last_day = monthrange(year, month)
-        end = f"{year}-{month:02d}-{last_day}"
-        
-        new_customers = await contacts_collection.count_documents({
-            "organization_id": org_id,
-            "contact_type": {"$in": ["customer", "both"]},
-            "created_time": {"$gte": start, "$lte": end}
-        })
-        
-        results.append({
-            "month": f"{year}-{month:02d}",
-            "month_name": datetime(year, month, 1).strftime("%b %Y"),
-            "new_customers": new_customers
-        })
-    
-    results.reverse()
+    current = datetime.now(timezone.utc).date()
+    
+    series = await time_series(
+        contacts_collection,
+        {"organization_id": org_id, "contact_type": {"$in": ["customer", "both"]}},
+        date_field="created_time", unit="month",
+        start=shift_months(current, -(months - 1)),
+        end=current.replace(day=monthrange(current.year, current.month)[1]),
+        accumulators={"new_customers": {"$sum": 1}},
+    )
+    
+    results = [{
+        "month": b["bucket"].strftime("%Y-%m"),
+        "month_name": b["bucket"].strftime("%b %Y"),
+        "new_customers": b["new_customers"]
+    } for b in series]
     
     return {
         "code": 0,
@@ -554,40 +458,23 @@ async def get_invoice_status_distribution(request: Request):
 async def get_payment_trend(request: Request, months: int = 6):
     org_id = require_org_id(request)
     """Get payment collection trend"""
-    current = datetime.now(timezone.utc)
-    results = []
-    
-    for i in range(months):
-        month = current.month - i
-        year = current.year
-        while month <= 0:
-            month += 12
-            year -= 1
-        
-        start = f"{year}-{month:02d}-01"
-        _, last_day = monthrange(year, month)
-        end = f"{year}-{month:02d}-{last_day}"
-        
-        pipeline = [
-            {"$match": {"organization_id": org_id, "payment_date": {"$gte": start, "$lte": end}}},
-            {"$group": {
-                "_id": None,
-                "total_collected": {"$sum": "$amount"},
-                "payment_count": {"$sum": 1}
-            }}
-        ]
-        
-        data = await payments_collection.aggregate(pipeline).to_list(1)
-        values = data[0] if data else {"total_collected": 0, "payment_count": 0}
-        
-        results.append({
-            "month": f"{year}-{month:02d}",
-            "month_name": datetime(year, month, 1).strftime("%b %Y"),
-            "collected": round_currency(values.get("total_collected", 0)),
-            "count": values.get("payment_count", 0)
-        })
-    
-    results.reverse()
+    current = datetime.now(timezone.utc).date()
+    
+    series = await time_series(
+        payments_collection,
+        {"organization_id": org_id},
+        date_field="payment_date", unit="month",
+        start=shift_months(current, -(months - 1)),
+        end=current.replace(day=monthrange(current.year, current.month)[1]),
+        accumulators={"total_collected": {"$sum": "$amount"}, "payment_count": {"$sum": 1}},
+    )
+    
+    results = [{
+        "month": b["bucket"].strftime("%Y-%m"),
+        "month_name": b["bucket"].strftime("%b %Y"),
+        "collected": round_currency(b["total_collected"]),
+        "count": b["payment_count"]
+    } for b in series]
     
     return {
         "code": 0,
@@ -645,6 +532,7 @@ async def get_payments_by_mode(request: Request):
 # ========================= DASHBOARD SUMMARY =========================
 
 @router.get("/dashboard-summary")
+@cached_report("reports_advanced.dashboard_summary", require_org_id)
 async def get_dashboard_summary(request: Request):
     org_id = require_org_id(request)
     """Get comprehensive dashboard summary with KPIs"""
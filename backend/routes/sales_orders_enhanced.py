@@ -18,6 +18,7 @@ router = APIRouter(prefix="/sales-orders-enhanced", tags=["Sales Orders Enhanced
 
 # Database connection - shared instance from utils.database
 from utils.database import db
+from services.pdf_renderer import render_pdf, PdfRenderError
 
 # Collections - Use main collections with Zoho-synced data
 salesorders_collection = db["salesorders"]
@@ -1518,12 +1519,9 @@ async def get_sales_order_pdf(salesorder_id: str):
     """
     
     try:
-        from weasyprint import HTML
         from fastapi.responses import StreamingResponse
         
-        pdf_buffer = BytesIO()
-        HTML(string=html_content).write_pdf(pdf_buffer)
-        pdf_buffer.seek(0)
+        pdf_buffer = BytesIO(await render_pdf(html_content))
         
         return StreamingResponse(
             pdf_buffer,
@@ -1532,6 +1530,8 @@ async def get_sales_order_pdf(salesorder_id: str):
                 "Content-Disposition": f"attachment; filename=SalesOrder_{order.get('salesorder_number', salesorder_id)}.pdf"
             }
         )
+    except PdfRenderError:
+        raise
     except Exception as e:
         from fastapi.responses import HTMLResponse
         return HTMLResponse(content=html_content)
@@ -20,6 +20,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 from utils.database import db
+from services.chart_of_accounts_cache import invalidate_chart_of_accounts
 
 router = APIRouter(prefix="/seed", tags=["Data Seeding"])
 
@@ -449,6 +450,7 @@ async def seed_chart_of_accounts(organization_id: Optional[str] = None):
         )
         if result.upserted_id:
             created += 1
+    invalidate_chart_of_accounts(organization_id)
     
     return {
         "code": 0,
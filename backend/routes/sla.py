@@ -18,6 +18,8 @@ from datetime import datetime, timezone, timedelta
 import logging
 import uuid
 
+from services.technician_daily_stats import record_assignment
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/sla", tags=["SLA"])
@@ -527,6 +529,11 @@ async def _maybe_auto_reassign(ticket: Dict, now: datetime, org_id: str) -> bool
         }}
     )
 
+    try:
+        await record_assignment(db, ticket, new_tech["user_id"], new_name, now)
+    except Exception as e:
+        logger.warning(f"Technician stats update failed for {ticket['ticket_id']}: {e}")
+
     # Send notifications
     try:
         await _send_reassignment_notifications(ticket, old_name, new_tech, org_id, breach_time_str)
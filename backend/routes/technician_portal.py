@@ -7,7 +7,11 @@ from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime, timezone, timedelta
 import os
+import logging
 from utils.database import require_org_id, org_query
+from services.technician_daily_stats import get_technician_totals, get_daily_series, record_work_completed
+
+logger = logging.getLogger(__name__)
 
 
 def get_db():
@@ -354,6 +358,11 @@ async def complete_work(request: Request, ticket_id: str, data: CompleteWorkRequ
         }}
     )
     
+    try:
+        await record_work_completed(db, ticket, now, technician_id=technician["user_id"])
+    except Exception as e:
+        logger.warning(f"Technician stats update failed for {ticket_id}: {e}")
+    
     # Log activity
     await db.ticket_activities.insert_one({
         "activity_id": f"act_{now.timestamp()}",
@@ -594,52 +603,28 @@ async def get_my_productivity(request: Request):
     now = datetime.now(timezone.utc)
     month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     
-    # This month's stats
-    resolved_this_month = await db.tickets.count_documents({
-        "assigned_to": tech_id,
-        "organization_id": org_id,
-        "status": {"$in": ["resolved", "closed", "work_completed"]},
-        "updated_at": {"$gte": month_start.isoformat()}
-    })
-    
-    # Get all resolved tickets for average time
-    resolved_tickets = await db.tickets.find(
-        {
-            "assigned_to": tech_id,
-            "organization_id": org_id,
-            "status": {"$in": ["resolved", "closed", "work_completed"]},
-            "resolved_at": {"$exists": True}
-        },
-        {"_id": 0, "created_at": 1, "resolved_at": 1, "priority": 1}
-    ).sort("resolved_at", -1).limit(100).to_list(100)
-    
+    # Daily rollups (services/technician_daily_stats.py)
+    today = now.date().isoformat()
+    month_totals = await get_technician_totals(db, org_id, month_start.date().isoformat(), today)
+    mine = month_totals.get(tech_id)
+    resolved_this_month = mine["resolved"] if mine else 0
     avg_resolution = 0
     priority_breakdown = {"low": 0, "medium": 0, "high": 0, "critical": 0}
-    if resolved_tickets:
-        total_hours = 0
-        for t in resolved_tickets:
-            try:
-                created = datetime.fromisoformat(t["created_at"].replace("Z", "+00:00"))
-                resolved = datetime.fromisoformat(t["resolved_at"].replace("Z", "+00:00"))
-                total_hours += (resolved - created).total_seconds() / 3600
-                priority = t.get("priority", "medium")
-                if priority in priority_breakdown:
-                    priority_breakdown[priority] += 1
-            except:
-                pass
-        avg_resolution = round(total_hours / len(resolved_tickets), 1)
-    
+    if mine:
+        if mine["resolution_count"]:
+            avg_resolution = round(mine["resolution_minutes"] / mine["resolution_count"] / 60, 1)
+        for priority, count in mine["by_priority"].items():
+            if priority in priority_breakdown:
+                priority_breakdown[priority] += count
+
     # Get weekly trend (last 4 weeks)
+    daily = await get_daily_series(db, org_id, tech_id, (now - timedelta(days=28)).date().isoformat(), today)
     weekly_trend = []
     for i in range(4):
         week_end = now - timedelta(days=i * 7)
         week_start = week_end - timedelta(days=7)
-        count = await db.tickets.count_documents({
-            "assigned_to": tech_id,
-            "organization_id": org_id,
-            "status": {"$in": ["resolved", "closed", "work_completed"]},
-            "updated_at": {"$gte": week_start.isoformat(), "$lt": week_end.isoformat()}
-        })
+        count = sum(n for d, n in daily.items()
+                    if week_start.date().isoformat() < d <= week_end.date().isoformat())
         weekly_trend.append({
             "week": f"Week {4 - i}",
             "resolved": count
@@ -647,20 +632,13 @@ async def get_my_productivity(request: Request):
     weekly_trend.reverse()
     
     # Get rank among technicians (scoped to org)
-    all_tech_resolved = await db.tickets.aggregate([
-        {"$match": {
-            "assigned_to": {"$exists": True},
-            "organization_id": org_id,
-            "status": {"$in": ["resolved", "closed", "work_completed"]},
-            "updated_at": {"$gte": month_start.isoformat()}
-        }},
-        {"$group": {"_id": "$assigned_to", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}}
-    ]).to_list(100)
+    all_tech_resolved = sorted(
+        (t for t in month_totals.values() if t["resolved"]), key=lambda t: t["resolved"], reverse=True
+    )
     
     rank = 1
     for i, t in enumerate(all_tech_resolved):
-        if t["_id"] == tech_id:
+        if t["technician_id"] == tech_id:
             rank = i + 1
             break
     
@@ -12,6 +12,8 @@ import uuid
 import io
 import logging
 
+from services.pdf_renderer import render_pdf, PdfRenderError
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/ticket-invoices", tags=["Ticket Invoices"])
@@ -75,7 +77,6 @@ async def get_ticket_invoice_pdf(request: Request, invoice_id: str):
     """Generate and download GST-compliant ticket invoice PDF.
     Reuses the same PDF generator as invoices_enhanced."""
     from services.pdf_service import generate_gst_invoice_html
-    from weasyprint import HTML
 
     org_id = _org_id(request)
     invoice = await db.ticket_invoices.find_one(
@@ -122,9 +123,7 @@ async def get_ticket_invoice_pdf(request: Request, invoice_id: str):
             survey_qr_url=None
         )
 
-        pdf_buffer = io.BytesIO()
-        HTML(string=html_content).write_pdf(pdf_buffer)
-        pdf_buffer.seek(0)
+        pdf_buffer = io.BytesIO(await render_pdf(html_content, cache=True))
 
         customer_name_safe = (invoice.get("customer_name", "") or "Customer").replace(" ", "_")[:30]
         filename = f"TKT-{invoice.get('invoice_number', invoice_id)}-{customer_name_safe}.pdf"
@@ -134,6 +133,8 @@ async def get_ticket_invoice_pdf(request: Request, invoice_id: str):
             media_type="application/pdf",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
+    except PdfRenderError:
+        raise
     except Exception as e:
         logger.error(f"PDF generation failed for ticket invoice {invoice_id}: {e}")
         raise HTTPException(status_code=500, detail=f"PDF generation failed: {str(e)}")
@@ -198,6 +198,8 @@ async def create_ticket(request: Request, data: TicketCreateRequest, ctx: Tenant
         user_id=user.get("user_id"),
         user_name=user.get("name", "System")
     )
+    from utils.plan_limits import record_created
+    await record_created(ctx.org_id, "tickets")
     
     return ticket
 
@@ -10,6 +10,7 @@ from typing import Optional, List
 from datetime import datetime, timezone
 import uuid
 import logging
+from services.account_period_balances import apply_journal_entry
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/vendor-credits", tags=["Vendor Credits"])
@@ -214,6 +215,7 @@ async def apply_vendor_credit(request: Request, credit_id: str):
         "created_at": datetime.now(timezone.utc).isoformat(),
     }
     await db.journal_entries.insert_one(journal_entry)
+    await apply_journal_entry(db, journal_entry)
 
     await db.vendor_credits.update_one(
         {"credit_id": credit_id},
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Rebuild / verify the gst_tax_lines ledger against invoices, credit notes, bills and expenses.
+
+Usage:
+    python scripts/rebuild_gst_ledger.py --verify                # all orgs, report only
+    python scripts/rebuild_gst_ledger.py --verify --org ORG_ID
+    python scripts/rebuild_gst_ledger.py --rebuild [--org ORG_ID]
+    python scripts/rebuild_gst_ledger.py --verify --fix          # rebuild orgs that drifted
+
+Exit code is 1 when --verify finds mismatches that were not fixed.
+"""
+
+import asyncio
+import argparse
+import os
+import sys
+
+# Load environment
+env_path = os.path.join(os.path.dirname(__file__), "..", ".env")
+if os.path.exists(env_path):
+    with open(env_path) as f:
+        for line in f:
+            line = line.strip()
+            if "=" in line and not line.startswith("#"):
+                k, v = line.split("=", 1)
+                os.environ.setdefault(k.strip(), v.strip().strip('"'))
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from services.gst_ledger import rebuild_gst_ledger, verify_gst_ledger
+
+
+async def run(org_id: str = None, rebuild: bool = False, verify: bool = False, fix: bool = False) -> int:
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+
+    if org_id:
+        org_ids = [org_id]
+    else:
+        org_ids = set()
+        for source in ("invoices", "invoices_enhanced", "credit_notes", "bills", "expenses"):
+            org_ids.update(o for o in await db[source].distinct("organization_id") if o)
+        org_ids = sorted(org_ids)
+    drifted = 0
+
+    for org in org_ids:
+        if rebuild:
+            result = await rebuild_gst_ledger(db, org)
+            print(f"[rebuilt] {org}: {result['lines']} lines / {result['documents']} documents, "
+                  f"{result['stale_removed']} stale removed")
+        if verify:
+            report = await verify_gst_ledger(db, org)
+            if report["ok"]:
+                print(f"[ok]      {org}: {report['documents_checked']} documents")
+                continue
+            print(f"[drift]   {org}: {len(report['mismatches'])} of {report['documents_checked']} documents differ")
+            for m in report["mismatches"][:20]:
+                print(f"          {m['source_type']} {m['source_id']}: {', '.join(m['fields'])}")
+            if fix:
+                await rebuild_gst_ledger(db, org)
+                print(f"[fixed]   {org}")
+            else:
+                drifted += 1
+
+    client.close()
+    return 1 if drifted else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild / verify the GST tax line ledger")
+    parser.add_argument("--org", help="Organization ID (default: every org with GST documents)")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute ledger lines from the source documents")
+    parser.add_argument("--verify", action="store_true", help="Reconcile ledger lines against the source documents")
+    parser.add_argument("--fix", action="store_true", help="With --verify: rebuild orgs that drifted")
+    args = parser.parse_args()
+
+    if not (args.rebuild or args.verify):
+        parser.error("choose --rebuild and/or --verify")
+    sys.exit(asyncio.run(run(args.org, args.rebuild, args.verify, args.fix)))
+
+
+if __name__ == "__main__":
+    main()
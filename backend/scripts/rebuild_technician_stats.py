@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Rebuild / verify the technician_daily_stats rollups against tickets and survey reviews.
+
+Usage:
+    python scripts/rebuild_technician_stats.py --verify                # all orgs, report only
+    python scripts/rebuild_technician_stats.py --verify --org ORG_ID
+    python scripts/rebuild_technician_stats.py --rebuild [--org ORG_ID]
+    python scripts/rebuild_technician_stats.py --verify --fix          # rebuild orgs that drifted
+
+Exit code is 1 when --verify finds mismatches that were not fixed.
+"""
+
+import asyncio
+import argparse
+import os
+import sys
+
+# Load environment
+env_path = os.path.join(os.path.dirname(__file__), "..", ".env")
+if os.path.exists(env_path):
+    with open(env_path) as f:
+        for line in f:
+            line = line.strip()
+            if "=" in line and not line.startswith("#"):
+                k, v = line.split("=", 1)
+                os.environ.setdefault(k.strip(), v.strip().strip('"'))
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from services.technician_daily_stats import rebuild_technician_stats, verify_technician_stats
+
+
+async def run(org_id: str = None, rebuild: bool = False, verify: bool = False, fix: bool = False) -> int:
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+
+    org_ids = [org_id] if org_id else sorted(
+        o for o in await db.tickets.distinct("organization_id") if o
+    )
+    drifted = 0
+
+    for org in org_ids:
+        if rebuild:
+            result = await rebuild_technician_stats(db, org)
+            print(f"[rebuilt] {org}: {result['rows']} rows, {result['stale_removed']} stale removed")
+        if verify:
+            report = await verify_technician_stats(db, org)
+            if report["ok"]:
+                print(f"[ok]      {org}: {report['rows_checked']} rows")
+                continue
+            print(f"[drift]   {org}: {len(report['mismatches'])} of {report['rows_checked']} rows differ")
+            for m in report["mismatches"][:20]:
+                print(f"          {m['date']} {m['technician_id']}: {', '.join(m['fields'])}")
+            if fix:
+                await rebuild_technician_stats(db, org)
+                print(f"[fixed]   {org}")
+            else:
+                drifted += 1
+
+    client.close()
+    return 1 if drifted else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild / verify technician daily stats rollups")
+    parser.add_argument("--org", help="Organization ID (default: every org with tickets)")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute rollups from tickets and reviews")
+    parser.add_argument("--verify", action="store_true", help="Reconcile rollups against tickets and reviews")
+    parser.add_argument("--fix", action="store_true", help="With --verify: rebuild orgs that drifted")
+    args = parser.parse_args()
+
+    if not (args.rebuild or args.verify):
+        parser.error("choose --rebuild and/or --verify")
+    sys.exit(asyncio.run(run(args.org, args.rebuild, args.verify, args.fix)))
+
+
+if __name__ == "__main__":
+    main()
@@ -158,6 +158,7 @@ async def lifespan(app: FastAPI):
     learning_task = asyncio.create_task(_learning_queue_worker())
     recurring_invoice_task = asyncio.create_task(_recurring_invoice_scheduler())
     sla_breach_task = asyncio.create_task(_sla_breach_checker())
+    balance_drift_task = asyncio.create_task(_account_balance_drift_repair())
 
     yield
 
@@ -165,6 +166,9 @@ async def lifespan(app: FastAPI):
     learning_task.cancel()
     recurring_invoice_task.cancel()
     sla_breach_task.cancel()
+    balance_drift_task.cancel()
+    from services.pdf_renderer import get_pdf_renderer
+    get_pdf_renderer().shutdown()
     client.close()
     logger.info("Battwheels OS shutdown")
 
@@ -225,6 +229,21 @@ async def _sla_breach_checker():
         await asyncio.sleep(30 * 60)  # Every 30 minutes
 
 
+async def _account_balance_drift_repair():
+    """Background worker: incremental chart-of-accounts balance re-sync every 24 hours."""
+    await asyncio.sleep(600)  # Wait for app to stabilize (10 minutes)
+    while True:
+        try:
+            from services.scheduler import repair_account_balance_drift
+            result = await repair_account_balance_drift()
+            logger.info(f"Balance drift repair: synced {result.get('synced_accounts', 0)} accounts")
+        except asyncio.CancelledError:
+            break
+        except Exception as e:
+            logger.warning(f"Balance drift repair error: {e}")
+        await asyncio.sleep(24 * 3600)  # Every 24 hours
+
+
 # ==================== APP ====================
 app = FastAPI(title="Battwheels OS", lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
@@ -243,6 +262,9 @@ for exc_cls, msg in [
     if exc_cls == TenantSuspended: status = 423
     app.add_exception_handler(exc_cls, lambda req, exc, s=status, m=msg: __import__('fastapi.responses', fromlist=['JSONResponse']).JSONResponse(status_code=s, content={"detail": str(exc) or m}))
 
+from services.pdf_renderer import PdfRenderError, pdf_render_error_handler
+app.add_exception_handler(PdfRenderError, pdf_render_error_handler)
+
 # ==================== ROUTE LOADING ====================
 # v1 routes (mounted at /api/v1/...)
 V1_ROUTES = [
@@ -259,7 +281,7 @@ V1_ROUTES = [
     "routes.amc", "routes.documents", "routes.uploads", "routes.pdf_templates",
     "routes.notifications", "routes.subscriptions", "routes.time_tracking",
     "routes.projects", "routes.productivity", "routes.contact_integration",
-    "routes.invoice_automation", "routes.export",
+    "routes.invoice_automation", "routes.export", "routes.pdf_jobs",
     "routes.razorpay", "routes.einvoice",
     "routes.efi_guided", "routes.failure_cards", "routes.failure_intelligence",
     "routes.ai_assistant", "routes.ai_guidance", "routes.efi_intelligence",
@@ -391,56 +413,32 @@ try:
     init_entitlement_service()
     TenantGuardMiddleware.set_db(db)
 
-    from middleware.rate_limit import RateLimitMiddleware
-    from middleware.rbac import RBACMiddleware
-    from middleware.csrf import CSRFMiddleware
-    from middleware.sanitization import SanitizationMiddleware
-    from middleware.plan_enforcement import PlanEnforcementMiddleware, set_plan_enforcement_db
+    from middleware.pipeline import RequestPipelineMiddleware
+    from middleware.plan_enforcement import set_plan_enforcement_db
 
     # Initialize login rate limiter (sync init, TTL index created on first use)
     from middleware.rate_limiter import init_rate_limiter_sync
     init_rate_limiter_sync(db)
 
+    # Token-bucket store for RateLimitMiddleware (shared via MongoDB unless RATE_LIMIT_BACKEND=memory)
+    from middleware.rate_limit_store import init_rate_limit_store
+    init_rate_limit_store(db)
+
     # Initialize plan enforcement DB
     set_plan_enforcement_db(db)
 
-    # Middleware registration order: LAST added = OUTERMOST (runs first).
-    # Target execution order (request flow):
-    #   CORS → CSRF → RateLimit → TenantGuard(Auth) → RBAC → PlanEnforcement → Sanitization → Route
-    #
-    # So we add innermost first, outermost last:
-    app.add_middleware(SanitizationMiddleware)  # 7-innermost: strips HTML from JSON
-    app.add_middleware(PlanEnforcementMiddleware) # 6: plan-based feature gating (write ops)
-    app.add_middleware(RBACMiddleware)          # 5: role-based access control
-    app.add_middleware(TenantGuardMiddleware)   # 4: auth + tenant isolation
-    app.add_middleware(RateLimitMiddleware)     # 3: reject floods early, before auth costs
-    app.add_middleware(CSRFMiddleware)          # 2: CSRF check (before rate limit, after CORS)
+    # Single pure-ASGI pipeline (middleware/pipeline.py). Execution order (request flow):
+    #   CORS → SecurityHeaders → /efi→/evfi rewrite → CSRF → RateLimit
+    #        → TenantGuard(Auth) → RBAC → PlanEnforcement → Sanitization → Route
+    # The route is resolved once against the shared route trie and passed to every stage.
+    app.add_middleware(RequestPipelineMiddleware)
     logger.info("Multi-tenant system + middleware initialized")
 except Exception as e:
     logger.error(f"Failed to initialize multi-tenant system: {e}")
     import traceback; traceback.print_exc()
 
-# ==================== BACKWARD COMPAT: /efi → /evfi REWRITE ====================
-@app.middleware("http")
-async def rewrite_efi_to_evfi(request: Request, call_next):
-    """Rewrite old /efi paths to /evfi for backward compatibility."""
-    path = request.scope.get("path", "")
-    if "/efi" in path and "/evfi" not in path:
-        new_path = path.replace("/efi-guided", "/evfi-guided").replace("/efi", "/evfi")
-        request.scope["path"] = new_path
-    return await call_next(request)
-
 # ==================== SECURITY + CORS ====================
-@app.middleware("http")
-async def add_security_headers(request: Request, call_next):
-    response = await call_next(request)
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-    response.headers["Content-Security-Policy"] = "default-src 'self'; connect-src 'self' https://*.emergentagent.com https://*.emergent.host https://*.battwheels.com; frame-ancestors 'none';"
-    return response
+# Security headers and the legacy /efi → /evfi rewrite run inside RequestPipelineMiddleware.
 
 _cors_env = os.environ.get("CORS_ORIGINS", "")
 _environment = os.environ.get("ENVIRONMENT", "development")
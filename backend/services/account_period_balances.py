@@ -0,0 +1,448 @@
+"""
+Account Period Balances
+=======================
+
+Materialized per-account, per-month debit/credit totals of posted journal
+lines (collection `account_period_balances`), so trial balance, P&L and
+balance sheet no longer `$unwind` every journal line an org ever posted.
+
+One document per (organization_id, period "YYYY-MM", account_id,
+account_name, account_code, account_type) — the same grouping key the
+reports used on raw lines, so report rows are unchanged:
+
+    {organization_id, period, account_id, account_name, account_code,
+     account_type, debit, credit, line_count, updated_at}
+
+Maintenance:
+- apply_journal_entry() is called after every posted journal insert
+  (DoubleEntryService.create_journal_entry — which also covers reversals —
+  and the direct inserters of posted entries: inventory_service,
+  ticket_estimate_service, routes/vendor_credits and the estimate → invoice
+  COGS entry in routes/estimates_enhanced). Inserts without is_posted never
+  reach the reports and are ignored here too.
+- An org's rollups are built from raw lines the first time a report needs
+  them (ensure_period_balances) and can be rebuilt / verified with
+  scripts/rebuild_period_balances.py.
+
+Reads (get_account_totals): full months in the requested range come from
+the rollups; partial months at either end (typically the current month)
+are aggregated from raw journal lines. entry_date is an ISO string on most
+write paths and a datetime on a few, so raw ranges match both forms.
+
+Every rollup carries a `version` that each posting `$inc`s. A rebuild only
+`$set`s rows whose version is unchanged since it read them, and repeats
+until a pass sees no posting land, so a concurrent apply_journal_entry is
+neither overwritten nor counted twice.
+"""
+
+from calendar import monthrange
+from datetime import datetime, timezone, date, timedelta
+from typing import Dict, List, Optional, Tuple, Iterable
+import logging
+import uuid
+
+from pymongo import UpdateOne, InsertOne, DeleteOne
+from pymongo.errors import BulkWriteError
+
+from services.report_cache import bump_financial_version
+
+logger = logging.getLogger(__name__)
+
+
+COLLECTION = "account_period_balances"
+STATUS_COLLECTION = "account_period_balances_status"
+
+KEY_FIELDS = ("account_id", "account_name", "account_code", "account_type")
+
+# Amount drift tolerated by verify (sums are stored as doubles)
+TOLERANCE = 0.005
+
+# Rebuild passes before giving up on an org that keeps posting
+REBUILD_ATTEMPTS = 5
+
+# Orgs whose rollups are known to be built (per process)
+_ready_orgs = set()
+
+
+# ==================== PERIOD HELPERS ====================
+
+def period_of(entry_date) -> str:
+    """YYYY-MM of a journal entry date (ISO string or datetime)"""
+    if isinstance(entry_date, (datetime, date)):
+        return entry_date.strftime("%Y-%m")
+    return str(entry_date or "")[:7]
+
+
+def _month_start(year: int, month: int) -> str:
+    return f"{year:04d}-{month:02d}-01"
+
+
+def _as_datetime(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def entry_date_clauses(gte: str, lt: Optional[str] = None, lte: Optional[str] = None) -> List[Dict]:
+    """
+    `$or` clauses for gte <= entry_date < lt (or <= lte), matching ISO string
+    and datetime entry dates. A date-only lte covers that whole day.
+    """
+    as_string = {"$gte": gte}
+    as_date = {"$gte": _as_datetime(gte)}
+    if lt:
+        as_string["$lt"] = lt
+        as_date["$lt"] = _as_datetime(lt)
+    if lte:
+        as_string["$lte"] = lte
+        if len(lte) == 10:
+            as_date["$lt"] = _as_datetime(lte) + timedelta(days=1)
+        else:
+            as_date["$lte"] = _as_datetime(lte)
+    return [{"entry_date": as_string}, {"entry_date": as_date}]
+
+
+def _next_month(year: int, month: int) -> Tuple[int, int]:
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _prev_month(year: int, month: int) -> Tuple[int, int]:
+    return (year - 1, 12) if month == 1 else (year, month - 1)
+
+
+def split_date_range(start_date: Optional[str], end_date: str):
+    """
+    Split [start_date, end_date] into whole months served from rollups and
+    partial ranges that must be read from raw journal lines.
+
+    Returns ((first_period | None, last_period) | None, [(gte, lt | None, lte | None), ...]).
+    A first_period of None means "from the beginning".
+    """
+    end = datetime.strptime(end_date[:10], "%Y-%m-%d").date()
+    raw_ranges = []
+
+    if end.day == monthrange(end.year, end.month)[1] and len(end_date) == 10:
+        last_y, last_m = end.year, end.month
+    else:
+        last_y, last_m = _prev_month(end.year, end.month)
+        raw_ranges.append((_month_start(end.year, end.month), None, end_date))
+
+    first = None
+    if start_date:
+        start = datetime.strptime(start_date[:10], "%Y-%m-%d").date()
+        first_y, first_m = start.year, start.month
+        if start.day != 1:
+            first_y, first_m = _next_month(start.year, start.month)
+            if (start.year, start.month) == (end.year, end.month):
+                # Entire range inside one month
+                return None, [(start_date, None, end_date)]
+            head_end = _month_start(first_y, first_m)
+            raw_ranges.insert(0, (start_date, head_end, None))
+        first = f"{first_y:04d}-{first_m:02d}"
+
+    last = f"{last_y:04d}-{last_m:02d}"
+    # first > last: only partial months (e.g. mid-March to mid-April)
+    full = (first, last) if first is None or first <= last else None
+    return full, raw_ranges
+
+
+# ==================== MAINTENANCE ====================
+
+def _entry_deltas(entry: Dict) -> Dict[Tuple, List[float]]:
+    deltas: Dict[Tuple, List[float]] = {}
+    for line in entry.get("lines") or []:
+        key = tuple(line.get(f) for f in KEY_FIELDS)
+        totals = deltas.setdefault(key, [0.0, 0.0, 0])
+        totals[0] += float(line.get("debit_amount") or 0)
+        totals[1] += float(line.get("credit_amount") or 0)
+        totals[2] += 1
+    return deltas
+
+
+async def apply_journal_entry(db, entry: Dict, session=None) -> None:
+    """Add a posted journal entry's lines to its month's rollups (one bulk_write)"""
+    if not entry.get("is_posted") or not entry.get("organization_id"):
+        return
+    deltas = _entry_deltas(entry)
+    if not deltas:
+        return
+    organization_id = entry["organization_id"]
+    period = period_of(entry.get("entry_date"))
+    now = datetime.now(timezone.utc).isoformat()
+    await db[COLLECTION].bulk_write([
+        UpdateOne(
+            {"organization_id": organization_id, "period": period, **dict(zip(KEY_FIELDS, key))},
+            {
+                "$inc": {"debit": debit, "credit": credit, "line_count": count, "version": 1},
+                "$set": {"updated_at": now}
+            },
+            upsert=True
+        )
+        for key, (debit, credit, count) in deltas.items()
+    ], ordered=False, session=session)
+    bump_financial_version(organization_id)
+
+
+def _raw_group_pipeline(match: Dict, by_period: bool, account_types: Iterable[str] = None) -> List[Dict]:
+    group_id = {f: f"$lines.{f}" for f in KEY_FIELDS}
+    if by_period:
+        group_id["period"] = {"$cond": [
+            {"$eq": [{"$type": "$entry_date"}, "date"]},
+            {"$dateToString": {"format": "%Y-%m", "date": "$entry_date"}},
+            {"$substrBytes": [{"$ifNull": ["$entry_date", ""]}, 0, 7]}
+        ]}
+    pipeline = [{"$match": match}, {"$unwind": "$lines"}]
+    if account_types:
+        pipeline.append({"$match": {"lines.account_type": {"$in": list(account_types)}}})
+    pipeline.append({"$group": {
+        "_id": group_id,
+        "total_debit": {"$sum": "$lines.debit_amount"},
+        "total_credit": {"$sum": "$lines.credit_amount"},
+        "line_count": {"$sum": 1}
+    }})
+    return pipeline
+
+
+async def _raw_period_totals(db, organization_id: str) -> Dict[Tuple, Dict]:
+    """(period, *key) -> totals, straight from journal lines"""
+    rows = await db.journal_entries.aggregate(
+        _raw_group_pipeline({"organization_id": organization_id, "is_posted": True}, by_period=True),
+        allowDiskUse=True
+    ).to_list(None)
+    return {
+        (row["_id"]["period"],) + tuple(row["_id"].get(f) for f in KEY_FIELDS): row
+        for row in rows
+    }
+
+
+async def _stored_rollups(db, organization_id: str) -> Dict[Tuple, Dict]:
+    """(period, *key) -> {_id, version, rebuild_id} of an org's stored rollups"""
+    docs = await db[COLLECTION].find(
+        {"organization_id": organization_id},
+        {"_id": 1, "period": 1, "version": 1, "rebuild_id": 1, **{f: 1 for f in KEY_FIELDS}}
+    ).to_list(None)
+    return {(d.get("period"),) + tuple(d.get(f) for f in KEY_FIELDS): d for d in docs}
+
+
+async def rebuild_period_balances(db, organization_id: str) -> Dict:
+    """
+    Recompute an org's rollups from raw journal lines.
+
+    Versions are read before the raw aggregation and every write is guarded
+    on them, so a posting that lands mid-rebuild turns its row's write into
+    a no-op. Passes repeat until the stored rows are exactly the ones the
+    last pass wrote (same version and rebuild_id), i.e. nothing was posted
+    between reading the versions and checking them again.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    rows = stale = 0
+    written = None
+    for attempt in range(REBUILD_ATTEMPTS + 1):
+        existing = await _stored_rollups(db, organization_id)
+        stored = {key: (d.get("version"), d.get("rebuild_id")) for key, d in existing.items()}
+        if stored == written:
+            break
+        if attempt == REBUILD_ATTEMPTS:
+            logger.warning(f"Period balances for org {organization_id} still changing after "
+                           f"{REBUILD_ATTEMPTS} rebuild passes; run verify_period_balances")
+            break
+        raw = await _raw_period_totals(db, organization_id)
+
+        rebuild_id = uuid.uuid4().hex
+        ops, written = [], {}
+        for key, row in raw.items():
+            totals = {
+                "debit": float(row["total_debit"] or 0),
+                "credit": float(row["total_credit"] or 0),
+                "line_count": row["line_count"],
+                "rebuild_id": rebuild_id,
+                "updated_at": now
+            }
+            doc = existing.get(key)
+            if doc is not None:
+                version = (doc.get("version") or 0) + 1
+                ops.append(UpdateOne({"_id": doc["_id"], "version": doc.get("version")},
+                                     {"$set": {**totals, "version": version}}))
+            else:
+                version = 1
+                period, *fields = key
+                ops.append(InsertOne({"organization_id": organization_id, "period": period,
+                                      **dict(zip(KEY_FIELDS, fields)), **totals, "version": version}))
+            written[key] = (version, rebuild_id)
+        # Drop rollups whose lines no longer exist
+        ops.extend(DeleteOne({"_id": doc["_id"], "version": doc.get("version")})
+                   for key, doc in existing.items() if key not in raw)
+
+        rows = len(raw)
+        if ops:
+            try:
+                stale += (await db[COLLECTION].bulk_write(ops, ordered=False)).deleted_count
+            except BulkWriteError as e:
+                # A posting created the row first (unique key); the next pass picks it up
+                stale += e.details.get("nRemoved", 0)
+
+    await db[STATUS_COLLECTION].update_one(
+        {"organization_id": organization_id},
+        {"$set": {"organization_id": organization_id, "built_at": now, "rows": rows}},
+        upsert=True
+    )
+    _ready_orgs.add(organization_id)
+    logger.info(f"Rebuilt {rows} account period balances for org {organization_id} ({stale} stale removed)")
+    return {"organization_id": organization_id, "rows": rows, "stale_removed": stale}
+
+
+async def verify_period_balances(db, organization_id: str) -> Dict:
+    """Compare rollups with raw journal lines; returns the mismatching keys"""
+    raw = await _raw_period_totals(db, organization_id)
+    rollups = await db[COLLECTION].find({"organization_id": organization_id}, {"_id": 0}).to_list(None)
+    materialized = {(d.get("period"),) + tuple(d.get(f) for f in KEY_FIELDS): d for d in rollups}
+
+    mismatches = []
+    for key in set(raw) | set(materialized):
+        expected = raw.get(key) or {}
+        actual = materialized.get(key) or {}
+        expected_debit = float(expected.get("total_debit") or 0)
+        expected_credit = float(expected.get("total_credit") or 0)
+        if (abs(expected_debit - float(actual.get("debit") or 0)) > TOLERANCE
+                or abs(expected_credit - float(actual.get("credit") or 0)) > TOLERANCE):
+            mismatches.append({
+                "period": key[0],
+                **dict(zip(KEY_FIELDS, key[1:])),
+                "expected_debit": round(expected_debit, 2),
+                "expected_credit": round(expected_credit, 2),
+                "rollup_debit": round(float(actual.get("debit") or 0), 2),
+                "rollup_credit": round(float(actual.get("credit") or 0), 2),
+            })
+    mismatches.sort(key=lambda m: (m["period"] or "", m["account_code"] or ""))
+    return {
+        "organization_id": organization_id,
+        "rows_checked": len(set(raw) | set(materialized)),
+        "mismatches": mismatches,
+        "ok": not mismatches
+    }
+
+
+async def ensure_period_balances(db, organization_id: str) -> None:
+    """Build an org's rollups from raw lines the first time they are needed"""
+    if organization_id in _ready_orgs:
+        return
+    if await db[STATUS_COLLECTION].find_one({"organization_id": organization_id}, {"_id": 1}):
+        _ready_orgs.add(organization_id)
+        return
+    await rebuild_period_balances(db, organization_id)
+
+
+# ==================== READS ====================
+
+async def get_account_totals(
+    db,
+    organization_id: str,
+    end_date: str,
+    start_date: str = None,
+    account_types: Iterable[str] = None
+) -> List[Dict]:
+    """
+    Per-account debit/credit totals of posted lines with
+    start_date <= entry_date <= end_date (start_date None = all history).
+
+    Rows have the shape of the old `$unwind`/`$group` pipelines:
+    {"_id": {account_id, account_name, account_code, account_type},
+     "total_debit", "total_credit"}, sorted by account_code.
+    """
+    await ensure_period_balances(db, organization_id)
+    full, raw_ranges = split_date_range(start_date, end_date)
+    totals: Dict[Tuple, List[float]] = {}
+
+    def add(key, debit, credit):
+        acc = totals.setdefault(key, [0.0, 0.0])
+        acc[0] += float(debit or 0)
+        acc[1] += float(credit or 0)
+
+    if full:
+        first, last = full
+        period_filter = {"$lte": last}
+        if first:
+            period_filter["$gte"] = first
+        match = {"organization_id": organization_id, "period": period_filter}
+        if account_types:
+            match["account_type"] = {"$in": list(account_types)}
+        rows = await db[COLLECTION].aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": {f: f"${f}" for f in KEY_FIELDS},
+                "debit": {"$sum": "$debit"},
+                "credit": {"$sum": "$credit"}
+            }}
+        ]).to_list(None)
+        for row in rows:
+            add(tuple(row["_id"].get(f) for f in KEY_FIELDS), row["debit"], row["credit"])
+
+    if raw_ranges:
+        match = {
+            "organization_id": organization_id,
+            "is_posted": True,
+            "$or": [clause for bounds in raw_ranges for clause in entry_date_clauses(*bounds)]
+        }
+        rows = await db.journal_entries.aggregate(
+            _raw_group_pipeline(match, by_period=False, account_types=account_types)
+        ).to_list(None)
+        for row in rows:
+            add(tuple(row["_id"].get(f) for f in KEY_FIELDS), row["total_debit"], row["total_credit"])
+
+    results = [
+        {
+            # Missing line fields are left out, as `$group` does
+            "_id": {f: v for f, v in zip(KEY_FIELDS, key) if v is not None},
+            # Stored sums are doubles; amounts are in paise precision
+            "total_debit": round(debit, 2),
+            "total_credit": round(credit, 2)
+        }
+        for key, (debit, credit) in totals.items()
+    ]
+    results.sort(key=lambda r: ("account_code" in r["_id"], str(r["_id"].get("account_code", ""))))
+    return results
+
+
+async def get_account_totals_before(db, organization_id: str, account_id: str, before_date: str) -> Tuple[float, float]:
+    """
+    (debit, credit) of one account's posted lines with entry_date < before_date:
+    the account's monthly rollups before that month act as checkpoints, and
+    only the days of before_date's own month are read from raw lines.
+    """
+    await ensure_period_balances(db, organization_id)
+    month = before_date[:7]
+    debit = credit = 0.0
+
+    rows = await db[COLLECTION].aggregate([
+        {"$match": {"organization_id": organization_id, "account_id": account_id, "period": {"$lt": month}}},
+        {"$group": {"_id": None, "debit": {"$sum": "$debit"}, "credit": {"$sum": "$credit"}}}
+    ]).to_list(1)
+    if rows:
+        debit += float(rows[0]["debit"] or 0)
+        credit += float(rows[0]["credit"] or 0)
+
+    month_start = f"{month}-01"
+    if before_date > month_start:
+        rows = await db.journal_entries.aggregate([
+            {"$match": {
+                "organization_id": organization_id,
+                "is_posted": True,
+                "$or": entry_date_clauses(month_start, lt=before_date),
+                "lines.account_id": account_id
+            }},
+            {"$unwind": "$lines"},
+            {"$match": {"lines.account_id": account_id}},
+            {"$group": {
+                "_id": None,
+                "debit": {"$sum": "$lines.debit_amount"},
+                "credit": {"$sum": "$lines.credit_amount"}
+            }}
+        ]).to_list(1)
+        if rows:
+            debit += float(rows[0]["debit"] or 0)
+            credit += float(rows[0]["credit"] or 0)
+    return round(debit, 2), round(credit, 2)
+
+
+def reset_ready_cache() -> None:
+    """Forget which orgs have built rollups (tests)"""
+    _ready_orgs.clear()
@@ -0,0 +1,213 @@
+"""
+AR / AP Aging Engine
+====================
+
+Aging buckets computed inside MongoDB, so totals are exact at any number of
+open invoices or bills (the endpoints used to load a capped list and bucket
+it in Python).
+
+- aging_summary()       — one aggregation: days overdue from the due date,
+                          a `$switch` into current / 1_30 / 31_60 / 61_90 /
+                          over_90, grouped per party (customer or vendor) and
+                          bucket. Returns bucket totals, counts and one row
+                          per party.
+- iter_aging_details()  — per-document rows (optionally one party), read with
+                          a cursor; used for drilldowns and exports only.
+- stream_aging()        — summary record, then each party's record followed
+                          by its documents, for NDJSON drilldown responses.
+
+Due dates may be "YYYY-MM-DD" strings, ISO timestamps or BSON dates;
+documents whose due date does not parse are left out, as before.
+"""
+
+from datetime import date, datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Union
+
+BUCKETS = ("current", "1_30", "31_60", "61_90", "over_90")
+
+# Outstanding amount expressions used by the aging endpoints
+BALANCE = "$balance"
+BALANCE_DUE = {"$cond": [
+    {"$ne": [{"$ifNull": ["$balance_due", 0]}, 0]},
+    "$balance_due",
+    {"$ifNull": ["$amount_due", 0]},
+]}
+
+
+def _as_of_datetime(as_of: Union[str, date, datetime, None]) -> datetime:
+    if as_of is None:
+        as_of = datetime.now(timezone.utc).date()
+    if isinstance(as_of, str):
+        as_of = datetime.strptime(as_of[:10], "%Y-%m-%d").date()
+    if isinstance(as_of, datetime):
+        as_of = as_of.date()
+    return datetime(as_of.year, as_of.month, as_of.day, tzinfo=timezone.utc)
+
+
+def days_overdue_expr(due_field: str, as_of: datetime) -> Dict:
+    """Whole days from the due date to `as_of`; null when the due date does not parse"""
+    field = f"${due_field}"
+    due = {"$cond": [
+        {"$eq": [{"$type": field}, "date"]},
+        {"$dateTrunc": {"date": field, "unit": "day"}},
+        {"$dateFromString": {
+            "dateString": {"$substrBytes": [{"$ifNull": [field, ""]}, 0, 10]},
+            "format": "%Y-%m-%d",
+            "onError": None,
+            "onNull": None,
+        }},
+    ]}
+    return {"$dateDiff": {"startDate": due, "endDate": as_of, "unit": "day"}}
+
+
+def bucket_expr(days: str = "$_days") -> Dict:
+    """`$switch` from days overdue to the bucket name"""
+    return {"$switch": {
+        "branches": [
+            {"case": {"$lte": [days, 0]}, "then": "current"},
+            {"case": {"$lte": [days, 30]}, "then": "1_30"},
+            {"case": {"$lte": [days, 60]}, "then": "31_60"},
+            {"case": {"$lte": [days, 90]}, "then": "61_90"},
+        ],
+        "default": "over_90",
+    }}
+
+
+def _aged_stages(match: Dict, as_of: datetime, amount: Any, due_field: str) -> List[Dict]:
+    return [
+        {"$match": match},
+        {"$addFields": {"_days": days_overdue_expr(due_field, as_of), "_amount": amount}},
+        {"$match": {"_days": {"$ne": None}}},
+        {"$addFields": {"_bucket": bucket_expr()}},
+    ]
+
+
+def _empty_buckets() -> Dict[str, float]:
+    return {b: 0 for b in BUCKETS}
+
+
+async def aging_summary(
+    collection,
+    match: Dict,
+    as_of=None,
+    amount: Any = BALANCE,
+    due_field: str = "due_date",
+    party_id_field: str = "customer_id",
+    party_name_field: str = "customer_name",
+) -> Dict[str, Any]:
+    """
+    Exact bucket totals for the documents matching `match`.
+
+    Returns {"totals", "counts", "total", "document_count", "parties"}; each
+    party row has party_id, party_name, one amount per bucket, total and
+    document_count, largest total first.
+    """
+    as_of = _as_of_datetime(as_of)
+    pipeline = _aged_stages(match, as_of, amount, due_field) + [
+        {"$group": {
+            "_id": {"party_id": f"${party_id_field}", "bucket": "$_bucket"},
+            "party_name": {"$first": f"${party_name_field}"},
+            "amount": {"$sum": "$_amount"},
+            "count": {"$sum": 1},
+        }},
+    ]
+    rows = await collection.aggregate(pipeline, allowDiskUse=True).to_list(None)
+
+    totals, counts = _empty_buckets(), _empty_buckets()
+    parties: Dict[Any, Dict[str, Any]] = {}
+    for row in rows:
+        party_id, bucket = row["_id"].get("party_id"), row["_id"]["bucket"]
+        amount_sum, count = row.get("amount") or 0, row.get("count", 0)
+        totals[bucket] += amount_sum
+        counts[bucket] += count
+        party = parties.get(party_id)
+        if party is None:
+            party = parties[party_id] = {
+                "party_id": party_id, "party_name": row.get("party_name"),
+                **_empty_buckets(), "total": 0, "document_count": 0,
+            }
+        party["party_name"] = party["party_name"] or row.get("party_name")
+        party[bucket] += amount_sum
+        party["total"] += amount_sum
+        party["document_count"] += count
+
+    return {
+        "as_of_date": as_of.date().isoformat(),
+        "totals": totals,
+        "counts": counts,
+        "total": sum(totals.values()),
+        "document_count": sum(counts.values()),
+        "parties": sorted(parties.values(), key=lambda p: p["total"], reverse=True),
+    }
+
+
+async def iter_aging_details(
+    collection,
+    match: Dict,
+    fields: Iterable[str],
+    as_of=None,
+    amount: Any = BALANCE,
+    due_field: str = "due_date",
+    party_id_field: str = "customer_id",
+    party_id: Optional[str] = None,
+    oldest_first: bool = False,
+    limit: Optional[int] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Aged documents: the requested `fields` plus balance, days_overdue and
+    bucket. Ordered by party (then most overdue first), or most overdue first
+    across all parties with `oldest_first`. Equally overdue documents come
+    in creation order, not by document number: as strings, INV-100000 sorts
+    before INV-99999.
+    """
+    as_of = _as_of_datetime(as_of)
+    if party_id is not None:
+        match = {**match, party_id_field: party_id}
+    sort = {"_days": -1} if oldest_first else {party_id_field: 1, "_days": -1}
+    sort.update({"created_at": 1, "_id": 1})
+    pipeline = _aged_stages(match, as_of, amount, due_field) + [{"$sort": sort}]
+    if limit:
+        pipeline.append({"$limit": limit})
+    pipeline.append({"$project": {
+        "_id": 0, **{f: 1 for f in fields}, party_id_field: 1,
+        "balance": "$_amount", "days_overdue": "$_days", "bucket": "$_bucket",
+    }})
+    async for doc in collection.aggregate(pipeline, allowDiskUse=True):
+        yield doc
+
+
+async def stream_aging(
+    collection,
+    match: Dict,
+    fields: Iterable[str],
+    as_of=None,
+    amount: Any = BALANCE,
+    due_field: str = "due_date",
+    party_id_field: str = "customer_id",
+    party_name_field: str = "customer_name",
+    party_id: Optional[str] = None,
+    document_type: str = "invoice",
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Drilldown records: {"type": "summary", ...}, then for each party
+    {"type": "party", ...} followed by its {"type": <document_type>, ...} rows.
+    """
+    summary = await aging_summary(
+        collection, match if party_id is None else {**match, party_id_field: party_id},
+        as_of=as_of, amount=amount, due_field=due_field,
+        party_id_field=party_id_field, party_name_field=party_name_field,
+    )
+    parties = {p["party_id"]: p for p in summary.pop("parties")}
+    yield {"type": "summary", **summary, "party_count": len(parties)}
+
+    current = object()
+    async for doc in iter_aging_details(
+        collection, match, fields, as_of=as_of, amount=amount, due_field=due_field,
+        party_id_field=party_id_field, party_id=party_id,
+    ):
+        doc_party = doc.get(party_id_field)
+        if doc_party != current:
+            current = doc_party
+            if doc_party in parties:
+                yield {"type": "party", **parties[doc_party]}
+        yield {"type": document_type, **doc}
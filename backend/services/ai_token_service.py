@@ -16,6 +16,8 @@ from datetime import datetime, timezone, timedelta
 from typing import Optional
 import logging
 
+from core.subscriptions.plan_snapshot import get_org_plan_snapshot
+
 logger = logging.getLogger(__name__)
 
 _db = None
@@ -41,15 +43,12 @@ def get_plan_token_limit(plan_name: str) -> int:
 
 
 async def _get_org_plan(org_id: str) -> dict:
-    """Fetch org document and return plan + created_at."""
-    org = await _db.organizations.find_one(
-        {"organization_id": org_id},
-        {"_id": 0, "plan": 1, "plan_type": 1, "created_at": 1}
-    )
-    if not org:
+    """Return plan + created_at from the shared org plan snapshot."""
+    snapshot = await get_org_plan_snapshot(_db, org_id)
+    if not snapshot.exists:
         return {"plan": "free", "created_at": None}
-    plan = org.get("plan") or org.get("plan_type") or "free"
-    return {"plan": plan, "created_at": org.get("created_at")}
+    plan = snapshot.plan or snapshot.plan_type or "free"
+    return {"plan": plan, "created_at": snapshot.created_at}
 
 
 def _is_free_trial_expired(created_at) -> bool:
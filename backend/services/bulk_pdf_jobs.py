@@ -0,0 +1,341 @@
+"""
+Bulk PDF Jobs
+=============
+
+Background rendering of many documents of one type (a month of invoices for
+a fleet customer, a year of Form 16s) into one zip or one merged PDF.
+
+- Documents are built first (one query per collection, not per document),
+  then rendered in parallel through the PDF render pool
+  (services/pdf_renderer.py). Bulk renders use generate_pdf_shared_styles,
+  so each worker parses a template's CSS and loads its fonts once for the
+  whole run instead of once per document.
+- At most one bulk render per pool worker is in flight, so interactive
+  PDF downloads still find room in the pool's queue.
+- Jobs live in `pdf_jobs` (status, total / rendered / failed counts,
+  progress_percent) and the output file in BULK_PDF_DIR; files older than
+  BULK_PDF_RETENTION_HOURS are removed when a new job is created.
+
+Document types register a builder with @pdf_job_source("<type>"). A builder
+takes (db, organization_id, filters) and returns [(filename, html), ...].
+Invoices are registered here; Form 16 is registered by routes/hr.py, next
+to its data assembly. A type also names the route whose RBAC roles it
+inherits and, optionally, the plan feature it needs (PDF_JOB_ACCESS); the
+pdf-jobs routes enforce both per job, so a bulk job never reaches documents
+the type's own routes would refuse.
+
+Usage:
+    service = BulkPdfJobService(db)
+    job = await service.create_job(org_id, "invoice", {"customer_id": "c1"}, output="zip")
+    background_tasks.add_task(service.run_job, job["job_id"])
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import uuid
+import zipfile
+
+from services.pdf_renderer import get_pdf_renderer, _render_html_shared_styles
+
+logger = logging.getLogger(__name__)
+
+
+BULK_PDF_DIR = os.environ.get("BULK_PDF_DIR", os.path.join(tempfile.gettempdir(), "battwheels_pdf_jobs"))
+BULK_PDF_MAX_DOCUMENTS = int(os.environ.get("BULK_PDF_MAX_DOCUMENTS", "5000"))
+BULK_PDF_RETENTION_HOURS = float(os.environ.get("BULK_PDF_RETENTION_HOURS", "24"))
+OUTPUTS = ("zip", "merged")
+PROGRESS_INTERVAL_SECONDS = 1.0
+MAX_ERROR_DETAILS = 50
+
+# Render function used for bulk documents (runs in the pool workers)
+BULK_RENDER_FN = _render_html_shared_styles
+
+PdfDocument = Tuple[str, str]  # (filename, html)
+DocumentBuilder = Callable[[Any, str, Dict[str, Any]], Awaitable[List[PdfDocument]]]
+
+PDF_JOB_SOURCES: Dict[str, DocumentBuilder] = {}
+# document type → {"route": RBAC path whose roles apply, "feature": plan feature or None}
+PDF_JOB_ACCESS: Dict[str, Dict[str, Optional[str]]] = {}
+
+
+class BulkPdfError(ValueError):
+    """Invalid bulk PDF request (unknown type or output, bad filter, too many documents)"""
+
+
+def pdf_job_source(document_type: str, route: Optional[str] = None, feature: Optional[str] = None):
+    """
+    Register the document builder of a bulk PDF document type. Jobs of the
+    type require the roles ROUTE_PERMISSIONS grants on `route` and, when
+    given, the plan `feature`.
+    """
+    def decorator(fn: DocumentBuilder) -> DocumentBuilder:
+        PDF_JOB_SOURCES[document_type] = fn
+        PDF_JOB_ACCESS[document_type] = {"route": route, "feature": feature}
+        return fn
+    return decorator
+
+
+# ==================== RENDERING ====================
+
+async def render_documents(
+    documents: List[PdfDocument],
+    is_trial: bool = False,
+    on_result: Optional[Callable[[int, str, Optional[bytes], Optional[str]], None]] = None,
+    concurrency: Optional[int] = None,
+) -> List[Optional[bytes]]:
+    """
+    Render documents in parallel through the pool. Returns one PDF (or None
+    when that document failed) per document, in order; `on_result(index,
+    filename, pdf, error)` is called as each one finishes.
+    """
+    renderer = get_pdf_renderer()
+    semaphore = asyncio.Semaphore(concurrency or max(1, renderer.workers))
+    results: List[Optional[bytes]] = [None] * len(documents)
+
+    async def render_one(index: int, filename: str, html_content: str) -> None:
+        async with semaphore:
+            try:
+                pdf, error = await renderer.render(html_content, is_trial=is_trial, render_fn=BULK_RENDER_FN), None
+            except Exception as e:
+                logger.warning(f"Bulk PDF render failed for {filename}: {e}")
+                pdf, error = None, str(e) or type(e).__name__
+        results[index] = pdf
+        if on_result is not None:
+            on_result(index, filename, pdf, error)
+
+    await asyncio.gather(*[render_one(i, name, html) for i, (name, html) in enumerate(documents)])
+    return results
+
+
+def write_zip(target, files: List[Tuple[str, bytes]]) -> None:
+    """Zip (filename, pdf) pairs into a path or file object; repeated filenames get a numeric suffix"""
+    seen: Dict[str, int] = {}
+    with zipfile.ZipFile(target, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for filename, pdf in files:
+            count = seen.get(filename, 0)
+            seen[filename] = count + 1
+            if count:
+                stem, ext = os.path.splitext(filename)
+                filename = f"{stem}_{count + 1}{ext}"
+            zf.writestr(filename, pdf)
+
+
+def merge_pdfs(path: str, pdfs: List[bytes]) -> None:
+    """Concatenate PDFs into one file (PyMuPDF)"""
+    import fitz
+
+    merged = fitz.open()
+    try:
+        for pdf in pdfs:
+            with fitz.open(stream=pdf, filetype="pdf") as part:
+                merged.insert_pdf(part)
+        merged.save(path, garbage=1, deflate=True)
+    finally:
+        merged.close()
+
+
+# ==================== DOCUMENT SOURCES ====================
+
+@pdf_job_source("invoice", route="/api/invoices")
+async def invoice_documents(db, organization_id: str, filters: Dict[str, Any]) -> List[PdfDocument]:
+    """
+    GST invoices matching customer_id / status / date_from / date_to /
+    invoice_ids. B2B invoices still waiting for IRN registration under
+    e-invoicing are skipped, as on the single download.
+    """
+    from services.pdf_service import generate_gst_invoice_html
+
+    query: Dict[str, Any] = {"organization_id": organization_id}
+    if filters.get("invoice_ids"):
+        query["invoice_id"] = {"$in": list(filters["invoice_ids"])}
+    if filters.get("customer_id"):
+        query["customer_id"] = filters["customer_id"]
+    if filters.get("status"):
+        query["status"] = filters["status"]
+    if filters.get("date_from") or filters.get("date_to"):
+        query["invoice_date"] = {}
+        if filters.get("date_from"):
+            query["invoice_date"]["$gte"] = filters["date_from"]
+        if filters.get("date_to"):
+            query["invoice_date"]["$lte"] = filters["date_to"]
+
+    invoices = await db.invoices.find(query, {"_id": 0}).sort("invoice_date", 1).to_list(BULK_PDF_MAX_DOCUMENTS + 1)
+    if len(invoices) > BULK_PDF_MAX_DOCUMENTS:
+        raise BulkPdfError(f"More than {BULK_PDF_MAX_DOCUMENTS} invoices match; narrow the filter")
+    if not invoices:
+        return []
+
+    org_settings = await db.organizations.find_one({"organization_id": organization_id}, {"_id": 0}) or {}
+    einvoice_config = await db.einvoice_config.find_one({"organization_id": organization_id}, {"_id": 0})
+    einvoice_enabled = bool(einvoice_config and einvoice_config.get("enabled"))
+    bank_details = None
+    if org_settings.get("bank_account_number"):
+        bank_details = {
+            "bank_name": org_settings.get("bank_name", ""),
+            "account_number": org_settings.get("bank_account_number", ""),
+            "ifsc_code": org_settings.get("bank_ifsc", ""),
+            "account_type": org_settings.get("bank_account_type", "Current"),
+            "upi_id": org_settings.get("upi_id", ""),
+        }
+
+    line_items: Dict[str, List[Dict]] = {}
+    async for item in db.invoice_line_items.find(
+        {"invoice_id": {"$in": [inv["invoice_id"] for inv in invoices]}}, {"_id": 0}
+    ):
+        line_items.setdefault(item["invoice_id"], []).append(item)
+
+    documents = []
+    for invoice in invoices:
+        customer_gstin = invoice.get("customer_gstin", invoice.get("gst_no", ""))
+        has_irn = invoice.get("irn") and invoice.get("irn_status", "pending") == "registered"
+        if einvoice_enabled and customer_gstin not in ("", "URP", None) and not has_irn:
+            continue
+        irn_data = {
+            "irn": invoice.get("irn"),
+            "ack_no": invoice.get("irn_ack_no"),
+            "ack_date": invoice.get("irn_ack_date"),
+            "signed_qr_code": invoice.get("irn_signed_qr"),
+        } if has_irn else None
+        html_content = generate_gst_invoice_html(
+            invoice=invoice,
+            line_items=line_items.get(invoice["invoice_id"], []),
+            org_settings=org_settings,
+            irn_data=irn_data,
+            bank_details=bank_details,
+        )
+        customer_name_safe = (invoice.get("customer_name", "") or "Customer").replace(" ", "_")[:30]
+        documents.append((f"INV-{invoice.get('invoice_number', invoice['invoice_id'])}-{customer_name_safe}.pdf", html_content))
+    return documents
+
+
+# ==================== JOBS ====================
+
+class BulkPdfJobService:
+    """Creates, runs and reports bulk PDF jobs (collection: pdf_jobs)"""
+
+    def __init__(self, db):
+        self.db = db
+        self.jobs = db.pdf_jobs
+
+    @staticmethod
+    def output_path(job: Dict[str, Any]) -> str:
+        ext = "zip" if job["output"] == "zip" else "pdf"
+        return os.path.join(BULK_PDF_DIR, f"{job['job_id']}.{ext}")
+
+    @staticmethod
+    def _cleanup_expired() -> None:
+        cutoff = time.time() - BULK_PDF_RETENTION_HOURS * 3600
+        try:
+            for entry in os.scandir(BULK_PDF_DIR):
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+
+    async def create_job(self, organization_id: str, document_type: str, filters: Optional[Dict[str, Any]] = None,
+                         output: str = "zip", is_trial: bool = False,
+                         created_by: Optional[str] = None) -> Dict[str, Any]:
+        if document_type not in PDF_JOB_SOURCES:
+            raise BulkPdfError(f"Unknown document type '{document_type}'. Available: {sorted(PDF_JOB_SOURCES)}")
+        if output not in OUTPUTS:
+            raise BulkPdfError(f"Output must be one of {list(OUTPUTS)}")
+        await asyncio.to_thread(self._cleanup_expired)
+
+        job = {
+            "job_id": f"pdfjob_{uuid.uuid4().hex[:12]}",
+            "organization_id": organization_id,
+            "document_type": document_type,
+            "filters": filters or {},
+            "output": output,
+            "is_trial": is_trial,
+            "status": "pending",
+            "total": 0,
+            "rendered": 0,
+            "failed": 0,
+            "progress_percent": 0.0,
+            "error_details": [],
+            "filename": None,
+            "size_bytes": 0,
+            "created_by": created_by,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "started_at": None,
+            "completed_at": None,
+            "render_seconds": None,
+        }
+        await self.jobs.insert_one(dict(job))
+        return job
+
+    async def get_job(self, organization_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.jobs.find_one({"organization_id": organization_id, "job_id": job_id}, {"_id": 0})
+
+    async def list_jobs(self, organization_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        return await self.jobs.find(
+            {"organization_id": organization_id}, {"_id": 0}
+        ).sort("created_at", -1).to_list(limit)
+
+    async def _update(self, job_id: str, **fields) -> None:
+        await self.jobs.update_one({"job_id": job_id}, {"$set": fields})
+
+    async def run_job(self, job_id: str) -> None:
+        """Build, render and package a job's documents (run as a background task)"""
+        job = await self.jobs.find_one({"job_id": job_id}, {"_id": 0})
+        if not job or job["status"] != "pending":
+            return
+        started = time.perf_counter()
+        await self._update(job_id, status="running", started_at=datetime.now(timezone.utc).isoformat())
+        try:
+            builder = PDF_JOB_SOURCES[job["document_type"]]
+            documents = await builder(self.db, job["organization_id"], job.get("filters") or {})
+            if not documents:
+                await self._update(job_id, status="failed", completed_at=datetime.now(timezone.utc).isoformat(),
+                                   error_details=[{"error": "No documents match the filter"}])
+                return
+            await self._update(job_id, total=len(documents))
+
+            progress = {"rendered": 0, "failed": 0, "errors": [], "last_flush": time.monotonic()}
+            pending_flush: List[asyncio.Task] = []
+
+            def on_result(index, filename, pdf, error):
+                progress["rendered" if pdf is not None else "failed"] += 1
+                if error and len(progress["errors"]) < MAX_ERROR_DETAILS:
+                    progress["errors"].append({"document": filename, "error": error})
+                now = time.monotonic()
+                if now - progress["last_flush"] >= PROGRESS_INTERVAL_SECONDS:
+                    progress["last_flush"] = now
+                    done = progress["rendered"] + progress["failed"]
+                    pending_flush.append(asyncio.ensure_future(self._update(
+                        job_id, rendered=progress["rendered"], failed=progress["failed"],
+                        progress_percent=round(done / len(documents) * 100, 1))))
+
+            pdfs = await render_documents(documents, is_trial=job.get("is_trial", False), on_result=on_result)
+            await asyncio.gather(*pending_flush, return_exceptions=True)
+
+            files = [(name, pdf) for (name, _), pdf in zip(documents, pdfs) if pdf is not None]
+            if not files:
+                raise RuntimeError("Every document failed to render")
+            os.makedirs(BULK_PDF_DIR, exist_ok=True)
+            path = self.output_path(job)
+            if job["output"] == "zip":
+                await asyncio.to_thread(write_zip, path, files)
+            else:
+                await asyncio.to_thread(merge_pdfs, path, [pdf for _, pdf in files])
+
+            await self._update(
+                job_id, status="completed", rendered=progress["rendered"], failed=progress["failed"],
+                progress_percent=100.0, error_details=progress["errors"],
+                filename=f"{job['document_type']}_{job_id}.{'zip' if job['output'] == 'zip' else 'pdf'}",
+                size_bytes=os.path.getsize(path),
+                render_seconds=round(time.perf_counter() - started, 2),
+                completed_at=datetime.now(timezone.utc).isoformat(),
+            )
+            logger.info(f"Bulk PDF job {job_id}: {len(files)}/{len(documents)} rendered "
+                        f"in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            logger.error(f"Bulk PDF job {job_id} failed: {e}")
+            await self._update(job_id, status="failed", completed_at=datetime.now(timezone.utc).isoformat(),
+                               error_details=[{"error": str(e)}])
@@ -0,0 +1,182 @@
+"""
+Chart of Accounts Cache
+=======================
+
+Per-org, in-process cache of active chart_of_accounts documents used by the
+double-entry posting path (services/double_entry_service.py).
+
+- Accounts are indexed by account_id and account_code, so every line of a
+  journal entry resolves from memory. A single `$in` query fetches only the
+  misses.
+- The org's "system accounts ensured" state is remembered, so
+  ensure_system_accounts costs one query per org per TTL instead of one
+  query per SYSTEM_ACCOUNT on every posting.
+
+Only active accounts are cached. A new account is a miss and is fetched on
+first use. Deactivations or renames become visible within
+COA_CACHE_TTL_SECONDS (default 300s), or immediately after
+invalidate_chart_of_accounts(org_id), which every chart_of_accounts writer
+outside the posting path calls.
+
+Running balances change on every posting, so they are not cached at all
+(VOLATILE_FIELDS). Lookups hand out copies: a caller mutating a resolved
+account never changes what the next caller sees.
+
+DoubleEntryService is created both as a singleton and ad hoc
+(DoubleEntryService(db)), so the cache is module-level and shared by every
+instance in the process.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_TTL_SECONDS = float(os.environ.get("COA_CACHE_TTL_SECONDS", "300"))
+DEFAULT_MAX_ORGS = int(os.environ.get("COA_CACHE_MAX_ORGS", "2000"))
+
+# Kept current by posting ($inc), so never served from the cache
+VOLATILE_FIELDS = ("_id", "balance", "current_balance", "last_balance_update")
+
+
+class _OrgAccounts:
+    """Cached accounts of one organization"""
+    __slots__ = ("by_id", "by_code", "system_ensured", "expires_at")
+
+    def __init__(self, expires_at: float):
+        self.by_id: Dict[str, Dict] = {}
+        self.by_code: Dict[str, Dict] = {}
+        self.system_ensured = False
+        self.expires_at = expires_at
+
+
+class ChartOfAccountsCache:
+    """LRU (by org) + TTL cache of active chart_of_accounts documents"""
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_orgs: int = DEFAULT_MAX_ORGS):
+        self.ttl_seconds = ttl_seconds
+        self.max_orgs = max_orgs
+        self._orgs: "OrderedDict[str, _OrgAccounts]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_orgs > 0
+
+    def _org(self, organization_id: str, create: bool = False) -> Optional[_OrgAccounts]:
+        """Live entry for an org (caller holds the lock)"""
+        entry = self._orgs.get(organization_id)
+        now = time.monotonic()
+        if entry is not None and entry.expires_at <= now:
+            del self._orgs[organization_id]
+            entry = None
+        if entry is None and create:
+            entry = _OrgAccounts(now + self.ttl_seconds)
+            self._orgs[organization_id] = entry
+            while len(self._orgs) > self.max_orgs:
+                self._orgs.popitem(last=False)
+                self._evictions += 1
+        if entry is not None:
+            self._orgs.move_to_end(organization_id)
+        return entry
+
+    def lookup(self, organization_id: str, account_ids: Iterable[str] = (), codes: Iterable[str] = ()):
+        """
+        Split requested ids/codes into cached accounts and misses.
+        Returns (by_id, by_code, missing_ids, missing_codes).
+        """
+        by_id, by_code, missing_ids, missing_codes = {}, {}, [], []
+        with self._lock:
+            entry = self._org(organization_id) if self.enabled else None
+            for account_id in account_ids:
+                account = entry.by_id.get(account_id) if entry else None
+                if account is None:
+                    missing_ids.append(account_id)
+                else:
+                    by_id[account_id] = dict(account)
+            for code in codes:
+                account = entry.by_code.get(code) if entry else None
+                if account is None:
+                    missing_codes.append(code)
+                else:
+                    by_code[code] = dict(account)
+            self._hits += len(by_id) + len(by_code)
+            self._misses += len(missing_ids) + len(missing_codes)
+        return by_id, by_code, missing_ids, missing_codes
+
+    def store(self, organization_id: str, accounts: Iterable[Dict]) -> None:
+        """Cache active account documents (copies, without VOLATILE_FIELDS)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self._org(organization_id, create=True)
+            for account in accounts:
+                if not account.get("is_active", True):
+                    continue
+                account = {k: v for k, v in account.items() if k not in VOLATILE_FIELDS}
+                if account.get("account_id"):
+                    entry.by_id[account["account_id"]] = account
+                if account.get("account_code"):
+                    entry.by_code.setdefault(account["account_code"], account)
+
+    def system_accounts_ensured(self, organization_id: str) -> bool:
+        with self._lock:
+            entry = self._org(organization_id) if self.enabled else None
+            return bool(entry and entry.system_ensured)
+
+    def mark_system_accounts_ensured(self, organization_id: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._org(organization_id, create=True).system_ensured = True
+
+    def invalidate(self, organization_id: str) -> bool:
+        with self._lock:
+            removed = self._orgs.pop(organization_id, None) is not None
+            if removed:
+                self._invalidations += 1
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidations += len(self._orgs)
+            self._orgs.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "orgs": len(self._orgs),
+                "accounts": sum(len(e.by_id) for e in self._orgs.values()),
+                "max_orgs": self.max_orgs,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+# Process-wide singleton
+_coa_cache = ChartOfAccountsCache()
+
+
+def get_chart_of_accounts_cache() -> ChartOfAccountsCache:
+    """Get the process-wide chart of accounts cache"""
+    return _coa_cache
+
+
+def invalidate_chart_of_accounts(organization_id: str) -> bool:
+    """Drop cached accounts for an org after chart_of_accounts edits"""
+    return _coa_cache.invalidate(organization_id)
@@ -15,12 +15,21 @@ This is the CORE accounting engine for Battwheels OS.
 
 from decimal import Decimal, ROUND_HALF_UP
 from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 from dataclasses import dataclass, field, asdict
 from enum import Enum
+import asyncio
+import base64
+import json
+import os
+import re
 import uuid
 import logging
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
 from utils.audit_log import log_financial_action
+from services.chart_of_accounts_cache import get_chart_of_accounts_cache
+from services import account_period_balances
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +37,24 @@ logger = logging.getLogger(__name__)
 
 CURRENCY_PRECISION = Decimal('0.01')
 
+# Wrap the journal insert, audit trail and balance updates in a MongoDB
+# transaction (requires a replica set; off by default for standalone dev DBs)
+USE_POSTING_TRANSACTIONS = os.environ.get("JOURNAL_POSTING_TRANSACTIONS", "0") == "1"
+
+# Journal reference numbers reserved per `sequences` round trip. Above 1, each
+# worker hands out numbers from an in-memory block; numbers left in a block
+# when the process exits are never used (gaps, but never duplicates).
+REFERENCE_BLOCK_SIZE = max(1, int(os.environ.get("JOURNAL_REFERENCE_BLOCK_SIZE", "1")))
+
+# Process-wide pool of pre-allocated reference numbers: sequence_id -> [next, last]
+_reference_blocks: Dict[str, List[int]] = {}
+
+# Journal entries fetched per keyset batch when walking an account ledger
+LEDGER_BATCH_SIZE = 500
+
+# Overlap re-scanned before the high-water mark by incremental balance sync
+BALANCE_SYNC_LOOKBACK = timedelta(minutes=5)
+
 
 # ==================== INDIAN FISCAL YEAR HELPERS (P1-11) ====================
 
@@ -244,9 +271,25 @@ def round_currency(amount: float | Decimal | int) -> Decimal:
     return amount.quantize(CURRENCY_PRECISION, rounding=ROUND_HALF_UP)
 
 
-def generate_reference_number(prefix: str, sequence: int) -> str:
-    """Generate sequential reference number"""
-    return f"{prefix}-{datetime.now().strftime('%Y%m')}-{str(sequence).zfill(5)}"
+def generate_reference_number(prefix: str, sequence: int, period: str = None) -> str:
+    """Generate sequential reference number (period = YYYYMM, default current month)"""
+    period = period or datetime.now().strftime('%Y%m')
+    return f"{prefix}-{period}-{str(sequence).zfill(5)}"
+
+
+def encode_ledger_cursor(entry_date: str, entry_id: str, running_balance: Decimal) -> str:
+    """Opaque keyset cursor for ledger pages (position + running balance)"""
+    raw = json.dumps({"d": entry_date, "id": entry_id, "b": str(running_balance)})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_ledger_cursor(cursor: str) -> Tuple[Tuple[str, str], Decimal]:
+    """Inverse of encode_ledger_cursor; raises ValueError on a malformed cursor"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (data["d"], data["id"]), Decimal(data["b"])
+    except Exception as e:
+        raise ValueError("Invalid ledger cursor") from e
 
 
 # ========================= DOUBLE ENTRY SERVICE =========================
@@ -266,60 +309,109 @@ class DoubleEntryService:
         self.db = db
         self.journal_entries = db.journal_entries
         self.chart_of_accounts = db.chart_of_accounts
-        self._account_cache: Dict[str, Dict] = {}
+        # Shared across instances (see services/chart_of_accounts_cache.py)
+        self._coa_cache = get_chart_of_accounts_cache()
     
     # ==================== ACCOUNT MANAGEMENT ====================
     
     async def ensure_system_accounts(self, organization_id: str) -> None:
-        """Ensure all system accounts exist for an organization"""
+        """
+        Ensure all system accounts exist for an organization.
+        
+        One `$in` query for all SYSTEM_ACCOUNTS codes plus one insert_many for
+        any missing ones; the result is remembered per org so later postings
+        skip the check entirely.
+        """
         if not organization_id:
             raise ValueError("organization_id is required for tenant-scoped operations")
+        if self._coa_cache.system_accounts_ensured(organization_id):
+            return
+        
+        codes = [account_def["code"] for account_def in SYSTEM_ACCOUNTS.values()]
+        existing = await self.chart_of_accounts.find({
+            "organization_id": organization_id,
+            "account_code": {"$in": codes}
+        }, {"_id": 0}).to_list(None)
+        existing_codes = {a.get("account_code") for a in existing}
+        
+        new_accounts = []
         for key, account_def in SYSTEM_ACCOUNTS.items():
-            existing = await self.chart_of_accounts.find_one({
+            if account_def["code"] in existing_codes:
+                continue
+            new_accounts.append({
+                "account_id": f"acc_{uuid.uuid4().hex[:12]}",
+                "account_name": account_def["name"],
+                "account_code": account_def["code"],
+                "account_type": account_def["type"].value,
+                "description": f"System account: {account_def['name']}",
+                "is_system": True,
+                "is_active": True,
+                "parent_account_id": None,
                 "organization_id": organization_id,
-                "account_code": account_def["code"]
+                "created_at": datetime.now(timezone.utc).isoformat()
             })
-            
-            if not existing:
-                account = {
-                    "account_id": f"acc_{uuid.uuid4().hex[:12]}",
-                    "account_name": account_def["name"],
-                    "account_code": account_def["code"],
-                    "account_type": account_def["type"].value,
-                    "description": f"System account: {account_def['name']}",
-                    "is_system": True,
-                    "is_active": True,
-                    "parent_account_id": None,
-                    "organization_id": organization_id,
-                    "created_at": datetime.now(timezone.utc).isoformat()
-                }
-                await self.chart_of_accounts.insert_one(account)
-                logger.info(f"Created system account: {account_def['name']} for org {organization_id}")
+        
+        if new_accounts:
+            await self.chart_of_accounts.insert_many(new_accounts)
+            for account in new_accounts:
+                account.pop("_id", None)
+                logger.info(f"Created system account: {account['account_name']} for org {organization_id}")
+        
+        self._coa_cache.store(organization_id, existing + new_accounts)
+        self._coa_cache.mark_system_accounts_ensured(organization_id)
     
-    async def get_account_by_code(self, organization_id: str, code: str) -> Optional[Dict]:
-        """Get account by code with caching"""
-        cache_key = f"{organization_id}:{code}"
-        if cache_key in self._account_cache:
-            return self._account_cache[cache_key]
+    async def resolve_accounts(
+        self,
+        organization_id: str,
+        account_ids: List[str] = (),
+        codes: List[str] = ()
+    ) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+        """
+        Resolve active accounts by id and by code in one round trip.
         
-        account = await self.chart_of_accounts.find_one({
-            "organization_id": organization_id,
-            "account_code": code,
-            "is_active": True
-        }, {"_id": 0})
+        Cached accounts are served from the per-org chart-of-accounts cache;
+        all misses are fetched with a single `$in` query.
+        Returns (accounts_by_id, accounts_by_code).
+        """
+        account_ids = list(dict.fromkeys(a for a in account_ids if a))
+        codes = list(dict.fromkeys(c for c in codes if c))
+        by_id, by_code, missing_ids, missing_codes = self._coa_cache.lookup(
+            organization_id, account_ids, codes
+        )
+        if not missing_ids and not missing_codes:
+            return by_id, by_code
+        
+        clauses = []
+        if missing_ids:
+            clauses.append({"account_id": {"$in": missing_ids}})
+        if missing_codes:
+            clauses.append({"account_code": {"$in": missing_codes}})
+        query = {"organization_id": organization_id, "is_active": True}
+        if len(clauses) == 1:
+            query.update(clauses[0])
+        else:
+            query["$or"] = clauses
         
-        if account:
-            self._account_cache[cache_key] = account
+        accounts = await self.chart_of_accounts.find(query, {"_id": 0}).to_list(None)
+        self._coa_cache.store(organization_id, accounts)
         
-        return account
+        wanted_ids, wanted_codes = set(missing_ids), set(missing_codes)
+        for account in accounts:
+            if account.get("account_id") in wanted_ids:
+                by_id[account["account_id"]] = account
+            if account.get("account_code") in wanted_codes:
+                by_code.setdefault(account["account_code"], account)
+        return by_id, by_code
+    
+    async def get_account_by_code(self, organization_id: str, code: str) -> Optional[Dict]:
+        """Get account by code with caching"""
+        _, by_code = await self.resolve_accounts(organization_id, codes=[code])
+        return by_code.get(code)
     
     async def get_account_by_id(self, organization_id: str, account_id: str) -> Optional[Dict]:
         """Get account by ID"""
-        return await self.chart_of_accounts.find_one({
-            "organization_id": organization_id,
-            "account_id": account_id,
-            "is_active": True
-        }, {"_id": 0})
+        by_id, _ = await self.resolve_accounts(organization_id, account_ids=[account_id])
+        return by_id.get(account_id)
     
     async def get_account_by_name(self, organization_id: str, name: str) -> Optional[Dict]:
         """Get account by name (case-insensitive)"""
@@ -372,12 +464,14 @@ class DoubleEntryService:
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         await self.chart_of_accounts.insert_one(account)
+        account.pop("_id", None)
+        self._coa_cache.store(organization_id, [account])
         return account
     
     # ==================== JOURNAL ENTRY CREATION ====================
     
-    async def get_next_reference_number(self, organization_id: str, entry_type: EntryType) -> str:
-        """Generate next sequential reference number"""
+    @staticmethod
+    def _reference_prefix(entry_type: EntryType) -> str:
         prefix_map = {
             EntryType.SALES: "JE-SLS",
             EntryType.PURCHASE: "JE-PUR",
@@ -391,16 +485,104 @@ class DoubleEntryService:
             EntryType.ADJUSTMENT: "JE-ADJ",
             EntryType.CREDIT_NOTE: "JE-CN"
         }
-        prefix = prefix_map.get(entry_type, "JE")
+        return prefix_map.get(entry_type, "JE")
+    
+    async def _seed_reference_sequence(
+        self, organization_id: str, sequence_id: str, prefix: str, period: str
+    ) -> None:
+        """
+        Create the sequence for a prefix/month, starting after the highest
+        reference number already issued for it (entries numbered before
+        sequences existed keep their numbers).
+        
+        The highest is taken over the numeric suffix: as strings,
+        JE-GEN-202610-100000 sorts below JE-GEN-202610-99999. This runs once
+        per prefix/month and reads only the (organization_id,
+        reference_number) index.
+        """
+        issued = await self.journal_entries.find(
+            {
+                "organization_id": organization_id,
+                "reference_number": {"$regex": f"^{re.escape(prefix)}-{period}-\\d+$"}
+            },
+            {"_id": 0, "reference_number": 1}
+        ).to_list(None)
+        start = max((int(d["reference_number"].rsplit("-", 1)[1]) for d in issued), default=0)
+        try:
+            await self.db.sequences.update_one(
+                {"sequence_id": sequence_id},
+                {"$setOnInsert": {
+                    "sequence_id": sequence_id,
+                    "organization_id": organization_id,
+                    "sequence_type": "JOURNAL_ENTRY",
+                    "prefix": prefix,
+                    "period": period,
+                    "current_value": start,
+                    "created_at": datetime.now(timezone.utc).isoformat()
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            pass  # Seeded concurrently by another poster
+    
+    async def _advance_reference_sequence(
+        self, organization_id: str, prefix: str, period: str, count: int
+    ) -> int:
+        """Atomically reserve `count` numbers; returns the last number reserved"""
+        sequence_id = f"journal_{organization_id}_{prefix}_{period}"
+        for _ in range(2):
+            result = await self.db.sequences.find_one_and_update(
+                {"sequence_id": sequence_id},
+                {"$inc": {"current_value": count}},
+                return_document=True
+            )
+            if result:
+                return result["current_value"]
+            await self._seed_reference_sequence(organization_id, sequence_id, prefix, period)
+        raise RuntimeError(f"Could not allocate journal reference sequence {sequence_id}")
+    
+    async def reserve_reference_numbers(
+        self, organization_id: str, entry_type: EntryType, count: int
+    ) -> List[str]:
+        """
+        Reserve `count` consecutive reference numbers in one round trip.
         
-        # Count existing entries for this month
-        month_start = datetime.now().strftime("%Y-%m-01")
-        count = await self.journal_entries.count_documents({
-            "organization_id": organization_id,
-            "entry_date": {"$gte": month_start}
-        })
+        For bulk posters (payroll runs, imports): pass each number to
+        create_journal_entry(reference_number=...).
+        """
+        if count < 1:
+            return []
+        prefix = self._reference_prefix(entry_type)
+        period = datetime.now().strftime("%Y%m")
+        last = await self._advance_reference_sequence(organization_id, prefix, period, count)
+        return [generate_reference_number(prefix, seq, period) for seq in range(last - count + 1, last + 1)]
+    
+    async def get_next_reference_number(self, organization_id: str, entry_type: EntryType) -> str:
+        """
+        Generate next sequential reference number.
         
-        return generate_reference_number(prefix, count + 1)
+        Numbers come from an atomic per-org, per-prefix, per-month counter in
+        `sequences` (same pattern as utils/helpers.generate_invoice_number).
+        Entry types sharing a prefix (PAYMENT / PAYROLL) share a sequence so
+        references stay unique.
+        """
+        prefix = self._reference_prefix(entry_type)
+        period = datetime.now().strftime("%Y%m")
+        if REFERENCE_BLOCK_SIZE == 1:
+            seq = await self._advance_reference_sequence(organization_id, prefix, period, 1)
+            return generate_reference_number(prefix, seq, period)
+        
+        key = f"{organization_id}:{prefix}:{period}"
+        block = _reference_blocks.get(key)
+        if not block or block[0] > block[1]:
+            last = await self._advance_reference_sequence(
+                organization_id, prefix, period, REFERENCE_BLOCK_SIZE
+            )
+            block = [last - REFERENCE_BLOCK_SIZE + 1, last]
+            _reference_blocks[key] = block
+        seq = block[0]
+        block[0] += 1
+        return generate_reference_number(prefix, seq, period)
     
     async def create_journal_entry(
         self,
@@ -412,7 +594,9 @@ class DoubleEntryService:
         source_document_id: str = None,
         source_document_type: str = None,
         created_by: str = "",
-        is_posted: bool = True
+        is_posted: bool = True,
+        use_transaction: bool = None,
+        reference_number: str = None
     ) -> Tuple[bool, str, Optional[Dict]]:
         """
         Create a new journal entry.
@@ -427,6 +611,9 @@ class DoubleEntryService:
             source_document_type: Type of source document (invoice, bill, etc.)
             created_by: User ID who created this
             is_posted: Whether to post immediately
+            use_transaction: Write entry, audit trail and balances in one MongoDB
+                transaction (defaults to JOURNAL_POSTING_TRANSACTIONS)
+            reference_number: Pre-reserved number from reserve_reference_numbers
         
         Returns:
             Tuple of (success, message, entry_dict)
@@ -460,13 +647,18 @@ class DoubleEntryService:
                 )
                 return True, "Journal entry already exists (idempotent)", existing
         
-        # Build entry lines with account details
+        # Build entry lines with account details (all accounts resolved in one query)
+        accounts_by_id, accounts_by_code = await self.resolve_accounts(
+            organization_id,
+            account_ids=[l.get("account_id", "") for l in lines],
+            codes=[l.get("account_code", "") for l in lines],
+        )
         entry_lines = []
         for line_data in lines:
-            account = await self.get_account_by_id(organization_id, line_data.get("account_id", ""))
+            account = accounts_by_id.get(line_data.get("account_id", ""))
             if not account:
                 # Try by code
-                account = await self.get_account_by_code(organization_id, line_data.get("account_code", ""))
+                account = accounts_by_code.get(line_data.get("account_code", ""))
             if not account:
                 return False, f"Account not found: {line_data.get('account_id', line_data.get('account_code', ''))}", None
             
@@ -482,7 +674,8 @@ class DoubleEntryService:
             entry_lines.append(line)
         
         # Create entry
-        reference_number = await self.get_next_reference_number(organization_id, entry_type)
+        if not reference_number:
+            reference_number = await self.get_next_reference_number(organization_id, entry_type)
         
         entry = JournalEntry(
             entry_date=entry_date,
@@ -502,22 +695,7 @@ class DoubleEntryService:
         if not is_valid:
             return False, validation_msg, None
         
-        # Save to database
         entry_dict = entry.to_dict()
-        await self.journal_entries.insert_one(entry_dict)
-        
-        # Remove MongoDB _id from response
-        entry_dict.pop("_id", None)
-        
-        logger.info(f"Created journal entry {reference_number} for org {organization_id}")
-        
-        # Audit log: journal_entry CREATE
-        await log_financial_action(
-            org_id=organization_id, action="CREATE", entity_type="journal_entry",
-            entity_id=entry_dict.get("entry_id", reference_number),
-            before_snapshot=None, after_snapshot=entry_dict,
-            user_id=created_by,
-        )
         
         # Tamper-evident journal audit trail — APPEND-ONLY (P1-21)
         # No DELETE or UPDATE operations should ever exist for journal_audit_log
@@ -535,10 +713,54 @@ class DoubleEntryService:
                 "line_count": len(entry.lines)
             }
         }
-        await self.db.journal_audit_log.insert_one(journal_audit_entry)
         
-        # Update account balances in chart_of_accounts (Phase C-2b)
-        await self._sync_account_balances_from_entry(organization_id, entry_lines)
+        if use_transaction is None:
+            use_transaction = USE_POSTING_TRANSACTIONS
+        
+        if use_transaction:
+            async with await self.db.client.start_session() as session:
+                async with session.start_transaction():
+                    await self.journal_entries.insert_one(entry_dict, session=session)
+                    await self.db.journal_audit_log.insert_one(journal_audit_entry, session=session)
+                    # Update account balances in chart_of_accounts (Phase C-2b)
+                    await self._sync_account_balances_from_entry(
+                        organization_id, entry_lines, session=session
+                    )
+                    await account_period_balances.apply_journal_entry(
+                        self.db, entry_dict, session=session
+                    )
+            entry_dict.pop("_id", None)
+            await log_financial_action(
+                org_id=organization_id, action="CREATE", entity_type="journal_entry",
+                entity_id=entry_dict.get("entry_id", reference_number),
+                before_snapshot=None, after_snapshot=entry_dict,
+                user_id=created_by,
+            )
+        else:
+            # Save to database (the unique source-document index may reject it,
+            # so nothing else is written until the insert succeeds)
+            await self.journal_entries.insert_one(entry_dict)
+            
+            # Remove MongoDB _id from response
+            entry_dict.pop("_id", None)
+            
+            # Independent writes — issued concurrently
+            await asyncio.gather(
+                # Audit log: journal_entry CREATE
+                log_financial_action(
+                    org_id=organization_id, action="CREATE", entity_type="journal_entry",
+                    entity_id=entry_dict.get("entry_id", reference_number),
+                    before_snapshot=None, after_snapshot=entry_dict,
+                    user_id=created_by,
+                ),
+                self.db.journal_audit_log.insert_one(journal_audit_entry),
+                # Update account balances in chart_of_accounts (Phase C-2b)
+                self._sync_account_balances_from_entry(organization_id, entry_lines),
+                # Monthly rollups read by trial balance / P&L / balance sheet
+                account_period_balances.apply_journal_entry(self.db, entry_dict),
+            )
+        
+        logger.info(f"Created journal entry {reference_number} for org {organization_id}")
         
         return True, "Journal entry created successfully", entry_dict
     
@@ -1331,32 +1553,11 @@ class DoubleEntryService:
         if not as_of_date:
             as_of_date = datetime.now().strftime("%Y-%m-%d")
         
-        # Aggregate all journal entry lines up to as_of_date
-        pipeline = [
-            {
-                "$match": {
-                    "organization_id": organization_id,
-                    "is_posted": True,
-                    "entry_date": {"$lte": as_of_date}
-                }
-            },
-            {"$unwind": "$lines"},
-            {
-                "$group": {
-                    "_id": {
-                        "account_id": "$lines.account_id",
-                        "account_name": "$lines.account_name",
-                        "account_code": "$lines.account_code",
-                        "account_type": "$lines.account_type"
-                    },
-                    "total_debit": {"$sum": "$lines.debit_amount"},
-                    "total_credit": {"$sum": "$lines.credit_amount"}
-                }
-            },
-            {"$sort": {"_id.account_code": 1}}
-        ]
-        
-        results = await self.journal_entries.aggregate(pipeline).to_list(1000)
+        # Account totals of all posted lines up to as_of_date (monthly rollups
+        # plus raw lines of the partial month)
+        results = await account_period_balances.get_account_totals(
+            self.db, organization_id, end_date=as_of_date
+        )
         
         accounts = []
         grand_total_debit = Decimal("0")
@@ -1461,7 +1662,8 @@ class DoubleEntryService:
     async def _sync_account_balances_from_entry(
         self,
         organization_id: str,
-        entry_lines: list
+        entry_lines: list,
+        session=None
     ) -> None:
         """
         Update current_balance in chart_of_accounts for each account affected by a journal entry.
@@ -1470,7 +1672,9 @@ class DoubleEntryService:
         For Liability/Equity/Income accounts: balance = credit - debit (increases with credits)
         
         This is called after every journal entry creation to keep balances current.
+        Deltas are summed per account and applied with a single bulk_write.
         """
+        balance_changes: Dict[str, float] = {}
         for line in entry_lines:
             account_id = line.account_id
             account_type = line.account_type.lower() if hasattr(line, 'account_type') else ""
@@ -1485,40 +1689,164 @@ class DoubleEntryService:
             else:  # liability, equity, income, revenue
                 balance_change = credit - debit
             
-            # Update the account balance
-            await self.chart_of_accounts.update_one(
+            balance_changes[account_id] = balance_changes.get(account_id, 0) + balance_change
+            logger.debug(f"[BALANCE SYNC] Account {account_id}: {'+' if balance_change >= 0 else ''}{balance_change}")
+        
+        if not balance_changes:
+            return
+        
+        now = datetime.now(timezone.utc).isoformat()
+        await self.chart_of_accounts.bulk_write([
+            UpdateOne(
                 {"account_id": account_id, "organization_id": organization_id},
                 {
-                    "$inc": {"current_balance": balance_change, "balance": balance_change},
-                    "$set": {"last_balance_update": datetime.now(timezone.utc).isoformat()}
+                    "$inc": {"current_balance": change, "balance": change},
+                    "$set": {"last_balance_update": now}
                 }
             )
-            
-            logger.debug(f"[BALANCE SYNC] Account {account_id}: {'+' if balance_change >= 0 else ''}{balance_change}")
+            for account_id, change in balance_changes.items()
+        ], ordered=False, session=session)
     
-    async def sync_all_account_balances(self, organization_id: str) -> Dict:
+    async def _account_totals_by_id(
+        self,
+        organization_id: str,
+        as_of_date: str,
+        account_ids: List[str] = None
+    ) -> Dict[str, Tuple[float, float]]:
+        """account_id -> (total_debit, total_credit) of posted lines up to as_of_date, in one aggregation"""
+        match = {
+            "organization_id": organization_id,
+            "is_posted": True,
+            "entry_date": {"$lte": as_of_date}
+        }
+        pipeline = [{"$match": match}, {"$unwind": "$lines"}]
+        if account_ids is not None:
+            match["lines.account_id"] = {"$in": account_ids}
+            pipeline.append({"$match": {"lines.account_id": {"$in": account_ids}}})
+        pipeline.append({
+            "$group": {
+                "_id": "$lines.account_id",
+                "total_debit": {"$sum": "$lines.debit_amount"},
+                "total_credit": {"$sum": "$lines.credit_amount"}
+            }
+        })
+        rows = await self.journal_entries.aggregate(pipeline, allowDiskUse=True).to_list(None)
+        return {row["_id"]: (row["total_debit"], row["total_credit"]) for row in rows}
+    
+    @staticmethod
+    def _created_at_mark(*values) -> str:
+        """
+        Latest of created_at values as a UTC ISO string. Journal entries mix
+        ISO-string and BSON-date created_at (TDS / e-invoice postings), which
+        Mongo never compares with each other, so the mark is kept as one
+        normalized string and matched against both types.
+        """
+        latest = None
+        for value in values:
+            if isinstance(value, str):
+                try:
+                    value = datetime.fromisoformat(value)
+                except ValueError:
+                    continue
+            if not isinstance(value, datetime):
+                continue
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            if latest is None or value > latest:
+                latest = value
+        return latest.astimezone(timezone.utc).isoformat() if latest else ""
+    
+    async def _accounts_touched_since(self, organization_id: str, state: Dict, as_of_date: str):
+        """
+        Accounts with lines in journal entries created after the stored
+        high-water mark, or whose entry_date has come due since the last run.
+        Returns (account_ids, new_high_water_mark).
+        """
+        # Re-scan a short window before the mark: created_at is stamped before
+        # insert, so concurrent posters can land slightly out of order
+        mark = self._created_at_mark(state.get("high_water_mark"))
+        if mark:
+            since = datetime.fromisoformat(mark) - BALANCE_SYNC_LOOKBACK
+            created_after = [{"created_at": {"$gt": since.isoformat()}}, {"created_at": {"$gt": since}}]
+        else:
+            created_after = [{"created_at": {"$exists": True}}]
+        rows = await self.journal_entries.aggregate([
+            {"$match": {
+                "organization_id": organization_id,
+                "$or": created_after + [
+                    {"entry_date": {"$gt": state["as_of_date"], "$lte": as_of_date}}
+                ]
+            }},
+            {"$unwind": "$lines"},
+            {"$group": {
+                "_id": None,
+                "account_ids": {"$addToSet": "$lines.account_id"},
+                # $max over mixed types would rank any date above every string
+                "string_mark": {"$max": {"$cond": [
+                    {"$eq": [{"$type": "$created_at"}, "string"]}, "$created_at", None]}},
+                "date_mark": {"$max": {"$cond": [
+                    {"$eq": [{"$type": "$created_at"}, "date"]}, "$created_at", None]}},
+            }}
+        ]).to_list(1)
+        if not rows:
+            return [], mark
+        return (
+            [a for a in rows[0]["account_ids"] if a],
+            self._created_at_mark(mark, rows[0].get("string_mark"), rows[0].get("date_mark"))
+        )
+    
+    async def sync_all_account_balances(self, organization_id: str, incremental: bool = False) -> Dict:
         """
         Recalculate all account balances from journal entries.
         Use this for initial sync or to fix any discrepancies.
+        
+        Totals for every account come from one grouped aggregation and are
+        written with one bulk_write. incremental=True only recomputes accounts
+        touched since the high-water mark stored by the previous run
+        (account_balance_sync_state) — cheap enough for nightly drift repair.
+        Falls back to a full sync when no previous run is recorded.
         """
         if not organization_id:
             raise ValueError("organization_id is required")
         
-        # Get all accounts
-        accounts = await self.chart_of_accounts.find(
-            {"organization_id": organization_id},
-            {"_id": 0, "account_id": 1, "account_type": 1}
-        ).to_list(1000)
-        
-        updated_count = 0
+        as_of_date = datetime.now().strftime("%Y-%m-%d")
+        state = await self.db.account_balance_sync_state.find_one(
+            {"organization_id": organization_id}, {"_id": 0}
+        ) if incremental else None
+        
+        if state:
+            account_ids, high_water_mark = await self._accounts_touched_since(organization_id, state, as_of_date)
+            accounts = await self.chart_of_accounts.find(
+                {"organization_id": organization_id, "account_id": {"$in": account_ids}},
+                {"_id": 0, "account_id": 1, "account_type": 1}
+            ).to_list(None) if account_ids else []
+            totals = await self._account_totals_by_id(
+                organization_id, as_of_date, [a["account_id"] for a in accounts]
+            ) if accounts else {}
+        else:
+            # Mark taken before the scan so entries created meanwhile are picked up next run;
+            # latest string and latest date created_at are looked up separately (see _created_at_mark)
+            latest = [
+                await self.journal_entries.find_one(
+                    {"organization_id": organization_id, "created_at": {"$type": bson_type}},
+                    {"_id": 0, "created_at": 1},
+                    sort=[("created_at", -1)]
+                )
+                for bson_type in ("string", "date")
+            ]
+            high_water_mark = self._created_at_mark(*((doc or {}).get("created_at") for doc in latest))
+            accounts = await self.chart_of_accounts.find(
+                {"organization_id": organization_id},
+                {"_id": 0, "account_id": 1, "account_type": 1}
+            ).to_list(None)
+            totals = await self._account_totals_by_id(organization_id, as_of_date)
+        
+        now = datetime.now(timezone.utc).isoformat()
+        updates = []
         for account in accounts:
             account_id = account["account_id"]
             account_type = (account.get("account_type") or "").lower()
-            
-            # Calculate balance from journal entries
-            balance_data = await self.get_account_balance(organization_id, account_id)
-            debit = balance_data.get("total_debit", 0)
-            credit = balance_data.get("total_credit", 0)
+            debit, credit = totals.get(account_id, (0, 0))
             
             # Calculate proper balance based on account type
             if account_type in ["asset", "expense"]:
@@ -1526,21 +1854,34 @@ class DoubleEntryService:
             else:
                 new_balance = credit - debit
             
-            # Update the account
-            await self.chart_of_accounts.update_one(
+            updates.append(UpdateOne(
                 {"account_id": account_id, "organization_id": organization_id},
                 {
                     "$set": {
                         "current_balance": new_balance,
                         "balance": new_balance,
-                        "last_balance_update": datetime.now(timezone.utc).isoformat()
+                        "last_balance_update": now
                     }
                 }
-            )
-            updated_count += 1
+            ))
+        
+        if updates:
+            await self.chart_of_accounts.bulk_write(updates, ordered=False)
+        
+        await self.db.account_balance_sync_state.update_one(
+            {"organization_id": organization_id},
+            {"$set": {
+                "organization_id": organization_id,
+                "high_water_mark": high_water_mark,
+                "as_of_date": as_of_date,
+                "synced_at": now
+            }},
+            upsert=True
+        )
         
-        logger.info(f"[BALANCE SYNC] Synced {updated_count} accounts for org {organization_id}")
-        return {"synced_accounts": updated_count}
+        mode = "incremental" if state else "full"
+        logger.info(f"[BALANCE SYNC] Synced {len(updates)} accounts for org {organization_id} ({mode})")
+        return {"synced_accounts": len(updates), "mode": mode}
     
     async def get_profit_and_loss(
         self,
@@ -1568,39 +1909,13 @@ class DoubleEntryService:
             end_date = fy_end.strftime("%Y-%m-%d")
         
         # Aggregate income and expense accounts
-        pipeline = [
-            {
-                "$match": {
-                    "organization_id": organization_id,
-                    "is_posted": True,
-                    "entry_date": {"$gte": start_date, "$lte": end_date}
-                }
-            },
-            {"$unwind": "$lines"},
-            {
-                "$match": {
-                    "lines.account_type": {"$in": [
-                        AccountType.INCOME.value, AccountType.EXPENSE.value,
-                        "income", "expense", "revenue", "Revenue"
-                    ]}
-                }
-            },
-            {
-                "$group": {
-                    "_id": {
-                        "account_id": "$lines.account_id",
-                        "account_name": "$lines.account_name",
-                        "account_code": "$lines.account_code",
-                        "account_type": "$lines.account_type"
-                    },
-                    "total_debit": {"$sum": "$lines.debit_amount"},
-                    "total_credit": {"$sum": "$lines.credit_amount"}
-                }
-            },
-            {"$sort": {"_id.account_code": 1}}
-        ]
-        
-        results = await self.journal_entries.aggregate(pipeline).to_list(1000)
+        results = await account_period_balances.get_account_totals(
+            self.db, organization_id, start_date=start_date, end_date=end_date,
+            account_types=[
+                AccountType.INCOME.value, AccountType.EXPENSE.value,
+                "income", "expense", "revenue", "Revenue"
+            ]
+        )
         
         income_accounts = []
         expense_accounts = []
@@ -1672,41 +1987,15 @@ class DoubleEntryService:
             as_of_date = fy_end.strftime("%Y-%m-%d")
         
         # Aggregate asset, liability, and equity accounts
-        pipeline = [
-            {
-                "$match": {
-                    "organization_id": organization_id,
-                    "is_posted": True,
-                    "entry_date": {"$lte": as_of_date}
-                }
-            },
-            {"$unwind": "$lines"},
-            {
-                "$match": {
-                    "lines.account_type": {"$in": [
-                        AccountType.ASSET.value, 
-                        AccountType.LIABILITY.value, 
-                        AccountType.EQUITY.value,
-                        "asset", "liability", "equity"
-                    ]}
-                }
-            },
-            {
-                "$group": {
-                    "_id": {
-                        "account_id": "$lines.account_id",
-                        "account_name": "$lines.account_name",
-                        "account_code": "$lines.account_code",
-                        "account_type": "$lines.account_type"
-                    },
-                    "total_debit": {"$sum": "$lines.debit_amount"},
-                    "total_credit": {"$sum": "$lines.credit_amount"}
-                }
-            },
-            {"$sort": {"_id.account_code": 1}}
-        ]
-        
-        results = await self.journal_entries.aggregate(pipeline).to_list(1000)
+        results = await account_period_balances.get_account_totals(
+            self.db, organization_id, end_date=as_of_date,
+            account_types=[
+                AccountType.ASSET.value,
+                AccountType.LIABILITY.value,
+                AccountType.EQUITY.value,
+                "asset", "liability", "equity"
+            ]
+        )
         
         assets = []
         liabilities = []
@@ -1813,98 +2102,212 @@ class DoubleEntryService:
             "has_more": total > skip + limit
         }
     
-    async def get_account_ledger(
+    async def _ledger_opening_balance(self, organization_id: str, account_id: str, start_date: str) -> Decimal:
+        """Debit-minus-credit balance of an account before start_date (monthly checkpoints)"""
+        debit, credit = await account_period_balances.get_account_totals_before(
+            self.db, organization_id, account_id, start_date
+        )
+        return Decimal(str(debit)) - Decimal(str(credit))
+    
+    async def iter_account_ledger(
         self,
         organization_id: str,
         account_id: str,
-        start_date: str = None,
-        end_date: str = None
-    ) -> Dict:
-        """Get ledger (all transactions) for a specific account with running balance"""
+        start_date: str,
+        end_date: str,
+        opening_balance: Decimal,
+        after: Tuple[str, str] = None,
+        max_entries: int = None,
+        batch_size: int = LEDGER_BATCH_SIZE
+    ):
+        """
+        Yield an account's ledger lines with running balance, ordered by
+        (entry_date, entry_id), fetching journal entries in keyset batches.
+        
+        after: (entry_date, entry_id) of the last entry already returned.
+        max_entries: stop after this many journal entries (None = all).
+        """
+        running_balance = opening_balance
+        fetched = 0
+        while max_entries is None or fetched < max_entries:
+            query = {
+                "organization_id": organization_id,
+                "is_posted": True,
+                "entry_date": {"$gte": start_date, "$lte": end_date},
+                "lines.account_id": account_id
+            }
+            if after:
+                query["$or"] = [
+                    {"entry_date": {"$gt": after[0]}},
+                    {"entry_date": after[0], "entry_id": {"$gt": after[1]}}
+                ]
+            limit = batch_size if max_entries is None else min(batch_size, max_entries - fetched)
+            entries = await self.journal_entries.find(query, {
+                "_id": 0, "entry_id": 1, "entry_date": 1, "reference_number": 1,
+                "description": 1, "lines": 1
+            }).sort([("entry_date", 1), ("entry_id", 1)]).limit(limit).to_list(limit)
+            
+            for entry in entries:
+                for line in entry.get("lines", []):
+                    if line.get("account_id") != account_id:
+                        continue
+                    debit = Decimal(str(line.get("debit_amount", 0)))
+                    credit = Decimal(str(line.get("credit_amount", 0)))
+                    running_balance += debit - credit
+                    yield {
+                        "entry_id": entry.get("entry_id"),
+                        "entry_date": entry.get("entry_date"),
+                        "reference_number": entry.get("reference_number", ""),
+                        "description": entry.get("description", ""),
+                        "line_description": line.get("description", ""),
+                        "debit_amount": float(debit),
+                        "credit_amount": float(credit),
+                        "running_balance": float(running_balance)
+                    }
+            
+            fetched += len(entries)
+            if len(entries) < limit:
+                break
+            after = (entries[-1].get("entry_date"), entries[-1].get("entry_id"))
+    
+    async def _ledger_header(self, organization_id: str, account_id: str, start_date: str, end_date: str):
         if not organization_id:
             raise ValueError("organization_id is required for tenant-scoped operations")
         if not start_date:
             start_date = "1900-01-01"
         if not end_date:
             end_date = datetime.now().strftime("%Y-%m-%d")
-        
-        # Get account details
         account = await self.get_account_by_id(organization_id, account_id)
         if not account:
-            return {"error": "Account not found"}
-        
-        # Get opening balance (before start_date)
-        opening_query = {
-            "organization_id": organization_id,
-            "is_posted": True,
-            "entry_date": {"$lt": start_date},
-            "lines.account_id": account_id
+            return None
+        return {
+            "account_id": account_id,
+            "account_name": account["account_name"],
+            "account_code": account["account_code"],
+            "account_type": account["account_type"],
+            "period": {"start_date": start_date, "end_date": end_date},
         }
+    
+    async def get_account_ledger(
+        self,
+        organization_id: str,
+        account_id: str,
+        start_date: str = None,
+        end_date: str = None
+    ) -> Dict:
+        """
+        Get ledger (all transactions) for a specific account with running balance.
         
-        opening_pipeline = [
-            {"$match": opening_query},
-            {"$unwind": "$lines"},
-            {"$match": {"lines.account_id": account_id}},
-            {
-                "$group": {
-                    "_id": None,
-                    "total_debit": {"$sum": "$lines.debit_amount"},
-                    "total_credit": {"$sum": "$lines.credit_amount"}
-                }
-            }
-        ]
+        Returns every line in the period (no row cap); large ledgers should use
+        get_account_ledger_page or the NDJSON stream instead.
+        """
+        header = await self._ledger_header(organization_id, account_id, start_date, end_date)
+        if not header:
+            return {"error": "Account not found"}
+        start_date, end_date = header["period"]["start_date"], header["period"]["end_date"]
         
-        opening_result = await self.journal_entries.aggregate(opening_pipeline).to_list(1)
-        opening_balance = Decimal("0")
-        if opening_result:
-            opening_balance = Decimal(str(opening_result[0]["total_debit"])) - Decimal(str(opening_result[0]["total_credit"]))
+        opening_balance = await self._ledger_opening_balance(organization_id, account_id, start_date)
+        ledger_entries = [
+            line async for line in self.iter_account_ledger(
+                organization_id, account_id, start_date, end_date, opening_balance
+            )
+        ]
+        closing_balance = Decimal(str(ledger_entries[-1]["running_balance"])) if ledger_entries else opening_balance
         
-        # Get transactions in period
-        period_query = {
-            "organization_id": organization_id,
-            "is_posted": True,
-            "entry_date": {"$gte": start_date, "$lte": end_date},
-            "lines.account_id": account_id
+        return {
+            **header,
+            "opening_balance": float(opening_balance),
+            "closing_balance": float(closing_balance),
+            "total_debit": float(sum(Decimal(str(e["debit_amount"])) for e in ledger_entries)),
+            "total_credit": float(sum(Decimal(str(e["credit_amount"])) for e in ledger_entries)),
+            "entries": ledger_entries
         }
+    
+    async def get_account_ledger_page(
+        self,
+        organization_id: str,
+        account_id: str,
+        start_date: str = None,
+        end_date: str = None,
+        cursor: str = None,
+        limit: int = LEDGER_BATCH_SIZE
+    ) -> Dict:
+        """
+        One keyset page of an account ledger (`limit` journal entries).
         
-        entries = await self.journal_entries.find(
-            period_query,
-            {"_id": 0}
-        ).sort("entry_date", 1).to_list(10000)
+        The opaque cursor carries the position and running balance, so later
+        pages need no opening-balance computation at all.
+        """
+        header = await self._ledger_header(organization_id, account_id, start_date, end_date)
+        if not header:
+            return {"error": "Account not found"}
+        start_date, end_date = header["period"]["start_date"], header["period"]["end_date"]
         
-        # Build ledger with running balance
-        ledger_entries = []
-        running_balance = opening_balance
+        if cursor:
+            after, opening_balance = decode_ledger_cursor(cursor)
+        else:
+            after, opening_balance = None, await self._ledger_opening_balance(
+                organization_id, account_id, start_date
+            )
         
-        for entry in entries:
-            for line in entry["lines"]:
-                if line["account_id"] == account_id:
-                    debit = Decimal(str(line["debit_amount"]))
-                    credit = Decimal(str(line["credit_amount"]))
-                    running_balance += debit - credit
-                    
-                    ledger_entries.append({
-                        "entry_id": entry["entry_id"],
-                        "entry_date": entry["entry_date"],
-                        "reference_number": entry["reference_number"],
-                        "description": entry["description"],
-                        "line_description": line["description"],
-                        "debit_amount": float(debit),
-                        "credit_amount": float(credit),
-                        "running_balance": float(running_balance)
-                    })
+        lines, entry_ids = [], set()
+        async for line in self.iter_account_ledger(
+            organization_id, account_id, start_date, end_date, opening_balance,
+            after=after, max_entries=limit
+        ):
+            lines.append(line)
+            entry_ids.add(line["entry_id"])
         
+        closing_balance = Decimal(str(lines[-1]["running_balance"])) if lines else opening_balance
+        has_more = len(entry_ids) >= limit
         return {
-            "account_id": account_id,
-            "account_name": account["account_name"],
-            "account_code": account["account_code"],
-            "account_type": account["account_type"],
-            "period": {"start_date": start_date, "end_date": end_date},
+            **header,
             "opening_balance": float(opening_balance),
-            "closing_balance": float(running_balance),
-            "total_debit": float(sum(Decimal(str(e["debit_amount"])) for e in ledger_entries)),
-            "total_credit": float(sum(Decimal(str(e["credit_amount"])) for e in ledger_entries)),
-            "entries": ledger_entries
+            "closing_balance": float(closing_balance),
+            "entries": lines,
+            "has_more": has_more,
+            "next_cursor": encode_ledger_cursor(
+                lines[-1]["entry_date"], lines[-1]["entry_id"], closing_balance
+            ) if has_more else None
+        }
+    
+    async def stream_account_ledger(
+        self,
+        organization_id: str,
+        account_id: str,
+        start_date: str = None,
+        end_date: str = None
+    ):
+        """
+        Account ledger as an async stream of records for NDJSON output:
+        a header (account, opening balance), one record per line, then a summary.
+        Yields nothing if the account does not exist.
+        """
+        header = await self._ledger_header(organization_id, account_id, start_date, end_date)
+        if not header:
+            return
+        start_date, end_date = header["period"]["start_date"], header["period"]["end_date"]
+        
+        opening_balance = await self._ledger_opening_balance(organization_id, account_id, start_date)
+        yield {"type": "header", **header, "opening_balance": float(opening_balance)}
+        
+        total_debit = total_credit = Decimal("0")
+        closing_balance, count = opening_balance, 0
+        async for line in self.iter_account_ledger(
+            organization_id, account_id, start_date, end_date, opening_balance
+        ):
+            total_debit += Decimal(str(line["debit_amount"]))
+            total_credit += Decimal(str(line["credit_amount"]))
+            closing_balance = Decimal(str(line["running_balance"]))
+            count += 1
+            yield {"type": "line", **line}
+        
+        yield {
+            "type": "summary",
+            "closing_balance": float(closing_balance),
+            "total_debit": float(total_debit),
+            "total_credit": float(total_credit),
+            "line_count": count
         }
 
 
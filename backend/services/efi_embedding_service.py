@@ -21,11 +21,16 @@ import logging
 import asyncio
 import re
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict, Any
+from functools import lru_cache
+from typing import List, Optional, Dict, Any, Sequence, Tuple
 from dataclasses import dataclass
 from datetime import datetime, timezone
 import httpx
 import json
+import numpy as np
+
+from services.embedding_pipeline import EmbeddingPipeline
+from services.failure_card_index import get_failure_card_index
 
 logger = logging.getLogger(__name__)
 
@@ -248,36 +253,33 @@ class FallbackEmbeddingService(BaseEmbeddingService):
     def get_dimensions(self) -> int:
         return self.output_dim
     
+    def _generate_hash_embeddings(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Deterministic embeddings from text hashes, one row per text.
+
+        Per position i: the byte combined[i % 48] of sha256 + md5 of the
+        lowercased text, scaled to [-1, 1] and blended with a fixed
+        sin(i * 0.1) wave; each row is then normalized to a unit vector.
+        Every step repeats the original per-element float operations in
+        the same order (the norm is a sequential cumsum, not a pairwise
+        sum), so stored vectors are reproduced bit for bit.
+        """
+        encoded = [t.lower().strip().encode() for t in texts]
+        digests = b"".join(hashlib.sha256(e).digest() + hashlib.md5(e).digest() for e in encoded)
+        combined = np.frombuffer(digests, dtype=np.uint8).reshape(len(texts), _HASH_BYTES)
+        byte_idx, keep, wave = _hash_position_terms(self.output_dim)
+
+        embeddings = combined[:, byte_idx] / 255.0 * 2 - 1  # Scale to [-1, 1]
+        embeddings = embeddings * keep + wave
+
+        # Normalize to unit vectors
+        norms = np.sqrt(np.cumsum(embeddings * embeddings, axis=1)[:, -1:])
+        np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+        return embeddings
+
     def _generate_hash_embedding(self, text: str) -> List[float]:
         """Generate deterministic embedding from text hash"""
-        # Combine multiple hash functions for better distribution
-        text_lower = text.lower().strip()
-        
-        # SHA-256 for primary hash
-        sha_hash = hashlib.sha256(text_lower.encode()).digest()
-        
-        # MD5 for secondary hash (mixing)
-        md5_hash = hashlib.md5(text_lower.encode()).digest()
-        
-        # Combine hashes
-        combined = sha_hash + md5_hash
-        
-        embedding = []
-        for i in range(self.output_dim):
-            byte_idx = i % len(combined)
-            # Create float from bytes with some variation
-            val = combined[byte_idx] / 255.0 * 2 - 1  # Scale to [-1, 1]
-            # Add variation based on position
-            variation = (i / self.output_dim) * 0.1
-            val = val * (1 - variation) + variation * math.sin(i * 0.1)
-            embedding.append(val)
-        
-        # Normalize to unit vector
-        norm = math.sqrt(sum(x*x for x in embedding))
-        if norm > 0:
-            embedding = [x / norm for x in embedding]
-        
-        return embedding
+        return self._generate_hash_embeddings([text])[0].tolist()
     
     async def embed_text(self, text: str, task_type: str = "SEMANTIC_SIMILARITY") -> EmbeddingResponse:
         """Generate hash-based embedding"""
@@ -291,8 +293,34 @@ class FallbackEmbeddingService(BaseEmbeddingService):
         )
     
     async def embed_batch(self, texts: List[str], task_type: str = "SEMANTIC_SIMILARITY") -> List[EmbeddingResponse]:
-        """Generate embeddings for multiple texts"""
-        return [await self.embed_text(text, task_type) for text in texts]
+        """Generate embeddings for multiple texts as one matrix"""
+        if not texts:
+            return []
+        return [
+            EmbeddingResponse(text=text, embedding=embedding, model="hash-fallback", dimensions=len(embedding))
+            for text, embedding in zip(texts, self._generate_hash_embeddings(texts).tolist())
+        ]
+
+
+# sha256 (32) + md5 (16) digest bytes per text
+_HASH_BYTES = 48
+
+
+@lru_cache(maxsize=8)
+def _hash_position_terms(output_dim: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per-position constants of the hash embedding: digest byte index,
+    (1 - variation) and variation * sin(i * 0.1), with variation = i / dim * 0.1.
+    math.sin keeps the wave identical to the original scalar loop.
+    """
+    positions = range(output_dim)
+    byte_idx = np.fromiter((i % _HASH_BYTES for i in positions), dtype=np.intp, count=output_dim)
+    variation = [(i / output_dim) * 0.1 for i in positions]
+    keep = np.array([1 - v for v in variation], dtype=np.float64)
+    wave = np.array([v * math.sin(i * 0.1) for i, v in enumerate(variation)], dtype=np.float64)
+    for array in (byte_idx, keep, wave):
+        array.flags.writeable = False
+    return byte_idx, keep, wave
 
 
 class EmbeddingServiceFactory:
@@ -345,27 +373,38 @@ class EmbeddingServiceFactory:
         return service
 
 
+def _as_vectors(vec1, vec2) -> Tuple[np.ndarray, np.ndarray]:
+    a = np.asarray(vec1, dtype=np.float64)
+    b = np.asarray(vec2, dtype=np.float64)
+    if a.shape != b.shape:
+        raise ValueError(f"Vector dimensions must match: {len(vec1)} vs {len(vec2)}")
+    return a, b
+
+
 def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
     """Calculate cosine similarity between two vectors"""
-    if len(vec1) != len(vec2):
-        raise ValueError(f"Vector dimensions must match: {len(vec1)} vs {len(vec2)}")
-    
-    dot_product = sum(a * b for a, b in zip(vec1, vec2))
-    norm1 = math.sqrt(sum(a * a for a in vec1))
-    norm2 = math.sqrt(sum(b * b for b in vec2))
+    a, b = _as_vectors(vec1, vec2)
+    norm1 = math.sqrt(a @ a)
+    norm2 = math.sqrt(b @ b)
     
     if norm1 == 0 or norm2 == 0:
         return 0.0
     
-    return dot_product / (norm1 * norm2)
+    return float(a @ b) / (norm1 * norm2)
+
+
+def cosine_similarities(query: List[float], vectors) -> np.ndarray:
+    """Cosine similarity of `query` against each row of `vectors` (0.0 for zero vectors)"""
+    q = np.asarray(query, dtype=np.float64)
+    matrix = np.asarray(vectors, dtype=np.float64).reshape(-1, q.shape[0])
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(q)
+    return np.divide(matrix @ q, norms, out=np.zeros(len(matrix)), where=norms > 0)
 
 
 def euclidean_distance(vec1: List[float], vec2: List[float]) -> float:
     """Calculate Euclidean distance between two vectors"""
-    if len(vec1) != len(vec2):
-        raise ValueError(f"Vector dimensions must match: {len(vec1)} vs {len(vec2)}")
-    
-    return math.sqrt(sum((a - b) ** 2 for a, b in zip(vec1, vec2)))
+    a, b = _as_vectors(vec1, vec2)
+    return float(np.linalg.norm(a - b))
 
 
 async def find_similar_embeddings(
@@ -386,19 +425,19 @@ async def find_similar_embeddings(
     Returns:
         List of matches with similarity scores
     """
-    results = []
-    
-    for item in embeddings:
-        if 'embedding' not in item:
-            continue
-            
-        similarity = cosine_similarity(query_embedding, item['embedding'])
-        
-        if similarity >= threshold:
-            results.append({
-                **item,
-                'similarity_score': similarity
-            })
+    items = [item for item in embeddings if 'embedding' in item]
+    for item in items:
+        if len(item['embedding']) != len(query_embedding):
+            raise ValueError(f"Vector dimensions must match: {len(query_embedding)} vs {len(item['embedding'])}")
+    if not items:
+        return []
+    
+    similarities = cosine_similarities(query_embedding, [item['embedding'] for item in items])
+    results = [
+        {**item, 'similarity_score': float(similarity)}
+        for item, similarity in zip(items, similarities)
+        if similarity >= threshold
+    ]
     
     # Sort by similarity (descending)
     results.sort(key=lambda x: x['similarity_score'], reverse=True)
@@ -464,86 +503,72 @@ class EFIEmbeddingManager:
         limit: int = 5,
         threshold: float = 0.1  # Lowered threshold for hash-based embeddings
     ) -> List[Dict[str, Any]]:
-        """Find similar failure cards using embedding similarity"""
-        
-        # Build query filter
-        query = {
-            "embedding_vector": {"$exists": True, "$ne": None},
-            "excluded_from_efi": {"$ne": True},
-        }
-        if subsystem and subsystem != "unknown":
-            query["$or"] = [
-                {"subsystem_category": subsystem},
-                {"fault_category": subsystem},
-            ]
-        
-        # TIER 2 SHARED-BRAIN: failure_cards cross-tenant by design — Sprint 1C
-        # H-01: hard cap, remove in Sprint 3 when cursor pagination implemented
-        cards = await self.db.failure_cards.find(query, {"_id": 0}).to_list(1000)
-        
-        if not cards:
-            # Try without subsystem filter
-            # TIER 2 SHARED-BRAIN: failure_cards cross-tenant by design — Sprint 1C
-            # H-01: hard cap, remove in Sprint 3 when cursor pagination implemented
-            cards = await self.db.failure_cards.find(
-                {"embedding_vector": {"$exists": True, "$ne": None}, "excluded_from_efi": {"$ne": True}},
-                {"_id": 0}
-            ).to_list(1000)
-        
-        if not cards:
+        """
+        Find similar failure cards using embedding similarity.
+
+        Scored against the process-local failure card vector index; cards with
+        a decision tree get a 1.5x boost and are listed first.
+        """
+        index = get_failure_card_index(self.db)
+        await index.refresh()
+        # One snapshot for every mask and search below (the distinct() await can span a refresh)
+        snapshot = index.snapshot()
+        dims = len(embedding)
+        
+        base = snapshot.mask(dims, include_excluded=False)
+        if base is None or not base.any():
             logger.warning("No failure cards with embeddings found")
             return []
         
+        if subsystem and subsystem != "unknown":
+            in_subsystem = base & snapshot.mask(dims, subsystem=[subsystem],
+                                                subsystem_fields=("subsystem_category", "fault_category"))
+            # Without matching cards, search all subsystems
+            if in_subsystem.any():
+                base = in_subsystem
+        
         # Get all decision tree IDs for boosting
-        tree_card_ids = set()
         # TIER 2 SHARED-BRAIN: efi_decision_trees cross-tenant by design — Sprint 1C
-        # H-01: hard cap, remove in Sprint 3 when cursor pagination implemented
-        trees = await self.db.efi_decision_trees.find({}, {"failure_card_id": 1}).to_list(1000)
-        for t in trees:
-            tree_card_ids.add(t.get("failure_card_id"))
+        tree_card_ids = set(await self.db.efi_decision_trees.distinct("failure_card_id"))
+        
+        # Cards with decision trees rank first (boosted), then the rest
+        tree_hits = snapshot.search(embedding, limit, min_score=threshold / 1.5,
+                                    mask=base & snapshot.mask(dims, only_ids=tree_card_ids))
+        hits = [(fid, score, True) for fid, score in tree_hits]
+        if len(hits) < limit:
+            other_hits = snapshot.search(embedding, limit - len(hits), min_score=threshold,
+                                         mask=base & snapshot.mask(dims, exclude_ids=tree_card_ids))
+            hits += [(fid, score, False) for fid, score in other_hits]
+        
+        cards = await index.fetch_cards([(fid, score) for fid, score, _ in hits])
+        has_tree = {fid: tree for fid, _, tree in hits}
         
-        # Calculate similarities
         results = []
-        for card in cards:
-            card_embedding = card.get("embedding_vector", [])
-            if not card_embedding or len(card_embedding) != len(embedding):
-                continue
-            
-            similarity = cosine_similarity(embedding, card_embedding)
+        for card, similarity in cards:
+            tree = has_tree[card["failure_id"]]
+            boosted_score = similarity * (1.5 if tree else 1.0)
             
-            # Boost cards that have decision trees
-            has_tree = card.get("failure_id") in tree_card_ids
-            boosted_score = similarity * (1.5 if has_tree else 1.0)
+            # Determine confidence level
+            if boosted_score >= 0.5:
+                confidence = "high"
+            elif boosted_score >= 0.25:
+                confidence = "medium"
+            else:
+                confidence = "low"
             
-            if boosted_score >= threshold:
-                # Determine confidence level
-                if boosted_score >= 0.5:
-                    confidence = "high"
-                elif boosted_score >= 0.25:
-                    confidence = "medium"
-                else:
-                    confidence = "low"
-                
-                results.append({
-                    **card,
-                    "similarity_score": round(boosted_score, 4),
-                    "raw_similarity": round(similarity, 4),
-                    "confidence_level": confidence,
-                    "has_decision_tree": has_tree
-                })
-        
-        # Sort by similarity and limit
-        results.sort(key=lambda x: (x.get("has_decision_tree", False), x["similarity_score"]), reverse=True)
-        return results[:limit]
-    
-    async def embed_failure_card(self, failure_id: str) -> Dict[str, Any]:
-        """Generate and store embedding for a single failure card (uses fast hash-based)"""
-        # TIER 2 SHARED-BRAIN: failure_cards cross-tenant by design — Sprint 1C
-        card = await self.db.failure_cards.find_one({"failure_id": failure_id})
-        if not card:
-            raise ValueError(f"Failure card {failure_id} not found")
+            results.append({
+                **card,
+                "similarity_score": round(boosted_score, 4),
+                "raw_similarity": round(similarity, 4),
+                "confidence_level": confidence,
+                "has_decision_tree": tree
+            })
         
-        # Create text for embedding from card fields
+        return results
+    
+    @staticmethod
+    def card_embedding_text(card: Dict[str, Any]) -> str:
+        """Text embedded for a failure card"""
         text_parts = [
             card.get("title", ""),
             card.get("description", ""),
@@ -552,7 +577,16 @@ class EFIEmbeddingManager:
             " ".join(card.get("common_causes", [])),
             " ".join(card.get("keywords", []))
         ]
-        text = " ".join(filter(None, text_parts))
+        return " ".join(filter(None, text_parts))
+    
+    async def embed_failure_card(self, failure_id: str) -> Dict[str, Any]:
+        """Generate and store embedding for a single failure card (uses fast hash-based)"""
+        # TIER 2 SHARED-BRAIN: failure_cards cross-tenant by design — Sprint 1C
+        card = await self.db.failure_cards.find_one({"failure_id": failure_id})
+        if not card:
+            raise ValueError(f"Failure card {failure_id} not found")
+        
+        text = self.card_embedding_text(card)
         
         # Use hash-based embedding for reliability in batch operations
         fallback = FallbackEmbeddingService(self.embedding_service.get_dimensions())
@@ -577,36 +611,39 @@ class EFIEmbeddingManager:
             "status": "success"
         }
     
-    async def embed_all_cards(self) -> Dict[str, Any]:
-        """Generate embeddings for all failure cards"""
-        # TIER 2 SHARED-BRAIN: failure_cards cross-tenant by design — Sprint 1C
-        # H-01: hard cap, remove in Sprint 3 when cursor pagination implemented
-        cards = await self.db.failure_cards.find({}, {"failure_id": 1, "_id": 0}).to_list(1000)
-        
-        results = {
-            "total": len(cards),
-            "success": 0,
-            "failed": 0,
-            "errors": []
-        }
+    async def embed_all_cards(self, batch_size: int = 256, restart: bool = False) -> Dict[str, Any]:
+        """
+        Generate embeddings for all failure cards (hash-based, like embed_failure_card).
         
-        for card in cards:
-            fid = card.get("failure_id")
-            if not fid:
-                results["failed"] += 1
-                results["errors"].append({"failure_id": None, "error": "Missing failure_id"})
-                continue
-            try:
-                await self.embed_failure_card(fid)
-                results["success"] += 1
-            except Exception as e:
-                results["failed"] += 1
-                results["errors"].append({
-                    "failure_id": fid,
-                    "error": str(e)
-                })
+        Runs the resumable embedding pipeline: cards are read in pages, identical
+        texts are embedded once and vectors are written with bulk_write. Hash
+        embeddings are cheaper to compute than to look up, so the persistent
+        cache is skipped.
+        """
+        fallback = FallbackEmbeddingService(self.embedding_service.get_dimensions())
+        pipeline = EmbeddingPipeline(
+            self.db,
+            fallback.embed_batch,
+            job_id="failure_cards:efi-hash",
+            model="hash-fallback",
+            dimensions=fallback.get_dimensions(),
+            build_text=self.card_embedding_text,
+            projection={"_id": 0, "failure_id": 1, "title": 1, "description": 1, "symptoms": 1,
+                        "symptom_text": 1, "common_causes": 1, "keywords": 1},
+            batch_size=batch_size,
+            concurrency=1,
+            max_chars=None,
+            use_cache=False,
+        )
+        result = await pipeline.run(restart=restart)
         
-        return results
+        return {
+            "total": result["selected"],
+            "success": result["processed"],
+            "failed": result["failed"],
+            "errors": result["errors"],
+            "resumed": result["resumed"],
+        }
 
 
 # ==================== SINGLETON MANAGEMENT ====================
@@ -0,0 +1,275 @@
+"""
+Embedding Pipeline
+==================
+
+Batched, concurrent (re-)embedding of failure cards, shared by
+FailureCardEmbedder.embed_all_cards (OpenAI), EFIEmbeddingManager.embed_all_cards
+(hash fallback) and the platform-admin /efi/regenerate-embeddings route, which
+used to embed one card per provider call and update one card per round trip.
+
+Cards are read in pages, keyset-paginated on the card key (no 1,000 card cap).
+Per page:
+
+  1. build each card's text and its text hash (compute_text_hash, the
+     `embedding_cache` key EmbeddingService already uses); cards sharing a
+     text are embedded once
+  2. look the hashes up in `embedding_cache` with one $in query
+  3. send the remaining texts to the provider in batches of `batch_size`,
+     at most `concurrency` batches in flight
+  4. write card vectors and new cache entries with bulk_write
+  5. checkpoint the job in `embedding_jobs`
+
+Resume: a job that did not complete keeps its last checkpointed key, and
+running the same job_id again continues after it (restart=True starts over).
+A page is checkpointed only after its writes, so an interrupted page is
+redone rather than lost.
+
+The embed callable takes a list of texts and returns one item per text:
+a vector, an object with `.embedding` / `.model` (EmbeddingResponse), or
+None when that text could not be embedded. Responses whose model differs
+from the pipeline's `model` (e.g. a degraded fallback) are written to the
+card but not cached.
+"""
+
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "embedding_jobs"
+CACHE_COLLECTION = "embedding_cache"
+
+PAGE_SIZE = 500
+MAX_TEXT_CHARS = 8000
+MAX_ERRORS = 200
+
+COUNTERS = ("scanned", "selected", "processed", "cache_hits", "embedded", "deduplicated",
+            "provider_calls", "failed")
+
+EmbedFn = Callable[[List[str]], Awaitable[Sequence[Any]]]
+
+
+def compute_text_hash(text: str) -> str:
+    """Deterministic cache key for an embedding text"""
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def _unpack(item: Any, default_model: str) -> Tuple[Optional[List[float]], str]:
+    vector = getattr(item, "embedding", item)
+    model = getattr(item, "model", default_model)
+    return (list(vector) if vector else None), model
+
+
+class EmbeddingPipeline:
+    """One resumable embedding job over a card collection"""
+
+    def __init__(
+        self,
+        db,
+        embed: EmbedFn,
+        *,
+        job_id: str,
+        model: str,
+        build_text: Callable[[Dict[str, Any]], str],
+        query: Optional[Dict[str, Any]] = None,
+        select: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        projection: Optional[Dict[str, Any]] = None,
+        key: str = "failure_id",
+        collection: str = "failure_cards",
+        dimensions: Optional[int] = None,
+        batch_size: int = 100,
+        concurrency: int = 4,
+        page_size: int = PAGE_SIZE,
+        max_chars: Optional[int] = MAX_TEXT_CHARS,
+        use_cache: bool = True,
+        timestamp_fields: Tuple[str, ...] = ("embedding_updated_at",),
+    ):
+        self.db = db
+        self.embed = embed
+        self.job_id = job_id
+        self.model = model
+        self.build_text = build_text
+        self.query = query or {}
+        self.select = select
+        self.projection = projection or {"_id": 0}
+        self.key = key
+        self.collection = collection
+        self.dimensions = dimensions
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.page_size = max(page_size, self.batch_size)
+        self.max_chars = max_chars
+        self.use_cache = use_cache
+        self.timestamp_fields = timestamp_fields
+
+    # ==================== STAGES ====================
+
+    def _text(self, card: Dict[str, Any]) -> str:
+        text = (self.build_text(card) or "").strip()
+        return text[:self.max_chars] if self.max_chars else text
+
+    async def _cached(self, hashes: List[str]) -> Dict[str, List[float]]:
+        if not self.use_cache or not hashes:
+            return {}
+        found = {}
+        # TIER 2 SHARED-BRAIN: failure card texts are cached cross-tenant — Sprint 1C
+        async for doc in self.db[CACHE_COLLECTION].find(
+            {"text_hash": {"$in": hashes}, "model": self.model},
+            {"_id": 0, "text_hash": 1, "embedding": 1}
+        ):
+            vector = doc.get("embedding")
+            if vector and (self.dimensions is None or len(vector) == self.dimensions):
+                found[doc["text_hash"]] = vector
+        return found
+
+    async def _embed(self, texts: Dict[str, str], stats: Dict[str, int]) -> Dict[str, Any]:
+        """Provider batches under a semaphore: hash → (vector, model) or the batch's exception"""
+        hashes = list(texts)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(batch: List[str]):
+            async with semaphore:
+                try:
+                    return batch, await self.embed([texts[h] for h in batch])
+                except Exception as e:
+                    logger.warning(f"Embedding batch of {len(batch)} failed for job {self.job_id}: {e}")
+                    return batch, e
+
+        results = {}
+        batches = [hashes[i:i + self.batch_size] for i in range(0, len(hashes), self.batch_size)]
+        for batch, items in await asyncio.gather(*(run(b) for b in batches)):
+            stats["provider_calls"] += 1
+            if isinstance(items, Exception):
+                results.update((h, items) for h in batch)
+                continue
+            items = list(items or [])
+            for i, h in enumerate(batch):
+                results[h] = _unpack(items[i] if i < len(items) else None, self.model)
+        return results
+
+    async def _process_page(self, cards: List[Dict[str, Any]], stats: Dict[str, int],
+                            errors: List[Dict[str, Any]]) -> None:
+        def fail(key, error):
+            stats["failed"] += 1
+            if len(errors) < MAX_ERRORS:
+                errors.append({self.key: key, "error": error})
+
+        card_hashes: List[Tuple[str, str]] = []
+        texts: Dict[str, str] = {}
+        for card in cards:
+            text = self._text(card)
+            if not text:
+                fail(card[self.key], "No text to embed")
+                continue
+            text_hash = compute_text_hash(text)
+            if text_hash in texts:
+                stats["deduplicated"] += 1
+            texts.setdefault(text_hash, text)
+            card_hashes.append((card[self.key], text_hash))
+
+        cached = await self._cached(list(texts))
+        stats["cache_hits"] += len(cached)
+        misses = {h: t for h, t in texts.items() if h not in cached}
+        embedded = await self._embed(misses, stats) if misses else {}
+
+        now = datetime.now(timezone.utc).isoformat()
+        cache_ops = []
+        for text_hash, result in embedded.items():
+            if isinstance(result, Exception):
+                continue
+            vector, model = result
+            if vector:
+                stats["embedded"] += 1
+                if self.use_cache and model == self.model:
+                    cache_ops.append(UpdateOne(
+                        {"text_hash": text_hash, "model": self.model},
+                        {"$set": {"text_hash": text_hash, "text_preview": misses[text_hash][:200],
+                                  "embedding": vector, "model": self.model, "created_at": now}},
+                        upsert=True
+                    ))
+
+        card_ops = []
+        for key, text_hash in card_hashes:
+            if text_hash in cached:
+                vector, model = cached[text_hash], self.model
+            else:
+                result = embedded.get(text_hash)
+                if isinstance(result, Exception):
+                    fail(key, str(result))
+                    continue
+                vector, model = result if result else (None, self.model)
+            if not vector:
+                fail(key, "Embedding generation failed")
+                continue
+            update = {"embedding_vector": vector, "embedding_model": model}
+            update.update((field, now) for field in self.timestamp_fields)
+            # TIER 2 SHARED-BRAIN: failure_cards cross-tenant by design — Sprint 1C
+            card_ops.append(UpdateOne({self.key: key}, {"$set": update}))
+
+        if card_ops:
+            await self.db[self.collection].bulk_write(card_ops, ordered=False)
+            stats["processed"] += len(card_ops)
+        if cache_ops:
+            await self.db[CACHE_COLLECTION].bulk_write(cache_ops, ordered=False)
+
+    # ==================== JOB ====================
+
+    def _page_query(self, last_key: str) -> Dict[str, Any]:
+        # "$gt" on a string also skips cards without a key
+        after = {self.key: {"$gt": last_key}}
+        if not self.query:
+            return after
+        return {"$and": [self.query, after]}
+
+    async def _checkpoint(self, fields: Dict[str, Any]) -> None:
+        await self.db[JOBS_COLLECTION].update_one(
+            {"job_id": self.job_id},
+            {"$set": {**fields, "updated_at": datetime.now(timezone.utc).isoformat()}},
+            upsert=True
+        )
+
+    async def run(self, restart: bool = False) -> Dict[str, Any]:
+        """Embed every matching card, resuming an unfinished run of this job_id"""
+        job = await self.db[JOBS_COLLECTION].find_one({"job_id": self.job_id}, {"_id": 0})
+        resumed = bool(job) and job.get("status") != "complete" and not restart
+        if resumed:
+            last_key = job.get("last_key") or ""
+            stats = {c: job.get(c, 0) for c in COUNTERS}
+            errors = list(job.get("errors", []))
+            logger.info(f"Resuming embedding job {self.job_id} after {self.key}={last_key!r}")
+        else:
+            last_key, stats, errors = "", dict.fromkeys(COUNTERS, 0), []
+            await self._checkpoint({
+                "job_id": self.job_id, "collection": self.collection, "model": self.model,
+                "status": "running", "last_key": last_key, "errors": errors, **stats,
+                "started_at": datetime.now(timezone.utc).isoformat(), "completed_at": None,
+            })
+
+        try:
+            while True:
+                # TIER 2 SHARED-BRAIN: failure_cards cross-tenant by design — Sprint 1C
+                page = await self.db[self.collection].find(
+                    self._page_query(last_key), self.projection
+                ).sort(self.key, 1).limit(self.page_size).to_list(self.page_size)
+                if not page:
+                    break
+                stats["scanned"] += len(page)
+                selected = [c for c in page if self.select is None or self.select(c)]
+                stats["selected"] += len(selected)
+                if selected:
+                    await self._process_page(selected, stats, errors)
+                last_key = page[-1][self.key]
+                await self._checkpoint({"status": "running", "last_key": last_key, "errors": errors, **stats})
+                logger.info(f"Embedding job {self.job_id}: {stats['processed']} written, "
+                            f"{stats['cache_hits']} cache hits, {stats['failed']} failed")
+        except Exception as e:
+            await self._checkpoint({"status": "failed", "error": str(e)})
+            raise
+
+        await self._checkpoint({"status": "complete", "completed_at": datetime.now(timezone.utc).isoformat()})
+        return {"job_id": self.job_id, "status": "complete", "resumed": resumed, **stats, "errors": errors}
@@ -12,7 +12,6 @@ Note: Embeddings require a direct OpenAI API key (OPENAI_API_KEY).
 The Emergent LLM key only supports chat completions.
 """
 import os
-import hashlib
 import asyncio
 import logging
 from typing import List, Dict, Any, Optional
@@ -20,6 +19,9 @@ from datetime import datetime, timezone
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
+from services.embedding_pipeline import EmbeddingPipeline, compute_text_hash
+from services.failure_card_index import filter_to_mask_args, get_failure_card_index
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -54,7 +56,7 @@ class EmbeddingService:
     
     def _compute_text_hash(self, text: str) -> str:
         """Generate deterministic hash for text caching."""
-        return hashlib.sha256(text.encode()).hexdigest()[:32]
+        return compute_text_hash(text)
     
     async def get_embedding(self, text: str, use_cache: bool = True, org_id: str = None) -> Optional[List[float]]:
         """
@@ -126,6 +128,21 @@ class EmbeddingService:
             logger.error(f"Embedding generation failed: {e}")
             return None
     
+    async def embed_texts(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        One uncached provider call for up to BATCH_SIZE texts.
+        
+        Raises on provider errors (the embedding pipeline records them per card).
+        """
+        if not self.client:
+            return [None] * len(texts)
+        response = await self.client.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=texts,
+            dimensions=EMBEDDING_DIMENSIONS
+        )
+        return [item.embedding for item in response.data]
+    
     async def get_embeddings_batch(
         self,
         texts: List[str],
@@ -239,6 +256,9 @@ class EmbeddingService:
         
         return dot_product / (norm1 * norm2)
     
+    # Flipped off after the first $vectorSearch failure (no Atlas)
+    _vector_search_available = True
+
     # 3A-02: Only Tier 2 shared-brain collections may be searched without org_id scoping.
     # Any new collection that needs embedding search must be explicitly added here.
     ALLOWED_SEARCH_COLLECTIONS = {
@@ -277,33 +297,42 @@ class EmbeddingService:
         
         filter_query = filter_query or {}
         
-        # Try MongoDB Atlas Vector Search first
-        try:
-            pipeline = [
-                {
-                    "$vectorSearch": {
-                        "index": f"{collection}_vector_index",
-                        "path": embedding_field,
-                        "queryVector": query_embedding,
-                        "numCandidates": limit * 10,
-                        "limit": limit,
-                        "filter": filter_query
-                    }
-                },
-                {
-                    "$project": {
-                        "_id": 0,
-                        embedding_field: 0,
-                        "score": {"$meta": "vectorSearchScore"}
+        # Try MongoDB Atlas Vector Search first (skipped once it has failed in this process)
+        if self._vector_search_available:
+            try:
+                pipeline = [
+                    {
+                        "$vectorSearch": {
+                            "index": f"{collection}_vector_index",
+                            "path": embedding_field,
+                            "queryVector": query_embedding,
+                            "numCandidates": limit * 10,
+                            "limit": limit,
+                            "filter": filter_query
+                        }
+                    },
+                    {
+                        "$project": {
+                            "_id": 0,
+                            embedding_field: 0,
+                            "score": {"$meta": "vectorSearchScore"}
+                        }
                     }
-                }
-            ]
-            
-            results = await self.db[collection].aggregate(pipeline).to_list(limit)
-            return [r for r in results if r.get("score", 0) >= min_score]
-            
-        except Exception as e:
-            logger.debug(f"Vector search not available: {e}, using fallback")
+                ]
+                
+                results = await self.db[collection].aggregate(pipeline).to_list(limit)
+                return [r for r in results if r.get("score", 0) >= min_score]
+                
+            except Exception as e:
+                logger.debug(f"Vector search not available: {e}, using fallback")
+                EmbeddingService._vector_search_available = False
+        
+        # Failure cards: process-local vector index
+        mask_args = filter_to_mask_args(filter_query)
+        if collection == "failure_cards" and embedding_field == "embedding_vector" and mask_args is not None:
+            index = get_failure_card_index(self.db)
+            hits = await index.query(query_embedding, limit, min_score=min_score, **mask_args)
+            return [{**card, "score": score} for card, score in await index.fetch_cards(hits)]
         
         # Fallback: In-memory similarity search
         documents = await self.db[collection].find(
@@ -389,63 +418,43 @@ class FailureCardEmbedder:
         text = self._build_embedding_text(card)
         return await self.embedding_service.get_embedding(text)
     
-    async def embed_all_cards(self, batch_size: int = 50) -> Dict[str, Any]:
+    async def embed_all_cards(self, batch_size: int = 50, concurrency: int = 4,
+                              restart: bool = False) -> Dict[str, Any]:
         """
         Generate embeddings for all failure cards without embeddings.
         
+        Runs the resumable embedding pipeline: provider batches of up to
+        `batch_size` texts (at most BATCH_SIZE), `concurrency` in flight,
+        deduplicated through embedding_cache.
+        
         Returns statistics about the operation.
         """
-        # Find cards without embeddings
-        # H-01: hard cap, remove in Sprint 3 when cursor pagination implemented
-        cards = await self.db.failure_cards.find(
-            {"embedding_vector": {"$exists": False}},
-            {"_id": 0}
-        ).to_list(1000)
-        
-        if not cards:
-            # Also check cards with null embeddings
-            # H-01: hard cap, remove in Sprint 3 when cursor pagination implemented
-            cards = await self.db.failure_cards.find(
-                {"embedding_vector": None},
-                {"_id": 0}
-            ).to_list(1000)
+        pipeline = EmbeddingPipeline(
+            self.db,
+            self.embedding_service.embed_texts,
+            job_id="failure_cards:openai-missing",
+            model=EMBEDDING_MODEL,
+            dimensions=EMBEDDING_DIMENSIONS,
+            build_text=self._build_embedding_text,
+            # Matches both missing and null embeddings
+            query={"embedding_vector": None},
+            projection={"_id": 0, "embedding_vector": 0},
+            batch_size=min(batch_size, BATCH_SIZE),
+            concurrency=concurrency,
+        )
+        result = await pipeline.run(restart=restart)
         
-        if not cards:
+        if not result["selected"]:
             return {"status": "complete", "processed": 0, "message": "All cards already have embeddings"}
         
-        logger.info(f"Generating embeddings for {len(cards)} failure cards")
-        
-        processed = 0
-        errors = 0
-        
-        # Process in batches
-        for i in range(0, len(cards), batch_size):
-            batch = cards[i:i + batch_size]
-            texts = [self._build_embedding_text(card) for card in batch]
-            
-            embeddings = await self.embedding_service.get_embeddings_batch(texts)
-            
-            # Update cards with embeddings
-            for card, embedding in zip(batch, embeddings):
-                if embedding:
-                    await self.db.failure_cards.update_one(
-                        {"failure_id": card["failure_id"]},
-                        {"$set": {
-                            "embedding_vector": embedding,
-                            "embedding_updated_at": datetime.now(timezone.utc).isoformat()
-                        }}
-                    )
-                    processed += 1
-                else:
-                    errors += 1
-            
-            logger.info(f"Processed batch {i // batch_size + 1}: {processed} successful, {errors} errors")
-        
         return {
             "status": "complete",
-            "total_cards": len(cards),
-            "processed": processed,
-            "errors": errors
+            "total_cards": result["selected"],
+            "processed": result["processed"],
+            "errors": result["failed"],
+            "cache_hits": result["cache_hits"],
+            "embedded": result["embedded"],
+            "resumed": result["resumed"],
         }
     
     async def update_card_embedding(self, failure_id: str) -> bool:
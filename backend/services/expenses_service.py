@@ -18,6 +18,8 @@ import uuid
 import logging
 import re
 
+from services.gst_ledger import sync_gst_document
+
 logger = logging.getLogger(__name__)
 
 # ========================= CONSTANTS =========================
@@ -453,6 +455,13 @@ class ExpensesService:
         )
         
         logger.info(f"Expense {expense_id} approved by {approved_by}")
+        
+        # Approved expenses count towards GSTR-3B input tax credit
+        try:
+            await sync_gst_document(self.db, "expenses", expense_id)
+        except Exception as e:
+            logger.warning(f"GST ledger update failed for expense {expense_id}: {e}")
+        
         return {k: v for k, v in result.items() if k != "_id"}, journal_entry_id
     
     async def _post_approval_journal_entry(
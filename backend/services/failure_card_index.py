@@ -0,0 +1,449 @@
+"""
+Failure Card Vector Index
+=========================
+
+Process-local similarity index over `failure_cards.embedding_vector`. We do
+not run Atlas, so `$vectorSearch` always fails and both similarity paths
+(EmbeddingService.find_similar and EFIEmbeddingManager.find_similar_failure_cards)
+used to load hundreds of full cards per query and score them one at a time.
+
+Layout — one segment per embedding dimension (the OpenAI and EVFI hash
+embedders write 1536- and 256-dim vectors to the same field; a query is only
+ever compared with vectors of its own length, as before):
+
+    ids        failure_id per row
+    matrix     float32 rows, L2-normalized (a zero vector stays zero → score 0)
+    subsystem / fault_category / status   small-int codes for pre-filter masks
+    excluded   excluded_from_efi
+    live       False for rows removed since the last full load
+
+search() is one matrix-vector product, the pre-filter mask applied as -inf,
+then `argpartition` for the top k and a sort of those k only.
+
+Sync is a version poll (no replica set needed for change streams): at most
+every REFRESH_SECONDS a query pulls the cards whose `updated_at` or
+`embedding_updated_at` moved past the newest one seen and patches their rows;
+a card-count mismatch (deletes, vectors unset) or FULL_RELOAD_SECONDS since
+the last load triggers a full reload.
+
+Concurrency: the index state is an IndexSnapshot that is never modified
+once published. A reload builds a new snapshot off to the side and a poll
+patches copies of the segments it touches; either is swapped in with one
+assignment. Refreshes are single-flight (callers arriving while one runs
+wait for it instead of starting their own scan), and a query that spans
+awaits takes snapshot() once and masks / searches that.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = 30
+FULL_RELOAD_SECONDS = 600
+BATCH_SIZE = 2000
+
+# Filters EmbeddingService.find_similar can answer from the index
+INDEXED_FILTER_FIELDS = ("status", "subsystem_category", "fault_category")
+
+_PROJECTION = {
+    "_id": 0, "failure_id": 1, "embedding_vector": 1, "subsystem_category": 1,
+    "fault_category": 1, "status": 1, "excluded_from_efi": 1,
+    "updated_at": 1, "embedding_updated_at": 1,
+}
+_HAS_VECTOR = {"failure_id": {"$exists": True, "$ne": None}, "embedding_vector.0": {"$exists": True}}
+
+
+class _Codes:
+    """String → small int, so filters are integer comparisons over the column"""
+
+    def __init__(self):
+        self.codes: Dict[Any, int] = {}
+
+    def code(self, value) -> int:
+        return self.codes.setdefault(value, len(self.codes))
+
+    def lookup(self, values: Iterable) -> List[int]:
+        return [self.codes[v] for v in values if v in self.codes]
+
+    def copy(self) -> "_Codes":
+        other = _Codes()
+        other.codes = dict(self.codes)
+        return other
+
+
+class _Segment:
+    """All indexed cards of one embedding dimension"""
+
+    COLUMNS = ("matrix", "subsystem", "fault_category", "status", "excluded", "live")
+
+    def __init__(self, dims: int):
+        self.dims = dims
+        self.ids: List[str] = []
+        self.pos: Dict[str, int] = {}
+        self.matrix = np.zeros((0, dims), dtype=np.float32)
+        self.subsystem = np.zeros(0, dtype=np.int32)
+        self.fault_category = np.zeros(0, dtype=np.int32)
+        self.status = np.zeros(0, dtype=np.int32)
+        self.excluded = np.zeros(0, dtype=bool)
+        self.live = np.zeros(0, dtype=bool)
+        # Appended blocks, concatenated once on the next read (a full load
+        # arrives in many batches; growing the matrix per batch is quadratic)
+        self._pending: List[Tuple[np.ndarray, ...]] = []
+
+    def __len__(self) -> int:
+        self.flush()
+        return int(self.live.sum())
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        blocks = list(zip(*self._pending))
+        for name, parts in zip(self.COLUMNS, blocks):
+            setattr(self, name, np.concatenate([getattr(self, name), *parts]))
+        self._pending = []
+
+    def upsert(self, rows: List[Tuple[str, np.ndarray, int, int, int, bool]]) -> None:
+        """Overwrite rows already present in place, append the rest as one block"""
+        new = []
+        for row in rows:
+            i = self.pos.get(row[0])
+            if i is None:
+                new.append(row)
+                continue
+            self.flush()
+            self.matrix[i] = row[1]
+            self.subsystem[i], self.fault_category[i], self.status[i], self.excluded[i] = row[2:]
+            self.live[i] = True
+        if not new:
+            return
+        start = len(self.ids)
+        for offset, row in enumerate(new):
+            self.pos[row[0]] = start + offset
+            self.ids.append(row[0])
+        self._pending.append((
+            np.stack([r[1] for r in new]),
+            np.array([r[2] for r in new], dtype=np.int32),
+            np.array([r[3] for r in new], dtype=np.int32),
+            np.array([r[4] for r in new], dtype=np.int32),
+            np.array([r[5] for r in new], dtype=bool),
+            np.ones(len(new), dtype=bool),
+        ))
+
+    def remove(self, failure_id: str) -> None:
+        i = self.pos.get(failure_id)
+        if i is not None:
+            self.flush()
+            self.live[i] = False
+
+    def copy(self) -> "_Segment":
+        self.flush()
+        other = _Segment(self.dims)
+        other.ids = list(self.ids)
+        other.pos = dict(self.pos)
+        for name in self.COLUMNS:
+            setattr(other, name, getattr(self, name).copy())
+        return other
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class IndexSnapshot:
+    """
+    One consistent state of the index: segments, code tables and watermark.
+    Only modified before it is published (see FailureCardVectorIndex).
+    """
+
+    def __init__(self):
+        self.segments: Dict[int, _Segment] = {}
+        self.dims_of: Dict[str, int] = {}
+        self.subsystems = _Codes()
+        self.fault_categories = _Codes()
+        self.statuses = _Codes()
+        self.watermark = ""
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self.segments.values())
+
+    def _add_cards(self, cards: Iterable[Dict[str, Any]]) -> int:
+        by_dims: Dict[int, list] = {}
+        count = 0
+        for card in cards:
+            failure_id = card.get("failure_id")
+            if not failure_id:
+                continue
+            self.watermark = max(self.watermark, str(card.get("updated_at") or ""),
+                                 str(card.get("embedding_updated_at") or ""))
+            vector = card.get("embedding_vector")
+            old_dims = self.dims_of.get(failure_id)
+            dims = len(vector) if vector else 0
+            if old_dims is not None and old_dims != dims:
+                self.segments[old_dims].remove(failure_id)
+                del self.dims_of[failure_id]
+            if not dims:
+                continue
+            by_dims.setdefault(dims, []).append((
+                failure_id,
+                vector,
+                self.subsystems.code(card.get("subsystem_category")),
+                self.fault_categories.code(card.get("fault_category")),
+                self.statuses.code(card.get("status")),
+                bool(card.get("excluded_from_efi")),
+            ))
+            self.dims_of[failure_id] = dims
+            count += 1
+        for dims, rows in by_dims.items():
+            vectors = normalize_rows(np.array([r[1] for r in rows], dtype=np.float32))
+            rows = [(r[0], vectors[i], *r[2:]) for i, r in enumerate(rows)]
+            self.segments.setdefault(dims, _Segment(dims)).upsert(rows)
+        return count
+
+    def _seal(self) -> "IndexSnapshot":
+        for segment in self.segments.values():
+            segment.flush()
+        return self
+
+    def with_cards(self, cards: List[Dict[str, Any]]) -> Tuple["IndexSnapshot", int]:
+        """A new snapshot with `cards` (re-)indexed; segments they do not touch are shared"""
+        touched = {len(c["embedding_vector"]) for c in cards if c.get("embedding_vector")}
+        touched |= {self.dims_of[c["failure_id"]] for c in cards if c.get("failure_id") in self.dims_of}
+        other = IndexSnapshot()
+        other.segments = {dims: seg.copy() if dims in touched else seg for dims, seg in self.segments.items()}
+        other.dims_of = dict(self.dims_of)
+        other.subsystems = self.subsystems.copy()
+        other.fault_categories = self.fault_categories.copy()
+        other.statuses = self.statuses.copy()
+        other.watermark = self.watermark
+        count = other._add_cards(cards)
+        return other._seal(), count
+
+    def mask(
+        self,
+        dims: int,
+        subsystem: Optional[Sequence[str]] = None,
+        subsystem_fields: Sequence[str] = ("subsystem_category",),
+        statuses: Optional[Sequence[str]] = None,
+        include_excluded: bool = True,
+        only_ids: Optional[Iterable[str]] = None,
+        exclude_ids: Optional[Iterable[str]] = None,
+    ) -> Optional[np.ndarray]:
+        """Pre-filter over one segment's rows (live rows only)"""
+        segment = self.segments.get(dims)
+        if segment is None:
+            return None
+        mask = segment.live.copy()
+        if subsystem is not None:
+            wanted = np.zeros(len(mask), dtype=bool)
+            for name in subsystem_fields:
+                column, codes = ((segment.subsystem, self.subsystems) if name == "subsystem_category"
+                                 else (segment.fault_category, self.fault_categories))
+                wanted |= np.isin(column, codes.lookup(subsystem))
+            mask &= wanted
+        if statuses is not None:
+            mask &= np.isin(segment.status, self.statuses.lookup(statuses))
+        if not include_excluded:
+            mask &= ~segment.excluded
+        if only_ids is not None:
+            members = np.zeros(len(mask), dtype=bool)
+            members[[segment.pos[i] for i in only_ids if i in segment.pos]] = True
+            mask &= members
+        if exclude_ids is not None:
+            mask[[segment.pos[i] for i in exclude_ids if i in segment.pos]] = False
+        return mask
+
+    def search(self, query: Sequence[float], k: int = 10, min_score: Optional[float] = None,
+               mask: Optional[np.ndarray] = None, **filters) -> List[Tuple[str, float]]:
+        """
+        Top-k (failure_id, cosine similarity), best first.
+
+        `filters` are mask() keyword arguments; pass a prebuilt `mask` (from
+        this snapshot) instead to reuse one across searches.
+        """
+        dims = len(query)
+        segment = self.segments.get(dims)
+        if segment is None or k <= 0:
+            return []
+        if mask is None:
+            mask = self.mask(dims, **filters)
+        q = normalize_rows(np.asarray(query, dtype=np.float32))
+
+        scores = segment.matrix @ q
+        scores[~mask] = -np.inf
+        k = min(k, int(mask.sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        results = [(segment.ids[i], float(scores[i])) for i in top if mask[i]]
+        if min_score is not None:
+            results = [r for r in results if r[1] >= min_score]
+        return results
+
+
+class FailureCardVectorIndex:
+    """Normalized float32 matrix + failure_id array per dimension, kept in sync by polling"""
+
+    def __init__(self, db=None, refresh_seconds: float = REFRESH_SECONDS,
+                 full_reload_seconds: float = FULL_RELOAD_SECONDS):
+        self.db = db
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self._snapshot = IndexSnapshot()
+        self._refresh_lock = asyncio.Lock()
+        self._refreshes = 0
+        self.loaded_at = 0.0
+        self.polled_at = 0.0
+
+    def snapshot(self) -> IndexSnapshot:
+        """The current state; stays consistent however the index is refreshed meanwhile"""
+        return self._snapshot
+
+    @property
+    def segments(self) -> Dict[int, _Segment]:
+        return self._snapshot.segments
+
+    @property
+    def watermark(self) -> str:
+        return self._snapshot.watermark
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    # ==================== SYNC ====================
+
+    def add_cards(self, cards: Iterable[Dict[str, Any]]) -> int:
+        """Index (or re-index) cards; ones without a usable vector are dropped from the index"""
+        self._snapshot, count = self._snapshot.with_cards(list(cards))
+        return count
+
+    async def load(self) -> int:
+        """Full (re)load from failure_cards, streamed in batches into a new snapshot"""
+        snapshot = IndexSnapshot()
+        batch: List[Dict] = []
+        # TIER 2 SHARED-BRAIN: failure_cards cross-tenant by design — Sprint 1C
+        cursor = self.db.failure_cards.find(_HAS_VECTOR, _PROJECTION)
+        if hasattr(cursor, "batch_size"):
+            cursor = cursor.batch_size(BATCH_SIZE)
+        async for card in cursor:
+            batch.append(card)
+            if len(batch) >= BATCH_SIZE:
+                snapshot._add_cards(batch)
+                batch = []
+        snapshot._add_cards(batch)
+        self._snapshot = snapshot._seal()
+        self.loaded_at = self.polled_at = time.monotonic()
+        logger.info(f"Failure card vector index loaded: {len(self)} cards, dims {sorted(self.segments)}")
+        return len(self)
+
+    def _due(self, now: float) -> bool:
+        return not self.loaded_at or now - self.polled_at >= self.refresh_seconds
+
+    async def refresh(self, force: bool = False) -> None:
+        """Pick up card changes since the last poll; reload fully when the poll cannot explain the count"""
+        if not force and not self._due(time.monotonic()):
+            return
+        seen = self._refreshes
+        async with self._refresh_lock:
+            # Single flight: a refresh that finished while we waited covers this call
+            if self._refreshes != seen:
+                return
+            try:
+                await self._refresh()
+            finally:
+                self._refreshes += 1
+
+    async def _refresh(self) -> None:
+        now = time.monotonic()
+        if not self.loaded_at or now - self.loaded_at >= self.full_reload_seconds:
+            await self.load()
+            return
+
+        self.polled_at = now
+        if self.watermark:
+            changed_query = {"$or": [
+                {"updated_at": {"$gte": self.watermark}},
+                {"embedding_updated_at": {"$gte": self.watermark}},
+            ]}
+            changed = await self.db.failure_cards.find(changed_query, _PROJECTION).to_list(None)
+            if changed:
+                self.add_cards(changed)
+        expected = await self.db.failure_cards.count_documents(_HAS_VECTOR)
+        if expected != len(self):
+            await self.load()
+
+    # ==================== SEARCH ====================
+
+    def mask(self, dims: int, **filters) -> Optional[np.ndarray]:
+        """IndexSnapshot.mask on the current snapshot"""
+        return self._snapshot.mask(dims, **filters)
+
+    def search(self, query: Sequence[float], k: int = 10, min_score: Optional[float] = None,
+               mask: Optional[np.ndarray] = None, **filters) -> List[Tuple[str, float]]:
+        """IndexSnapshot.search on the current snapshot (take snapshot() to reuse masks across awaits)"""
+        return self._snapshot.search(query, k, min_score=min_score, mask=mask, **filters)
+
+    async def query(self, query: Sequence[float], k: int = 10, min_score: Optional[float] = None,
+                    **filters) -> List[Tuple[str, float]]:
+        """refresh() then search()"""
+        await self.refresh()
+        return self.snapshot().search(query, k, min_score=min_score, **filters)
+
+    async def fetch_cards(self, hits: List[Tuple[str, float]],
+                          projection: Optional[Dict[str, int]] = None) -> List[Tuple[Dict, float]]:
+        """The card documents for `hits`, in hit order (cards deleted since the poll are skipped)"""
+        if not hits:
+            return []
+        projection = projection or {"_id": 0, "embedding_vector": 0}
+        # TIER 2 SHARED-BRAIN: failure_cards cross-tenant by design — Sprint 1C
+        docs = await self.db.failure_cards.find(
+            {"failure_id": {"$in": [h[0] for h in hits]}}, projection
+        ).to_list(len(hits))
+        by_id = {d.get("failure_id"): d for d in docs}
+        return [(by_id[fid], score) for fid, score in hits if fid in by_id]
+
+
+def filter_to_mask_args(filter_query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    mask() arguments equivalent to a simple failure_cards filter
+    (`status` / `subsystem_category` / `fault_category` equality or `$in`);
+    None when the filter uses anything else.
+    """
+    args: Dict[str, Any] = {}
+    for field, cond in (filter_query or {}).items():
+        if field not in INDEXED_FILTER_FIELDS:
+            return None
+        if isinstance(cond, dict):
+            if set(cond) != {"$in"}:
+                return None
+            values = list(cond["$in"])
+        else:
+            values = [cond]
+        if field == "status":
+            args["statuses"] = values
+        elif "subsystem" in args:
+            return None  # subsystem_category AND fault_category: not a single mask column
+        else:
+            args["subsystem"] = values
+            args["subsystem_fields"] = (field,)
+    return args
+
+
+# ==================== SINGLETON ====================
+
+_index: Optional[FailureCardVectorIndex] = None
+
+
+def get_failure_card_index(db) -> FailureCardVectorIndex:
+    """The process-wide index over `db.failure_cards` (loaded on first query)"""
+    global _index
+    if _index is None or _index.db is not db:
+        _index = FailureCardVectorIndex(db)
+    return _index
@@ -4,7 +4,7 @@ Business logic for Electric Vehicle Failure Intelligence Platform
 
 Service responsibilities:
 - Failure card CRUD operations
-- AI matching pipeline (4-stage)
+- AI matching pipeline (staged, see FailureMatchEngine)
 - Confidence scoring and history
 - Technician action processing
 - Pattern detection
@@ -18,15 +18,19 @@ Event Flow:
 └─────────────┘     └───────────────┘     │ - Pattern Detect   │
                                           └────────────────────┘
 """
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Set, Tuple
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from pydantic import BaseModel
+import asyncio
 import uuid
 import logging
 import hashlib
+import re
 import time
 
 from events import get_dispatcher, EventType, EventPriority
+from services.text_index import sync_document
 from models.failure_intelligence import (
     FailureCard, FailureCardCreate, FailureCardUpdate, FailureCardStatus,
     SubsystemCategory, ConfidenceLevel, FailureMode, SourceType,
@@ -118,6 +122,451 @@ def compute_text_similarity(text1: str, text2: str) -> float:
     return len(intersection) / len(union)
 
 
+# ==================== MATCH ENGINE ====================
+
+MATCH_STATUSES = ["approved", "draft"]
+
+# Stage 1 looks up exact signatures on its own (indexed, never crowded out by
+# the candidate limit); stage 2 scores one shared candidate set
+CANDIDATE_LIMIT = 100
+CANDIDATE_PROJECTION = {
+    "_id": 0, "failure_id": 1, "card_id": 1, "title": 1, "issue_title": 1, "signature_hash": 1,
+    "subsystem_category": 1, "vehicle_models": 1, "error_codes": 1,
+    "confidence_score": 1, "effectiveness_score": 1,
+}
+SIGNATURE_LIMIT = 5
+SUBSYSTEM_LIMIT = 20
+
+# Platform patterns: one vehicle query, keyword / category filter in memory
+PATTERN_CANDIDATE_LIMIT = 50
+PATTERN_PROJECTION = {
+    "_id": 0, "pattern_id": 1, "title": 1, "vehicle_model": 1, "fault_category": 1,
+    "symptoms": 1, "keywords": 1, "confidence_score": 1, "effectiveness_score": 1,
+}
+PATTERN_MATCH_LIMIT = 15
+PATTERN_FALLBACK_LIMIT = 10
+
+CATEGORY_KEYWORDS = {
+    "battery": ["battery", "bms", "cell", "charge", "drain", "soc", "voltage"],
+    "motor": ["motor", "overheat", "vibrat", "noise", "torque", "rpm"],
+    "controller": ["controller", "ecu", "throttle", "error code", "limp"],
+    "charging": ["charg", "plug", "socket", "adapter", "slow charg"],
+    "electrical": ["wire", "fuse", "light", "horn", "relay", "electrical", "short"],
+}
+
+
+def _card_id(card: Dict[str, Any]) -> Optional[str]:
+    return card.get("failure_id") or card.get("card_id")
+
+
+def _card_title(card: Dict[str, Any]) -> str:
+    return card.get("title") or card.get("issue_title", "Unknown")
+
+
+@dataclass
+class MatchContext:
+    """Everything derived from a match request, computed once and shared by the stages"""
+    data: FailureMatchRequest
+    query_text: str
+    signature_hash: str
+    subsystem: Optional[str]
+    keywords: List[str]
+    keyword_set: Set[str]
+    query_codes: Set[str]
+    query_words: List[str]
+    matched_category: Optional[str]
+    vehicle_make: str
+    vehicle_model: str
+
+    @classmethod
+    def build(cls, data: FailureMatchRequest) -> "MatchContext":
+        query_text = data.symptom_text
+        if data.error_codes:
+            query_text += " " + " ".join(data.error_codes)
+        keywords = extract_keywords(data.symptom_text)
+        subsystem = data.subsystem_hint.value if data.subsystem_hint else None
+        signature_hash = compute_signature_hash({
+            "primary_symptoms": keywords,
+            "error_codes": data.error_codes,
+            "subsystem": subsystem or "",
+            "failure_mode": data.failure_mode_hint.value if data.failure_mode_hint else "",
+            "temperature_range": data.temperature_range or "",
+            "load_condition": data.load_condition or ""
+        })
+        query_lower = data.symptom_text.lower()
+        matched_category = next(
+            (cat for cat, cat_kws in CATEGORY_KEYWORDS.items() if any(kw in query_lower for kw in cat_kws)),
+            None
+        )
+        return cls(
+            data=data,
+            query_text=query_text,
+            signature_hash=signature_hash,
+            subsystem=subsystem,
+            keywords=keywords,
+            keyword_set={k.lower() for k in keywords},
+            query_codes=set(data.error_codes),
+            query_words=[w for w in query_lower.split() if len(w) > 2],
+            matched_category=matched_category,
+            vehicle_make=(data.vehicle_make or "").lower(),
+            vehicle_model=(data.vehicle_model or "").lower(),
+        )
+
+
+class FailureMatchEngine:
+    """
+    Staged failure matching for EFIService.match_failure.
+
+    Wave 1 (concurrent): an indexed exact-signature lookup (stage 1), one
+    projected candidate query for the subsystem + vehicle scorer (stage 2)
+    and one platform pattern query (stage 2.5).
+    Wave 2 (concurrent, gated on the best wave 1 score): vector semantic
+    (stage 3), hybrid text+vector (stage 4) and $text keyword (stage 5).
+
+    Results are merged in stage order (first stage to find a card keeps
+    it; vector scores can upgrade earlier matches to "hybrid"), and every
+    stage's wall time is returned in stage_timings_ms.
+    """
+
+    def __init__(self, db, embedding_service=None, search_service=None):
+        self.db = db
+        self.embedding_service = embedding_service
+        self.search_service = search_service
+
+    # ==================== WAVE 1 ====================
+
+    async def fetch_signature(self, ctx: MatchContext) -> List[Dict[str, Any]]:
+        """Cards with the request's exact signature"""
+        # TIER 2 SHARED-BRAIN: failure_cards cross-tenant by design — Sprint 1C
+        return await self.db.failure_cards.find(
+            {"signature_hash": ctx.signature_hash, "status": {"$in": MATCH_STATUSES}}, CANDIDATE_PROJECTION
+        ).limit(SIGNATURE_LIMIT).to_list(SIGNATURE_LIMIT)
+
+    async def fetch_candidates(self, ctx: MatchContext) -> List[Dict[str, Any]]:
+        """Cards sharing the subsystem, error codes or keywords"""
+        clauses: List[Dict[str, Any]] = []
+        if ctx.subsystem:
+            clauses.append({"subsystem_category": ctx.subsystem})
+        if ctx.query_codes:
+            clauses.append({"error_codes": {"$in": sorted(ctx.query_codes)}})
+        if ctx.keywords:
+            clauses.append({"keywords": {"$in": ctx.keywords}})
+        if not clauses:
+            return []
+        # TIER 2 SHARED-BRAIN: failure_cards cross-tenant by design — Sprint 1C
+        return await self.db.failure_cards.find(
+            {"status": {"$in": MATCH_STATUSES}, "$or": clauses}, CANDIDATE_PROJECTION
+        ).limit(CANDIDATE_LIMIT).to_list(CANDIDATE_LIMIT)
+
+    async def fetch_patterns(self, ctx: MatchContext) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {"status": "active"}
+        if ctx.data.vehicle_make:
+            query["vehicle_make"] = {"$regex": re.escape(ctx.data.vehicle_make), "$options": "i"}
+        if ctx.data.vehicle_model:
+            query["vehicle_model"] = {"$regex": re.escape(ctx.data.vehicle_model), "$options": "i"}
+        return await self.db.efi_platform_patterns.find(
+            query, PATTERN_PROJECTION
+        ).sort("confidence_score", -1).limit(PATTERN_CANDIDATE_LIMIT).to_list(PATTERN_CANDIDATE_LIMIT)
+
+    def signature_stage(self, ctx: MatchContext, candidates: List[Dict[str, Any]]) -> List[FailureMatchResult]:
+        return [
+            FailureMatchResult(
+                failure_id=_card_id(card),
+                title=_card_title(card),
+                match_score=0.95,
+                match_type="signature",
+                match_stage=1,
+                matched_error_codes=list(set(card.get("error_codes", [])) & ctx.query_codes),
+                confidence_level=calculate_confidence_level(card.get("confidence_score", 0.5)),
+                effectiveness_score=card.get("effectiveness_score", 0)
+            )
+            for card in candidates if card.get("signature_hash") == ctx.signature_hash
+        ][:SIGNATURE_LIMIT]
+
+    def subsystem_vehicle_stage(self, ctx: MatchContext,
+                                candidates: List[Dict[str, Any]]) -> List[FailureMatchResult]:
+        scored = []
+        for card in candidates:
+            if ctx.subsystem and card.get("subsystem_category") != ctx.subsystem:
+                continue
+            score = 0.5
+            
+            # Vehicle match bonus
+            if ctx.vehicle_make:
+                for vm in card.get("vehicle_models", []):
+                    if vm.get("make", "").lower() == ctx.vehicle_make:
+                        score += 0.15
+                        if ctx.vehicle_model and vm.get("model", "").lower() == ctx.vehicle_model:
+                            score += 0.1
+                        break
+            
+            # Error code overlap
+            shared_codes = set(card.get("error_codes", [])) & ctx.query_codes
+            if shared_codes:
+                score += 0.2 * (len(shared_codes) / max(len(ctx.query_codes), 1))
+            
+            if score > 0.4:
+                scored.append((min(0.85, score), shared_codes, card))
+        
+        # Only the best SUBSYSTEM_LIMIT candidates become results
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return [
+            FailureMatchResult(
+                failure_id=_card_id(card),
+                title=_card_title(card),
+                match_score=score,
+                match_type="subsystem_vehicle",
+                match_stage=2,
+                matched_error_codes=list(shared_codes),
+                confidence_level=calculate_confidence_level(card.get("confidence_score", 0.5)),
+                effectiveness_score=card.get("effectiveness_score", 0)
+            )
+            for score, shared_codes, card in scored[:SUBSYSTEM_LIMIT]
+        ]
+
+    def _pattern_matches(self, ctx: MatchContext, pattern: Dict[str, Any]) -> bool:
+        title = (pattern.get("title") or "").lower()
+        if ctx.keywords:
+            keywords = set(ctx.keywords)
+            if keywords & set(pattern.get("symptoms", [])) or keywords & set(pattern.get("keywords", [])):
+                return True
+            if any(k.lower() in title for k in ctx.keywords[:5]):
+                return True
+        if ctx.matched_category and pattern.get("fault_category") == ctx.matched_category:
+            return True
+        return any(w in title for w in ctx.query_words[:5])
+
+    def platform_pattern_stage(self, ctx: MatchContext,
+                               patterns: List[Dict[str, Any]]) -> List[FailureMatchResult]:
+        """Keyword / category matches first; vehicle-only patterns when nothing matches"""
+        if ctx.keywords or ctx.matched_category or ctx.query_words:
+            selected = [p for p in patterns if self._pattern_matches(ctx, p)][:PATTERN_MATCH_LIMIT]
+        else:
+            selected = patterns[:PATTERN_MATCH_LIMIT]
+        if not selected:
+            selected = patterns[:PATTERN_FALLBACK_LIMIT]
+        
+        results = []
+        for pattern in selected:
+            score = 0.70  # Base score for brand match
+            
+            # Exact vehicle model match bonus
+            if ctx.vehicle_model and pattern.get("vehicle_model", "").lower() == ctx.vehicle_model:
+                score += 0.15
+            
+            # Fault category match bonus
+            if ctx.matched_category and pattern.get("fault_category") == ctx.matched_category:
+                score += 0.08
+            
+            # Symptom overlap bonus
+            shared = set(s.lower() for s in pattern.get("symptoms", [])) & ctx.keyword_set
+            if shared:
+                score += 0.10 * min(len(shared), 3) / 3
+            
+            results.append(FailureMatchResult(
+                failure_id=pattern.get("pattern_id", ""),
+                title=pattern.get("title", "Unknown Pattern"),
+                match_score=min(0.92, score),
+                match_type="platform_pattern",
+                match_stage=2,
+                matched_symptoms=list(shared)[:5] if shared else pattern.get("symptoms", [])[:3],
+                confidence_level=calculate_confidence_level(pattern.get("confidence_score", 0.8)),
+                effectiveness_score=pattern.get("effectiveness_score", 0.85)
+            ))
+        return results
+
+    # ==================== WAVE 2 ====================
+
+    async def vector_stage(self, ctx: MatchContext) -> Optional[List[FailureMatchResult]]:
+        """None when no query embedding could be generated"""
+        try:
+            embedding_service = self.embedding_service
+            if embedding_service is None:
+                if not EMBEDDINGS_AVAILABLE:
+                    return None
+                embedding_service = get_embedding_service()
+            query_embedding = await embedding_service.get_embedding(ctx.query_text)
+            if not query_embedding:
+                return None
+            
+            vector_results = await embedding_service.find_similar(
+                query_embedding=query_embedding,
+                collection="failure_cards",
+                embedding_field="embedding_vector",
+                filter_query={"status": {"$in": MATCH_STATUSES}},
+                limit=10,
+                min_score=0.6
+            )
+        except Exception as e:
+            logger.warning(f"Vector search failed, continuing with fallback: {e}")
+            return None
+        
+        return [
+            FailureMatchResult(
+                failure_id=_card_id(card),
+                title=_card_title(card),
+                match_score=card.get("score", 0.6) * 0.85,
+                match_type="vector_semantic",
+                match_stage=3,
+                matched_symptoms=extract_keywords(card.get("symptom_text", ""))[:5],
+                confidence_level=calculate_confidence_level(card.get("confidence_score", 0.5)),
+                effectiveness_score=card.get("effectiveness_score", 0)
+            )
+            for card in vector_results
+        ]
+
+    async def hybrid_stage(self, ctx: MatchContext) -> List[FailureMatchResult]:
+        try:
+            search_service = self.search_service
+            if search_service is None:
+                if not ADVANCED_SEARCH_AVAILABLE:
+                    return []
+                search_service = get_search_service()
+            hybrid_results = await search_service.hybrid_search(
+                query=ctx.query_text,
+                error_codes=ctx.data.error_codes,
+                subsystem=ctx.subsystem,
+                vehicle_make=ctx.data.vehicle_make,
+                vehicle_model=ctx.data.vehicle_model,
+                limit=10
+            )
+        except Exception as e:
+            logger.warning(f"Hybrid search failed: {e}")
+            return []
+        
+        return [
+            FailureMatchResult(
+                failure_id=_card_id(card),
+                title=_card_title(card),
+                match_score=min(0.75, card.get("hybrid_score", 0.5)),
+                match_type="hybrid",
+                match_stage=4,
+                confidence_level=calculate_confidence_level(card.get("confidence_score", 0.5)),
+                effectiveness_score=card.get("effectiveness_score", 0)
+            )
+            for card in hybrid_results or []
+        ]
+
+    async def keyword_stage(self, ctx: MatchContext) -> List[FailureMatchResult]:
+        try:
+            stage5_cards = await self.db.failure_cards.find(
+                {
+                    "status": {"$in": MATCH_STATUSES},
+                    "$text": {"$search": ctx.query_text}
+                },
+                {**CANDIDATE_PROJECTION, "score": {"$meta": "textScore"}}
+            ).sort([("score", {"$meta": "textScore"})]).limit(5).to_list(5)
+        except Exception as e:
+            logger.warning(f"Text search failed: {e}")
+            return []
+        
+        return [
+            FailureMatchResult(
+                failure_id=_card_id(card),
+                title=_card_title(card),
+                match_score=min(0.5, card.get("score", 0) / 10),
+                match_type="keyword",
+                match_stage=5,
+                confidence_level=calculate_confidence_level(card.get("confidence_score", 0.5)),
+                effectiveness_score=card.get("effectiveness_score", 0)
+            )
+            for card in stage5_cards
+        ]
+
+    # ==================== PIPELINE ====================
+
+    async def match(self, data: FailureMatchRequest) -> FailureMatchResponse:
+        start_time = time.time()
+        timings: Dict[str, float] = {}
+
+        async def timed(name, coro):
+            started = time.perf_counter()
+            try:
+                return await coro
+            finally:
+                timings[name] = round((time.perf_counter() - started) * 1000, 3)
+
+        def timed_sync(name, fn, *args):
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                timings[name] = round((time.perf_counter() - started) * 1000, 3)
+
+        ctx = MatchContext.build(data)
+        matches: Dict[str, FailureMatchResult] = {}
+        stages_used: List[str] = []
+
+        def add(results):
+            for m in results:
+                matches.setdefault(m.failure_id, m)
+
+        def best():
+            return max((m.match_score for m in matches.values()), default=0.0)
+
+        # Wave 1: signature cards, candidate cards and platform patterns
+        has_vehicle = bool(data.vehicle_make or data.vehicle_model)
+        wave1 = [timed("signature_fetch", self.fetch_signature(ctx)), timed("prefetch", self.fetch_candidates(ctx))]
+        if has_vehicle:
+            wave1.append(timed("platform_patterns_fetch", self.fetch_patterns(ctx)))
+        fetched = await asyncio.gather(*wave1)
+        signature_cards = fetched[0]
+        candidate_ids = {_card_id(card) for card in fetched[1]}
+        candidates = fetched[1] + [card for card in signature_cards if _card_id(card) not in candidate_ids]
+        patterns = fetched[2] if has_vehicle else []
+
+        signature_matches = timed_sync("signature", self.signature_stage, ctx, signature_cards)
+        if signature_matches:
+            stages_used.append("signature")
+            add(signature_matches)
+        if best() < 0.9:
+            stages_used.append("subsystem_vehicle")
+            add(timed_sync("subsystem_vehicle", self.subsystem_vehicle_stage, ctx, candidates))
+        if has_vehicle:
+            stages_used.append("platform_patterns")
+            add(timed_sync("platform_patterns", self.platform_pattern_stage, ctx, patterns))
+
+        # Wave 2: gated on the best wave 1 score, run together
+        top = best()
+        wave2 = {}
+        if top < 0.8 and (self.embedding_service is not None or EMBEDDINGS_AVAILABLE):
+            wave2["vector_semantic"] = self.vector_stage(ctx)
+        if top < 0.7 and (self.search_service is not None or ADVANCED_SEARCH_AVAILABLE):
+            wave2["hybrid"] = self.hybrid_stage(ctx)
+        if top < 0.5:
+            wave2["keyword"] = self.keyword_stage(ctx)
+        results = dict(zip(wave2, await asyncio.gather(*(timed(n, c) for n, c in wave2.items()))))
+
+        vector_matches = results.get("vector_semantic")
+        if vector_matches is not None:
+            stages_used.append("vector_semantic")
+            for m in vector_matches:
+                existing = matches.get(m.failure_id)
+                if existing is None:
+                    matches[m.failure_id] = m
+                elif m.match_score > existing.match_score:
+                    # Upgrade an earlier match when the vector score is higher
+                    existing.match_score = m.match_score
+                    existing.match_type = "hybrid"
+        if results.get("hybrid"):
+            stages_used.append("hybrid")
+            add(results["hybrid"])
+        if "keyword" in results:
+            stages_used.append("keyword")
+            add(results["keyword"])
+
+        all_matches = sorted(matches.values(), key=lambda x: (x.match_score, x.effectiveness_score), reverse=True)
+        return FailureMatchResponse(
+            query_text=ctx.query_text,
+            signature_hash=ctx.signature_hash,
+            matches=all_matches[:data.limit],
+            processing_time_ms=(time.time() - start_time) * 1000,
+            model_used="hybrid_4stage_pipeline",
+            matching_stages_used=stages_used,
+            stage_timings_ms=timings,
+        )
+
+
 # ==================== EVFI SERVICE ====================
 
 class EFIService:
@@ -238,6 +687,7 @@ class EFIService:
                     entry['timestamp'] = entry['timestamp'].isoformat()
         
         await self.db.failure_cards.insert_one(doc)
+        await sync_document("failure_cards", card.failure_id)
         
         # EMIT FAILURE_CARD_CREATED EVENT
         await self.dispatcher.emit(
@@ -386,6 +836,7 @@ class EFIService:
             {"failure_id": failure_id},
             {"$set": update_dict, "$push": {"version_history": version_entry}}
         )
+        await sync_document("failure_cards", failure_id)
         
         # EMIT FAILURE_CARD_UPDATED EVENT
         await self.dispatcher.emit(
@@ -447,6 +898,7 @@ class EFIService:
                 "$push": {"confidence_history": history_entry}
             }
         )
+        await sync_document("failure_cards", failure_id)
         
         # EMIT FAILURE_CARD_APPROVED EVENT
         await self.dispatcher.emit(
@@ -503,321 +955,33 @@ class EFIService:
     
     async def match_failure(self, data: FailureMatchRequest) -> FailureMatchResponse:
         """
-        AI-powered failure matching - Enhanced 5-stage pipeline
+        AI-powered failure matching - staged pipeline (FailureMatchEngine)
         
         Priority order:
         1. Failure signature match (fastest, highest confidence)
-        2. Subsystem + vehicle filtering
+        2. Subsystem + vehicle filtering, platform patterns
         3. Vector semantic search (if embeddings available)
         4. Hybrid text+vector search
         5. Keyword fallback
         """
-        start_time = time.time()
-        
-        query_text = data.symptom_text
-        if data.error_codes:
-            query_text += " " + " ".join(data.error_codes)
-        
-        # Build signature
-        signature_data = {
-            "primary_symptoms": extract_keywords(data.symptom_text),
-            "error_codes": data.error_codes,
-            "subsystem": data.subsystem_hint.value if data.subsystem_hint else "",
-            "failure_mode": data.failure_mode_hint.value if data.failure_mode_hint else "",
-            "temperature_range": data.temperature_range or "",
-            "load_condition": data.load_condition or ""
-        }
-        signature_hash = compute_signature_hash(signature_data)
-        
-        all_matches = []
-        stages_used = []
-        
-        # Stage 1: Signature match (exact hash match)
-        signature_matches = await self.db.failure_cards.find(
-            {"signature_hash": signature_hash, "status": {"$in": ["approved", "draft"]}},
-            {"_id": 0, "embedding_vector": 0}
-        ).limit(5).to_list(5)
-        
-        if signature_matches:
-            stages_used.append("signature")
-            for card in signature_matches:
-                all_matches.append(FailureMatchResult(
-                    failure_id=card.get("failure_id") or card.get("card_id"),
-                    title=card.get("title") or card.get("issue_title", "Unknown"),
-                    match_score=0.95,
-                    match_type="signature",
-                    match_stage=1,
-                    matched_error_codes=list(set(card.get("error_codes", [])) & set(data.error_codes)),
-                    confidence_level=calculate_confidence_level(card.get("confidence_score", 0.5)),
-                    effectiveness_score=card.get("effectiveness_score", 0)
-                ))
-        
-        # Stage 2: Subsystem + Vehicle filtering
-        if not all_matches or all_matches[0].match_score < 0.9:
-            stages_used.append("subsystem_vehicle")
-            
-            stage2_query = {"status": {"$in": ["approved", "draft"]}}
-            if data.subsystem_hint:
-                stage2_query["subsystem_category"] = data.subsystem_hint.value
-            
-            stage2_cards = await self.db.failure_cards.find(
-                stage2_query, {"_id": 0, "embedding_vector": 0}
-            ).limit(20).to_list(20)
-            
-            for card in stage2_cards:
-                if card.get("failure_id") or card.get("card_id") in [m.failure_id for m in all_matches]:
-                    continue
-                
-                score = 0.5
-                
-                # Vehicle match bonus
-                if data.vehicle_make:
-                    for vm in card.get("vehicle_models", []):
-                        if vm.get("make", "").lower() == data.vehicle_make.lower():
-                            score += 0.15
-                            if data.vehicle_model and vm.get("model", "").lower() == data.vehicle_model.lower():
-                                score += 0.1
-                            break
-                
-                # Error code overlap
-                card_codes = set(card.get("error_codes", []))
-                query_codes = set(data.error_codes)
-                if card_codes & query_codes:
-                    score += 0.2 * (len(card_codes & query_codes) / max(len(query_codes), 1))
-                
-                if score > 0.4:
-                    all_matches.append(FailureMatchResult(
-                        failure_id=card.get("failure_id") or card.get("card_id"),
-                        title=card.get("title") or card.get("issue_title", "Unknown"),
-                        match_score=min(0.85, score),
-                        match_type="subsystem_vehicle",
-                        match_stage=2,
-                        matched_error_codes=list(card_codes & query_codes),
-                        confidence_level=calculate_confidence_level(card.get("confidence_score", 0.5)),
-                        effectiveness_score=card.get("effectiveness_score", 0)
-                    ))
-        
-        # Stage 2.5: Platform Patterns Search (brand-specific diagnostic patterns)
-        if data.vehicle_make or data.vehicle_model:
-            stages_used.append("platform_patterns")
-            
-            pattern_query = {"status": "active"}
-            if data.vehicle_make:
-                pattern_query["vehicle_make"] = {"$regex": data.vehicle_make, "$options": "i"}
-            if data.vehicle_model:
-                pattern_query["vehicle_model"] = {"$regex": data.vehicle_model, "$options": "i"}
-            
-            # Derive fault_category from query text
-            query_lower = data.symptom_text.lower()
-            category_keywords = {
-                "battery": ["battery", "bms", "cell", "charge", "drain", "soc", "voltage"],
-                "motor": ["motor", "overheat", "vibrat", "noise", "torque", "rpm"],
-                "controller": ["controller", "ecu", "throttle", "error code", "limp"],
-                "charging": ["charg", "plug", "socket", "adapter", "slow charg"],
-                "electrical": ["wire", "fuse", "light", "horn", "relay", "electrical", "short"],
-            }
-            matched_category = None
-            for cat, cat_kws in category_keywords.items():
-                if any(kw in query_lower for kw in cat_kws):
-                    matched_category = cat
-                    break
-            
-            # Build keyword and category search filter
-            keywords = extract_keywords(data.symptom_text)
-            search_conditions = []
-            if keywords:
-                search_conditions.append({"symptoms": {"$in": keywords}})
-                search_conditions.append({"title": {"$regex": "|".join(keywords[:5]), "$options": "i"}})
-                search_conditions.append({"keywords": {"$in": keywords}})
-            if matched_category:
-                search_conditions.append({"fault_category": matched_category})
-            # Also do a broad regex on title/description using raw query words
-            query_words = [w for w in data.symptom_text.lower().split() if len(w) > 2]
-            if query_words:
-                search_conditions.append({"title": {"$regex": "|".join(query_words[:5]), "$options": "i"}})
-            
-            if search_conditions:
-                pattern_query["$or"] = search_conditions
-            
-            platform_patterns = await self.db.efi_platform_patterns.find(
-                pattern_query, {"_id": 0}
-            ).limit(15).to_list(15)
-            
-            # Fallback: if no results with keyword filter, try vehicle-only
-            if not platform_patterns and (data.vehicle_make or data.vehicle_model):
-                fallback_query = {"status": "active"}
-                if data.vehicle_make:
-                    fallback_query["vehicle_make"] = {"$regex": data.vehicle_make, "$options": "i"}
-                if data.vehicle_model:
-                    fallback_query["vehicle_model"] = {"$regex": data.vehicle_model, "$options": "i"}
-                platform_patterns = await self.db.efi_platform_patterns.find(
-                    fallback_query, {"_id": 0}
-                ).sort("confidence_score", -1).limit(10).to_list(10)
-            
-            for pattern in platform_patterns:
-                pattern_id = pattern.get("pattern_id", "")
-                if pattern_id in [m.failure_id for m in all_matches]:
-                    continue
-                
-                # Calculate score based on matches
-                score = 0.70  # Base score for brand match
-                
-                # Exact vehicle model match bonus
-                if data.vehicle_model and pattern.get("vehicle_model", "").lower() == data.vehicle_model.lower():
-                    score += 0.15
-                
-                # Fault category match bonus
-                if matched_category and pattern.get("fault_category") == matched_category:
-                    score += 0.08
-                
-                # Symptom overlap bonus
-                pattern_symptoms = set(s.lower() for s in pattern.get("symptoms", []))
-                query_keywords = set(k.lower() for k in keywords)
-                if pattern_symptoms & query_keywords:
-                    score += 0.10 * min(len(pattern_symptoms & query_keywords), 3) / 3
-                
-                all_matches.append(FailureMatchResult(
-                    failure_id=pattern_id,
-                    title=pattern.get("title", "Unknown Pattern"),
-                    match_score=min(0.92, score),
-                    match_type="platform_pattern",
-                    match_stage=2,
-                    matched_symptoms=list(pattern_symptoms & query_keywords)[:5] if pattern_symptoms & query_keywords else pattern.get("symptoms", [])[:3],
-                    confidence_level=calculate_confidence_level(pattern.get("confidence_score", 0.8)),
-                    effectiveness_score=pattern.get("effectiveness_score", 0.85)
-                ))
-        
-        # Stage 3: Vector Semantic Search (if available)
-        if EMBEDDINGS_AVAILABLE and (not all_matches or all_matches[0].match_score < 0.8):
-            try:
-                embedding_service = get_embedding_service()
-                query_embedding = await embedding_service.get_embedding(query_text)
-                
-                if query_embedding:
-                    stages_used.append("vector_semantic")
-                    
-                    vector_results = await embedding_service.find_similar(
-                        query_embedding=query_embedding,
-                        collection="failure_cards",
-                        embedding_field="embedding_vector",
-                        filter_query={"status": {"$in": ["approved", "draft"]}},
-                        limit=10,
-                        min_score=0.6
-                    )
-                    
-                    for card in vector_results:
-                        if card.get("failure_id") or card.get("card_id") in [m.failure_id for m in all_matches]:
-                            # Update existing match score if vector score is higher
-                            for m in all_matches:
-                                if m.failure_id == card.get("failure_id") or card.get("card_id"):
-                                    vector_score = card.get("score", 0) * 0.85
-                                    if vector_score > m.match_score:
-                                        m.match_score = vector_score
-                                        m.match_type = "hybrid"
-                            continue
-                        
-                        all_matches.append(FailureMatchResult(
-                            failure_id=card.get("failure_id") or card.get("card_id"),
-                            title=card.get("title") or card.get("issue_title", "Unknown"),
-                            match_score=card.get("score", 0.6) * 0.85,
-                            match_type="vector_semantic",
-                            match_stage=3,
-                            matched_symptoms=extract_keywords(card.get("symptom_text", ""))[:5],
-                            confidence_level=calculate_confidence_level(card.get("confidence_score", 0.5)),
-                            effectiveness_score=card.get("effectiveness_score", 0)
-                        ))
-            except Exception as e:
-                logger.warning(f"Vector search failed, continuing with fallback: {e}")
-        
-        # Stage 4: Hybrid Text+Vector Search (if advanced search available)
-        if ADVANCED_SEARCH_AVAILABLE and (not all_matches or all_matches[0].match_score < 0.7):
-            try:
-                search_service = get_search_service()
-                hybrid_results = await search_service.hybrid_search(
-                    query=query_text,
-                    error_codes=data.error_codes,
-                    subsystem=data.subsystem_hint.value if data.subsystem_hint else None,
-                    vehicle_make=data.vehicle_make,
-                    vehicle_model=data.vehicle_model,
-                    limit=10
-                )
-                
-                if hybrid_results:
-                    stages_used.append("hybrid")
-                    
-                    for card in hybrid_results:
-                        if card.get("failure_id") or card.get("card_id") in [m.failure_id for m in all_matches]:
-                            continue
-                        
-                        all_matches.append(FailureMatchResult(
-                            failure_id=card.get("failure_id") or card.get("card_id"),
-                            title=card.get("title") or card.get("issue_title", "Unknown"),
-                            match_score=min(0.75, card.get("hybrid_score", 0.5)),
-                            match_type="hybrid",
-                            match_stage=4,
-                            confidence_level=calculate_confidence_level(card.get("confidence_score", 0.5)),
-                            effectiveness_score=card.get("effectiveness_score", 0)
-                        ))
-            except Exception as e:
-                logger.warning(f"Hybrid search failed: {e}")
-        
-        # Stage 5: Keyword fallback
-        if not all_matches or all_matches[0].match_score < 0.5:
-            if "keyword" not in stages_used:
-                stages_used.append("keyword")
-            
-            try:
-                stage5_cards = await self.db.failure_cards.find(
-                    {
-                        "status": {"$in": ["approved", "draft"]},
-                        "$text": {"$search": query_text}
-                    },
-                    {"_id": 0, "embedding_vector": 0, "score": {"$meta": "textScore"}}
-                ).sort([("score", {"$meta": "textScore"})]).limit(5).to_list(5)
-                
-                for card in stage5_cards:
-                    if card.get("failure_id") or card.get("card_id") in [m.failure_id for m in all_matches]:
-                        continue
-                    
-                    all_matches.append(FailureMatchResult(
-                        failure_id=card.get("failure_id") or card.get("card_id"),
-                        title=card.get("title") or card.get("issue_title", "Unknown"),
-                        match_score=min(0.5, card.get("score", 0) / 10),
-                        match_type="keyword",
-                        match_stage=5,
-                        confidence_level=calculate_confidence_level(card.get("confidence_score", 0.5)),
-                        effectiveness_score=card.get("effectiveness_score", 0)
-                    ))
-            except Exception as e:
-                logger.warning(f"Text search failed: {e}")
-        
-        # Sort by score
-        all_matches.sort(key=lambda x: (x.match_score, x.effectiveness_score), reverse=True)
+        response = await FailureMatchEngine(self.db).match(data)
         
         # EMIT MATCH_COMPLETED EVENT
         await self.dispatcher.emit(
             EventType.MATCH_COMPLETED,
             {
-                "query": query_text[:200],
-                "signature_hash": signature_hash,
-                "matches_found": len(all_matches),
-                "stages_used": stages_used,
-                "top_match": all_matches[0].failure_id if all_matches else None,
-                "top_score": all_matches[0].match_score if all_matches else 0
+                "query": response.query_text[:200],
+                "signature_hash": response.signature_hash,
+                "matches_found": len(response.matches),
+                "stages_used": response.matching_stages_used,
+                "stage_timings_ms": response.stage_timings_ms,
+                "top_match": response.matches[0].failure_id if response.matches else None,
+                "top_score": response.matches[0].match_score if response.matches else 0
             },
             source="efi_service"
         )
         
-        processing_time = (time.time() - start_time) * 1000
-        
-        return FailureMatchResponse(
-            query_text=query_text,
-            signature_hash=signature_hash,
-            matches=[m for m in all_matches[:data.limit]],
-            processing_time_ms=processing_time,
-            model_used="hybrid_4stage_pipeline",
-            matching_stages_used=stages_used
-        )
+        return response
     
     async def match_ticket_to_failures(self, ticket_id: str, org_id: str = None) -> Dict[str, Any]:
         """Match an existing ticket to failure cards"""
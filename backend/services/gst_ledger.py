@@ -0,0 +1,598 @@
+"""
+GST Tax Line Ledger
+===================
+
+Per-line GST ledger (collection `gst_tax_lines`), so GSTR-1, GSTR-3B and
+the HSN summary are grouped aggregations over one indexed collection
+instead of loading capped batches of invoices, credit notes, bills and
+expenses and classifying them in Python on every request.
+
+One document per line item of a document that counts for GST:
+
+    {organization_id, source_type, source_collection, source_id, line_no,
+     document_number, doc_date, period "YYYY-MM",
+     party_name, party_gstin, registered, place_of_supply,
+     category, supply_type, itc_category, reverse_charge, blocked_credit,
+     hsn_code, description, uqc, quantity, gst_rate,
+     taxable_value, tax, value, cgst, sgst, igst, unsplit_tax, meta, updated_at}
+
+The document's taxable value, tax and total are spread over its lines in
+proportion to the line amounts (the last line takes the rounding
+remainder), so the lines always sum back to the document header.
+
+Where the document fixes its own CGST/SGST/IGST split (credit notes, new
+expenses) the components are stored and unsplit_tax is 0. Otherwise the
+components are 0 and the whole tax is in unsplit_tax, which the reports
+split against the organization's state at read time (split_tax), so a
+changed GST registration never leaves stale splits behind.
+
+Documents that count:
+- invoices (`invoices`, `invoices_enhanced`): sent / paid / partial / partially_paid / overdue
+- credit notes: anything but cancelled
+- bills: anything but draft / void / cancelled
+- expenses: approved and later (legacy expenses without a workflow status too)
+
+Maintenance:
+- The invoice, bill, credit note and expense write paths call
+  sync_gst_document(), which replaces the document's lines (or removes them
+  once the document no longer counts).
+- Writes that bypass the hook (direct inserts in other modules, scripts)
+  are picked up by a watermark poll: every ensure_gst_ledger call re-syncs
+  the org's documents whose created / updated stamps are past the last
+  poll (`synced_through`, with CATCH_UP_OVERLAP of slack for clock skew
+  and in-flight writes).
+- Deletions and stampless or back-dated writes leave no stamp to poll, so
+  before a return is read its period is reconciled (reconcile_gst_period):
+  the document ids ledgered for the period are compared with the counting
+  documents dated in it, and every difference is re-synced.
+- An org's ledger is built the first time a return needs it
+  (ensure_gst_ledger) and can be rebuilt / verified with
+  scripts/rebuild_gst_ledger.py.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+
+from pymongo import ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+
+COLLECTION = "gst_tax_lines"
+STATUS_COLLECTION = "gst_tax_lines_status"
+
+INVOICE_STATUSES = ("sent", "paid", "partial", "partially_paid", "overdue")
+CREDIT_NOTE_EXCLUDED_STATUSES = ("cancelled",)
+BILL_EXCLUDED_STATUSES = ("draft", "void", "cancelled")
+EXPENSE_EXCLUDED_STATUSES = ("DRAFT", "SUBMITTED", "REJECTED", "draft", "rejected", "void")
+
+B2CL_THRESHOLD = 250000  # B2C Large: unregistered invoice value above 2.5L
+DEFAULT_HSN = "9987"     # Maintenance and repair services
+EXPENSE_ASSUMED_RATE = 0.18  # legacy expenses without any GST fields
+
+BATCH_SIZE = 500
+WRITE_BATCH = 1000
+CATCH_UP_OVERLAP = timedelta(minutes=5)
+
+# source collection → how its documents map onto ledger lines
+SOURCES = {
+    "invoices": {
+        "type": "invoice", "id": "invoice_id", "dates": ("invoice_date", "date"),
+        "line_items": "invoice_line_items", "include": INVOICE_STATUSES,
+        "stamps": ("created_at", "updated_at", "created_time", "updated_time"),
+    },
+    "invoices_enhanced": {
+        "type": "invoice", "id": "invoice_id", "dates": ("invoice_date",),
+        "line_items": "invoice_line_items", "include": INVOICE_STATUSES,
+        "stamps": ("created_at", "updated_at", "created_time", "updated_time"),
+    },
+    "credit_notes": {
+        "type": "credit_note", "id": "credit_note_id", "dates": ("credit_note_date", "created_at"),
+        "line_items": None, "exclude": CREDIT_NOTE_EXCLUDED_STATUSES,
+        "stamps": ("created_at", "updated_at"),
+    },
+    "bills": {
+        "type": "bill", "id": "bill_id", "dates": ("bill_date", "date"),
+        "line_items": "bill_line_items", "exclude": BILL_EXCLUDED_STATUSES,
+        "stamps": ("created_time", "updated_time"),
+    },
+    "expenses": {
+        "type": "expense", "id": "expense_id", "dates": ("expense_date",),
+        "line_items": None, "exclude": EXPENSE_EXCLUDED_STATUSES,
+        "stamps": ("created_at", "updated_at", "created_time"),
+    },
+}
+
+SUM_FIELDS = ("taxable_value", "tax", "value", "cgst", "sgst", "igst", "unsplit_tax", "quantity")
+
+# Orgs whose ledger is known to be built (per process)
+_ready_orgs = set()
+
+
+# ==================== HELPERS ====================
+
+def _num(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _counts(cfg: Dict, doc: Dict) -> bool:
+    """Whether a document's status makes it count for GST"""
+    status = doc.get("status")
+    if "include" in cfg:
+        return status in cfg["include"]
+    return status not in cfg["exclude"]
+
+
+def _status_query(cfg: Dict) -> Dict:
+    if "include" in cfg:
+        return {"status": {"$in": list(cfg["include"])}}
+    return {"status": {"$nin": list(cfg["exclude"])}}
+
+
+def _doc_date(cfg: Dict, doc: Dict) -> str:
+    for field in cfg["dates"]:
+        if doc.get(field):
+            return str(doc[field])[:10]
+    return ""
+
+
+def _gstin_valid(gstin: str) -> bool:
+    from routes.gst import validate_gstin
+    return bool(validate_gstin(gstin).get("valid"))
+
+
+def _allocate(total: float, weights: Sequence[float]) -> List[float]:
+    """Split total in proportion to weights, rounded to paise; the last share takes the remainder"""
+    weights = [max(_num(w), 0.0) for w in weights]
+    base = sum(weights)
+    if base <= 0:
+        weights, base = [1.0] * len(weights), float(len(weights))
+    shares = [round(total * w / base, 2) for w in weights[:-1]]
+    return shares + [round(total - sum(shares), 2)]
+
+
+def _header(source_type: str, doc: Dict) -> Tuple[float, float, float, Optional[Tuple[float, float, float]]]:
+    """(taxable value, tax, document total, fixed cgst/sgst/igst split or None) of a document"""
+    if source_type == "credit_note":
+        split = tuple(_num(doc.get(f)) for f in ("cgst_amount", "sgst_amount", "igst_amount"))
+        taxable = _num(doc.get("subtotal"))
+        tax = _num(doc.get("gst_amount")) or sum(split)
+        return taxable, tax, _num(doc.get("total")) or taxable + tax, split
+
+    if source_type == "expense":
+        taxable = _num(doc.get("amount"))
+        parts = [doc.get(f) for f in ("cgst_amount", "sgst_amount", "igst_amount")]
+        if any(p is not None for p in parts):
+            split = tuple(_num(p) for p in parts)
+            tax = sum(split)
+        else:
+            split = None
+            tax = _num(doc.get("tax_amount")) or taxable * EXPENSE_ASSUMED_RATE
+        return taxable, tax, taxable + tax, split
+
+    taxable = _num(doc.get("sub_total")) or _num(doc.get("subtotal"))
+    total = _num(doc.get("total")) or _num(doc.get("grand_total"))
+    tax = _num(doc.get("tax_total")) or (total - taxable if total else 0.0)
+    return taxable, tax, total or taxable + tax, None
+
+
+def _itc_category(doc: Dict) -> str:
+    """Table 4A bucket of a bill"""
+    treatment = doc.get("gst_treatment", "")
+    is_import = doc.get("is_import", False) or treatment in ("import", "overseas")
+    is_service = doc.get("is_service", False) or doc.get("supply_type") == "service"
+    if is_import and is_service:
+        return "import_services"
+    if is_import:
+        return "import_goods"
+    if doc.get("reverse_charge", False):
+        return "rcm"
+    if doc.get("is_isd", False) or treatment == "isd":
+        return "isd"
+    return "other"
+
+
+def _line_amount(item: Dict) -> float:
+    return (_num(item.get("taxable_amount")) or _num(item.get("amount")) or _num(item.get("item_total"))
+            or _num(item.get("quantity") or 1) * _num(item.get("rate")))
+
+
+def _line_rate(item: Dict, default: float) -> float:
+    for field in ("tax_rate", "tax_percentage", "gst_rate"):
+        if item.get(field) is not None:
+            return _num(item[field])
+    return default
+
+
+def _line_hsn(item: Dict) -> str:
+    return str(item.get("hsn_sac_code") or item.get("hsn_or_sac") or item.get("hsn_sac")
+               or item.get("hsn_code") or DEFAULT_HSN)
+
+
+# ==================== LINES ====================
+
+def build_tax_lines(source_collection: str, doc: Dict, line_items: Optional[List[Dict]] = None) -> List[Dict]:
+    """
+    Ledger lines of one document (no status check).
+
+    Embedded `line_items` win over the separately stored ones passed in;
+    a document without line items becomes a single line.
+    """
+    cfg = SOURCES[source_collection]
+    source_type = cfg["type"]
+    doc_date = _doc_date(cfg, doc)
+    if not doc_date:
+        return []
+
+    taxable, tax, total, split = _header(source_type, doc)
+    doc_rate = round(tax / taxable * 100, 2) if taxable else 0.0
+
+    if source_type == "expense":
+        items = [{"hsn_sac_code": doc.get("hsn_sac_code"), "description": doc.get("description", ""),
+                  "gst_rate": doc.get("gst_rate")}]
+    else:
+        items = [li for li in (doc.get("line_items") or line_items or []) if isinstance(li, dict)]
+    if not items:
+        items = [{"description": doc.get("description", "")}]
+
+    amounts = [_line_amount(li) for li in items]
+    rates = [_line_rate(li, doc_rate) for li in items]
+    if any(_num(li.get("tax_amount")) > 0 for li in items):
+        tax_weights = [_num(li.get("tax_amount")) for li in items]
+    elif any(r > 0 for r in rates):
+        tax_weights = [a * r for a, r in zip(amounts, rates)]
+    else:
+        tax_weights = amounts
+
+    taxable_shares = _allocate(taxable, amounts)
+    tax_shares = _allocate(tax, tax_weights)
+    value_shares = _allocate(total, amounts)
+    if split:
+        split_shares = [_allocate(component, tax_weights) for component in split]
+
+    if source_type in ("bill", "expense"):
+        gstin = doc.get("vendor_gstin") or doc.get("gst_no") or ""
+        party_name = doc.get("vendor_name", "")
+    else:
+        gstin = doc.get("customer_gstin") or doc.get("gst_no") or ""
+        party_name = doc.get("customer_name", "")
+    gstin = str(gstin).strip().upper()
+    registered = bool(gstin) and _gstin_valid(gstin)
+    if gstin and len(gstin) >= 2:
+        place_of_supply = gstin[:2]
+    elif source_type in ("invoice", "credit_note"):
+        place_of_supply = doc.get("place_of_supply") or ""
+    else:
+        place_of_supply = ""
+
+    category = None
+    if source_type == "invoice":
+        category = "b2b" if registered else ("b2cl" if total > B2CL_THRESHOLD else "b2cs")
+    elif source_type == "credit_note":
+        category = "cdnr" if registered else "cdnur"
+
+    base = {
+        "organization_id": doc.get("organization_id"),
+        "source_type": source_type,
+        "source_collection": source_collection,
+        "source_id": doc.get(cfg["id"]),
+        "document_number": (doc.get("invoice_number") or doc.get("credit_note_number") or doc.get("bill_number")
+                            or doc.get("expense_number") or ""),
+        "doc_date": doc_date,
+        "period": doc_date[:7],
+        "party_name": party_name,
+        "party_gstin": gstin,
+        "registered": registered,
+        "place_of_supply": place_of_supply,
+        "category": category,
+        "supply_type": doc.get("supply_type"),
+        "itc_category": _itc_category(doc) if source_type == "bill" else ("other" if source_type == "expense" else None),
+        "reverse_charge": bool(doc.get("reverse_charge", False)) if source_type == "bill" else False,
+        "blocked_credit": bool(doc.get("is_blocked_credit", False)) if source_type == "bill" else False,
+        "meta": {
+            "original_invoice_number": doc.get("original_invoice_number", ""),
+            "reason": doc.get("reason", ""),
+            "gst_treatment": doc.get("gst_treatment", "cgst_sgst"),
+        } if source_type == "credit_note" else None,
+    }
+
+    lines = []
+    for i, item in enumerate(items):
+        line = {
+            **base,
+            "line_no": i,
+            "hsn_code": _line_hsn(item),
+            "description": item.get("description") or item.get("name") or "",
+            "uqc": item.get("unit") or "NOS",
+            "quantity": _num(item.get("quantity") or 1),
+            "gst_rate": rates[i],
+            "taxable_value": taxable_shares[i],
+            "tax": tax_shares[i],
+            "value": value_shares[i],
+        }
+        if split:
+            line.update(cgst=split_shares[0][i], sgst=split_shares[1][i], igst=split_shares[2][i], unsplit_tax=0.0)
+        else:
+            line.update(cgst=0.0, sgst=0.0, igst=0.0, unsplit_tax=tax_shares[i])
+        lines.append(line)
+    return lines
+
+
+async def sync_gst_document(db, source_collection: str, source_id: str) -> int:
+    """Replace one document's ledger lines from its current state; returns the lines written"""
+    cfg = SOURCES[source_collection]
+    doc = await db[source_collection].find_one({cfg["id"]: source_id}, {"_id": 0})
+    lines = []
+    if doc and doc.get("organization_id") and _counts(cfg, doc):
+        line_items = None
+        if not doc.get("line_items") and cfg["line_items"]:
+            line_items = await db[cfg["line_items"]].find({cfg["id"]: source_id}, {"_id": 0}).to_list(None)
+        lines = build_tax_lines(source_collection, doc, line_items)
+
+    await db[COLLECTION].delete_many({"source_type": cfg["type"], "source_id": source_id})
+    if lines:
+        now = datetime.now(timezone.utc).isoformat()
+        await db[COLLECTION].insert_many([{**line, "updated_at": now} for line in lines])
+    return len(lines)
+
+
+# ==================== REBUILD / VERIFY ====================
+
+async def _fold(db, source_collection: str, docs: List[Dict], seen: set, lines: Dict) -> None:
+    cfg = SOURCES[source_collection]
+    docs = [d for d in docs if (cfg["type"], d.get(cfg["id"])) not in seen]
+    by_doc = {}
+    need_items = [d.get(cfg["id"]) for d in docs if not d.get("line_items")]
+    if cfg["line_items"] and need_items:
+        async for item in db[cfg["line_items"]].find({cfg["id"]: {"$in": need_items}}, {"_id": 0}):
+            by_doc.setdefault(item.get(cfg["id"]), []).append(item)
+    for doc in docs:
+        seen.add((cfg["type"], doc.get(cfg["id"])))
+        for line in build_tax_lines(source_collection, doc, by_doc.get(doc.get(cfg["id"]))):
+            lines[(line["source_type"], line["source_id"], line["line_no"])] = line
+
+
+async def _raw_ledger(db, organization_id: str) -> Dict[Tuple, Dict]:
+    """Fresh ledger lines of an org keyed by (source_type, source_id, line_no)"""
+    lines, seen = {}, set()
+    for source_collection, cfg in SOURCES.items():
+        query = {"organization_id": organization_id, **_status_query(cfg)}
+        batch = []
+        async for doc in db[source_collection].find(query, {"_id": 0}):
+            batch.append(doc)
+            if len(batch) >= BATCH_SIZE:
+                await _fold(db, source_collection, batch, seen, lines)
+                batch = []
+        if batch:
+            await _fold(db, source_collection, batch, seen, lines)
+    return lines
+
+
+async def rebuild_gst_ledger(db, organization_id: str) -> Dict:
+    """Recompute an org's ledger lines from its invoices, credit notes, bills and expenses"""
+    started = datetime.now(timezone.utc).isoformat()
+    raw = await _raw_ledger(db, organization_id)
+    now = datetime.now(timezone.utc).isoformat()
+    ops = []
+    for (source_type, source_id, line_no), line in raw.items():
+        key = {"source_type": source_type, "source_id": source_id, "line_no": line_no}
+        ops.append(ReplaceOne(dict(key), {**line, "updated_at": now}, upsert=True))
+    for start in range(0, len(ops), WRITE_BATCH):
+        await db[COLLECTION].bulk_write(ops[start:start + WRITE_BATCH], ordered=False)
+
+    stale = 0
+    existing = await db[COLLECTION].find(
+        {"organization_id": organization_id}, {"_id": 1, "source_type": 1, "source_id": 1, "line_no": 1}
+    ).to_list(None)
+    stale_ids = [d["_id"] for d in existing
+                 if (d.get("source_type"), d.get("source_id"), d.get("line_no")) not in raw]
+    if stale_ids:
+        stale = (await db[COLLECTION].delete_many({"_id": {"$in": stale_ids}})).deleted_count
+
+    documents = len({(t, s) for t, s, _ in raw})
+    await db[STATUS_COLLECTION].update_one(
+        {"organization_id": organization_id},
+        {"$set": {"organization_id": organization_id, "built_at": now, "synced_through": started,
+                  "lines": len(ops), "documents": documents}},
+        upsert=True
+    )
+    _ready_orgs.add(organization_id)
+    logger.info(f"Rebuilt {len(ops)} GST tax lines ({documents} documents) for org {organization_id} "
+                f"({stale} stale removed)")
+    return {"organization_id": organization_id, "lines": len(ops), "documents": documents, "stale_removed": stale}
+
+
+def _document_totals(lines: Iterable[Dict]) -> Dict[Tuple, Dict]:
+    totals = {}
+    for line in lines:
+        row = totals.setdefault((line.get("source_type"), line.get("source_id")), {"lines": 0})
+        row["lines"] += 1
+        row["period"] = line.get("period")
+        for f in ("taxable_value", "tax", "value", "cgst", "sgst", "igst"):
+            row[f] = row.get(f, 0) + _num(line.get(f))
+    return totals
+
+
+async def verify_gst_ledger(db, organization_id: str) -> Dict:
+    """Compare the ledger with a fresh build per document; returns the mismatching documents"""
+    raw = _document_totals((await _raw_ledger(db, organization_id)).values())
+    materialized = _document_totals(
+        await db[COLLECTION].find({"organization_id": organization_id}, {"_id": 0}).to_list(None)
+    )
+    mismatches = []
+    for key in set(raw) | set(materialized):
+        expected, actual = raw.get(key) or {}, materialized.get(key) or {}
+        fields = [f for f in ("taxable_value", "tax", "value", "cgst", "sgst", "igst", "lines")
+                  if abs(_num(expected.get(f)) - _num(actual.get(f))) > 0.01]
+        if expected.get("period") != actual.get("period"):
+            fields.append("period")
+        if fields:
+            mismatches.append({"source_type": key[0], "source_id": key[1], "fields": fields})
+    mismatches.sort(key=lambda m: (m["source_type"] or "", m["source_id"] or ""))
+    return {
+        "organization_id": organization_id,
+        "documents_checked": len(set(raw) | set(materialized)),
+        "mismatches": mismatches,
+        "ok": not mismatches
+    }
+
+
+def _parse_stamp(value) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _changed_since(cfg: Dict, since: datetime) -> List[Dict]:
+    # Stamps are ISO strings on most write paths and datetimes on a few; Mongo
+    # only compares within a type, so each stamp is matched in both forms
+    return [{field: {"$gt": value}} for field in cfg["stamps"] for value in (since.isoformat(), since)]
+
+
+async def catch_up_gst_ledger(db, organization_id: str) -> int:
+    """Re-sync an org's documents created / updated since the last poll; returns the documents synced"""
+    status = await db[STATUS_COLLECTION].find_one(
+        {"organization_id": organization_id}, {"_id": 0, "synced_through": 1, "built_at": 1}
+    ) or {}
+    mark = _parse_stamp(status.get("synced_through") or status.get("built_at"))
+    started = datetime.now(timezone.utc)
+    synced = set()
+    if mark:
+        since = mark - CATCH_UP_OVERLAP
+        for source_collection, cfg in SOURCES.items():
+            query = {"organization_id": organization_id, "$or": _changed_since(cfg, since)}
+            async for doc in db[source_collection].find(query, {"_id": 0, cfg["id"]: 1}):
+                source_id = doc.get(cfg["id"])
+                if not source_id or (cfg["type"], source_id) in synced:
+                    continue
+                synced.add((cfg["type"], source_id))
+                source = source_collection
+                # An invoice in both collections is ledgered from `invoices` (as in the rebuild)
+                if source_collection == "invoices_enhanced" and await db.invoices.find_one(
+                        {"invoice_id": source_id}, {"_id": 1}):
+                    source = "invoices"
+                await sync_gst_document(db, source, source_id)
+    await db[STATUS_COLLECTION].update_one(
+        {"organization_id": organization_id},
+        {"$set": {"synced_through": started.isoformat()}}
+    )
+    if synced:
+        logger.info(f"GST ledger catch-up re-synced {len(synced)} documents for org {organization_id}")
+    return len(synced)
+
+
+def _period_range(cfg: Dict, period: str) -> List[Dict]:
+    # Document dates are ISO strings on most write paths and datetimes on a
+    # few; each date field is matched in both forms, like _changed_since
+    start = datetime.strptime(period, "%Y-%m").replace(tzinfo=timezone.utc)
+    end = (start + timedelta(days=32)).replace(day=1)
+    clauses = []
+    for field in cfg["dates"]:
+        clauses.append({field: {"$gte": start.strftime("%Y-%m"), "$lt": end.strftime("%Y-%m")}})
+        clauses.append({field: {"$gte": start, "$lt": end}})
+    return clauses
+
+
+async def reconcile_gst_period(db, organization_id: str, period: str) -> int:
+    """Re-sync the documents whose presence in a period differs from the ledger; returns the documents synced"""
+    ledgered = {}
+    async for line in db[COLLECTION].find(
+            {"organization_id": organization_id, "period": period},
+            {"_id": 0, "source_type": 1, "source_id": 1, "source_collection": 1}):
+        ledgered[(line.get("source_type"), line.get("source_id"))] = line.get("source_collection")
+
+    present = {}
+    for source_collection, cfg in SOURCES.items():
+        query = {"organization_id": organization_id, **_status_query(cfg), "$or": _period_range(cfg, period)}
+        projection = {"_id": 0, cfg["id"]: 1, **{field: 1 for field in cfg["dates"]}}
+        async for doc in db[source_collection].find(query, projection):
+            source_id = doc.get(cfg["id"])
+            # The first date field decides the period; `invoices` wins over `invoices_enhanced`
+            if source_id and _doc_date(cfg, doc)[:7] == period:
+                present.setdefault((cfg["type"], source_id), source_collection)
+
+    # Present but unledgered (or ledgered from the other invoice collection): sync
+    # from where it is now; ledgered but gone: the sync removes its lines
+    stale = {key: source for key, source in present.items() if ledgered.get(key) != source}
+    stale.update({key: source for key, source in ledgered.items() if key not in present and source in SOURCES})
+    for (_, source_id), source_collection in stale.items():
+        if source_collection == "invoices_enhanced" and await db.invoices.find_one(
+                {"invoice_id": source_id}, {"_id": 1}):
+            source_collection = "invoices"
+        await sync_gst_document(db, source_collection, source_id)
+    if stale:
+        logger.info(f"GST ledger reconcile re-synced {len(stale)} documents for org {organization_id} "
+                    f"period {period}")
+    return len(stale)
+
+
+async def ensure_gst_ledger(db, organization_id: str, period: Optional[str] = None) -> None:
+    """Build an org's ledger the first time a return needs it, afterwards catch up on missed writes
+    and reconcile the return's period"""
+    if organization_id not in _ready_orgs:
+        if not await db[STATUS_COLLECTION].find_one({"organization_id": organization_id}, {"_id": 1}):
+            await rebuild_gst_ledger(db, organization_id)
+            return
+        _ready_orgs.add(organization_id)
+    await catch_up_gst_ledger(db, organization_id)
+    if period:
+        await reconcile_gst_period(db, organization_id, period)
+
+
+# ==================== READS ====================
+
+async def grouped_tax_lines(
+    db,
+    organization_id: str,
+    period: str,
+    match: Dict,
+    keys: Sequence[str],
+    first: Sequence[str] = (),
+    documents: bool = False,
+) -> List[Dict]:
+    """
+    Sum the ledger lines of one return period grouped by `keys`.
+
+    Each row carries the grouping keys, the SUM_FIELDS totals, the `first`
+    fields of any line in the group and, with documents=True, the distinct
+    source_ids in the group.
+    """
+    group = {"_id": {k: f"${k}" for k in keys}}
+    group.update({f: {"$sum": f"${f}"} for f in SUM_FIELDS})
+    group.update({f: {"$first": f"${f}"} for f in first})
+    if documents:
+        group["documents"] = {"$addToSet": "$source_id"}
+    pipeline = [
+        {"$match": {"organization_id": organization_id, "period": period, **match}},
+        {"$group": group},
+    ]
+    rows = await db[COLLECTION].aggregate(pipeline).to_list(None)
+    return [{**(row.pop("_id") or {}), **row} for row in rows]
+
+
+def is_intra_state(row: Dict, org_state: str) -> bool:
+    return (row.get("place_of_supply") or org_state) == org_state
+
+
+def split_tax(row: Dict, org_state: str) -> Dict[str, float]:
+    """CGST / SGST / IGST of a grouped row: fixed components plus the unsplit tax by place of supply"""
+    unsplit = _num(row.get("unsplit_tax"))
+    intra = is_intra_state(row, org_state)
+    return {
+        "cgst": _num(row.get("cgst")) + (unsplit / 2 if intra else 0),
+        "sgst": _num(row.get("sgst")) + (unsplit / 2 if intra else 0),
+        "igst": _num(row.get("igst")) + (0 if intra else unsplit),
+    }
+
+
+def reset_ready_cache() -> None:
+    """Forget which orgs have a built ledger (tests)"""
+    _ready_orgs.clear()
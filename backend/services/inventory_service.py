@@ -15,6 +15,7 @@ import uuid
 import logging
 
 from events import get_dispatcher, EventType, EventPriority
+from services.account_period_balances import apply_journal_entry
 
 logger = logging.getLogger(__name__)
 
@@ -351,6 +352,7 @@ class InventoryService:
             }
             
             await self.db.journal_entries.insert_one(journal_entry)
+            await apply_journal_entry(self.db, journal_entry)
             logger.info(f"COGS journal entry posted: {entry_id} for ₹{total_cost}")
             
         except Exception as e:
@@ -0,0 +1,315 @@
+"""
+Inventory Valuation Engine
+==========================
+
+One valuation path for the stock summary / valuation reports in
+routes/reports.py, routes/items_enhanced.py and routes/inventory_enhanced.py
+(each used to load a capped item list and value it one item at a time).
+
+- value_inventory() — streams only the needed item fields through a
+  projection cursor in batches into NumPy columns, then values every item at
+  once:
+
+    unit_price        on hand × the item's current rate (the first non-empty
+                      of `rate_fields`, e.g. purchase_rate / opening_stock_rate)
+    weighted_average  on hand × the quantity-weighted mean cost of the item's
+                      inbound stock movements
+    fifo              on hand consumed from the newest inbound movements
+                      backwards (what is left on the shelf is the most
+                      recently bought), each layer at its own unit cost
+
+  FIFO / weighted average fall back to the current rate for items with no
+  costed inbound movements, and for any on-hand quantity beyond them.
+
+Quantity comes from the item document (`qty_fields`) or, with
+stock_source="locations", from the org's item_stock_locations rows (optionally
+one warehouse); location rows also give the per-warehouse totals.
+
+Cost layers are the `stock_movements` rows with a positive quantity and unit
+cost (bill receipts write these with movement_type PURCHASE).
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+METHODS = ("fifo", "weighted_average", "unit_price")
+BATCH_SIZE = 1000
+
+ITEM_QTY_FIELDS = ("stock_on_hand", "available_stock")
+LOCATION_QTY_FIELDS = ("available_stock", "stock")
+
+
+def normalize_method(method: Optional[str], default: str = "unit_price") -> str:
+    """Lower-cased valuation method; ValueError for one the engine does not support"""
+    method = (method or default).strip().lower()
+    if method not in METHODS:
+        raise ValueError(f"Unsupported valuation method '{method}'. Use one of: {', '.join(METHODS)}")
+    return method
+
+
+def to_number(value: Any) -> float:
+    """Stored quantities / rates may be numbers, numeric strings, "" or None"""
+    if value is None or isinstance(value, bool):
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value) if str(value).strip() else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def first_number(doc: Dict, fields: Sequence[str], default: float = 0.0) -> float:
+    """First non-zero value of `fields` (the reports' `a or b` fallback)"""
+    for name in fields:
+        value = to_number(doc.get(name))
+        if value:
+            return value
+    return default
+
+
+def present_number(doc: Dict, fields: Sequence[str], default: float = 0.0) -> float:
+    """First of `fields` the document has at all, even when it is 0"""
+    for name in fields:
+        if doc.get(name) is not None:
+            return to_number(doc[name])
+    return default
+
+
+def column(docs: Sequence[Dict], fields: Sequence[str], default: float = 0.0) -> np.ndarray:
+    return np.fromiter((first_number(d, fields, default) for d in docs), dtype=np.float64, count=len(docs))
+
+
+@dataclass
+class Valuation:
+    """Column view of a valued item set: docs[i] pairs with qty[i], unit_cost[i], value[i]"""
+
+    method: str
+    docs: List[Dict]
+    qty: np.ndarray
+    rate: np.ndarray
+    unit_cost: np.ndarray
+    value: np.ndarray
+    reserved: Optional[np.ndarray] = None
+    warehouses: List[Dict] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    @property
+    def total_qty(self) -> float:
+        return float(self.qty.sum())
+
+    @property
+    def total_value(self) -> float:
+        return float(self.value.sum())
+
+    def column(self, *fields: str, default: float = 0.0) -> np.ndarray:
+        return column(self.docs, fields, default)
+
+    def values(self, name: str, default: float = 0.0) -> np.ndarray:
+        """One numeric field, `default` only where the field is missing"""
+        return np.fromiter((to_number(d.get(name, default)) for d in self.docs), dtype=np.float64,
+                           count=len(self.docs))
+
+    def group_by(self, key: str, **columns: np.ndarray) -> List[Dict]:
+        """Sum `columns` (plus an item_count) per distinct docs[i][key]"""
+        labels = [d.get(key) for d in self.docs]
+        keys = list(dict.fromkeys(labels))
+        index = {k: i for i, k in enumerate(keys)}
+        codes = np.fromiter((index[label] for label in labels), dtype=np.int64, count=len(labels))
+        sums = {name: np.bincount(codes, weights=col, minlength=len(keys)) for name, col in columns.items()}
+        counts = np.bincount(codes, minlength=len(keys))
+        return [
+            {"_id": k, "item_count": int(counts[i]), **{name: float(s[i]) for name, s in sums.items()}}
+            for i, k in enumerate(keys)
+        ]
+
+
+# ==================== LOADING ====================
+
+async def _iter_docs(collection, query: Dict, projection: Dict, batch_size: int):
+    cursor = collection.find(query, projection)
+    if hasattr(cursor, "batch_size"):
+        cursor = cursor.batch_size(batch_size)
+    async for doc in cursor:
+        yield doc
+
+
+def _chunks(values: Sequence, size: int) -> Iterable[Sequence]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+async def load_items(db, query: Dict, fields: Iterable[str], collection: str = "items",
+                     batch_size: int = BATCH_SIZE) -> List[Dict]:
+    """Projected item documents, read in cursor batches"""
+    projection = {"_id": 0, **{name: 1 for name in fields}}
+    return [doc async for doc in _iter_docs(db[collection], query, projection, batch_size)]
+
+
+async def load_cost_layers(db, org_id: str, item_ids: Sequence[str],
+                           batch_size: int = BATCH_SIZE) -> Dict[str, np.ndarray]:
+    """Inbound stock movements of `item_ids` as parallel arrays (item_id, qty, cost, date)"""
+    ids, qtys, costs, dates = [], [], [], []
+    projection = {"_id": 0, "item_id": 1, "quantity": 1, "unit_cost": 1, "movement_date": 1, "created_at": 1}
+    for chunk in _chunks(list(item_ids), batch_size):
+        query = {
+            "organization_id": org_id,
+            "item_id": {"$in": list(chunk)},
+            "quantity": {"$gt": 0},
+            "unit_cost": {"$gt": 0},
+        }
+        async for m in _iter_docs(db.stock_movements, query, projection, batch_size):
+            ids.append(m["item_id"])
+            qtys.append(to_number(m.get("quantity")))
+            costs.append(to_number(m.get("unit_cost")))
+            dates.append(str(m.get("movement_date") or m.get("created_at") or ""))
+    return {
+        "item_id": np.array(ids, dtype=object),
+        "qty": np.array(qtys, dtype=np.float64),
+        "cost": np.array(costs, dtype=np.float64),
+        "date": np.array(dates, dtype=object),
+    }
+
+
+async def load_location_stock(db, org_id: str, item_ids: Sequence[str], warehouse_id: Optional[str] = None,
+                              qty_fields: Sequence[str] = LOCATION_QTY_FIELDS,
+                              batch_size: int = BATCH_SIZE) -> Dict[str, np.ndarray]:
+    """
+    item_stock_locations rows of `item_ids` as parallel arrays (item_id,
+    warehouse_id, qty, reserved). A row's qty is its first `qty_fields` field
+    that is set: available_stock of 0 means none available, not "use stock".
+    """
+    ids, warehouses, qtys, reserved = [], [], [], []
+    projection = {"_id": 0, "item_id": 1, "warehouse_id": 1, "reserved_stock": 1, **{f: 1 for f in qty_fields}}
+    for chunk in _chunks(list(item_ids), batch_size):
+        query: Dict[str, Any] = {"organization_id": org_id, "item_id": {"$in": list(chunk)}}
+        if warehouse_id:
+            query["warehouse_id"] = warehouse_id
+        async for loc in _iter_docs(db.item_stock_locations, query, projection, batch_size):
+            ids.append(loc["item_id"])
+            warehouses.append(loc.get("warehouse_id") or "")
+            qtys.append(present_number(loc, qty_fields))
+            reserved.append(to_number(loc.get("reserved_stock")))
+    return {
+        "item_id": np.array(ids, dtype=object),
+        "warehouse_id": np.array(warehouses, dtype=object),
+        "qty": np.array(qtys, dtype=np.float64),
+        "reserved": np.array(reserved, dtype=np.float64),
+    }
+
+
+def _positions(item_ids: np.ndarray, index: Dict[str, int]) -> np.ndarray:
+    return np.fromiter((index[i] for i in item_ids), dtype=np.int64, count=len(item_ids))
+
+
+# ==================== VALUATION ====================
+
+def weighted_average_cost(n: int, idx: np.ndarray, qty: np.ndarray, cost: np.ndarray,
+                          fallback: np.ndarray) -> np.ndarray:
+    """Quantity-weighted mean layer cost per item; `fallback` where an item has no layers"""
+    layer_qty = np.bincount(idx, weights=qty, minlength=n)
+    layer_value = np.bincount(idx, weights=qty * cost, minlength=n)
+    return np.divide(layer_value, layer_qty, out=fallback.copy(), where=layer_qty > 0)
+
+
+def fifo_value(on_hand: np.ndarray, idx: np.ndarray, qty: np.ndarray, cost: np.ndarray,
+               rank: np.ndarray, fallback: np.ndarray) -> np.ndarray:
+    """
+    Value of `on_hand` per item when stock leaves oldest-first.
+
+    The quantity still on the shelf is taken from the newest layers backwards;
+    whatever exceeds the item's layers (or negative stock) is at `fallback`.
+    """
+    n = len(on_hand)
+    if not len(idx):
+        return on_hand * fallback
+
+    # Newest layer first within each item
+    order = np.lexsort((-rank, idx))
+    idx, qty, cost = idx[order], qty[order], cost[order]
+
+    # Quantity in newer layers of the same item, before each layer
+    running = np.cumsum(qty)
+    starts = np.r_[True, idx[1:] != idx[:-1]]
+    group_base = (running - qty)[starts]
+    newer = running - qty - group_base[np.cumsum(starts) - 1]
+
+    take = np.clip(on_hand[idx] - newer, 0.0, qty)
+    layered_qty = np.bincount(idx, weights=take, minlength=n)
+    layered_value = np.bincount(idx, weights=take * cost, minlength=n)
+    return layered_value + (on_hand - layered_qty) * fallback
+
+
+async def value_inventory(
+    db,
+    org_id: str,
+    query: Dict,
+    *,
+    method: str = "unit_price",
+    collection: str = "items",
+    rate_fields: Sequence[str] = ("purchase_rate",),
+    qty_fields: Sequence[str] = ITEM_QTY_FIELDS,
+    fields: Iterable[str] = (),
+    stock_source: str = "item",
+    warehouse_id: Optional[str] = None,
+    batch_size: int = BATCH_SIZE,
+) -> Valuation:
+    """
+    Value the items matching `query` (already scoped to the organization).
+
+    `fields` are extra item fields the caller needs back in Valuation.docs.
+    With stock_source="locations" the quantity is the item's
+    item_stock_locations total (one warehouse when `warehouse_id` is set),
+    Valuation.reserved carries the reserved stock and Valuation.warehouses
+    the per-warehouse quantity / value.
+    """
+    method = normalize_method(method)
+    wanted = {"item_id", *rate_fields, *fields}
+    if stock_source == "item":
+        wanted.update(qty_fields)
+    docs = await load_items(db, query, sorted(wanted), collection=collection, batch_size=batch_size)
+
+    n = len(docs)
+    rate = column(docs, rate_fields)
+    item_ids = [d.get("item_id") for d in docs]
+    index = {item_id: i for i, item_id in enumerate(item_ids) if item_id}
+
+    reserved = None
+    locations = None
+    if stock_source == "locations":
+        locations = await load_location_stock(db, org_id, list(index), warehouse_id, batch_size=batch_size)
+        loc_idx = _positions(locations["item_id"], index)
+        qty = np.bincount(loc_idx, weights=locations["qty"], minlength=n)
+        reserved = np.bincount(loc_idx, weights=locations["reserved"], minlength=n)
+    else:
+        qty = column(docs, qty_fields)
+
+    if method == "unit_price" or not index:
+        value = qty * rate
+    else:
+        layers = await load_cost_layers(db, org_id, list(index), batch_size=batch_size)
+        layer_idx = _positions(layers["item_id"], index)
+        if method == "weighted_average":
+            value = qty * weighted_average_cost(n, layer_idx, layers["qty"], layers["cost"], rate)
+        else:
+            rank = np.unique(layers["date"].astype(str), return_inverse=True)[1] if len(layer_idx) else layer_idx
+            value = fifo_value(qty, layer_idx, layers["qty"], layers["cost"], rank, rate)
+
+    unit_cost = np.divide(value, qty, out=rate.copy(), where=qty != 0)
+
+    warehouses: List[Dict] = []
+    if locations is not None and len(locations["item_id"]):
+        codes, inverse = np.unique(locations["warehouse_id"].astype(str), return_inverse=True)
+        wh_qty = np.bincount(inverse, weights=locations["qty"], minlength=len(codes))
+        wh_value = np.bincount(inverse, weights=locations["qty"] * unit_cost[loc_idx], minlength=len(codes))
+        warehouses = [
+            {"warehouse_id": wid, "total_units": float(wh_qty[i]), "stock_value": round(float(wh_value[i]), 2)}
+            for i, wid in enumerate(codes)
+        ]
+
+    return Valuation(method=method, docs=docs, qty=qty, rate=rate, unit_cost=unit_cost,
+                     value=value, reserved=reserved, warehouses=warehouses)
@@ -9,6 +9,7 @@ import logging
 from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional, Tuple
 import motor.motor_asyncio
+from services.text_index import sync_document
 from models.knowledge_brain import (
     KnowledgeArticle, FailureCard, ErrorCodeDefinition,
     KnowledgeType, KnowledgeScope, ApprovalStatus, Severity,
@@ -278,6 +279,7 @@ class KnowledgeStoreService:
         }
         
         await self.knowledge_collection.insert_one(article)
+        await sync_document("knowledge_articles", article["knowledge_id"])
         
         logger.info(f"Created knowledge article: {article['knowledge_id']}")
         return article
@@ -396,6 +398,7 @@ class KnowledgeStoreService:
         )
         
         if result.modified_count > 0:
+            await sync_document("knowledge_articles", knowledge_id)
             # Also update linked failure card if exists
             await self.failure_cards_collection.update_one(
                 {"knowledge_id": knowledge_id},
@@ -0,0 +1,204 @@
+"""
+PDF Artifact Cache
+==================
+
+Content-addressed, on-disk cache of rendered PDFs. The key is a SHA-256 of
+the document HTML plus the trial-watermark flag, so a repeat download of an
+unchanged invoice, estimate, credit note or report is served from disk with
+no WeasyPrint render. Any change to the document, its line items or the
+org branding changes the HTML and therefore the key. Nothing is ever
+invalidated explicitly; superseded PDFs simply age out.
+
+- PDF_CACHE_DIR (default <tmp>/battwheels_pdf_cache) holds <key>.pdf files,
+  written atomically (temp file + rename) and shared by all workers.
+- PDF_CACHE_MAX_MB (default 256) caps the total size; least recently used
+  files are deleted first. 0 disables the cache.
+
+"Generated on" timestamps would change the HTML on every request; templates
+wrap them in generated_stamp(), whose content the key ignores. A cached PDF
+keeps the stamp of its first render.
+
+Usage (through the render pool):
+    pdf_bytes = await render_pdf(html_content, is_trial=is_trial, cache=True)
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_DIR = os.environ.get("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "battwheels_pdf_cache"))
+DEFAULT_MAX_BYTES = int(float(os.environ.get("PDF_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+_STAMP_OPEN, _STAMP_CLOSE = "<!--generated-->", "<!--/generated-->"
+_STAMP_RE = re.compile(re.escape(_STAMP_OPEN) + ".*?" + re.escape(_STAMP_CLOSE), re.S)
+
+
+def generated_stamp(fmt: str = "%B %d, %Y at %I:%M %p", utc: bool = False) -> str:
+    """Current time for a template's "Generated on" line, excluded from the cache key"""
+    now = datetime.now(timezone.utc) if utc else datetime.now()
+    return f"{_STAMP_OPEN}{now.strftime(fmt)}{_STAMP_CLOSE}"
+
+
+class PdfCache:
+    """LRU (by total bytes) cache of PDF files keyed by rendered-HTML hash"""
+
+    def __init__(self, directory: str = DEFAULT_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._files: "OrderedDict[str, int]" = OrderedDict()  # key → size, oldest first
+        self._bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+        self._errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and bool(self.directory)
+
+    @staticmethod
+    def make_key(html_content: str, is_trial: bool = False) -> str:
+        digest = hashlib.sha256(_STAMP_RE.sub(_STAMP_OPEN, html_content).encode("utf-8"))
+        digest.update(b"\0trial" if is_trial else b"\0full")
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _ensure_loaded(self) -> None:
+        """Index the files already on disk (other workers, earlier runs), oldest first (caller holds the lock)"""
+        if self._loaded:
+            return
+        self._loaded = True
+        found = []
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.endswith(".pdf"):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        except OSError as e:
+            logger.warning(f"PDF cache directory unavailable: {e}")
+            self._errors += 1
+        for _, key, size in sorted(found):
+            self._files[key] = size
+            self._bytes += size
+        self._evict()
+
+    def _forget(self, key: str) -> None:
+        size = self._files.pop(key, None)
+        if size is not None:
+            self._bytes -= size
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._files:
+            key, size = self._files.popitem(last=False)
+            self._bytes -= size
+            self._evictions += 1
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Cached PDF bytes, or None (blocking file I/O)"""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            data = None
+        except OSError as e:
+            logger.warning(f"PDF cache read failed: {e}")
+            data = None
+        with self._lock:
+            self._ensure_loaded()
+            if data is None:
+                self._forget(key)
+                self._misses += 1
+                return None
+            if key not in self._files:
+                # Written by another worker
+                self._files[key] = len(data)
+                self._bytes += len(data)
+            self._files.move_to_end(key)
+            self._hits += 1
+        return data
+
+    def put(self, key: str, pdf: bytes) -> None:
+        """Store a rendered PDF and evict down to max_bytes (blocking file I/O)"""
+        if not self.enabled or len(pdf) > self.max_bytes:
+            return
+        with self._lock:
+            self._ensure_loaded()
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(pdf)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"PDF cache write failed: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            with self._lock:
+                self._errors += 1
+            return
+        with self._lock:
+            self._forget(key)
+            self._files[key] = len(pdf)
+            self._bytes += len(pdf)
+            self._stores += 1
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ensure_loaded()
+            for key in list(self._files):
+                try:
+                    os.unlink(self._path(key))
+                except FileNotFoundError:
+                    pass
+            self._files.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "directory": self.directory,
+                "entries": len(self._files),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "stores": self._stores,
+                "evictions": self._evictions,
+                "errors": self._errors,
+            }
+
+
+# Process-wide singleton
+_pdf_cache = PdfCache()
+
+
+def get_pdf_cache() -> PdfCache:
+    """Get the process-wide PDF artifact cache"""
+    return _pdf_cache
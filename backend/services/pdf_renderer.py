@@ -0,0 +1,256 @@
+"""
+PDF Render Pool
+===============
+
+WeasyPrint layout is CPU-bound (hundreds of ms for a GST invoice) and used
+to run inside async handlers, stalling every other request on the worker.
+All HTML → PDF rendering now goes through render_pdf(), which runs the
+render in a bounded process pool and only awaits the result.
+
+- PDF_RENDER_WORKERS (default min(4, cpus)) worker processes, started on
+  first use with the "spawn" method (the API process holds Motor threads).
+  0 renders in a thread instead (dev / tests without a pool).
+- PDF_RENDER_MAX_QUEUE (default 32) renders may wait for a worker. Beyond
+  that render_pdf raises PdfRenderBusy at once (503, Retry-After) instead
+  of piling up requests.
+- PDF_RENDER_TIMEOUT_SECONDS (default 30) per render, queue wait included.
+  A render that is still running at the deadline has its pool recycled
+  (worker processes terminated) and raises PdfRenderTimeout (504).
+
+Errors raised by WeasyPrint itself propagate unchanged, so existing
+fallbacks in the routes keep working. get_stats() feeds
+/api/platform/cache-stats.
+
+Usage:
+    from services.pdf_renderer import render_pdf
+    pdf_bytes = await render_pdf(html_content, is_trial=is_trial)
+    pdf_bytes = await render_pdf(html_content, cache=True)  # documents downloaded repeatedly
+"""
+
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from fastapi.responses import JSONResponse
+
+from services.pdf_cache import get_pdf_cache
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_WORKERS = int(os.environ.get("PDF_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+DEFAULT_MAX_QUEUE = int(os.environ.get("PDF_RENDER_MAX_QUEUE", "32"))
+DEFAULT_TIMEOUT_SECONDS = float(os.environ.get("PDF_RENDER_TIMEOUT_SECONDS", "30"))
+BUSY_RETRY_AFTER_SECONDS = 5
+
+
+class PdfRenderError(Exception):
+    """The render pool could not produce the PDF (not a WeasyPrint error)"""
+
+
+class PdfRenderBusy(PdfRenderError):
+    """Too many renders queued"""
+
+
+class PdfRenderTimeout(PdfRenderError):
+    """Render did not finish within the timeout"""
+
+
+# ==================== WORKER SIDE ====================
+
+def _render_html(html_content: str, is_trial: bool) -> bytes:
+    """Default render function (runs in a pool worker)"""
+    from services.pdf_service import generate_pdf_from_html
+    return generate_pdf_from_html(html_content, is_trial=is_trial)
+
+
+def _render_html_shared_styles(html_content: str, is_trial: bool) -> bytes:
+    """Bulk render function: stylesheets and fonts reused across documents in the worker"""
+    from services.pdf_service import generate_pdf_shared_styles
+    return generate_pdf_shared_styles(html_content, is_trial=is_trial)
+
+
+def _init_worker() -> None:
+    # Pay the WeasyPrint import (fonts, cairo/pango bindings) once per worker
+    try:
+        import services.pdf_service  # noqa: F401
+    except Exception as e:
+        logger.warning(f"PDF worker warm-up failed: {e}")
+
+
+def _timed(render_fn: Callable[[str, bool], bytes], html_content: str, is_trial: bool) -> Tuple[bytes, float]:
+    start = time.perf_counter()
+    pdf = render_fn(html_content, is_trial)
+    return pdf, time.perf_counter() - start
+
+
+# ==================== POOL ====================
+
+class PdfRenderer:
+    """Bounded process pool for HTML → PDF renders, with queue limit, timeout and metrics"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_queue: int = DEFAULT_MAX_QUEUE,
+                 timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+                 render_fn: Callable[[str, bool], bytes] = _render_html):
+        self.workers = max(0, workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout_seconds = timeout_seconds
+        self.render_fn = render_fn
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._peak_pending = 0
+        self._submitted = 0
+        self._rendered = 0
+        self._failed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._recycles = 0
+        self._render_seconds = 0.0
+        self._max_render_seconds = 0.0
+        self._wait_seconds = 0.0
+
+    @property
+    def capacity(self) -> int:
+        """Renders allowed at once (running + queued)"""
+        return max(1, self.workers) + self.max_queue
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.workers:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-render")
+            return self._executor
+
+    def _recycle(self, executor: Executor) -> None:
+        """Replace the pool, terminating its worker processes"""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self._recycles += 1
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        logger.warning(f"PDF render pool recycled ({len(processes)} worker(s) terminated)")
+
+    async def render(self, html_content: str, is_trial: bool = False,
+                     render_fn: Optional[Callable[[str, bool], bytes]] = None) -> bytes:
+        """Render HTML to PDF bytes off the event loop (`render_fn` overrides the pool's default)"""
+        with self._lock:
+            if self._pending >= self.capacity:
+                self._rejected += 1
+                raise PdfRenderBusy(f"PDF renderer busy ({self._pending} renders queued)")
+            self._pending += 1
+            self._submitted += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+
+        start = time.perf_counter()
+        executor = self._get_executor()
+        try:
+            future = executor.submit(_timed, render_fn or self.render_fn, html_content, is_trial)
+            try:
+                pdf, render_seconds = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout_seconds)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self._timeouts += 1
+                if not future.cancel() and self.workers:
+                    # Still laying out: the only way to stop it is to kill the worker
+                    self._recycle(executor)
+                raise PdfRenderTimeout(f"PDF render exceeded {self.timeout_seconds:g}s")
+            except BrokenExecutor as e:
+                with self._lock:
+                    self._failed += 1
+                self._recycle(executor)
+                raise PdfRenderError(f"PDF render worker died: {e}") from e
+        except PdfRenderError:
+            raise
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+        with self._lock:
+            self._rendered += 1
+            self._render_seconds += render_seconds
+            self._max_render_seconds = max(self._max_render_seconds, render_seconds)
+            self._wait_seconds += max(0.0, time.perf_counter() - start - render_seconds)
+        return pdf
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool counters for monitoring"""
+        with self._lock:
+            rendered = self._rendered
+            return {
+                "mode": "process" if self.workers else "thread",
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "timeout_seconds": self.timeout_seconds,
+                "in_flight": self._pending,
+                "peak_in_flight": self._peak_pending,
+                "submitted": self._submitted,
+                "rendered": rendered,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+                "recycles": self._recycles,
+                "avg_render_ms": round(self._render_seconds / rendered * 1000, 1) if rendered else 0.0,
+                "max_render_ms": round(self._max_render_seconds * 1000, 1),
+                "avg_wait_ms": round(self._wait_seconds / rendered * 1000, 1) if rendered else 0.0,
+            }
+
+
+# Process-wide singleton
+_pdf_renderer = PdfRenderer()
+
+
+def get_pdf_renderer() -> PdfRenderer:
+    """Get the process-wide PDF render pool"""
+    return _pdf_renderer
+
+
+async def render_pdf(html_content: str, is_trial: bool = False, cache: bool = False) -> bytes:
+    """
+    Render HTML to PDF through the shared pool (adds the TRIAL watermark when
+    asked). With `cache`, an identical earlier render is served from the
+    on-disk PDF cache (services/pdf_cache.py) and new renders are stored.
+    """
+    if not cache:
+        return await _pdf_renderer.render(html_content, is_trial=is_trial)
+    pdf_cache = get_pdf_cache()
+    key = pdf_cache.make_key(html_content, is_trial)
+    pdf = await asyncio.to_thread(pdf_cache.get, key)
+    if pdf is None:
+        pdf = await _pdf_renderer.render(html_content, is_trial=is_trial)
+        await asyncio.to_thread(pdf_cache.put, key, pdf)
+    return pdf
+
+
+async def pdf_render_error_handler(request, exc: PdfRenderError) -> JSONResponse:
+    """App exception handler: busy → 503 with Retry-After, timeout → 504"""
+    if isinstance(exc, PdfRenderTimeout):
+        return JSONResponse(status_code=504, content={"detail": str(exc)})
+    headers = {"Retry-After": str(BUSY_RETRY_AFTER_SECONDS)} if isinstance(exc, PdfRenderBusy) else None
+    return JSONResponse(status_code=503, content={"detail": str(exc) or "PDF rendering unavailable"}, headers=headers)
@@ -4,10 +4,14 @@ Uses WeasyPrint to generate professional GST-compliant PDF documents
 Supports IRN/QR code for E-Invoicing
 """
 from weasyprint import HTML, CSS
+from weasyprint.text.fonts import FontConfiguration
 from io import BytesIO
-from datetime import datetime
 import base64
+import hashlib
 import logging
+import re
+
+from services.pdf_cache import generated_stamp
 
 logger = logging.getLogger(__name__)
 
@@ -923,7 +927,7 @@ def generate_gst_invoice_html(
         
         <!-- Footer -->
         <div class="footer">
-            This is a computer generated invoice | Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')}
+            This is a computer generated invoice | Generated on {generated_stamp()}
         </div>
     </body>
     </html>
@@ -1278,7 +1282,7 @@ def generate_invoice_html(invoice: dict, org_settings: dict = None) -> str:
         ''' if invoice.get('terms') else ''}
         
         <div class="footer">
-            Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')} | <strong>{company_name}</strong> | Powered by Battwheels OS
+            Generated on {generated_stamp()} | <strong>{company_name}</strong> | Powered by Battwheels OS
         </div>
     </body>
     </html>
@@ -1531,7 +1535,7 @@ def generate_credit_note_html(
         </div>
         
         <div class="footer">
-            This is a computer generated credit note | Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')}
+            This is a computer generated credit note | Generated on {generated_stamp()}
         </div>
     </body>
     </html>
@@ -1568,6 +1572,38 @@ def generate_pdf_from_html(html_content: str, is_trial: bool = False) -> bytes:
     return pdf_buffer.getvalue()
 
 
+# Per-process state for bulk renders: one font configuration and the parsed
+# <style> sheets of the templates seen so far
+_STYLE_BLOCK_RE = re.compile(r"<style[^>]*>(.*?)</style>", re.S | re.I)
+_PARSED_STYLESHEETS_MAX = 32
+_font_config = None
+_parsed_stylesheets = {}
+
+
+def generate_pdf_shared_styles(html_content: str, is_trial: bool = False) -> bytes:
+    """
+    Same output as generate_pdf_from_html for bulk runs of one template: the
+    document's <style> blocks are parsed once per process (keyed by their
+    text) and passed as a pre-built stylesheet with a shared font
+    configuration, instead of re-parsing CSS and reloading fonts per document.
+    """
+    global _font_config
+    if _font_config is None:
+        _font_config = FontConfiguration()
+    css_text = "\n".join(_STYLE_BLOCK_RE.findall(html_content))
+    html_content = _STYLE_BLOCK_RE.sub("", html_content)
+    if is_trial:
+        html_content = html_content.replace('<body>', '<body>' + _TRIAL_WATERMARK_CSS, 1)
+
+    key = hashlib.sha1(css_text.encode("utf-8")).hexdigest()
+    stylesheet = _parsed_stylesheets.get(key)
+    if stylesheet is None:
+        if len(_parsed_stylesheets) >= _PARSED_STYLESHEETS_MAX:
+            _parsed_stylesheets.clear()
+        stylesheet = _parsed_stylesheets[key] = CSS(string=css_text, font_config=_font_config)
+    return HTML(string=html_content).write_pdf(stylesheets=[stylesheet], font_config=_font_config)
+
+
 def generate_estimate_html(estimate: dict, org_settings: dict = None) -> str:
     """Generate HTML template for estimate/quote"""
     org = org_settings or {}
@@ -1710,7 +1746,7 @@ def generate_estimate_html(estimate: dict, org_settings: dict = None) -> str:
             </table>
         </div>
         <div class="footer">
-            Generated on {datetime.now().strftime('%B %d, %Y')} | <strong>{company_name}</strong> | Powered by Battwheels OS
+            Generated on {generated_stamp('%B %d, %Y')} | <strong>{company_name}</strong> | Powered by Battwheels OS
         </div>
     </body>
     </html>
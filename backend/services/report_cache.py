@@ -0,0 +1,266 @@
+"""
+Report Cache
+============
+
+Per-org, in-process cache of dashboard / report endpoint results
+(routes/financial_dashboard.py, reports_advanced /dashboard-summary,
+routes/insights.py).
+
+Entries are keyed by (org_id, endpoint, query params) and tagged with the
+org's "financial data version". Anything that changes the numbers behind a
+report bumps that version:
+
+- journal postings (services/account_period_balances.apply_journal_entry)
+- successful writes to invoice / payment / bill / expense / banking routes
+  (FinancialVersionStage in middleware/pipeline.py)
+- scheduler jobs that create or re-status invoices and expenses
+
+Reads:
+- fresh (same version, younger than REPORT_CACHE_TTL_SECONDS)  → hit
+- stale (version bumped or TTL passed, but younger than
+  REPORT_CACHE_STALE_SECONDS)                                    → the stale
+  value is returned at once and one background task recomputes it
+  (stale-while-revalidate), so a dashboard view never waits on a recompute
+- anything older, or no entry                                    → computed
+  inline; concurrent requests for the same key share one computation
+
+The cache and the version counters are per-process. The TTL bounds
+staleness across uvicorn workers.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_TTL_SECONDS = float(os.environ.get("REPORT_CACHE_TTL_SECONDS", "60"))
+DEFAULT_STALE_SECONDS = float(os.environ.get("REPORT_CACHE_STALE_SECONDS", "600"))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("REPORT_CACHE_MAX_ENTRIES", "5000"))
+
+# Route prefixes whose writes change report numbers
+FINANCIAL_WRITE_PREFIXES = (
+    "/api/v1/invoices",            # /invoices, /invoices-enhanced
+    "/api/v1/invoice-payments",
+    "/api/v1/invoice-automation",
+    "/api/v1/recurring-invoices",
+    "/api/v1/ticket-invoices",
+    "/api/v1/ticket-estimates",
+    "/api/v1/payments",            # /payments, /payments-received
+    "/api/v1/bills",               # /bills, /bills-enhanced
+    "/api/v1/expenses",
+    "/api/v1/credit-notes",
+    "/api/v1/vendor-credits",
+    "/api/v1/journal-entries",
+    "/api/v1/banking",
+    "/api/v1/inv-adjustments",
+)
+
+ReportKey = Tuple[str, str, Tuple[Tuple[str, Any], ...]]
+
+
+@dataclass
+class _ReportEntry:
+    value: Any
+    version: int
+    fresh_until: float
+    stale_until: float
+
+
+class ReportCache:
+    """LRU + TTL cache of report results with per-org version invalidation"""
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 stale_seconds: float = DEFAULT_STALE_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = max(stale_seconds, ttl_seconds)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[ReportKey, _ReportEntry]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._inflight: Dict[ReportKey, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._refreshes = 0
+        self._refresh_errors = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    @staticmethod
+    def make_key(organization_id: str, endpoint: str, params: Optional[Dict[str, Any]] = None) -> ReportKey:
+        return (organization_id, endpoint, tuple(sorted((params or {}).items())))
+
+    def version(self, organization_id: str) -> int:
+        with self._lock:
+            return self._versions.get(organization_id, 0)
+
+    def bump_version(self, organization_id: str) -> int:
+        """Mark every cached report of the org as out of date"""
+        with self._lock:
+            version = self._versions.get(organization_id, 0) + 1
+            self._versions[organization_id] = version
+            self._invalidations += 1
+            return version
+
+    def _store(self, key: ReportKey, value: Any, version: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = _ReportEntry(value, version, now + self.ttl_seconds, now + self.stale_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    async def _compute(self, key: ReportKey, compute: Callable[[], Awaitable[Any]]) -> Any:
+        version = self.version(key[0])
+        try:
+            value = await compute()
+            self._store(key, value, version)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _start(self, key: ReportKey, compute: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Shared computation for a key (caller holds the lock)"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._compute(key, compute))
+            self._inflight[key] = task
+        return task
+
+    def _refresh_done(self, task: asyncio.Task) -> None:
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            with self._lock:
+                self._refresh_errors += 1
+            logger.warning(f"Report cache background refresh failed: {exc}")
+
+    async def get_or_compute(self, organization_id: str, endpoint: str, params: Optional[Dict[str, Any]],
+                             compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached report value, computing (inline or in the background) as needed"""
+        if not self.enabled or not organization_id:
+            return await compute()
+
+        key = self.make_key(organization_id, endpoint, params)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            current = self._versions.get(organization_id, 0)
+            if entry is not None and entry.stale_until <= now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry.version == current and entry.fresh_until > now:
+                    self._hits += 1
+                    return entry.value
+                # Stale: serve it and revalidate once in the background
+                self._stale_hits += 1
+                if key not in self._inflight:
+                    self._refreshes += 1
+                    self._start(key, compute).add_done_callback(self._refresh_done)
+                return entry.value
+            self._misses += 1
+            task = self._start(key, compute)
+        return await asyncio.shield(task)
+
+    def invalidate(self, organization_id: str) -> int:
+        """Drop every cached report of an org"""
+        with self._lock:
+            keys = [k for k in self._entries if k[0] == organization_id]
+            for k in keys:
+                del self._entries[k]
+            self._invalidations += 1
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+            self._versions.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring (stale hits count as hits)"""
+        with self._lock:
+            lookups = self._hits + self._stale_hits + self._misses
+            served = self._hits + self._stale_hits
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "stale_seconds": self.stale_seconds,
+                "hits": self._hits,
+                "stale_hits": self._stale_hits,
+                "misses": self._misses,
+                "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+                "refreshes": self._refreshes,
+                "refresh_errors": self._refresh_errors,
+                "refreshing": len(self._inflight),
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+# Process-wide singleton
+_report_cache = ReportCache()
+
+
+def get_report_cache() -> ReportCache:
+    """Get the process-wide report cache"""
+    return _report_cache
+
+
+def bump_financial_version(organization_id: Optional[str]) -> None:
+    """Invalidate cached reports of an org after a financial write"""
+    if organization_id:
+        _report_cache.bump_version(organization_id)
+
+
+def is_financial_write(method: str, path: str) -> bool:
+    """True for a mutating request to a route that changes report numbers"""
+    return method not in ("GET", "HEAD", "OPTIONS") and path.startswith(FINANCIAL_WRITE_PREFIXES)
+
+
+def cached_report(endpoint: str, get_org_id: Callable[[Any], Any]):
+    """
+    Cache a FastAPI report endpoint per org and query params.
+
+    `get_org_id(request)` (sync or async) is the route module's own org
+    resolver; requests without an org bypass the cache. The endpoint must
+    take `request` as a keyword and return a JSON-serialisable value that
+    callers do not mutate.
+
+        @router.get("/summary")
+        @cached_report("financial.summary", get_org_id)
+        async def get_financial_summary(request: Request): ...
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            request = kwargs.get("request", args[0] if args else None)
+            org_id = get_org_id(request)
+            if inspect.isawaitable(org_id):
+                org_id = await org_id
+            params = {k: v for k, v in kwargs.items() if k != "request"}
+            return await _report_cache.get_or_compute(
+                org_id, endpoint, params, lambda: func(*args, **kwargs)
+            )
+        return wrapper
+    return decorator
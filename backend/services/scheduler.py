@@ -10,6 +10,8 @@ import os
 logger = logging.getLogger(__name__)
 
 from utils.database import db as _db
+from services.report_cache import bump_financial_version
+from services.gst_ledger import sync_gst_document
 
 def get_db():
     return _db
@@ -41,6 +43,7 @@ async def update_overdue_invoices():
             {"_id": inv["_id"], "organization_id": inv.get("organization_id")},
             {"$set": {"status": "overdue"}}
         )
+        bump_financial_version(inv.get("organization_id"))
         updated += 1
     
     logger.info(f"Marked {updated} invoices as overdue")
@@ -108,6 +111,8 @@ async def generate_recurring_invoices():
             }
             
             await db.invoices.insert_one(invoice)
+            await sync_gst_document(db, "invoices", invoice_id)
+            bump_financial_version(org_id)
             
             # Update customer outstanding (scoped to org)
             # SCHEDULER-FIX: org_id scoped from recurring profile — Sprint 1B
@@ -202,6 +207,7 @@ async def generate_recurring_expenses():
                 "account_id": re.get("account_id"),
                 "account_name": re.get("account_name"),
                 "date": today,
+                "expense_date": today,
                 "amount": re.get("amount", 0),
                 "tax_percentage": re.get("tax_percentage", 0),
                 "tax_amount": re.get("tax_amount", 0),
@@ -216,6 +222,8 @@ async def generate_recurring_expenses():
             }
             
             await db.expenses.insert_one(expense)
+            await sync_gst_document(db, "expenses", expense_id)
+            bump_financial_version(org_id)
             
             # Calculate next date (simplified)
             frequency = re.get("recurrence_frequency", "monthly")
@@ -345,6 +353,31 @@ async def send_payment_reminders():
     return {"reminders_queued": reminders_sent}
 
 
+async def repair_account_balance_drift():
+    """
+    Incrementally re-sync chart_of_accounts balances from journal entries for
+    every org with journal entries (accounts touched since the last run only).
+    Should be run nightly.
+    """
+    db = get_db()
+    from services.double_entry_service import DoubleEntryService
+    service = DoubleEntryService(db)
+
+    org_ids = [o for o in await db.journal_entries.distinct("organization_id") if o]
+    synced_accounts = 0
+    errors = 0
+    for org_id in org_ids:
+        try:
+            result = await service.sync_all_account_balances(org_id, incremental=True)
+            synced_accounts += result["synced_accounts"]
+        except Exception as e:
+            errors += 1
+            logger.error(f"Balance drift repair failed for org {org_id}: {e}")
+
+    logger.info(f"Balance drift repair: {synced_accounts} accounts across {len(org_ids)} orgs")
+    return {"orgs": len(org_ids), "synced_accounts": synced_accounts, "errors": errors}
+
+
 async def run_all_scheduled_jobs():
     """Run all scheduled jobs - can be triggered via API"""
     results = {}
@@ -369,6 +402,11 @@ async def run_all_scheduled_jobs():
     except Exception as e:
         results["payment_reminders"] = {"error": str(e)}
 
+    try:
+        results["account_balance_drift"] = await repair_account_balance_drift()
+    except Exception as e:
+        results["account_balance_drift"] = {"error": str(e)}
+
     try:
         from services.continuous_learning_service import ContinuousLearningService
         learning_svc = ContinuousLearningService(get_db())
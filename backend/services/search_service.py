@@ -18,6 +18,7 @@ from datetime import datetime, timezone
 from collections import Counter
 
 from services.embedding_service import EmbeddingService, get_embedding_service
+from services.text_index import InvertedIndex, filter_matches, get_text_index
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +39,12 @@ EV_SYNONYMS = {
     "not working": ["failed", "dead", "stuck", "broken", "malfunction"],
 }
 
+# Relative BM25 weight of query tokens, their EV synonyms, and fuzzy
+# vocabulary variants of either
+QUERY_TERM_WEIGHT = 1.0
+SYNONYM_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.6
+
 # Stopwords to filter from search
 STOPWORDS = {
     "the", "a", "an", "is", "are", "was", "were", "be", "been", "being",
@@ -181,103 +188,100 @@ class AdvancedSearchService:
     
     # ==================== SEARCH METHODS ====================
     
+    def text_index(self, collection: str = "failure_cards") -> InvertedIndex:
+        """Inverted index over a shared-brain collection (built on first search)"""
+        return get_text_index(self.db, collection, self.tokenize, self.fuzzy_match)
+    
+    def weight_query_terms(
+        self,
+        index: InvertedIndex,
+        query_tokens: List[str],
+        fuzzy: bool = True
+    ) -> Dict[str, float]:
+        """
+        Query terms → BM25 weight, resolved against the index vocabulary:
+        query tokens, then EV synonyms, then fuzzy variants of both.
+        """
+        weights: Dict[str, float] = {}
+        for token in self.expand_query(query_tokens):
+            weight = QUERY_TERM_WEIGHT if token in query_tokens else SYNONYM_WEIGHT
+            if token in index.postings:
+                weights[token] = max(weights.get(token, 0.0), weight)
+            if fuzzy:
+                for term in index.fuzzy_terms(token):
+                    weights[term] = max(weights.get(term, 0.0), weight * FUZZY_WEIGHT)
+        return weights
+    
     async def text_search(
         self,
         query: str,
         filter_query: Dict[str, Any] = None,
         limit: int = 20,
         fuzzy: bool = True,
-        org_id: str = None
+        org_id: str = None,
+        collection: str = "failure_cards"
     ) -> List[Dict[str, Any]]:
         """
-        Perform text-based search on failure cards.
+        Perform text-based search on failure cards (or knowledge articles).
         
-        Uses tokenization, BM25 scoring, and optional fuzzy matching.
+        BM25F from the inverted index postings, with EV synonym and fuzzy
+        expansion against the index vocabulary.
         """
-        filter_query = filter_query or {"status": {"$in": ["approved", "draft"]}}
+        filter_query = filter_query or (
+            {"status": {"$in": ["approved", "draft"]}} if collection == "failure_cards" else {}
+        )
         
         # Tokenize and expand query
         query_tokens = self.tokenize(query)
         if not query_tokens:
             return []
         
-        expanded_tokens = self.expand_query(query_tokens)
+        index = self.text_index(collection)
+        await index.refresh()
         
-        # Build MongoDB query - use $or with $regex for each field
-        or_conditions = []
-        for token in expanded_tokens:
-            if fuzzy:
-                pattern = f".*{token}.*"
-            else:
-                pattern = f"\\b{token}\\b"
-            
-            or_conditions.extend([
-                {"title": {"$regex": pattern, "$options": "i"}},
-                {"description": {"$regex": pattern, "$options": "i"}},
-                {"symptom_text": {"$regex": pattern, "$options": "i"}},
-                {"root_cause": {"$regex": pattern, "$options": "i"}}
-            ])
-        
-        # Add keyword matches
-        or_conditions.append({"keywords": {"$in": expanded_tokens}})
-        
-        mongo_query = {
-            **filter_query,
-            "$or": or_conditions
-        }
-        
-        # Fallback to simpler query if regex fails
-        try:
-            # TIER 2 SHARED-BRAIN: failure_cards cross-tenant by design — Sprint 1D
-            candidates = await self.db.failure_cards.find(
-                mongo_query,
-                {"_id": 0, "embedding_vector": 0}
-            ).limit(limit * 3).to_list(limit * 3)
-        except Exception as e:
-            logger.warning(f"Complex query failed, using simple: {e}")
-            # TIER 2 SHARED-BRAIN: failure_cards cross-tenant by design — Sprint 1D
-            # Simple keyword search
-            candidates = await self.db.failure_cards.find(
-                {**filter_query, "keywords": {"$in": expanded_tokens}},
-                {"_id": 0, "embedding_vector": 0}
-            ).limit(limit * 3).to_list(limit * 3)
-        
-        if not candidates:
+        term_weights = self.weight_query_terms(index, query_tokens, fuzzy)
+        scores = index.score(term_weights)
+        if not scores:
             return []
         
-        # Score candidates using BM25
-        scored_results = []
-        
-        for card in candidates:
-            # Build document tokens
-            doc_text = f"{card.get('title', '')} {card.get('description', '')} {card.get('symptom_text', '')} {card.get('root_cause', '')} {' '.join(card.get('keywords', []))}"
-            doc_tokens = self.tokenize(doc_text)
-            
-            # Compute BM25 score
-            bm25_score = self.compute_bm25_score(expanded_tokens, doc_tokens)
-            
-            # Bonus for exact keyword matches
-            keyword_matches = len(set(expanded_tokens) & set(card.get("keywords", [])))
-            keyword_bonus = keyword_matches * 0.1
-            
-            # Bonus for title match
-            title_tokens = self.tokenize(card.get("title", ""))
-            title_matches = len(set(query_tokens) & set(title_tokens))
-            title_bonus = title_matches * 0.2
-            
-            # Confidence and effectiveness boost
-            confidence_boost = card.get("confidence_score", 0.5) * 0.1
-            effectiveness_boost = card.get("effectiveness_score", 0) * 0.1
-            
-            total_score = bm25_score + keyword_bonus + title_bonus + confidence_boost + effectiveness_boost
-            
-            card["text_score"] = round(total_score, 4)
-            scored_results.append(card)
-        
-        # Sort by score
-        scored_results.sort(key=lambda x: x["text_score"], reverse=True)
+        # Bonus for exact keyword matches and query tokens in the title
+        if "keywords" in index.fields:
+            for key, matches in index.docs_with(self.expand_query(query_tokens), "keywords").items():
+                if key in scores:
+                    scores[key] += matches * 0.1
+        for key, matches in index.docs_with(query_tokens, "title").items():
+            if key in scores:
+                scores[key] += matches * 0.2
+        
+        # Confidence and effectiveness boost
+        for key in scores:
+            meta = index.meta(key)
+            scores[key] += (meta.get("confidence_score") or 0.5) * 0.1 + (meta.get("effectiveness_score") or 0) * 0.1
+        
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        in_memory_filter = index.supports_filter(filter_query)
+        if in_memory_filter:
+            ranked = [(k, s) for k, s in ranked if filter_matches(index.meta(k), filter_query)][:limit]
+        
+        # Fetch the winning documents (and apply filters the index cannot evaluate)
+        results = []
+        chunk = limit if in_memory_filter else limit * 3
+        for start in range(0, len(ranked), chunk):
+            batch = ranked[start:start + chunk]
+            # TIER 2 SHARED-BRAIN: failure_cards cross-tenant by design — Sprint 1D
+            docs = await self.db[collection].find(
+                {**({} if in_memory_filter else filter_query), index.key: {"$in": [k for k, _ in batch]}},
+                {"_id": 0, "embedding_vector": 0}
+            ).to_list(len(batch))
+            by_key = {d.get(index.key): d for d in docs}
+            for key, score in batch:
+                if key in by_key:
+                    by_key[key]["text_score"] = round(score, 4)
+                    results.append(by_key[key])
+            if len(results) >= limit:
+                break
         
-        return scored_results[:limit]
+        return results[:limit]
     
     async def vector_search(
         self,
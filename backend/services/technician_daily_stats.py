@@ -0,0 +1,376 @@
+"""
+Technician Daily Stats
+======================
+
+Materialized per-technician, per-day ticket counters (collection
+`technician_daily_stats`), so the technician performance report, the
+insights leaderboard / heatmap and the technician portal productivity page
+sum a few rows per day instead of folding every ticket in the range.
+
+One document per (organization_id, technician_id, date "YYYY-MM-DD", UTC):
+
+    {organization_id, technician_id, technician_name, date,
+     assigned, completed, closed, resolved,
+     resolution_minutes, resolution_count, response_minutes, response_count,
+     sla_tracked, sla_breached, sla_response_breaches, sla_resolution_breaches,
+     rating_total, rating_count, revenue,
+     by_priority: {priority: n}, by_vehicle_type: {type: n}, updated_at}
+
+`resolved` counts a ticket once: when work is completed, or when it is
+closed without a completed-work step. Resolution / response times and SLA
+outcome are recorded on close, ratings on the day the customer submits the
+survey, and revenue (estimate total before tax) on close.
+
+Maintenance:
+- TicketService.assign_ticket / complete_work / close_ticket, the
+  technician portal's complete-work endpoint, the SLA breach auto-reassign
+  and the public survey submission call the record_* functions (one upsert
+  each).
+- An org's rows are built from its tickets the first time a report needs
+  them (ensure_technician_stats) and can be rebuilt / verified with
+  scripts/rebuild_technician_stats.py.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+from pymongo import ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+
+COLLECTION = "technician_daily_stats"
+STATUS_COLLECTION = "technician_daily_stats_status"
+
+COUNTER_FIELDS = (
+    "assigned", "completed", "closed", "resolved",
+    "resolution_minutes", "resolution_count", "response_minutes", "response_count",
+    "sla_tracked", "sla_breached", "sla_response_breaches", "sla_resolution_breaches",
+    "rating_total", "rating_count", "revenue",
+)
+BREAKDOWN_FIELDS = ("by_priority", "by_vehicle_type")
+
+# Orgs whose rows are known to be built (per process)
+_ready_orgs = set()
+
+
+# ==================== HELPERS ====================
+
+def _parse(value) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def day_of(value) -> Optional[str]:
+    dt = _parse(value)
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%d") if dt else None
+
+
+def technician_of(ticket: Dict) -> Optional[str]:
+    return ticket.get("assigned_technician_id") or ticket.get("assigned_to")
+
+
+def _minutes_between(start, end) -> Optional[float]:
+    s, e = _parse(start), _parse(end)
+    if not s or not e:
+        return None
+    return max(0.0, (e - s).total_seconds() / 60)
+
+
+def _key(value) -> str:
+    # Breakdown keys become field names: no dots or leading $
+    return str(value or "unknown").replace(".", "_").lstrip("$") or "unknown"
+
+
+def estimate_revenue(estimate: Optional[Dict]) -> float:
+    """Pre-tax estimate total attributed to the closing technician"""
+    if not estimate:
+        return 0.0
+    return round(float(estimate.get("grand_total") or 0) - float(estimate.get("tax_total") or 0), 2)
+
+
+def close_deltas(ticket: Dict, closed_at, revenue: float = 0.0) -> Dict[str, float]:
+    """Counter increments for a ticket closed at `closed_at`"""
+    deltas: Dict[str, float] = {"closed": 1, "revenue": revenue}
+    if not ticket.get("work_completed_at"):
+        deltas["resolved"] = 1
+        deltas[f"by_priority.{_key(ticket.get('priority') or 'medium')}"] = 1
+    deltas[f"by_vehicle_type.{_key(ticket.get('vehicle_type'))}"] = 1
+
+    resolution = _minutes_between(ticket.get("created_at"), closed_at)
+    if resolution is not None:
+        deltas["resolution_minutes"] = resolution
+        deltas["resolution_count"] = 1
+    response = _minutes_between(ticket.get("created_at"), ticket.get("first_response_at"))
+    if response is not None:
+        deltas["response_minutes"] = response
+        deltas["response_count"] = 1
+
+    due = _parse(ticket.get("sla_resolution_due_at"))
+    if due:
+        deltas["sla_tracked"] = 1
+        late = bool(_parse(closed_at) and _parse(closed_at) > due)
+        if ticket.get("sla_response_breached") or ticket.get("sla_resolution_breached") or late:
+            deltas["sla_breached"] = 1
+    if ticket.get("sla_response_breached"):
+        deltas["sla_response_breaches"] = 1
+    if ticket.get("sla_resolution_breached"):
+        deltas["sla_resolution_breaches"] = 1
+    return deltas
+
+
+def complete_deltas(ticket: Dict) -> Dict[str, float]:
+    """Counter increments for completed work"""
+    return {"completed": 1, "resolved": 1, f"by_priority.{_key(ticket.get('priority') or 'medium')}": 1}
+
+
+# ==================== MAINTENANCE ====================
+
+async def _apply(db, organization_id: str, technician_id: str, day: str, deltas: Dict[str, float],
+                 technician_name: Optional[str] = None) -> None:
+    if not (organization_id and technician_id and day):
+        return
+    update: Dict[str, Any] = {
+        "$inc": deltas,
+        "$set": {"updated_at": datetime.now(timezone.utc).isoformat()},
+    }
+    if technician_name:
+        update["$set"]["technician_name"] = technician_name
+    await db[COLLECTION].update_one(
+        {"organization_id": organization_id, "technician_id": technician_id, "date": day},
+        update, upsert=True
+    )
+
+
+async def record_assignment(db, ticket: Dict, technician_id: str, technician_name: Optional[str], assigned_at) -> None:
+    await _apply(db, ticket.get("organization_id"), technician_id, day_of(assigned_at),
+                 {"assigned": 1}, technician_name)
+
+
+async def record_work_completed(db, ticket: Dict, completed_at, technician_id: Optional[str] = None) -> None:
+    await _apply(db, ticket.get("organization_id"), technician_of(ticket) or technician_id,
+                 day_of(completed_at), complete_deltas(ticket), ticket.get("assigned_technician_name"))
+
+
+async def record_ticket_closed(db, ticket: Dict, closed_at) -> None:
+    """Closing counters; `ticket` is the document as it was before the close"""
+    organization_id = ticket.get("organization_id")
+    technician_id = technician_of(ticket)
+    if not (organization_id and technician_id):
+        return
+    estimate = await db.ticket_estimates.find_one(
+        {"ticket_id": ticket.get("ticket_id"), "organization_id": organization_id},
+        {"_id": 0, "grand_total": 1, "tax_total": 1}
+    )
+    await _apply(db, organization_id, technician_id, day_of(closed_at),
+                 close_deltas(ticket, closed_at, estimate_revenue(estimate)),
+                 ticket.get("assigned_technician_name"))
+
+
+async def record_rating(db, review: Dict, rating: int, rated_at) -> None:
+    ticket = await db.tickets.find_one(
+        {"ticket_id": review.get("ticket_id"), "organization_id": review.get("organization_id")},
+        {"_id": 0, "assigned_technician_id": 1, "assigned_to": 1}
+    )
+    if ticket:
+        await _apply(db, review.get("organization_id"), technician_of(ticket), day_of(rated_at),
+                     {"rating_total": rating, "rating_count": 1})
+
+
+def _last_assigned_at(ticket: Dict):
+    for entry in reversed(ticket.get("status_history") or []):
+        if entry.get("status") == "assigned":
+            return entry.get("timestamp")
+    return ticket.get("created_at")
+
+
+async def _raw_daily_stats(db, organization_id: str) -> Dict[Tuple[str, str], Dict]:
+    """(technician_id, date) -> row, folded from tickets, estimates and reviews"""
+    rows: Dict[Tuple[str, str], Dict] = {}
+
+    def add(technician_id, day, deltas, name=None):
+        if not (technician_id and day):
+            return
+        row = rows.setdefault((technician_id, day), {"technician_name": None})
+        if name:
+            row["technician_name"] = name
+        for field, value in deltas.items():
+            if "." in field:
+                group, key = field.split(".", 1)
+                bucket = row.setdefault(group, {})
+                bucket[key] = bucket.get(key, 0) + value
+            else:
+                row[field] = row.get(field, 0) + value
+
+    revenue = {}
+    async for est in db.ticket_estimates.find(
+        {"organization_id": organization_id}, {"_id": 0, "ticket_id": 1, "grand_total": 1, "tax_total": 1}
+    ):
+        revenue[est.get("ticket_id")] = estimate_revenue(est)
+
+    technicians = {}
+    async for ticket in db.tickets.find(
+        {"organization_id": organization_id,
+         "$or": [{"assigned_technician_id": {"$nin": [None, ""]}}, {"assigned_to": {"$nin": [None, ""]}}]},
+        {"_id": 0, "ticket_id": 1, "organization_id": 1, "assigned_technician_id": 1, "assigned_to": 1,
+         "assigned_technician_name": 1, "status": 1, "status_history": 1, "priority": 1, "vehicle_type": 1,
+         "created_at": 1, "first_response_at": 1, "work_completed_at": 1, "closed_at": 1,
+         "sla_resolution_due_at": 1, "sla_response_breached": 1, "sla_resolution_breached": 1}
+    ):
+        technician_id = technician_of(ticket)
+        name = ticket.get("assigned_technician_name")
+        technicians[ticket.get("ticket_id")] = technician_id
+        add(technician_id, day_of(_last_assigned_at(ticket)), {"assigned": 1}, name)
+        if ticket.get("work_completed_at"):
+            add(technician_id, day_of(ticket["work_completed_at"]), complete_deltas(ticket), name)
+        if ticket.get("status") == "closed" and ticket.get("closed_at"):
+            add(technician_id, day_of(ticket["closed_at"]),
+                close_deltas(ticket, ticket["closed_at"], revenue.get(ticket.get("ticket_id"), 0.0)), name)
+
+    async for review in db.ticket_reviews.find(
+        {"organization_id": organization_id, "completed": True},
+        {"_id": 0, "ticket_id": 1, "rating": 1, "completed_at": 1}
+    ):
+        if review.get("rating"):
+            add(technicians.get(review.get("ticket_id")), day_of(review.get("completed_at")),
+                {"rating_total": int(review["rating"]), "rating_count": 1})
+    return rows
+
+
+async def rebuild_technician_stats(db, organization_id: str) -> Dict:
+    """Recompute an org's daily stats from its tickets and reviews"""
+    raw = await _raw_daily_stats(db, organization_id)
+    now = datetime.now(timezone.utc).isoformat()
+    ops = []
+    for (technician_id, day), row in raw.items():
+        key = {"organization_id": organization_id, "technician_id": technician_id, "date": day}
+        doc = {**key, **{f: row.get(f, 0) for f in COUNTER_FIELDS},
+               **{f: row.get(f, {}) for f in BREAKDOWN_FIELDS},
+               "technician_name": row.get("technician_name"), "updated_at": now}
+        ops.append(ReplaceOne(dict(key), doc, upsert=True))
+    if ops:
+        await db[COLLECTION].bulk_write(ops, ordered=False)
+
+    stale = 0
+    existing = await db[COLLECTION].find(
+        {"organization_id": organization_id}, {"_id": 1, "technician_id": 1, "date": 1}
+    ).to_list(None)
+    stale_ids = [d["_id"] for d in existing if (d.get("technician_id"), d.get("date")) not in raw]
+    if stale_ids:
+        stale = (await db[COLLECTION].delete_many({"_id": {"$in": stale_ids}})).deleted_count
+
+    await db[STATUS_COLLECTION].update_one(
+        {"organization_id": organization_id},
+        {"$set": {"organization_id": organization_id, "built_at": now, "rows": len(ops)}},
+        upsert=True
+    )
+    _ready_orgs.add(organization_id)
+    logger.info(f"Rebuilt {len(ops)} technician daily stats for org {organization_id} ({stale} stale removed)")
+    return {"organization_id": organization_id, "rows": len(ops), "stale_removed": stale}
+
+
+async def verify_technician_stats(db, organization_id: str) -> Dict:
+    """Compare the daily rows with a fresh fold of the tickets; returns the mismatching days"""
+    raw = await _raw_daily_stats(db, organization_id)
+    materialized = {
+        (d.get("technician_id"), d.get("date")): d
+        for d in await db[COLLECTION].find({"organization_id": organization_id}, {"_id": 0}).to_list(None)
+    }
+    mismatches = []
+    for key in set(raw) | set(materialized):
+        expected, actual = raw.get(key) or {}, materialized.get(key) or {}
+        fields = [f for f in COUNTER_FIELDS
+                  if abs(float(expected.get(f, 0)) - float(actual.get(f, 0) or 0)) > 0.01]
+        if fields:
+            mismatches.append({"technician_id": key[0], "date": key[1], "fields": fields})
+    mismatches.sort(key=lambda m: (m["date"] or "", m["technician_id"] or ""))
+    return {
+        "organization_id": organization_id,
+        "rows_checked": len(set(raw) | set(materialized)),
+        "mismatches": mismatches,
+        "ok": not mismatches
+    }
+
+
+async def ensure_technician_stats(db, organization_id: str) -> None:
+    """Build an org's daily stats from its tickets the first time they are needed"""
+    if organization_id in _ready_orgs:
+        return
+    if await db[STATUS_COLLECTION].find_one({"organization_id": organization_id}, {"_id": 1}):
+        _ready_orgs.add(organization_id)
+        return
+    await rebuild_technician_stats(db, organization_id)
+
+
+# ==================== READS ====================
+
+async def get_technician_totals(
+    db,
+    organization_id: str,
+    start_date: str,
+    end_date: str,
+    technician_id: Optional[str] = None,
+) -> Dict[str, Dict]:
+    """
+    technician_id -> counters summed over start_date..end_date (YYYY-MM-DD,
+    inclusive), with breakdowns merged. Reads one row per technician-day.
+    """
+    await ensure_technician_stats(db, organization_id)
+    match: Dict[str, Any] = {"organization_id": organization_id,
+                             "date": {"$gte": start_date[:10], "$lte": end_date[:10]}}
+    if technician_id:
+        match["technician_id"] = technician_id
+
+    totals: Dict[str, Dict] = {}
+    async for row in db[COLLECTION].find(match, {"_id": 0}):
+        acc = totals.setdefault(row["technician_id"], {
+            "technician_id": row["technician_id"], "technician_name": None,
+            **{f: 0 for f in COUNTER_FIELDS}, **{f: {} for f in BREAKDOWN_FIELDS},
+        })
+        if row.get("technician_name"):
+            acc["technician_name"] = row["technician_name"]
+        for f in COUNTER_FIELDS:
+            acc[f] += row.get(f) or 0
+        for f in BREAKDOWN_FIELDS:
+            for k, v in (row.get(f) or {}).items():
+                acc[f][k] = acc[f].get(k, 0) + v
+    return totals
+
+
+async def get_daily_series(db, organization_id: str, technician_id: str,
+                           start_date: str, end_date: str, field: str = "resolved") -> Dict[str, float]:
+    """date -> one counter for one technician"""
+    await ensure_technician_stats(db, organization_id)
+    rows = await db[COLLECTION].find(
+        {"organization_id": organization_id, "technician_id": technician_id,
+         "date": {"$gte": start_date[:10], "$lte": end_date[:10]}},
+        {"_id": 0, "date": 1, field: 1}
+    ).to_list(None)
+    return {r["date"]: r.get(field) or 0 for r in rows}
+
+
+def averages(totals: Dict) -> Dict[str, Optional[float]]:
+    """Derived means of a get_technician_totals entry"""
+    def mean(total, count):
+        return round(totals[total] / totals[count], 1) if totals[count] else None
+    return {
+        "avg_resolution_minutes": mean("resolution_minutes", "resolution_count"),
+        "avg_response_minutes": mean("response_minutes", "response_count"),
+        "avg_rating": mean("rating_total", "rating_count"),
+        "sla_compliance_pct": round((totals["sla_tracked"] - totals["sla_breached"]) / totals["sla_tracked"] * 100, 1)
+        if totals["sla_tracked"] else None,
+    }
+
+
+def reset_ready_cache() -> None:
+    """Forget which orgs have built rows (tests)"""
+    _ready_orgs.clear()
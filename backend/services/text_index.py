@@ -0,0 +1,374 @@
+"""
+Inverted Text Index
+===================
+
+Process-local BM25 index over the shared-brain text collections
+(failure_cards, knowledge_articles) for AdvancedSearchService.text_search,
+which used to send up to four `.*token.*` `$regex` clauses per expanded token
+(a collection scan every search) and re-tokenize each candidate in Python
+against guessed corpus statistics.
+
+Per collection:
+
+    postings   term → {doc key → per-field term frequencies}
+    docs       doc key → per-field token counts, indexed terms, filter fields
+    vocabulary sorted terms + bigram → terms, for prefix / edit-distance
+               expansion of query tokens against the vocabulary
+
+Scoring is BM25F: each field's term frequency is length-normalized against
+that field's true average length, weighted by the field boost, summed, then
+saturated once with k1; idf comes from the real document frequency.
+
+Sync: documents are added / re-indexed when cards or articles are created,
+updated or approved (sync_document, a no-op until the index is first used),
+and a version poll every REFRESH_SECONDS picks up writes from elsewhere
+(`updated_at` / `created_at` past the newest seen; count drift reloads).
+Full reloads build into a staging index and swap in between two reads, so a
+search never sees a half-loaded index; concurrent refreshes share one reload.
+"""
+
+import asyncio
+import bisect
+import logging
+import math
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = 30
+FULL_RELOAD_SECONDS = 600
+BATCH_SIZE = 2000
+
+K1 = 1.2
+B = 0.75
+
+# key field, field boosts, fields kept for in-memory filtering / score boosts
+COLLECTIONS: Dict[str, Dict[str, Any]] = {
+    "failure_cards": {
+        "key": "failure_id",
+        "fields": {"title": 2.0, "symptom_text": 1.5, "keywords": 1.5, "description": 1.0, "root_cause": 1.0},
+        "meta": ("status", "subsystem_category", "fault_category", "organization_id", "approval_status",
+                 "confidence_score", "effectiveness_score"),
+    },
+    "knowledge_articles": {
+        "key": "knowledge_id",
+        "fields": {"title": 2.0, "symptoms": 1.5, "tags": 1.5, "summary": 1.2, "content": 1.0},
+        "meta": ("approval_status", "scope", "organization_id", "subsystem", "knowledge_type",
+                 "confidence_score"),
+    },
+}
+
+# Attributes a full reload builds off to the side and swaps in together
+_STATE = ("postings", "docs", "length_totals", "vocabulary", "_bigram_terms", "_fuzzy_cache", "watermark")
+
+
+def _bigrams(term: str) -> Set[str]:
+    return {term[i:i + 2] for i in range(len(term) - 1)}
+
+
+def _field_text(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value if v)
+    return str(value) if value else ""
+
+
+def filter_matches(meta: Dict[str, Any], filter_query: Dict[str, Any]) -> bool:
+    """Equality / $in / $nin / $ne over indexed filter fields (see supports_filter)"""
+    for field, cond in filter_query.items():
+        value = meta.get(field)
+        if isinstance(cond, dict):
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+            if "$nin" in cond and value in cond["$nin"]:
+                return False
+            if "$ne" in cond and value == cond["$ne"]:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class InvertedIndex:
+    """BM25F postings for one collection, kept in sync by hooks and a version poll"""
+
+    def __init__(self, db, collection: str, tokenize: Callable[[str], List[str]],
+                 fuzzy_match: Callable[[str, str], bool],
+                 refresh_seconds: float = REFRESH_SECONDS,
+                 full_reload_seconds: float = FULL_RELOAD_SECONDS):
+        config = COLLECTIONS[collection]
+        self.db = db
+        self.collection = collection
+        self.key = config["key"]
+        self.fields: List[str] = list(config["fields"])
+        self.boosts: List[float] = list(config["fields"].values())
+        self.meta_fields: Tuple[str, ...] = config["meta"]
+        self.tokenize = tokenize
+        self.fuzzy_match = fuzzy_match
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self._staging: Optional["InvertedIndex"] = None
+        self._refresh_lock = asyncio.Lock()
+        self._refreshes = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self.postings: Dict[str, Dict[str, Tuple[int, ...]]] = {}
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.length_totals = [0] * len(self.fields)
+        self.vocabulary: List[str] = []
+        self._bigram_terms: Dict[str, Set[str]] = {}
+        self._fuzzy_cache: Dict[str, List[str]] = {}
+        self.watermark = ""
+        self.loaded_at = 0.0
+        self.polled_at = 0.0
+        self._loading = False
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def supports_filter(self, filter_query: Dict[str, Any]) -> bool:
+        return all(
+            field in self.meta_fields
+            and (not isinstance(cond, dict) or set(cond) <= {"$in", "$nin", "$ne"})
+            for field, cond in (filter_query or {}).items()
+        )
+
+    # ==================== DOCUMENTS ====================
+
+    def _add_term(self, term: str) -> None:
+        if self._loading:
+            self.vocabulary.append(term)  # sorted once at the end of load()
+        else:
+            bisect.insort(self.vocabulary, term)
+        for gram in _bigrams(term):
+            self._bigram_terms.setdefault(gram, set()).add(term)
+        self._fuzzy_cache.clear()
+
+    def _drop_term(self, term: str) -> None:
+        del self.postings[term]
+        if self._loading:
+            self.vocabulary.remove(term)
+        else:
+            i = bisect.bisect_left(self.vocabulary, term)
+            if i < len(self.vocabulary) and self.vocabulary[i] == term:
+                self.vocabulary.pop(i)
+        for gram in _bigrams(term):
+            self._bigram_terms.get(gram, set()).discard(term)
+        self._fuzzy_cache.clear()
+
+    def remove(self, key: str) -> None:
+        doc = self.docs.pop(key, None)
+        if doc is None:
+            return
+        for i, length in enumerate(doc["lengths"]):
+            self.length_totals[i] -= length
+        for term in doc["terms"]:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    self._drop_term(term)
+
+    def add(self, doc: Dict[str, Any]) -> bool:
+        """Index (or re-index) one document; False when it has no key"""
+        key = doc.get(self.key)
+        if not key:
+            return False
+        self.watermark = max(self.watermark, str(doc.get("updated_at") or ""), str(doc.get("created_at") or ""))
+        self.remove(key)
+
+        counts = [Counter(self.tokenize(_field_text(doc.get(f)))) for f in self.fields]
+        lengths = [sum(c.values()) for c in counts]
+        terms = set().union(*counts)
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                self._add_term(term)
+            postings[key] = tuple(c.get(term, 0) for c in counts)
+        for i, length in enumerate(lengths):
+            self.length_totals[i] += length
+        self.docs[key] = {
+            "lengths": lengths,
+            "terms": terms,
+            "meta": {f: doc.get(f) for f in self.meta_fields},
+        }
+        return True
+
+    # ==================== SYNC ====================
+
+    def _keyed(self) -> Dict[str, Any]:
+        return {self.key: {"$exists": True, "$nin": [None, ""]}}
+
+    def _projection(self) -> Dict[str, int]:
+        return {"_id": 0, self.key: 1, "updated_at": 1, "created_at": 1,
+                **{f: 1 for f in self.fields}, **{f: 1 for f in self.meta_fields}}
+
+    async def load(self) -> int:
+        """Full (re)load, streamed in batches into a staging index and swapped in at the end"""
+        staging = InvertedIndex(self.db, self.collection, self.tokenize, self.fuzzy_match)
+        self._staging = staging
+        # TIER 2 SHARED-BRAIN: cross-tenant by design — Sprint 1D
+        cursor = self.db[self.collection].find(self._keyed(), self._projection())
+        if hasattr(cursor, "batch_size"):
+            cursor = cursor.batch_size(BATCH_SIZE)
+        staging._loading = True
+        try:
+            async for doc in cursor:
+                staging.add(doc)
+        finally:
+            if self._staging is staging:
+                self._staging = None
+            staging._loading = False
+            staging.vocabulary.sort()
+        # No await from here on: readers see either the old state or the new one
+        for name in _STATE:
+            setattr(self, name, getattr(staging, name))
+        self.loaded_at = self.polled_at = time.monotonic()
+        logger.info(f"Text index loaded for {self.collection}: {len(self)} docs, {len(self.postings)} terms")
+        return len(self)
+
+    async def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and self.loaded_at and now - self.polled_at < self.refresh_seconds:
+            return
+        seen = self._refreshes
+        async with self._refresh_lock:
+            # Single flight: a refresh that finished while we waited covers this call
+            if self._refreshes != seen:
+                return
+            try:
+                await self._refresh()
+            finally:
+                self._refreshes += 1
+
+    async def _refresh(self) -> None:
+        now = time.monotonic()
+        if not self.loaded_at or now - self.loaded_at >= self.full_reload_seconds:
+            await self.load()
+            return
+
+        self.polled_at = now
+        if self.watermark:
+            changed = await self.db[self.collection].find(
+                {"$or": [{"updated_at": {"$gte": self.watermark}}, {"created_at": {"$gte": self.watermark}}]},
+                self._projection()
+            ).to_list(None)
+            for doc in changed:
+                self.add(doc)
+        expected = await self.db[self.collection].count_documents(self._keyed())
+        if expected != len(self):
+            await self.load()
+
+    async def sync(self, key: str) -> None:
+        """Re-read one document after a write; drops it if it is gone"""
+        doc = await self.db[self.collection].find_one({self.key: key}, self._projection())
+        # A reload in flight may already have streamed past this document
+        for index in filter(None, (self, self._staging)):
+            if doc:
+                index.add(doc)
+            else:
+                index.remove(key)
+
+    # ==================== QUERY ====================
+
+    def fuzzy_terms(self, token: str) -> List[str]:
+        """
+        Vocabulary terms fuzzy-matching `token` (prefix either way or close edit
+        distance). Edit-distance candidates must share bigrams with the token
+        (q-gram count filter), so only a slice of the vocabulary is compared.
+        """
+        cached = self._fuzzy_cache.get(token)
+        if cached is not None:
+            return cached
+
+        found = set()
+        # Terms the token is a prefix of
+        i = bisect.bisect_left(self.vocabulary, token)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(token):
+            found.add(self.vocabulary[i])
+            i += 1
+        # Terms that are a prefix of the token
+        found.update(token[:n] for n in range(3, len(token)) if token[:n] in self.postings)
+        # Close edit distance
+        shared = Counter()
+        for gram in _bigrams(token):
+            shared.update(self._bigram_terms.get(gram, ()))
+        for term, count in shared.items():
+            longest = max(len(term), len(token))
+            if abs(len(term) - len(token)) > 3 or term in found:
+                continue
+            if count >= longest - 1 - 2 * int(0.3 * longest) and self.fuzzy_match(token, term):
+                found.add(term)
+        found.discard(token)
+        result = sorted(found)
+        self._fuzzy_cache[token] = result
+        return result
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        n = len(self.docs)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def score(self, term_weights: Dict[str, float], keys: Optional[Set[str]] = None) -> Dict[str, float]:
+        """BM25F over the postings of `term_weights` (weight multiplies each term's contribution)"""
+        n = len(self.docs)
+        if not n:
+            return {}
+        averages = [total / n or 1.0 for total in self.length_totals]
+        scores: Dict[str, float] = {}
+        for term, weight in term_weights.items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term) * weight
+            for key, tfs in postings.items():
+                if keys is not None and key not in keys:
+                    continue
+                lengths = self.docs[key]["lengths"]
+                tf = 0.0
+                for f, count in enumerate(tfs):
+                    if count:
+                        tf += self.boosts[f] * count / (1 - B + B * lengths[f] / averages[f])
+                scores[key] = scores.get(key, 0.0) + idf * tf * (K1 + 1) / (tf + K1)
+        return scores
+
+    def docs_with(self, terms: Iterable[str], field: str) -> Counter:
+        """Per doc key, how many of `terms` occur in `field`"""
+        f = self.fields.index(field)
+        hits = Counter()
+        for term in set(terms):
+            for key, tfs in self.postings.get(term, {}).items():
+                if tfs[f]:
+                    hits[key] += 1
+        return hits
+
+    def meta(self, key: str) -> Dict[str, Any]:
+        return self.docs[key]["meta"]
+
+
+# ==================== SINGLETONS ====================
+
+_indexes: Dict[str, InvertedIndex] = {}
+
+
+def get_text_index(db, collection: str, tokenize: Callable[[str], List[str]],
+                   fuzzy_match: Callable[[str, str], bool]) -> InvertedIndex:
+    """The process-wide index for `collection` (loaded on first refresh)"""
+    index = _indexes.get(collection)
+    if index is None or index.db is not db:
+        index = _indexes[collection] = InvertedIndex(db, collection, tokenize, fuzzy_match)
+    return index
+
+
+async def sync_document(collection: str, key: Optional[str]) -> None:
+    """Write hook: re-index one card / article if this process has built that index"""
+    index = _indexes.get(collection)
+    if index is None or not index.loaded_at or not key:
+        return
+    try:
+        await index.sync(key)
+    except Exception as e:
+        logger.warning(f"Text index update failed for {collection} {key}: {e}")
@@ -15,6 +15,7 @@ from datetime import datetime, timezone, timedelta
 from pydantic import BaseModel, Field
 import uuid
 import logging
+from services.account_period_balances import apply_journal_entry
 
 logger = logging.getLogger(__name__)
 
@@ -1390,6 +1391,7 @@ class TicketEstimateService:
             }
             
             await self.db.journal_entries.insert_one(journal_entry)
+            await apply_journal_entry(self.db, journal_entry)
             logger.info(f"COGS journal entry posted: {entry_id} for ₹{total_cost}")
             
         except Exception as e:
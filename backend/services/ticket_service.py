@@ -26,6 +26,7 @@ import hashlib
 import re
 
 from events import get_dispatcher, EventType, EventPriority
+from services.technician_daily_stats import record_assignment, record_ticket_closed, record_work_completed
 
 logger = logging.getLogger(__name__)
 
@@ -547,6 +548,13 @@ class TicketService:
             {"ticket_id": ticket_id}, {"$set": update_dict}
         )
         
+        # Technician daily stats (reports, insights, technician portal)
+        if old_status != TicketState.CLOSED:
+            try:
+                await record_ticket_closed(self.db, existing, now)
+            except Exception as e:
+                logger.warning(f"Technician stats update failed for {ticket_id}: {e}")
+        
         # Update vehicle status if applicable
         if existing.get("vehicle_id"):
             await self.db.vehicles.update_one(
@@ -802,6 +810,11 @@ class TicketService:
             }}
         )
         
+        try:
+            await record_assignment(self.db, existing, technician_id, tech.get("name"), now)
+        except Exception as e:
+            logger.warning(f"Technician stats update failed for {ticket_id}: {e}")
+        
         # EMIT TICKET_ASSIGNED EVENT
         await self.dispatcher.emit(
             EventType.TICKET_ASSIGNED,
@@ -935,6 +948,11 @@ class TicketService:
             {"$set": update_data}
         )
         
+        try:
+            await record_work_completed(self.db, existing, now, technician_id=user_id)
+        except Exception as e:
+            logger.warning(f"Technician stats update failed for {ticket_id}: {e}")
+        
         # Deduct inventory for parts used
         if parts_used:
             org_id = existing.get("organization_id", "")
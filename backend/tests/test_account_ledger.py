@@ -0,0 +1,176 @@
+"""
+Tests for the Account Ledger (keyset pages, NDJSON stream)
+==========================================================
+Covers: opening balance from monthly rollup checkpoints plus the partial
+month, keyset batches with no row cap, cursor pages that carry the running
+balance, and the header / line / summary stream.
+"""
+
+import pytest
+import asyncio
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.double_entry_service import DoubleEntryService, decode_ledger_cursor
+from services import account_period_balances as apb
+from services.chart_of_accounts_cache import get_chart_of_accounts_cache
+
+
+# Unpatched, for the checkpoint test (other tests stub the opening balance)
+_real_totals_before = apb.get_account_totals_before
+
+ORG = "org-ledger"
+BANK = "acc_bank"
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def _cursor(docs):
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=docs)
+    return cursor
+
+
+class _FindCursor:
+    """find() cursor over in-memory entries honouring the ledger keyset query"""
+
+    def __init__(self, entries, query):
+        after = None
+        for clause in query.get("$or", []):
+            if "entry_id" in clause:
+                after = (clause["entry_date"], clause["entry_id"]["$gt"])
+        date_range = query["entry_date"]
+        self._docs = sorted(
+            (e for e in entries
+             if date_range["$gte"] <= e["entry_date"] <= date_range["$lte"]
+             and any(l["account_id"] == query["lines.account_id"] for l in e["lines"])
+             and (after is None or (e["entry_date"], e["entry_id"]) > after)),
+            key=lambda e: (e["entry_date"], e["entry_id"]))
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, n):
+        self._docs = self._docs[:n]
+        return self
+
+    async def to_list(self, n):
+        return self._docs
+
+
+def _entries(n):
+    entries = []
+    for i in range(n):
+        entries.append({
+            "entry_id": f"je_{i:05d}", "entry_date": f"2026-03-{1 + i % 28:02d}",
+            "reference_number": f"JE-GEN-202603-{i:05d}", "description": f"entry {i}",
+            "lines": [
+                {"account_id": BANK, "debit_amount": 10.0, "credit_amount": 0, "description": "in"},
+                {"account_id": "acc_sales", "debit_amount": 0, "credit_amount": 10.0, "description": ""},
+            ],
+        })
+    return entries
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def mock_db():
+    entries = _entries(1200)
+    db = MagicMock()
+    db.journal_entries.find = MagicMock(side_effect=lambda q, p=None: _FindCursor(entries, q))
+    db.journal_entries.aggregate = MagicMock(return_value=_cursor([]))
+    db.chart_of_accounts.find = MagicMock(return_value=_cursor([
+        {"account_id": BANK, "account_name": "Bank", "account_code": "1200",
+         "account_type": "Asset", "is_active": True},
+    ]))
+    get_chart_of_accounts_cache().clear()
+    yield db
+    get_chart_of_accounts_cache().clear()
+
+
+@pytest.fixture(autouse=True)
+def _opening_checkpoint():
+    # Bank had 1,000.00 debit / 250.00 credit before March
+    with patch.object(apb, "get_account_totals_before", new=AsyncMock(return_value=(1000.0, 250.0))) as m:
+        yield m
+
+
+# ==================== TESTS ====================
+
+class TestOpeningBalanceCheckpoints:
+
+    def test_rollups_before_month_plus_partial_raw(self):
+        db = MagicMock()
+        db.__getitem__.return_value.aggregate = MagicMock(
+            return_value=_cursor([{"debit": 900.0, "credit": 100.0}]))
+        db.journal_entries.aggregate = MagicMock(return_value=_cursor([{"debit": 50.0, "credit": 20.0}]))
+        with patch.object(apb, "ensure_period_balances", new=AsyncMock()):
+            debit, credit = run(_real_totals_before(db, ORG, BANK, "2026-03-15"))
+        assert (debit, credit) == (950.0, 120.0)
+        rollup_match = db.__getitem__.return_value.aggregate.call_args.args[0][0]["$match"]
+        assert rollup_match["period"] == {"$lt": "2026-03"}
+        raw_match = db.journal_entries.aggregate.call_args.args[0][0]["$match"]
+        assert raw_match["$or"] == apb.entry_date_clauses("2026-03-01", lt="2026-03-15")
+        assert raw_match["$or"][0] == {"entry_date": {"$gte": "2026-03-01", "$lt": "2026-03-15"}}
+
+
+class TestLedger:
+
+    def test_full_ledger_not_truncated(self, mock_db):
+        svc = DoubleEntryService(mock_db)
+        ledger = run(svc.get_account_ledger(ORG, BANK, "2026-03-01", "2026-03-31"))
+        assert len(ledger["entries"]) == 1200
+        assert ledger["opening_balance"] == 750.0
+        assert ledger["closing_balance"] == 750.0 + 12000.0
+        # Keyset batches of LEDGER_BATCH_SIZE (500)
+        assert mock_db.journal_entries.find.call_count == 3
+
+    def test_pages_chain_to_full_ledger(self, mock_db, _opening_checkpoint):
+        svc = DoubleEntryService(mock_db)
+        full = run(svc.get_account_ledger(ORG, BANK, "2026-03-01", "2026-03-31"))["entries"]
+
+        pages, cursor = [], None
+        while True:
+            page = run(svc.get_account_ledger_page(ORG, BANK, "2026-03-01", "2026-03-31",
+                                                   cursor=cursor, limit=350))
+            pages.extend(page["entries"])
+            if not page["has_more"]:
+                break
+            cursor = page["next_cursor"]
+        assert pages == full
+        # Only the full ledger and the first page compute it; later pages use the cursor
+        assert _opening_checkpoint.await_count == 2
+
+    def test_cursor_carries_running_balance(self, mock_db):
+        svc = DoubleEntryService(mock_db)
+        page = run(svc.get_account_ledger_page(ORG, BANK, "2026-03-01", "2026-03-31", limit=10))
+        (entry_date, entry_id), balance = decode_ledger_cursor(page["next_cursor"])
+        assert entry_id == page["entries"][-1]["entry_id"]
+        assert balance == Decimal(str(page["closing_balance"]))
+
+    def test_invalid_cursor(self, mock_db):
+        with pytest.raises(ValueError):
+            run(DoubleEntryService(mock_db).get_account_ledger_page(ORG, BANK, cursor="not-a-cursor"))
+
+    def test_stream_header_lines_summary(self, mock_db):
+        svc = DoubleEntryService(mock_db)
+
+        async def collect():
+            return [r async for r in svc.stream_account_ledger(ORG, BANK, "2026-03-01", "2026-03-31")]
+        records = run(collect())
+        assert records[0]["type"] == "header" and records[0]["opening_balance"] == 750.0
+        assert records[-1] == {"type": "summary", "closing_balance": 12750.0, "total_debit": 12000.0,
+                               "total_credit": 0.0, "line_count": 1200}
+        assert len(records) == 1202
+
+    def test_unknown_account(self, mock_db):
+        mock_db.chart_of_accounts.find = MagicMock(return_value=_cursor([]))
+        assert run(DoubleEntryService(mock_db).get_account_ledger(ORG, "acc_nope")) == {"error": "Account not found"}
@@ -0,0 +1,299 @@
+"""
+Tests for Account Period Balance Rollups
+========================================
+Covers: splitting report ranges into whole months (rollups) and partial
+months (raw lines), incremental rollup updates per posted entry, merging
+rollup and raw totals (string and datetime entry dates), lazy first build,
+version-guarded rebuilds racing postings, and verify drift detection.
+"""
+
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+from datetime import datetime, timezone
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pymongo import InsertOne, DeleteOne
+
+from services import account_period_balances as apb
+
+
+ORG = "org-apb"
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def _cursor(docs):
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=docs)
+    return cursor
+
+
+class _Rollups:
+    """account_period_balances: find plus a bulk_write that honours filters (version guards)"""
+
+    def __init__(self, docs=()):
+        self.docs = [dict(d, _id=i) for i, d in enumerate(docs)]
+
+    def find(self, query, projection=None):
+        return _cursor([dict(d) for d in self.docs if d["organization_id"] == query["organization_id"]])
+
+    def _match(self, query):
+        return next((d for d in self.docs if all(d.get(k) == v for k, v in query.items())), None)
+
+    async def bulk_write(self, ops, ordered=True, session=None):
+        deleted = 0
+        for op in ops:
+            if isinstance(op, InsertOne):
+                self.docs.append(dict(op._doc, _id=len(self.docs) + 100))
+                continue
+            doc = self._match(op._filter)
+            if isinstance(op, DeleteOne):
+                if doc is not None:
+                    self.docs.remove(doc)
+                    deleted += 1
+                continue
+            if doc is None:
+                if not op._upsert:
+                    continue
+                doc = dict(op._filter, _id=len(self.docs) + 100)
+                self.docs.append(doc)
+            for field, delta in op._doc.get("$inc", {}).items():
+                doc[field] = doc.get(field, 0) + delta
+            doc.update(op._doc.get("$set", {}))
+        return MagicMock(deleted_count=deleted)
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def mock_db():
+    collections = {}
+
+    def collection(name):
+        if name not in collections:
+            col = MagicMock()
+            col.aggregate = MagicMock(return_value=_cursor([]))
+            col.find = MagicMock(return_value=_cursor([]))
+            col.find_one = AsyncMock(return_value=None)
+            col.bulk_write = AsyncMock()
+            col.update_one = AsyncMock()
+            col.delete_many = AsyncMock()
+            collections[name] = col
+        return collections[name]
+
+    db = MagicMock()
+    db.__getitem__.side_effect = collection
+    db.journal_entries = collection("journal_entries")
+    apb.reset_ready_cache()
+    yield db
+    apb.reset_ready_cache()
+
+
+def _key(code, name, typ, account_id=None):
+    return {"account_id": account_id or f"acc_{code}", "account_name": name,
+            "account_code": code, "account_type": typ}
+
+
+# ==================== RANGE SPLITTING ====================
+
+class TestSplitDateRange:
+
+    def test_as_of_mid_month(self):
+        full, raw = apb.split_date_range(None, "2026-03-15")
+        assert full == (None, "2026-02")
+        assert raw == [("2026-03-01", None, "2026-03-15")]
+
+    def test_as_of_month_end_needs_no_raw_lines(self):
+        full, raw = apb.split_date_range(None, "2026-03-31")
+        assert full == (None, "2026-03")
+        assert raw == []
+
+    def test_fiscal_year(self):
+        full, raw = apb.split_date_range("2025-04-01", "2026-03-31")
+        assert full == ("2025-04", "2026-03")
+        assert raw == []
+
+    def test_partial_months_at_both_ends(self):
+        full, raw = apb.split_date_range("2025-04-10", "2025-07-20")
+        assert full == ("2025-05", "2025-06")
+        assert raw == [("2025-04-10", "2025-05-01", None), ("2025-07-01", None, "2025-07-20")]
+
+    def test_within_one_month(self):
+        assert apb.split_date_range("2025-04-10", "2025-04-20") == (None, [("2025-04-10", None, "2025-04-20")])
+
+    def test_adjacent_partial_months(self):
+        full, raw = apb.split_date_range("2025-04-10", "2025-05-20")
+        assert full is None
+        assert len(raw) == 2
+
+    def test_timestamp_cutoff_reads_its_month_raw(self):
+        full, raw = apb.split_date_range(None, "2026-03-31T23:59:59+00:00")
+        assert full == (None, "2026-02")
+        assert raw == [("2026-03-01", None, "2026-03-31T23:59:59+00:00")]
+
+
+# ==================== MAINTENANCE ====================
+
+class TestApplyJournalEntry:
+
+    def test_one_bulk_write_with_per_account_deltas(self, mock_db):
+        entry = {
+            "organization_id": ORG, "entry_date": "2026-03-14", "is_posted": True,
+            "lines": [
+                {**_key("1100", "Accounts Receivable", "Asset"), "debit_amount": 118.0, "credit_amount": 0},
+                {**_key("4100", "Sales Revenue", "Income"), "debit_amount": 0, "credit_amount": 60.0},
+                {**_key("4100", "Sales Revenue", "Income"), "debit_amount": 0, "credit_amount": 40.0},
+                {**_key("2210", "GST Payable - CGST", "Liability"), "debit_amount": 0, "credit_amount": 18.0},
+            ],
+        }
+        run(apb.apply_journal_entry(mock_db, entry))
+        bulk_write = mock_db[apb.COLLECTION].bulk_write
+        assert bulk_write.await_count == 1
+        ops = {op._filter["account_code"]: op for op in bulk_write.await_args.args[0]}
+        assert set(ops) == {"1100", "4100", "2210"}
+        assert ops["4100"]._filter["period"] == "2026-03"
+        assert ops["4100"]._doc["$inc"] == {"debit": 0.0, "credit": 100.0, "line_count": 2, "version": 1}
+        assert ops["4100"]._upsert is True
+
+    def test_unposted_entry_ignored(self, mock_db):
+        run(apb.apply_journal_entry(mock_db, {"organization_id": ORG, "is_posted": False, "lines": [{}]}))
+        mock_db[apb.COLLECTION].bulk_write.assert_not_awaited()
+
+
+# ==================== READS ====================
+
+class TestGetAccountTotals:
+
+    def test_rollups_merged_with_current_month_lines(self, mock_db):
+        mock_db[apb.STATUS_COLLECTION].find_one.return_value = {"_id": 1}
+        mock_db[apb.COLLECTION].aggregate.return_value = _cursor([
+            {"_id": _key("4100", "Sales Revenue", "Income"), "debit": 10.0, "credit": 1000.1},
+            {"_id": _key("1100", "Accounts Receivable", "Asset"), "debit": 990.1, "credit": 0.0},
+        ])
+        mock_db.journal_entries.aggregate.return_value = _cursor([
+            {"_id": _key("4100", "Sales Revenue", "Income"), "total_debit": 0, "total_credit": 0.2},
+            {"_id": _key("1200", "Bank Account", "Asset"), "total_debit": 0.2, "total_credit": 0},
+        ])
+        rows = run(apb.get_account_totals(mock_db, ORG, end_date="2026-03-15"))
+
+        assert [r["_id"]["account_code"] for r in rows] == ["1100", "1200", "4100"]
+        sales = rows[2]
+        assert sales["total_credit"] == 1000.3
+        assert sales["total_debit"] == 10.0
+
+        rollup_match = mock_db[apb.COLLECTION].aggregate.call_args.args[0][0]["$match"]
+        assert rollup_match["period"] == {"$lte": "2026-02"}
+        raw_match = mock_db.journal_entries.aggregate.call_args.args[0][0]["$match"]
+        assert raw_match["$or"][0] == {"entry_date": {"$gte": "2026-03-01", "$lte": "2026-03-15"}}
+        assert raw_match["is_posted"] is True
+
+    def test_raw_months_match_datetime_entry_dates(self, mock_db):
+        mock_db[apb.STATUS_COLLECTION].find_one.return_value = {"_id": 1}
+        run(apb.get_account_totals(mock_db, ORG, start_date="2025-04-10", end_date="2025-07-20"))
+        clauses = mock_db.journal_entries.aggregate.call_args.args[0][0]["$match"]["$or"]
+        assert clauses == [
+            {"entry_date": {"$gte": "2025-04-10", "$lt": "2025-05-01"}},
+            {"entry_date": {"$gte": datetime(2025, 4, 10, tzinfo=timezone.utc),
+                            "$lt": datetime(2025, 5, 1, tzinfo=timezone.utc)}},
+            {"entry_date": {"$gte": "2025-07-01", "$lte": "2025-07-20"}},
+            # A date-only end covers that whole day
+            {"entry_date": {"$gte": datetime(2025, 7, 1, tzinfo=timezone.utc),
+                            "$lt": datetime(2025, 7, 21, tzinfo=timezone.utc)}},
+        ]
+
+    def test_account_types_filter_both_sources(self, mock_db):
+        mock_db[apb.STATUS_COLLECTION].find_one.return_value = {"_id": 1}
+        run(apb.get_account_totals(mock_db, ORG, start_date="2025-04-01", end_date="2026-03-20",
+                                   account_types=["Income", "Expense"]))
+        rollup_match = mock_db[apb.COLLECTION].aggregate.call_args.args[0][0]["$match"]
+        assert rollup_match["account_type"] == {"$in": ["Income", "Expense"]}
+        assert rollup_match["period"] == {"$gte": "2025-04", "$lte": "2026-02"}
+        raw_pipeline = mock_db.journal_entries.aggregate.call_args.args[0]
+        assert raw_pipeline[2] == {"$match": {"lines.account_type": {"$in": ["Income", "Expense"]}}}
+
+    def test_missing_line_fields_omitted_like_group(self, mock_db):
+        mock_db[apb.STATUS_COLLECTION].find_one.return_value = {"_id": 1}
+        mock_db[apb.COLLECTION].aggregate.return_value = _cursor([
+            {"_id": {"account_id": None, "account_name": "Vendor Payable", "account_code": None,
+                     "account_type": None}, "debit": 50.0, "credit": 0.0},
+        ])
+        rows = run(apb.get_account_totals(mock_db, ORG, end_date="2026-03-31"))
+        assert rows[0]["_id"] == {"account_name": "Vendor Payable"}
+        mock_db.journal_entries.aggregate.assert_not_called()
+
+    def test_first_read_builds_rollups_once(self, mock_db):
+        rollups = _Rollups()
+        mock_db[apb.COLLECTION].find = rollups.find
+        mock_db[apb.COLLECTION].bulk_write = AsyncMock(side_effect=rollups.bulk_write)
+        mock_db.journal_entries.aggregate.return_value = _cursor([
+            {"_id": {**_key("4100", "Sales Revenue", "Income"), "period": "2026-01"},
+             "total_debit": 0, "total_credit": 500.0, "line_count": 3},
+        ])
+        run(apb.get_account_totals(mock_db, ORG, end_date="2026-03-31"))
+        run(apb.get_account_totals(mock_db, ORG, end_date="2026-03-31"))
+
+        insert = mock_db[apb.COLLECTION].bulk_write.await_args.args[0][0]
+        assert insert._doc["credit"] == 500.0 and insert._doc["period"] == "2026-01"
+        mock_db[apb.COLLECTION].bulk_write.assert_awaited_once()
+        mock_db[apb.STATUS_COLLECTION].update_one.assert_awaited_once()
+        mock_db[apb.STATUS_COLLECTION].find_one.assert_awaited_once()
+
+
+# ==================== REBUILD ====================
+
+class TestRebuild:
+
+    def test_posting_during_rebuild_is_not_overwritten(self, mock_db):
+        sales = {"organization_id": ORG, "period": "2026-01", **_key("4100", "Sales Revenue", "Income")}
+        rollups = _Rollups([{**sales, "debit": 0.0, "credit": 400.0, "line_count": 2, "version": 3},
+                            {**sales, **_key("9999", "Closed", "Expense"), "debit": 5.0, "credit": 0.0}])
+        mock_db[apb.COLLECTION].find = rollups.find
+        mock_db[apb.COLLECTION].bulk_write = AsyncMock(side_effect=rollups.bulk_write)
+        passes = []
+
+        def aggregate(pipeline, **kwargs):
+            passes.append(pipeline)
+            if len(passes) == 1:
+                # A 100.0 entry posts after this read of the lines, before the rebuild writes
+                doc = rollups.docs[0]
+                doc.update(credit=doc["credit"] + 100.0, line_count=3, version=4)
+                return _cursor([{"_id": {**_key("4100", "Sales Revenue", "Income"), "period": "2026-01"},
+                                 "total_debit": 0, "total_credit": 400.0, "line_count": 2}])
+            return _cursor([{"_id": {**_key("4100", "Sales Revenue", "Income"), "period": "2026-01"},
+                             "total_debit": 0, "total_credit": 500.0, "line_count": 3}])
+        mock_db.journal_entries.aggregate = MagicMock(side_effect=aggregate)
+
+        result = run(apb.rebuild_period_balances(mock_db, ORG))
+        [row] = rollups.docs
+        assert row["credit"] == 500.0 and row["line_count"] == 3  # not 400 (lost) nor 600 (twice)
+        assert result["stale_removed"] == 1
+        assert len(passes) == 2
+
+
+# ==================== VERIFY ====================
+
+class TestVerify:
+
+    def test_reports_drift(self, mock_db):
+        mock_db.journal_entries.aggregate.return_value = _cursor([
+            {"_id": {**_key("4100", "Sales Revenue", "Income"), "period": "2026-01"},
+             "total_debit": 0, "total_credit": 500.0, "line_count": 3},
+            {"_id": {**_key("1100", "Accounts Receivable", "Asset"), "period": "2026-01"},
+             "total_debit": 500.0, "total_credit": 0, "line_count": 1},
+        ])
+        mock_db[apb.COLLECTION].find.return_value = _cursor([
+            {"period": "2026-01", **_key("4100", "Sales Revenue", "Income"), "debit": 0.0, "credit": 500.0},
+            {"period": "2026-01", **_key("1100", "Accounts Receivable", "Asset"), "debit": 450.0, "credit": 0.0},
+        ])
+        report = run(apb.verify_period_balances(mock_db, ORG))
+        assert report["ok"] is False
+        assert [m["account_code"] for m in report["mismatches"]] == ["1100"]
+        assert report["mismatches"][0]["expected_debit"] == 500.0
+        assert report["mismatches"][0]["rollup_debit"] == 450.0
@@ -0,0 +1,150 @@
+"""
+Tests for the AR / AP Aging Engine
+==================================
+Covers: the aggregation shape (days overdue from the due date, `$switch`
+buckets, per-party grouping), folding grouped rows into exact bucket and
+party totals, detail ordering / limits, and the summary → party → document
+drilldown stream.
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.aging_report import (
+    BUCKETS, aging_summary, bucket_expr, iter_aging_details, stream_aging,
+)
+
+
+ORG = "org-aging"
+MATCH = {"organization_id": ORG, "balance": {"$gt": 0}}
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def to_list(self, n):
+        return self._docs
+
+    def __aiter__(self):
+        async def gen():
+            for d in self._docs:
+                yield d
+        return gen()
+
+
+def _collection(summary_rows=(), detail_rows=()):
+    collection = MagicMock()
+
+    def aggregate(pipeline, **kwargs):
+        is_summary = any("$group" in stage for stage in pipeline)
+        return _Cursor(list(summary_rows if is_summary else detail_rows))
+    collection.aggregate = MagicMock(side_effect=aggregate)
+    return collection
+
+
+def _group(party_id, name, bucket, amount, count):
+    return {"_id": {"party_id": party_id, "bucket": bucket}, "party_name": name,
+            "amount": amount, "count": count}
+
+
+# ==================== PIPELINE ====================
+
+class TestPipeline:
+
+    def test_bucket_switch_boundaries(self):
+        branches = bucket_expr()["$switch"]["branches"]
+        assert [b["case"]["$lte"][1] for b in branches] == [0, 30, 60, 90]
+        assert [b["then"] for b in branches] + [bucket_expr()["$switch"]["default"]] == list(BUCKETS)
+
+    def test_summary_pipeline(self):
+        collection = _collection()
+        run(aging_summary(collection, MATCH, as_of="2026-03-31", party_id_field="vendor_id",
+                          party_name_field="vendor_name"))
+        pipeline = collection.aggregate.call_args.args[0]
+        assert pipeline[0] == {"$match": MATCH}
+        diff = pipeline[1]["$addFields"]["_days"]["$dateDiff"]
+        assert diff["endDate"] == datetime(2026, 3, 31, tzinfo=timezone.utc)
+        assert diff["unit"] == "day"
+        assert pipeline[2] == {"$match": {"_days": {"$ne": None}}}
+        assert pipeline[-1]["$group"]["_id"] == {"party_id": "$vendor_id", "bucket": "$_bucket"}
+        assert collection.aggregate.call_args.kwargs["allowDiskUse"] is True
+
+
+# ==================== SUMMARY ====================
+
+class TestSummary:
+
+    def test_exact_totals_and_parties(self):
+        collection = _collection(summary_rows=[
+            _group("c1", "Acme", "current", 1000.0, 3),
+            _group("c1", "Acme", "over_90", 250.0, 1),
+            _group("c2", "Zen Motors", "31_60", 5000.0, 40),
+            _group(None, None, "1_30", 10.0, 1),
+        ])
+        summary = run(aging_summary(collection, MATCH, as_of="2026-03-31"))
+        assert summary["totals"] == {"current": 1000.0, "1_30": 10.0, "31_60": 5000.0,
+                                     "61_90": 0, "over_90": 250.0}
+        assert summary["counts"]["31_60"] == 40
+        assert summary["total"] == 6260.0
+        assert summary["document_count"] == 45
+        assert [p["party_id"] for p in summary["parties"]] == ["c2", "c1", None]
+        acme = summary["parties"][1]
+        assert (acme["current"], acme["over_90"], acme["total"], acme["document_count"]) == (1000.0, 250.0, 1250.0, 4)
+
+    def test_empty(self):
+        summary = run(aging_summary(_collection(), MATCH))
+        assert summary["total"] == 0 and summary["parties"] == []
+        assert set(summary["totals"]) == set(BUCKETS)
+
+
+# ==================== DETAILS / DRILLDOWN ====================
+
+class TestDrilldown:
+
+    def test_details_oldest_first_with_limit(self):
+        collection = _collection()
+
+        async def collect():
+            return [d async for d in iter_aging_details(
+                collection, MATCH, ("invoice_number",), as_of="2026-03-31", oldest_first=True, limit=20)]
+        run(collect())
+        pipeline = collection.aggregate.call_args.args[0]
+        assert {"$sort": {"_days": -1, "created_at": 1, "_id": 1}} in pipeline
+        assert {"$limit": 20} in pipeline
+        assert pipeline[-1]["$project"]["days_overdue"] == "$_days"
+
+    def test_party_filter(self):
+        collection = _collection()
+
+        async def collect():
+            return [d async for d in iter_aging_details(collection, MATCH, (), party_id="c1")]
+        run(collect())
+        assert collection.aggregate.call_args.args[0][0]["$match"]["customer_id"] == "c1"
+
+    def test_stream_groups_documents_under_parties(self):
+        collection = _collection(
+            summary_rows=[_group("c1", "Acme", "current", 100.0, 1),
+                          _group("c2", "Zen", "over_90", 50.0, 2)],
+            detail_rows=[
+                {"customer_id": "c1", "invoice_number": "INV-1", "balance": 100.0, "days_overdue": -3, "bucket": "current"},
+                {"customer_id": "c2", "invoice_number": "INV-7", "balance": 30.0, "days_overdue": 120, "bucket": "over_90"},
+                {"customer_id": "c2", "invoice_number": "INV-9", "balance": 20.0, "days_overdue": 95, "bucket": "over_90"},
+            ])
+
+        async def collect():
+            return [r async for r in stream_aging(collection, MATCH, ("invoice_number",), as_of="2026-03-31")]
+        records = run(collect())
+        assert [r["type"] for r in records] == ["summary", "party", "invoice", "party", "invoice", "invoice"]
+        assert records[0]["total"] == 150.0 and records[0]["party_count"] == 2
+        assert records[3]["party_id"] == "c2" and records[3]["total"] == 50.0
@@ -22,6 +22,7 @@ from services.ai_token_service import (
     init_ai_token_service,
     _is_free_trial_expired,
 )
+from core.subscriptions.plan_snapshot import get_org_plan_cache
 
 
 # ==================== FIXTURES ====================
@@ -39,7 +40,10 @@ def mock_db():
 def setup_service(mock_db):
     """Init the ai_token_service with mock db."""
     init_ai_token_service(mock_db)
-    return mock_db
+    # Plans are cached per org; each test sets its own
+    get_org_plan_cache().clear()
+    yield mock_db
+    get_org_plan_cache().clear()
 
 
 # ==================== TESTS ====================
@@ -0,0 +1,224 @@
+"""
+Tests for Bulk PDF Jobs
+=======================
+Covers: parallel rendering through the pool with per-document failures,
+zip output (duplicate filenames), the job lifecycle (pending → running →
+completed, progress counters, error details), request validation, the
+invoice source batching line items into one query, and per-document-type
+access (RBAC mapping, Form 16 roles and plan feature).
+"""
+
+import pytest
+import asyncio
+import os
+import sys
+import zipfile
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from fastapi import HTTPException
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services import bulk_pdf_jobs, pdf_renderer
+from services.bulk_pdf_jobs import (
+    BulkPdfError, BulkPdfJobService, PDF_JOB_SOURCES, invoice_documents, pdf_job_source,
+    render_documents, write_zip,
+)
+from services.pdf_renderer import PdfRenderer
+from middleware.pipeline import resolve_route
+from routes import hr, pdf_jobs  # noqa: F401  (hr registers the form16 source)
+
+
+ORG = "org-bulk"
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def _fake_render(html_content, is_trial):
+    if "broken" in html_content:
+        raise ValueError("bad html")
+    return b"%PDF-" + html_content.encode()
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def sort(self, *args):
+        return self
+
+    async def to_list(self, n):
+        return self._docs[:n]
+
+    def __aiter__(self):
+        async def gen():
+            for d in self._docs:
+                yield d
+        return gen()
+
+
+class _Collection:
+    """Just enough of a Motor collection for the job documents"""
+
+    def __init__(self, docs=None):
+        self.docs = list(docs or [])
+        self.queries = []
+
+    async def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+    def _match(self, doc, query):
+        return all(doc.get(k) == v for k, v in query.items() if not isinstance(v, dict))
+
+    async def find_one(self, query, projection=None):
+        self.queries.append(query)
+        return next((dict(d) for d in self.docs if self._match(d, query)), None)
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return _Cursor([dict(d) for d in self.docs if self._match(d, query)])
+
+    async def update_one(self, query, update):
+        for d in self.docs:
+            if self._match(d, query):
+                d.update(update["$set"])
+
+
+class _Db:
+    def __init__(self, **collections):
+        self._collections = collections
+
+    def __getattr__(self, name):
+        return self._collections.setdefault(name, _Collection())
+
+
+@pytest.fixture
+def pool(tmp_path):
+    renderer = PdfRenderer(workers=0, render_fn=_fake_render)
+    with patch.object(pdf_renderer, "_pdf_renderer", renderer), \
+         patch.object(bulk_pdf_jobs, "BULK_RENDER_FN", _fake_render), \
+         patch.object(bulk_pdf_jobs, "BULK_PDF_DIR", str(tmp_path)):
+        yield renderer
+    renderer.shutdown()
+
+
+# ==================== RENDERING ====================
+
+class TestRenderDocuments:
+
+    def test_renders_in_order_and_reports_failures(self, pool):
+        seen = []
+        docs = [("a.pdf", "a"), ("b.pdf", "broken"), ("c.pdf", "c")]
+        pdfs = run(render_documents(docs, on_result=lambda i, name, pdf, err: seen.append((name, err))))
+        assert pdfs == [b"%PDF-a", None, b"%PDF-c"]
+        assert sorted(seen) == [("a.pdf", None), ("b.pdf", "bad html"), ("c.pdf", None)]
+        assert pool.get_stats()["rendered"] == 2
+
+    def test_zip_renames_duplicates(self, tmp_path):
+        path = str(tmp_path / "out.zip")
+        write_zip(path, [("x.pdf", b"1"), ("x.pdf", b"2"), ("y.pdf", b"3")])
+        with zipfile.ZipFile(path) as zf:
+            assert zf.namelist() == ["x.pdf", "x_2.pdf", "y.pdf"]
+            assert zf.read("x_2.pdf") == b"2"
+
+
+# ==================== JOBS ====================
+
+@pdf_job_source("test_docs")
+async def _test_documents(db, organization_id, filters):
+    return [(f"{name}.pdf", name) for name in filters["names"]]
+
+
+class TestJobs:
+
+    def test_zip_job_lifecycle(self, pool, tmp_path):
+        service = BulkPdfJobService(_Db())
+        job = run(service.create_job(ORG, "test_docs", {"names": ["a", "broken", "c"]}))
+        assert job["status"] == "pending"
+        run(service.run_job(job["job_id"]))
+
+        done = run(service.get_job(ORG, job["job_id"]))
+        assert done["status"] == "completed"
+        assert (done["total"], done["rendered"], done["failed"], done["progress_percent"]) == (3, 2, 1, 100.0)
+        assert done["error_details"] == [{"document": "broken.pdf", "error": "bad html"}]
+        with zipfile.ZipFile(service.output_path(done)) as zf:
+            assert zf.namelist() == ["a.pdf", "c.pdf"]
+        assert run(service.get_job("other-org", job["job_id"])) is None
+
+    def test_empty_job_fails(self, pool):
+        service = BulkPdfJobService(_Db())
+        job = run(service.create_job(ORG, "test_docs", {"names": []}))
+        run(service.run_job(job["job_id"]))
+        assert run(service.get_job(ORG, job["job_id"]))["status"] == "failed"
+
+    def test_validation(self, pool):
+        service = BulkPdfJobService(_Db())
+        with pytest.raises(BulkPdfError):
+            run(service.create_job(ORG, "unknown", {}))
+        with pytest.raises(BulkPdfError):
+            run(service.create_job(ORG, "test_docs", {}, output="tar"))
+        assert "invoice" in PDF_JOB_SOURCES
+
+
+# ==================== INVOICE SOURCE ====================
+
+class TestInvoiceSource:
+
+    def test_line_items_batched_and_unregistered_b2b_skipped(self):
+        pytest.importorskip("weasyprint")
+        invoices = [
+            {"invoice_id": "i1", "invoice_number": "INV-1", "organization_id": ORG, "customer_name": "Fleet Co"},
+            {"invoice_id": "i2", "invoice_number": "INV-2", "organization_id": ORG, "customer_gstin": "07AAACF1234A1Z5"},
+        ]
+        db = _Db(
+            invoices=_Collection(invoices),
+            einvoice_config=_Collection([{"organization_id": ORG, "enabled": True}]),
+            invoice_line_items=_Collection([{"invoice_id": "i1", "name": "Battery check"}]),
+        )
+        with patch("services.pdf_service.generate_gst_invoice_html",
+                   side_effect=lambda invoice, line_items, **kw: f"{invoice['invoice_id']}:{len(line_items)}"):
+            docs = run(invoice_documents(db, ORG, {"customer_id": None}))
+        assert docs == [("INV-INV-1-Fleet_Co.pdf", "i1:1")]
+        assert len(db.invoice_line_items.queries) == 1
+
+
+# ==================== ACCESS ====================
+
+def _request(role):
+    return SimpleNamespace(state=SimpleNamespace(tenant_org_id=ORG, tenant_user_role=role, tenant_user_id="u1"))
+
+
+class TestAccess:
+
+    def test_routes_are_mapped(self):
+        for path in ("/api/pdf-jobs", "/api/v1/pdf-jobs", "/api/v1/pdf-jobs/pdfjob_1/download"):
+            assert "accountant" in resolve_route(path).allowed_roles
+            assert "hr" in resolve_route(path).allowed_roles
+
+    def test_form16_needs_hr_role_and_payroll_feature(self, pool):
+        service = BulkPdfJobService(_Db())
+        entitlement = SimpleNamespace(check_feature_access=AsyncMock())
+        data = pdf_jobs.PdfJobCreate(document_type="form16", filters={"fy": "2024-25"})
+        with patch.object(pdf_jobs, "_service", service), \
+             patch.object(pdf_jobs, "get_entitlement_service", return_value=entitlement):
+            for role in ("accountant", "manager", "technician"):
+                with pytest.raises(HTTPException) as exc:
+                    run(pdf_jobs.create_pdf_job(_request(role), data, SimpleNamespace(add_task=lambda *a: None)))
+                assert exc.value.status_code == 403
+            assert service.db.pdf_jobs.docs == []
+            entitlement.check_feature_access.assert_not_called()
+
+            created = run(pdf_jobs.create_pdf_job(_request("hr"), data, SimpleNamespace(add_task=lambda *a: None)))
+            entitlement.check_feature_access.assert_awaited_once_with(ORG, "hr_payroll")
+
+            job_id = created["job"]["job_id"]
+            with pytest.raises(HTTPException) as exc:
+                run(pdf_jobs.get_pdf_job(_request("accountant"), job_id))
+            assert exc.value.status_code == 403
+            assert run(pdf_jobs.list_pdf_jobs(_request("accountant")))["jobs"] == []
+            assert "form16" not in run(pdf_jobs.list_pdf_jobs(_request("accountant")))["document_types"]
+            assert len(run(pdf_jobs.list_pdf_jobs(_request("owner")))["jobs"]) == 1
@@ -0,0 +1,340 @@
+"""
+Tests for the Double-Entry Posting Path
+=======================================
+Covers: accounts resolved with one batched query through the shared
+chart-of-accounts cache (copies without running balances, dropped by
+invalidate_chart_of_accounts), memoized ensure_system_accounts, balance deltas
+applied with a single bulk_write, the optional transaction, journal
+reference numbers from atomic `sequences` counters (with block reservation),
+and full / incremental sync_all_account_balances (including a high-water
+mark over mixed string / datetime created_at).
+"""
+
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from datetime import datetime, timezone
+
+import services.double_entry_service as des
+from services.double_entry_service import DoubleEntryService, SYSTEM_ACCOUNTS, EntryType
+from services.chart_of_accounts_cache import get_chart_of_accounts_cache, invalidate_chart_of_accounts
+
+
+ORG = "org-post"
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def _accounts():
+    return [
+        {"account_id": f"acc_{d['code']}", "account_name": d["name"], "account_code": d["code"],
+         "account_type": d["type"].value, "is_active": True, "organization_id": ORG,
+         "current_balance": 0.0, "balance": 0.0}
+        for d in SYSTEM_ACCOUNTS.values()
+    ]
+
+
+def _cursor(docs):
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=docs)
+    return cursor
+
+
+def _filter(docs, query):
+    ids = query.get("account_id", {}).get("$in")
+    codes = query.get("account_code", {}).get("$in")
+    for clause in query.get("$or", []):
+        ids = clause.get("account_id", {}).get("$in", ids)
+        codes = clause.get("account_code", {}).get("$in", codes)
+    if ids is None and codes is None:
+        return docs
+    return [d for d in docs if (ids and d["account_id"] in ids) or (codes and d["account_code"] in codes)]
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def mock_db():
+    accounts = _accounts()
+    db = MagicMock()
+    db.chart_of_accounts.find = MagicMock(side_effect=lambda q, p=None: _cursor(_filter(accounts, q)))
+    db.chart_of_accounts.insert_many = AsyncMock()
+    db.chart_of_accounts.bulk_write = AsyncMock()
+    db.chart_of_accounts.update_one = AsyncMock()
+    db.journal_entries.find_one = AsyncMock(return_value=None)
+    db.journal_entries.insert_one = AsyncMock()
+    db.journal_entries.count_documents = AsyncMock(return_value=0)
+    db.journal_audit_log.insert_one = AsyncMock()
+    db.sequences.find_one_and_update = AsyncMock(return_value={"current_value": 1})
+    db.sequences.update_one = AsyncMock()
+    db["account_period_balances"].bulk_write = AsyncMock()
+    get_chart_of_accounts_cache().clear()
+    yield db
+    get_chart_of_accounts_cache().clear()
+
+
+@pytest.fixture(autouse=True)
+def _no_side_effects():
+    with patch("services.double_entry_service.log_financial_action", new=AsyncMock()), \
+         patch("utils.period_lock.check_period_locked", new=AsyncMock()):
+        yield
+
+
+def _lines(n):
+    lines = []
+    for i in range(n):
+        lines.append({"account_code": "1100", "debit_amount": 100, "credit_amount": 0})
+        lines.append({"account_id": "acc_4100", "debit_amount": 0, "credit_amount": 100})
+    return lines
+
+
+# ==================== TESTS ====================
+
+class TestPostingRoundTrips:
+
+    def test_cold_posting_costs_one_account_query(self, mock_db):
+        svc = DoubleEntryService(mock_db)
+        # The system-account check loads every system account into the cache
+        ok, msg, entry = run(svc.create_journal_entry(ORG, "2026-03-01", "test", _lines(5)))
+        assert ok, msg
+        assert mock_db.chart_of_accounts.find.call_count == 1
+        assert len(entry["lines"]) == 10
+        assert entry["lines"][0]["account_id"] == "acc_1100"
+
+    def test_misses_resolved_with_one_in_query(self, mock_db):
+        svc = DoubleEntryService(mock_db)
+        mock_db.chart_of_accounts.find.reset_mock()
+        by_id, by_code = run(svc.resolve_accounts(
+            ORG, account_ids=["acc_4100", "acc_2100"], codes=["1100", "1200", "1100"]))
+        assert mock_db.chart_of_accounts.find.call_count == 1
+        query = mock_db.chart_of_accounts.find.call_args.args[0]
+        assert query["is_active"] is True
+        assert len(query["$or"]) == 2
+        assert set(by_id) == {"acc_4100", "acc_2100"}
+        assert set(by_code) == {"1100", "1200"}
+
+    def test_warm_cache_skips_account_queries(self, mock_db):
+        svc = DoubleEntryService(mock_db)
+        run(svc.create_journal_entry(ORG, "2026-03-01", "first", _lines(1)))
+        mock_db.chart_of_accounts.find.reset_mock()
+
+        # A new service instance shares the process-wide cache
+        ok, _, _ = run(DoubleEntryService(mock_db).create_journal_entry(ORG, "2026-03-02", "second", _lines(3)))
+        assert ok
+        mock_db.chart_of_accounts.find.assert_not_called()
+
+    def test_cached_accounts_are_copies_and_invalidated(self, mock_db):
+        svc = DoubleEntryService(mock_db)
+        run(svc.ensure_system_accounts(ORG))
+        account = run(svc.get_account_by_code(ORG, "1100"))
+        assert "current_balance" not in account
+        account["account_name"] = "mutated"
+        assert run(svc.get_account_by_code(ORG, "1100"))["account_name"] == "Accounts Receivable"
+
+        mock_db.chart_of_accounts.find.reset_mock()
+        assert invalidate_chart_of_accounts(ORG)
+        run(svc.get_account_by_code(ORG, "1100"))
+        assert mock_db.chart_of_accounts.find.call_count == 1
+
+    def test_system_accounts_check_memoized(self, mock_db):
+        svc = DoubleEntryService(mock_db)
+        run(svc.ensure_system_accounts(ORG))
+        run(svc.ensure_system_accounts(ORG))
+        assert mock_db.chart_of_accounts.find.call_count == 1
+        mock_db.chart_of_accounts.insert_many.assert_not_awaited()
+
+    def test_missing_system_accounts_inserted_in_one_batch(self, mock_db):
+        mock_db.chart_of_accounts.find = MagicMock(return_value=_cursor([]))
+        run(DoubleEntryService(mock_db).ensure_system_accounts(ORG))
+        inserted = mock_db.chart_of_accounts.insert_many.await_args.args[0]
+        assert len(inserted) == len(SYSTEM_ACCOUNTS)
+
+    def test_unknown_account_rejected(self, mock_db):
+        svc = DoubleEntryService(mock_db)
+        lines = [{"account_id": "acc_missing", "debit_amount": 1, "credit_amount": 0},
+                 {"account_id": "acc_4100", "debit_amount": 0, "credit_amount": 1}]
+        ok, msg, _ = run(svc.create_journal_entry(ORG, "2026-03-01", "bad", lines))
+        assert not ok
+        assert "acc_missing" in msg
+        mock_db.journal_entries.insert_one.assert_not_awaited()
+
+    def test_balances_applied_with_single_bulk_write(self, mock_db):
+        svc = DoubleEntryService(mock_db)
+        run(svc.create_journal_entry(ORG, "2026-03-01", "test", _lines(4)))
+        mock_db.chart_of_accounts.update_one.assert_not_awaited()
+        assert mock_db.chart_of_accounts.bulk_write.await_count == 1
+        ops = mock_db.chart_of_accounts.bulk_write.await_args.args[0]
+        changes = {op._filter["account_id"]: op._doc["$inc"]["balance"] for op in ops}
+        # AR (asset) +400, Sales (income) +400, deltas summed per account
+        assert changes == {"acc_1100": 400.0, "acc_4100": 400.0}
+
+
+class TestPostingTransaction:
+
+    def test_writes_share_one_session(self, mock_db):
+        session = MagicMock()
+        session.__aenter__ = AsyncMock(return_value=session)
+        session.__aexit__ = AsyncMock(return_value=False)
+        txn = MagicMock()
+        txn.__aenter__ = AsyncMock()
+        txn.__aexit__ = AsyncMock(return_value=False)
+        session.start_transaction = MagicMock(return_value=txn)
+        mock_db.client.start_session = AsyncMock(return_value=session)
+
+        svc = DoubleEntryService(mock_db)
+        ok, _, _ = run(svc.create_journal_entry(ORG, "2026-03-01", "txn", _lines(1), use_transaction=True))
+        assert ok
+        assert mock_db.journal_entries.insert_one.await_args.kwargs["session"] is session
+        assert mock_db.journal_audit_log.insert_one.await_args.kwargs["session"] is session
+        assert mock_db.chart_of_accounts.bulk_write.await_args.kwargs["session"] is session
+        assert mock_db["account_period_balances"].bulk_write.await_args.kwargs["session"] is session
+
+
+class TestReferenceSequences:
+
+    PERIOD = datetime.now().strftime("%Y%m")
+
+    def test_number_from_atomic_sequence(self, mock_db):
+        mock_db.sequences.find_one_and_update.return_value = {"current_value": 7}
+        ref = run(DoubleEntryService(mock_db).get_next_reference_number(ORG, EntryType.SALES))
+        assert ref == f"JE-SLS-{self.PERIOD}-00007"
+        mock_db.journal_entries.count_documents.assert_not_awaited()
+        query, update = mock_db.sequences.find_one_and_update.await_args.args
+        assert query == {"sequence_id": f"journal_{ORG}_JE-SLS_{self.PERIOD}"}
+        assert update == {"$inc": {"current_value": 1}}
+
+    def test_payment_and_payroll_share_prefix_sequence(self, mock_db):
+        svc = DoubleEntryService(mock_db)
+        run(svc.get_next_reference_number(ORG, EntryType.PAYMENT))
+        run(svc.get_next_reference_number(ORG, EntryType.PAYROLL))
+        ids = {c.args[0]["sequence_id"] for c in mock_db.sequences.find_one_and_update.await_args_list}
+        assert ids == {f"journal_{ORG}_JE-PAY_{self.PERIOD}"}
+
+    def test_new_sequence_seeded_after_existing_numbers(self, mock_db):
+        mock_db.sequences.find_one_and_update.side_effect = [None, {"current_value": 43}]
+        mock_db.journal_entries.find = MagicMock(return_value=_cursor([
+            {"reference_number": f"JE-SLS-{self.PERIOD}-{n}"} for n in ("00042", "99999", "100000", "00007")
+        ]))
+        ref = run(DoubleEntryService(mock_db).get_next_reference_number(ORG, EntryType.SALES))
+        assert ref == f"JE-SLS-{self.PERIOD}-00043"
+        seed = mock_db.sequences.update_one.await_args.args[1]["$setOnInsert"]
+        assert seed["current_value"] == 100000  # numeric max, not the string max "99999"
+        assert mock_db.sequences.update_one.await_args.kwargs["upsert"] is True
+
+    def test_reserve_block_in_one_round_trip(self, mock_db):
+        mock_db.sequences.find_one_and_update.return_value = {"current_value": 105}
+        refs = run(DoubleEntryService(mock_db).reserve_reference_numbers(ORG, EntryType.PAYROLL, 5))
+        assert refs == [f"JE-PAY-{self.PERIOD}-{n:05d}" for n in range(101, 106)]
+        assert mock_db.sequences.find_one_and_update.await_count == 1
+        assert mock_db.sequences.find_one_and_update.await_args.args[1] == {"$inc": {"current_value": 5}}
+
+    def test_block_pool_serves_from_memory(self, mock_db):
+        mock_db.sequences.find_one_and_update.return_value = {"current_value": 10}
+        svc = DoubleEntryService(mock_db)
+        with patch.object(des, "REFERENCE_BLOCK_SIZE", 10), patch.dict(des._reference_blocks, clear=True):
+            refs = [run(svc.get_next_reference_number(ORG, EntryType.JOURNAL)) for _ in range(10)]
+        assert refs[0].endswith("-00001") and refs[-1].endswith("-00010")
+        assert len(set(refs)) == 10
+        assert mock_db.sequences.find_one_and_update.await_count == 1
+
+    def test_pre_reserved_number_used_as_is(self, mock_db):
+        ok, _, entry = run(DoubleEntryService(mock_db).create_journal_entry(
+            ORG, "2026-03-01", "bulk", _lines(1), reference_number="JE-PAY-202603-00101"))
+        assert ok
+        assert entry["reference_number"] == "JE-PAY-202603-00101"
+        mock_db.sequences.find_one_and_update.assert_not_awaited()
+
+
+class TestBalanceSync:
+
+    def _setup(self, mock_db, totals, state=None):
+        mock_db.journal_entries.aggregate = MagicMock(side_effect=lambda p, **kw: _cursor(totals(p)))
+        mock_db.journal_entries.find_one = AsyncMock(return_value={"created_at": "2026-03-05T10:00:00+00:00"})
+        mock_db.account_balance_sync_state.find_one = AsyncMock(return_value=state)
+        mock_db.account_balance_sync_state.update_one = AsyncMock()
+
+    def test_full_sync_one_aggregation_one_bulk_write(self, mock_db):
+        self._setup(mock_db, lambda p: [
+            {"_id": "acc_1100", "total_debit": 500.0, "total_credit": 200.0},
+            {"_id": "acc_4100", "total_debit": 0, "total_credit": 300.0},
+        ])
+        result = run(DoubleEntryService(mock_db).sync_all_account_balances(ORG))
+
+        assert result == {"synced_accounts": len(SYSTEM_ACCOUNTS), "mode": "full"}
+        assert mock_db.journal_entries.aggregate.call_count == 1
+        mock_db.chart_of_accounts.update_one.assert_not_awaited()
+        ops = mock_db.chart_of_accounts.bulk_write.await_args.args[0]
+        balances = {op._filter["account_id"]: op._doc["$set"]["balance"] for op in ops}
+        assert balances["acc_1100"] == 300.0      # asset: debit - credit
+        assert balances["acc_4100"] == 300.0      # income: credit - debit
+        assert balances["acc_2100"] == 0          # untouched accounts reset
+        state = mock_db.account_balance_sync_state.update_one.await_args.args[1]["$set"]
+        assert state["high_water_mark"] == "2026-03-05T10:00:00+00:00"
+
+    def test_incremental_recomputes_touched_accounts_only(self, mock_db):
+        state = {"organization_id": ORG, "high_water_mark": "2026-03-05T10:00:00+00:00",
+                 "as_of_date": "2026-03-04"}
+
+        def totals(pipeline):
+            group = pipeline[-1]["$group"]
+            if "account_ids" in group:
+                return [{"_id": None, "account_ids": ["acc_1100", "acc_4100"],
+                         "string_mark": "2026-03-06T09:00:00+00:00", "date_mark": None}]
+            return [{"_id": "acc_1100", "total_debit": 900.0, "total_credit": 0}]
+        self._setup(mock_db, totals, state)
+
+        result = run(DoubleEntryService(mock_db).sync_all_account_balances(ORG, incremental=True))
+        assert result["mode"] == "incremental"
+        assert result["synced_accounts"] == 2
+
+        scan = mock_db.journal_entries.aggregate.call_args_list[0].args[0][0]["$match"]["$or"]
+        assert scan[0]["created_at"]["$gt"] == "2026-03-05T09:55:00+00:00"    # 5 minute lookback
+        assert scan[1]["created_at"]["$gt"] == datetime(2026, 3, 5, 9, 55, tzinfo=timezone.utc)
+        assert scan[2]["entry_date"]["$gt"] == "2026-03-04"
+        totals_match = mock_db.journal_entries.aggregate.call_args_list[1].args[0][0]["$match"]
+        assert set(totals_match["lines.account_id"]["$in"]) == {"acc_1100", "acc_4100"}
+
+        ops = mock_db.chart_of_accounts.bulk_write.await_args.args[0]
+        assert {op._filter["account_id"]: op._doc["$set"]["balance"] for op in ops} == {
+            "acc_1100": 900.0, "acc_4100": 0}
+        new_state = mock_db.account_balance_sync_state.update_one.await_args.args[1]["$set"]
+        assert new_state["high_water_mark"] == "2026-03-06T09:00:00+00:00"
+
+    def test_mark_over_mixed_created_at_types(self, mock_db):
+        # A TDS / e-invoice entry with a BSON date created_at, older than the newest string one
+        dated = datetime(2026, 3, 6, 8, 0)
+        mock_db.journal_entries.find_one = AsyncMock(side_effect=lambda q, p=None, sort=None: {
+            "created_at": dated if q["created_at"]["$type"] == "date" else "2026-03-06T09:00:00+00:00"})
+        mock_db.journal_entries.aggregate = MagicMock(side_effect=lambda p, **kw: _cursor([]))
+        mock_db.account_balance_sync_state.find_one = AsyncMock(return_value=None)
+        mock_db.account_balance_sync_state.update_one = AsyncMock()
+        svc = DoubleEntryService(mock_db)
+        run(svc.sync_all_account_balances(ORG))
+        full_state = mock_db.account_balance_sync_state.update_one.await_args.args[1]["$set"]
+        assert full_state["high_water_mark"] == "2026-03-06T09:00:00+00:00"
+
+        # A later date-typed entry moves the mark, which stays a string
+        state = {"organization_id": ORG, "high_water_mark": dated, "as_of_date": "2026-03-04"}
+        self._setup(mock_db, lambda p: [{"_id": None, "account_ids": ["acc_1100"],
+                                         "string_mark": "2026-03-06T09:00:00+00:00",
+                                         "date_mark": datetime(2026, 3, 6, 10, 30)}]
+                    if "account_ids" in p[-1]["$group"] else [], state)
+        run(svc.sync_all_account_balances(ORG, incremental=True))
+        scan = mock_db.journal_entries.aggregate.call_args_list[0].args[0][0]["$match"]["$or"]
+        since = datetime(2026, 3, 6, 7, 55, tzinfo=timezone.utc)
+        assert scan[:2] == [{"created_at": {"$gt": since.isoformat()}}, {"created_at": {"$gt": since}}]
+        new_state = mock_db.account_balance_sync_state.update_one.await_args.args[1]["$set"]
+        assert new_state["high_water_mark"] == "2026-03-06T10:30:00+00:00"
+
+    def test_incremental_without_state_runs_full(self, mock_db):
+        self._setup(mock_db, lambda p: [])
+        result = run(DoubleEntryService(mock_db).sync_all_account_balances(ORG, incremental=True))
+        assert result["mode"] == "full"
@@ -0,0 +1,114 @@
+"""
+Tests for the Vectorized Hash-Fallback Embeddings
+=================================================
+Covers: NumPy hash embeddings reproducing the original scalar loop bit for
+bit (single and batched, across dimensions), embed_batch matching
+embed_text, and the NumPy cosine / euclidean / batched similarity helpers
+against pure-Python references.
+"""
+
+import pytest
+import asyncio
+import hashlib
+import math
+import random
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.efi_embedding_service import (
+    FallbackEmbeddingService, cosine_similarity, cosine_similarities, euclidean_distance,
+    find_similar_embeddings,
+)
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def _scalar_hash_embedding(text, output_dim):
+    """The original per-element implementation"""
+    text_lower = text.lower().strip()
+    combined = hashlib.sha256(text_lower.encode()).digest() + hashlib.md5(text_lower.encode()).digest()
+    embedding = []
+    for i in range(output_dim):
+        val = combined[i % len(combined)] / 255.0 * 2 - 1
+        variation = (i / output_dim) * 0.1
+        val = val * (1 - variation) + variation * math.sin(i * 0.1)
+        embedding.append(val)
+    norm = math.sqrt(sum(x * x for x in embedding))
+    if norm > 0:
+        embedding = [x / norm for x in embedding]
+    return embedding
+
+
+def _python_cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    na, nb = math.sqrt(sum(x * x for x in a)), math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+TEXTS = ["", "Battery not charging", "  BATTERY not Charging  ", "ECU fault E-17 ⚡ ट्रिप",
+         "motor " * 500] + [f"complaint {i}: hub motor noise at {i * 7} km/h" for i in range(50)]
+
+
+# ==================== HASH EMBEDDINGS ====================
+
+class TestHashEmbeddings:
+
+    @pytest.mark.parametrize("dims", [1, 8, 48, 49, 256, 1536])
+    def test_bit_identical_to_scalar_loop(self, dims):
+        service = FallbackEmbeddingService(dims)
+        batch = service._generate_hash_embeddings(TEXTS).tolist()
+        for text, row in zip(TEXTS, batch):
+            expected = _scalar_hash_embedding(text, dims)
+            assert service._generate_hash_embedding(text) == expected
+            assert row == expected
+
+    def test_embed_batch_matches_embed_text(self):
+        service = FallbackEmbeddingService(256)
+        batch = run(service.embed_batch(TEXTS[:5]))
+        singles = [run(service.embed_text(t)) for t in TEXTS[:5]]
+        assert [r.embedding for r in batch] == [r.embedding for r in singles]
+        assert {r.model for r in batch} == {"hash-fallback"} and batch[0].dimensions == 256
+        assert all(isinstance(v, float) for v in batch[0].embedding)
+        assert run(service.embed_batch([])) == []
+
+
+# ==================== SIMILARITY ====================
+
+class TestSimilarity:
+
+    def test_pairwise_helpers_match_python(self):
+        rng = random.Random(3)
+        for _ in range(20):
+            a = [rng.uniform(-1, 1) for _ in range(64)]
+            b = [rng.uniform(-1, 1) for _ in range(64)]
+            assert cosine_similarity(a, b) == pytest.approx(_python_cosine(a, b), abs=1e-12)
+            assert euclidean_distance(a, b) == pytest.approx(
+                math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b))), abs=1e-12)
+        assert cosine_similarity([0.0, 0.0], [1.0, 0.0]) == 0.0
+        with pytest.raises(ValueError):
+            cosine_similarity([1.0], [1.0, 0.0])
+        with pytest.raises(ValueError):
+            euclidean_distance([1.0], [1.0, 0.0])
+
+    def test_batched_similarities(self):
+        rng = random.Random(5)
+        query = [rng.uniform(-1, 1) for _ in range(32)]
+        rows = [[rng.uniform(-1, 1) for _ in range(32)] for _ in range(40)] + [[0.0] * 32]
+        scores = cosine_similarities(query, rows)
+        assert scores.tolist() == pytest.approx([_python_cosine(query, r) for r in rows], abs=1e-12)
+        assert scores[-1] == 0.0
+
+        items = [{"id": i, "embedding": r} for i, r in enumerate(rows)] + [{"id": "no-vector"}]
+        top = run(find_similar_embeddings(query, items, top_k=3, threshold=0.0))
+        expected = sorted((i for i in range(len(rows)) if _python_cosine(query, rows[i]) >= 0),
+                          key=lambda i: _python_cosine(query, rows[i]), reverse=True)[:3]
+        assert [r["id"] for r in top] == expected
+        assert isinstance(top[0]["similarity_score"], float)
+        assert run(find_similar_embeddings(query, [])) == []
+        with pytest.raises(ValueError):
+            run(find_similar_embeddings(query, [{"id": 1, "embedding": [1.0]}]))
@@ -0,0 +1,245 @@
+"""
+Tests for the Staged Failure Match Engine
+=========================================
+Covers: the exact-signature lookup surviving a crowded candidate set, one
+projected candidate query for the subsystem + vehicle stage, platform pattern keyword / category filtering
+with the vehicle-only fallback, wave 2 gating and concurrency, vector
+upgrades of earlier matches, per-stage timings, and EFIService.match_failure
+delegating to the engine.
+"""
+
+import pytest
+import asyncio
+import re
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from models.failure_intelligence import FailureMatchRequest
+from services import failure_intelligence_service as fis
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def _match_value(value, cond):
+    values = value if isinstance(value, list) else [value]
+    if isinstance(cond, dict):
+        if "$in" in cond:
+            return any(v in cond["$in"] for v in values)
+        if "$regex" in cond:
+            flags = re.I if "i" in cond.get("$options", "") else 0
+            return isinstance(value, str) and re.search(cond["$regex"], value, flags) is not None
+        return True
+    return cond in values
+
+
+def _matches(doc, query):
+    for field, cond in query.items():
+        if field == "$or":
+            if not any(_matches(doc, q) for q in cond):
+                return False
+        elif field == "$text":
+            raise RuntimeError("text index required for $text query")
+        elif not _match_value(doc.get(field), cond):
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def sort(self, key, direction=1):
+        self._docs.sort(key=lambda d: d.get(key) or 0, reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        self._docs = self._docs[:n]
+        return self
+
+    async def to_list(self, n):
+        await asyncio.sleep(0.01)
+        return self._docs
+
+
+class _Collection:
+    def __init__(self, docs=None):
+        self.docs = [dict(d) for d in docs or []]
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append((query, projection))
+        docs = [dict(d) for d in self.docs if _matches(d, query)]
+        if projection and any(v == 1 for v in projection.values()):
+            docs = [{k: v for k, v in d.items() if projection.get(k) == 1} for d in docs]
+        return _Cursor(docs)
+
+
+class _Db:
+    def __init__(self, **collections):
+        self._collections = collections
+
+    def __getattr__(self, name):
+        return self._collections.setdefault(name, _Collection())
+
+
+def _card(failure_id, **fields):
+    return {"failure_id": failure_id, "title": failure_id, "status": "approved",
+            "embedding_vector": [0.1] * 4, "confidence_score": 0.6, **fields}
+
+
+def _request(**fields):
+    return FailureMatchRequest(**{"symptom_text": "battery not charging", **fields})
+
+
+class _FakeEmbeddings:
+    def __init__(self, cards, delay=0.05):
+        self.cards = cards
+        self.delay = delay
+
+    async def get_embedding(self, text):
+        await asyncio.sleep(self.delay)
+        return [1.0, 0.0]
+
+    async def find_similar(self, **kwargs):
+        return self.cards
+
+
+class _FakeSearch:
+    def __init__(self, cards, delay=0.05):
+        self.cards = cards
+        self.delay = delay
+
+    async def hybrid_search(self, **kwargs):
+        await asyncio.sleep(self.delay)
+        return self.cards
+
+
+# ==================== WAVE 1 ====================
+
+class TestCandidateStages:
+
+    def test_signature_and_candidate_queries(self):
+        request = _request(error_codes=["E12"], subsystem_hint="battery", vehicle_make="Ather")
+        signature = fis.MatchContext.build(request).signature_hash
+        db = _Db(failure_cards=_Collection([
+            _card("sig", signature_hash=signature, subsystem_category="battery"),
+            _card("bat", subsystem_category="battery", error_codes=["E12"],
+                  vehicle_models=[{"make": "ather", "model": "450X"}]),
+            _card("mot", subsystem_category="motor", error_codes=["E12"]),
+            _card("old", subsystem_category="battery", status="deprecated"),
+        ]))
+        engine = fis.FailureMatchEngine(db)
+        response = run(engine.match(request))
+
+        assert len(db.failure_cards.queries) == 2
+        assert [q["signature_hash"] for q, _ in db.failure_cards.queries if "signature_hash" in q] == [signature]
+        for _, projection in db.failure_cards.queries:
+            assert projection.get("embedding_vector") is None and projection["failure_id"] == 1
+        assert response.matches[0].failure_id == "sig" and response.matches[0].match_type == "signature"
+        assert response.matching_stages_used == ["signature", "platform_patterns"]  # 0.95 skips stage 2
+
+    def test_signature_match_survives_candidate_limit(self):
+        request = _request(subsystem_hint="battery")
+        signature = fis.MatchContext.build(request).signature_hash
+        crowd = [_card(f"bat{i}", subsystem_category="battery") for i in range(fis.CANDIDATE_LIMIT + 50)]
+        db = _Db(failure_cards=_Collection(crowd + [_card("sig", signature_hash=signature)]))
+        response = run(fis.FailureMatchEngine(db).match(request))
+
+        assert response.matches[0].failure_id == "sig" and response.matches[0].match_score == 0.95
+        assert response.matching_stages_used[0] == "signature"
+
+    def test_subsystem_vehicle_scoring(self):
+        db = _Db(failure_cards=_Collection([
+            _card("bat", subsystem_category="battery", error_codes=["E12", "E40"],
+                  vehicle_models=[{"make": "Ather", "model": "450X"}]),
+            _card("plain", subsystem_category="battery"),
+            _card("mot", subsystem_category="motor", error_codes=["E12"]),
+        ]))
+        request = _request(error_codes=["E12"], subsystem_hint="battery",
+                           vehicle_make="ATHER", vehicle_model="450x")
+        response = run(fis.FailureMatchEngine(db).match(request))
+
+        scores = {m.failure_id: m for m in response.matches if m.match_type == "subsystem_vehicle"}
+        assert set(scores) == {"bat", "plain"}
+        assert scores["bat"].match_score == pytest.approx(0.85)  # 0.5 + 0.25 + 0.2, capped
+        assert scores["bat"].matched_error_codes == ["E12"]
+        assert scores["plain"].match_score == pytest.approx(0.5)
+
+    def test_platform_patterns_filter_and_fallback(self):
+        patterns = _Collection([
+            {"pattern_id": "p1", "title": "Charging port failure", "vehicle_make": "Ather",
+             "vehicle_model": "450X", "fault_category": "charging", "symptoms": ["charging"],
+             "status": "active", "confidence_score": 0.7},
+            {"pattern_id": "p2", "title": "Brake squeal", "vehicle_make": "Ather",
+             "vehicle_model": "Rizta", "fault_category": "brakes", "status": "active", "confidence_score": 0.9},
+            {"pattern_id": "p3", "title": "Other make", "vehicle_make": "Ola", "status": "active"},
+        ])
+        db = _Db(efi_platform_patterns=patterns)
+        engine = fis.FailureMatchEngine(db)
+
+        response = run(engine.match(_request(vehicle_make="ather", vehicle_model="450X")))
+        assert [m.failure_id for m in response.matches] == ["p1"]
+        assert response.matches[0].match_score == pytest.approx(0.7 + 0.15 + 0.1 / 3)
+        assert response.matches[0].matched_symptoms == ["charging"]
+        assert len(patterns.queries) == 1
+
+        response = run(engine.match(_request(symptom_text="zzz", vehicle_make="ath.r")))
+        assert response.matches == []  # make is matched literally, not as a regex
+        response = run(engine.match(_request(symptom_text="squeak", vehicle_make="Ather")))
+        assert [m.failure_id for m in response.matches] == ["p2", "p1"]  # vehicle-only, by confidence
+
+
+# ==================== WAVE 2 ====================
+
+class TestLaterStages:
+
+    def test_gated_stages_run_concurrently_and_merge(self):
+        db = _Db(failure_cards=_Collection([_card("low", subsystem_category="motor", keywords=["noise"])]))
+        embeddings = _FakeEmbeddings([
+            {"failure_id": "low", "title": "low", "score": 0.9},
+            {"failure_id": "vec", "title": "vec", "score": 0.7, "symptom_text": "battery not charging"},
+        ])
+        search = _FakeSearch([{"failure_id": "vec", "hybrid_score": 0.9}, {"failure_id": "hyb", "hybrid_score": 0.9}])
+        engine = fis.FailureMatchEngine(db, embedding_service=embeddings, search_service=search)
+        response = run(engine.match(_request(symptom_text="hub noise")))
+
+        by_id = {m.failure_id: m for m in response.matches}
+        assert by_id["low"].match_type == "hybrid" and by_id["low"].match_score == pytest.approx(0.765)
+        assert by_id["vec"].match_type == "vector_semantic" and by_id["vec"].match_stage == 3
+        assert by_id["hyb"].match_score == pytest.approx(0.75)
+        assert response.matching_stages_used == ["subsystem_vehicle", "vector_semantic", "hybrid"]
+
+        timings = response.stage_timings_ms
+        assert {"prefetch", "signature", "subsystem_vehicle", "vector_semantic", "hybrid"} <= set(timings)
+        assert "keyword" not in timings  # best wave 1 score 0.5 closes the keyword gate
+        assert response.processing_time_ms < timings["prefetch"] + timings["vector_semantic"] + timings["hybrid"]
+
+    def test_keyword_stage_failure_is_tolerated(self):
+        db = _Db(failure_cards=_Collection([]))
+        response = run(fis.FailureMatchEngine(db).match(_request()))
+        assert response.matches == []
+        assert "keyword" in response.matching_stages_used and "keyword" in response.stage_timings_ms
+
+
+# ==================== SERVICE ====================
+
+class TestService:
+
+    def test_match_failure_uses_engine_and_emits(self, monkeypatch):
+        events = []
+
+        class _Dispatcher:
+            async def emit(self, event_type, data, **kwargs):
+                events.append(data)
+
+        monkeypatch.setattr(fis, "get_dispatcher", lambda: _Dispatcher())
+        db = _Db(failure_cards=_Collection([_card("bat", subsystem_category="battery")]))
+        response = run(fis.EFIService(db).match_failure(_request(subsystem_hint="battery")))
+
+        assert [m.failure_id for m in response.matches] == ["bat"]
+        assert events[0]["top_match"] == "bat" and events[0]["stage_timings_ms"] == response.stage_timings_ms
@@ -0,0 +1,237 @@
+"""
+Tests for the Embedding Pipeline
+================================
+Covers: provider batching with bounded concurrency, keyset paging past the
+old 1,000 card cap, in-page text dedupe and embedding_cache hits (one $in
+lookup, bulk_write of new entries, degraded models not cached), per-batch
+provider failures, resuming an interrupted job from its checkpoint, and
+EFIEmbeddingManager.embed_all_cards on the pipeline.
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services import embedding_pipeline as ep
+from services.efi_embedding_service import EFIEmbeddingManager, EmbeddingResponse, FallbackEmbeddingService
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def _matches(doc, query):
+    for field, cond in query.items():
+        if field == "$and":
+            if not all(_matches(doc, q) for q in cond):
+                return False
+            continue
+        value = doc.get(field)
+        if isinstance(cond, dict):
+            if "$exists" in cond and (field in doc) != cond["$exists"]:
+                return False
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+            if "$gt" in cond and not (isinstance(value, str) and value > cond["$gt"]):
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def sort(self, key, direction=1):
+        self._docs.sort(key=lambda d: d[key], reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        self._docs = self._docs[:n]
+        return self
+
+    async def to_list(self, n):
+        return self._docs
+
+    def __aiter__(self):
+        async def gen():
+            for d in self._docs:
+                yield d
+        return gen()
+
+
+class _Collection:
+    def __init__(self, docs=None):
+        self.docs = [dict(d) for d in docs or []]
+        self.queries = []
+        self.bulk_writes = 0
+        self.fail_bulk_write_at = None
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return _Cursor([dict(d) for d in self.docs if _matches(d, query)])
+
+    async def find_one(self, query, projection=None):
+        return next((dict(d) for d in self.docs if _matches(d, query)), None)
+
+    async def update_one(self, query, update, upsert=False):
+        doc = next((d for d in self.docs if _matches(d, query)), None)
+        if doc is None and upsert:
+            doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            self.docs.append(doc)
+        if doc is not None:
+            doc.update(update.get("$set", {}))
+
+    async def bulk_write(self, ops, ordered=True):
+        self.bulk_writes += 1
+        if self.bulk_writes == self.fail_bulk_write_at:
+            raise RuntimeError("connection reset")
+        for op in ops:
+            await self.update_one(op._filter, op._doc, upsert=op._upsert or False)
+
+
+class _Db:
+    def __init__(self, **collections):
+        self._collections = collections
+
+    def __getattr__(self, name):
+        return self._collections.setdefault(name, _Collection())
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+class _Provider:
+    """Vector = [len(text), call number]; records batches and peak concurrency"""
+
+    def __init__(self, fail=(), missing=(), model="test-model"):
+        self.batches = []
+        self.in_flight = self.peak = 0
+        self.fail = set(fail)
+        self.missing = set(missing)
+        self.model = model
+
+    async def __call__(self, texts):
+        self.batches.append(list(texts))
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        if self.fail & set(texts):
+            raise RuntimeError("rate limited")
+        return [None if t in self.missing else EmbeddingResponse(t, [float(len(t)), 1.0], self.model, 2)
+                for t in texts]
+
+    @property
+    def texts(self):
+        return [t for b in self.batches for t in b]
+
+
+def _cards(n, text=lambda i: f"card text {i}"):
+    return [{"failure_id": f"fc{i:04d}", "title": text(i)} for i in range(n)]
+
+
+def _pipeline(db, provider, **kwargs):
+    options = dict(job_id="test", model="test-model", build_text=lambda c: c.get("title", ""),
+                   batch_size=4, concurrency=2, page_size=10)
+    options.update(kwargs)
+    return ep.EmbeddingPipeline(db, provider, **options)
+
+
+# ==================== BATCHING ====================
+
+class TestBatching:
+
+    def test_batches_concurrency_and_paging(self):
+        db = _Db(failure_cards=_Collection(_cards(25) + [{"title": "no key"}]))
+        provider = _Provider()
+        result = run(_pipeline(db, provider).run())
+
+        assert result["processed"] == result["selected"] == 25 and result["failed"] == 0
+        assert max(len(b) for b in provider.batches) == 4
+        assert 1 < provider.peak <= 2
+        assert db.failure_cards.bulk_writes == 3  # one per page
+        assert all(d.get("embedding_vector") for d in db.failure_cards.docs if "failure_id" in d)
+        assert all(d["embedding_model"] == "test-model" for d in db.failure_cards.docs if "failure_id" in d)
+        assert run(db.embedding_jobs.find_one({"job_id": "test"}))["status"] == "complete"
+
+    def test_dedupe_and_cache(self):
+        db = _Db(failure_cards=_Collection(_cards(6, text=lambda i: f"shared {i % 2}") +
+                                           [{"failure_id": "fc9", "title": "cached text"}]),
+                 embedding_cache=_Collection([{"text_hash": ep.compute_text_hash("cached text"),
+                                               "model": "test-model", "embedding": [9.0, 9.0]}]))
+        provider = _Provider()
+        result = run(_pipeline(db, provider).run())
+
+        assert sorted(provider.texts) == ["shared 0", "shared 1"]
+        assert result["deduplicated"] == 4 and result["cache_hits"] == 1 and result["embedded"] == 2
+        assert db.failure_cards.docs[-1]["embedding_vector"] == [9.0, 9.0]
+        assert len(db.embedding_cache.docs) == 3
+
+        # Second run: every text now comes from the cache
+        for d in db.failure_cards.docs:
+            d.pop("embedding_vector")
+        provider = _Provider()
+        result = run(_pipeline(db, provider).run())
+        assert provider.batches == [] and result["cache_hits"] == 3 and result["processed"] == 7
+
+    def test_degraded_model_written_but_not_cached(self):
+        db = _Db(failure_cards=_Collection(_cards(2)))
+        run(_pipeline(db, _Provider(model="text-features-only")).run())
+        assert db.embedding_cache.docs == []
+        assert db.failure_cards.docs[0]["embedding_model"] == "text-features-only"
+
+
+# ==================== FAILURES / RESUME ====================
+
+class TestFailures:
+
+    def test_batch_errors_and_missing_vectors(self):
+        cards = _cards(8) + [{"failure_id": "fc9999", "title": "   "}]
+        db = _Db(failure_cards=_Collection(cards))
+        provider = _Provider(fail={"card text 0"}, missing={"card text 5"})
+        result = run(_pipeline(db, provider).run())
+
+        errors = {e["failure_id"]: e["error"] for e in result["errors"]}
+        assert set(errors) == {"fc0000", "fc0001", "fc0002", "fc0003", "fc0005", "fc9999"}
+        assert errors["fc0000"] == "rate limited" and errors["fc9999"] == "No text to embed"
+        assert result["processed"] == 3 and result["failed"] == 6
+
+    def test_resume_after_interruption(self):
+        db = _Db(failure_cards=_Collection(_cards(25)))
+        db.failure_cards.fail_bulk_write_at = 2
+        with pytest.raises(RuntimeError):
+            run(_pipeline(db, _Provider()).run())
+        job = run(db.embedding_jobs.find_one({"job_id": "test"}))
+        assert job["status"] == "failed" and job["last_key"] == "fc0009" and job["processed"] == 10
+
+        provider = _Provider()
+        result = run(_pipeline(db, provider, use_cache=False).run())
+        assert result["resumed"] and result["processed"] == 25 and result["scanned"] == 25
+        assert sorted(provider.texts) == [f"card text {i}" for i in range(10, 25)]
+
+        result = run(_pipeline(db, _Provider(), use_cache=False).run())  # complete → fresh run
+        assert not result["resumed"] and result["processed"] == 25
+
+
+# ==================== EFI MANAGER ====================
+
+class TestEFIManager:
+
+    def test_embed_all_cards_matches_single_card_path(self):
+        cards = [{"failure_id": f"fc{i}", "title": f"Battery fault {i % 3}", "keywords": ["bms"]}
+                 for i in range(7)]
+        db = _Db(failure_cards=_Collection(cards))
+        manager = EFIEmbeddingManager(db, embedding_service=FallbackEmbeddingService(16))
+        result = run(manager.embed_all_cards())
+
+        assert (result["total"], result["success"], result["failed"]) == (7, 7, 0)
+        expected = FallbackEmbeddingService(16)._generate_hash_embedding("Battery fault 1 bms")
+        assert db.failure_cards.docs[1]["embedding_vector"] == expected
+        assert db.failure_cards.docs[1]["embedding_model"] == "hash-fallback"
+        assert db.embedding_cache.docs == []
@@ -0,0 +1,282 @@
+"""
+Tests for the Failure Card Vector Index
+=======================================
+Covers: top-k matching a brute-force cosine ranking, status / subsystem /
+EFI-exclusion pre-filters, per-dimension segments, version-poll sync
+(changed cards patched, deletes forcing a reload), reloads swapped in
+atomically and run single-flight, simple filter translation,
+and EFIEmbeddingManager.find_similar_failure_cards on the index (decision
+tree boost first, subsystem fallback, no embeddings in results).
+"""
+
+import pytest
+import asyncio
+import math
+import random
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services import failure_card_index as fci
+from services.efi_embedding_service import EFIEmbeddingManager, FallbackEmbeddingService
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def _get(doc, path):
+    for part in path.split("."):
+        if isinstance(doc, list) and part.isdigit():
+            doc = doc[int(part)] if int(part) < len(doc) else None
+        elif isinstance(doc, dict):
+            doc = doc.get(part)
+        else:
+            return None
+    return doc
+
+
+def _matches(doc, query):
+    for field, cond in query.items():
+        if field == "$or":
+            if not any(_matches(doc, q) for q in cond):
+                return False
+            continue
+        value = _get(doc, field)
+        if isinstance(cond, dict):
+            if "$exists" in cond and (value is not None) != cond["$exists"]:
+                return False
+            if "$ne" in cond and value == cond["$ne"]:
+                return False
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+            if "$gte" in cond and not (value is not None and value >= cond["$gte"]):
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def batch_size(self, n):
+        return self
+
+    async def to_list(self, n):
+        return self._docs
+
+    def __aiter__(self):
+        async def gen():
+            for d in self._docs:
+                yield d
+        return gen()
+
+
+class _Collection:
+    def __init__(self, docs=None):
+        self.docs = [dict(d) for d in docs or []]
+
+    def find(self, query, projection=None):
+        docs = [dict(d) for d in self.docs if _matches(d, query)]
+        for field, keep in (projection or {}).items():
+            if not keep:
+                for d in docs:
+                    d.pop(field, None)
+        return _Cursor(docs)
+
+    async def count_documents(self, query):
+        return sum(1 for d in self.docs if _matches(d, query))
+
+    async def distinct(self, field):
+        return list({d.get(field) for d in self.docs})
+
+
+class _SlowCursor(_Cursor):
+    """Yields to the event loop between documents, like a cursor fetching batches"""
+
+    def __aiter__(self):
+        async def gen():
+            for d in self._docs:
+                await asyncio.sleep(0)
+                yield d
+        return gen()
+
+
+class _SlowCollection(_Collection):
+    def __init__(self, docs=None):
+        super().__init__(docs)
+        self.finds = 0
+
+    def find(self, query, projection=None):
+        self.finds += 1
+        return _SlowCursor(super().find(query, projection)._docs)
+
+
+class _Db:
+    def __init__(self, **collections):
+        self._collections = collections
+
+    def __getattr__(self, name):
+        return self._collections.setdefault(name, _Collection())
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+def _card(failure_id, vector, **fields):
+    return {"failure_id": failure_id, "embedding_vector": vector, "status": "approved",
+            "subsystem_category": "battery", "updated_at": "2026-01-01T00:00:00", "title": failure_id,
+            **fields}
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    na, nb = math.sqrt(sum(x * x for x in a)), math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+def _random_vector(rng, dims=16):
+    return [rng.uniform(-1, 1) for _ in range(dims)]
+
+
+# ==================== SEARCH ====================
+
+class TestSearch:
+
+    def test_top_k_matches_brute_force(self):
+        rng = random.Random(7)
+        cards = [_card(f"fc{i}", _random_vector(rng)) for i in range(300)]
+        index = fci.FailureCardVectorIndex()
+        index.add_cards(cards)
+        query = _random_vector(rng)
+
+        hits = index.search(query, 10)
+        expected = sorted(((c["failure_id"], _cosine(query, c["embedding_vector"])) for c in cards),
+                          key=lambda x: x[1], reverse=True)[:10]
+        assert [h[0] for h in hits] == [e[0] for e in expected]
+        assert [h[1] for h in hits] == pytest.approx([e[1] for e in expected], abs=1e-5)
+
+    def test_filters_and_min_score(self):
+        index = fci.FailureCardVectorIndex()
+        index.add_cards([
+            _card("a", [1.0, 0.0]),
+            _card("b", [0.9, 0.1], status="draft", subsystem_category="motor"),
+            _card("c", [0.8, 0.2], excluded_from_efi=True),
+            _card("d", [0.0, 1.0], fault_category="battery", subsystem_category="electrical"),
+            _card("e", [0.0, 0.0]),
+        ])
+        assert [h[0] for h in index.search([1.0, 0.0], 10)][:3] == ["a", "b", "c"]
+        assert [h[0] for h in index.search([1.0, 0.0], 10, statuses=["draft"])] == ["b"]
+        assert [h[0] for h in index.search([1.0, 0.0], 10, include_excluded=False, min_score=0.5)] == ["a", "b"]
+        battery_any = index.search([1.0, 0.0], 10, subsystem=["battery"],
+                                   subsystem_fields=("subsystem_category", "fault_category"))
+        assert {h[0] for h in battery_any} == {"a", "c", "d", "e"}
+        assert dict(index.search([1.0, 0.0], 10))["e"] == 0.0
+        assert index.search([1.0, 0.0], 10, statuses=["unknown"]) == []
+
+    def test_segments_per_dimension(self):
+        index = fci.FailureCardVectorIndex()
+        index.add_cards([_card("a", [1.0, 0.0]), _card("b", [1.0, 0.0, 0.0])])
+        assert [h[0] for h in index.search([1.0, 0.0, 0.0], 5)] == ["b"]
+        assert index.search([1.0] * 4, 5) == []
+
+        index.add_cards([_card("b", [0.0, 1.0])])  # re-embedded at the other dimension
+        assert [h[0] for h in index.search([0.0, 1.0], 5)] == ["b", "a"]
+        assert index.search([1.0, 0.0, 0.0], 5) == []
+        assert len(index) == 2
+
+
+# ==================== SYNC ====================
+
+class TestSync:
+
+    def test_poll_patches_changed_cards_and_reloads_on_delete(self):
+        db = _Db(failure_cards=_Collection([_card("a", [1.0, 0.0]), _card("b", [0.0, 1.0]),
+                                            {"failure_id": "c", "title": "no vector"}]))
+        index = fci.FailureCardVectorIndex(db, refresh_seconds=0)
+        assert [h[0] for h in run(index.query([1.0, 0.0], 1))] == ["a"]
+        assert len(index) == 2
+
+        db.failure_cards.docs[1].update(embedding_vector=[1.0, 0.01], updated_at="2026-02-01T00:00:00")
+        assert [h[0] for h in run(index.query([0.0, 1.0], 2))] == ["b", "a"]
+        assert index.watermark == "2026-02-01T00:00:00"
+
+        db.failure_cards.docs.pop(0)
+        assert [h[0] for h in run(index.query([1.0, 0.0], 5))] == ["b"]
+
+    def test_refresh_is_rate_limited(self):
+        db = _Db(failure_cards=_Collection([_card("a", [1.0, 0.0])]))
+        index = fci.FailureCardVectorIndex(db, refresh_seconds=3600)
+        run(index.refresh())
+        db.failure_cards.docs.append(_card("b", [0.0, 1.0], updated_at="2026-03-01T00:00:00"))
+        run(index.refresh())
+        assert len(index) == 1
+        run(index.refresh(force=True))
+        assert len(index) == 2
+
+    def test_reload_is_atomic_and_single_flight(self):
+        cards = _SlowCollection([_card(f"c{i}", [1.0, i / 10]) for i in range(5)])
+        index = fci.FailureCardVectorIndex(_Db(failure_cards=cards), refresh_seconds=0, full_reload_seconds=0)
+        run(index.load())
+        snapshot = index.snapshot()
+        mask = snapshot.mask(2, statuses=["approved"])
+        cards.docs.append(_card("c5", [1.0, 0.5]))
+        cards.finds = 0
+
+        async def scenario():
+            reloads = [asyncio.ensure_future(index.refresh()) for _ in range(5)]
+            during = []
+            for _ in range(3):
+                await asyncio.sleep(0)
+                during.append(len(index.search([1.0, 0.0], 10)))
+            await asyncio.gather(*reloads)
+            return during
+
+        assert run(scenario()) == [5, 5, 5]  # never a half-built index
+        assert cards.finds == 1  # five concurrent refreshes, one collection scan
+        assert len(index) == 6
+        # A mask from the old snapshot still searches that snapshot
+        assert len(snapshot.search([1.0, 0.0], 10, mask=mask)) == 5
+
+    def test_filter_translation(self):
+        assert fci.filter_to_mask_args({"status": {"$in": ["approved", "draft"]}, "subsystem_category": "motor"}) == {
+            "statuses": ["approved", "draft"], "subsystem": ["motor"], "subsystem_fields": ("subsystem_category",)}
+        assert fci.filter_to_mask_args({}) == {}
+        assert fci.filter_to_mask_args({"keywords": {"$in": ["bms"]}}) is None
+        assert fci.filter_to_mask_args({"status": {"$nin": ["deprecated"]}}) is None
+
+
+# ==================== EFI MANAGER ====================
+
+class TestEFIManager:
+
+    def _manager(self, cards, trees=()):
+        db = _Db(failure_cards=_Collection(cards),
+                 efi_decision_trees=_Collection([{"failure_card_id": t} for t in trees]))
+        return EFIEmbeddingManager(db, embedding_service=FallbackEmbeddingService(2))
+
+    def test_tree_cards_first_and_boosted(self):
+        manager = self._manager([
+            _card("close", [1.0, 0.0]),
+            _card("tree", [0.6, 0.8]),
+            _card("far", [0.0, 1.0]),
+        ], trees=["tree"])
+        results = run(manager.find_similar_failure_cards([1.0, 0.0], subsystem="battery", limit=2))
+        assert [r["failure_id"] for r in results] == ["tree", "close"]
+        assert results[0]["similarity_score"] == pytest.approx(0.9) and results[0]["has_decision_tree"]
+        assert results[0]["raw_similarity"] == pytest.approx(0.6)
+        assert results[1]["confidence_level"] == "high"
+        assert all("embedding_vector" not in r for r in results)
+
+    def test_subsystem_fallback_and_exclusions(self):
+        manager = self._manager([
+            _card("m", [1.0, 0.0], subsystem_category="motor"),
+            _card("x", [1.0, 0.0], excluded_from_efi=True),
+        ])
+        results = run(manager.find_similar_failure_cards([1.0, 0.0], subsystem="controller"))
+        assert [r["failure_id"] for r in results] == ["m"]
+        assert run(manager.find_similar_failure_cards([1.0, 0.0, 0.0])) == []
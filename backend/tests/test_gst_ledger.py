@@ -0,0 +1,410 @@
+"""
+Tests for the GST Tax Line Ledger
+=================================
+Covers: line building (document totals allocated across lines, HSN
+fallback, B2B/B2CL/B2CS category, credit-note fixed split, legacy expense
+18% assumption), sync on status changes, rebuild / verify (invoice copies
+in both collections counted once, drift detection), and GSTR-1 / GSTR-3B /
+HSN summary computed from grouped ledger rows, scheduler-generated
+documents reaching the ledger, the watermark catch-up of writes that
+bypass sync_gst_document, and the per-period reconcile of deletions and
+stampless / back-dated writes.
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services import gst_ledger
+from services.gst_ledger import build_tax_lines, split_tax, sync_gst_document
+from services import scheduler
+from routes import gst
+
+
+ORG = "org-gst"
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def _gstin(state, pan="AAACF1234A"):
+    base = f"{state}{pan}1Z"
+    return base + gst.compute_gstin_checksum(base)
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def to_list(self, length=None):
+        return self._docs
+
+    def __aiter__(self):
+        async def gen():
+            for d in self._docs:
+                yield d
+        return gen()
+
+
+def _matches(doc, query):
+    for field, cond in query.items():
+        if field == "$or":
+            if not any(_matches(doc, q) for q in cond):
+                return False
+            continue
+        value = doc.get(field)
+        if isinstance(cond, dict):
+            # Like Mongo, range operators only compare values of the same type
+            for op, cmp in (("$gt", "__gt__"), ("$gte", "__ge__"), ("$lt", "__lt__"), ("$lte", "__le__")):
+                if op in cond and not (isinstance(value, type(cond[op])) and getattr(value, cmp)(cond[op])):
+                    return False
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+            if "$nin" in cond and value in cond["$nin"]:
+                return False
+            if "$ne" in cond and value == cond["$ne"]:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+def _value(doc, expr):
+    return doc.get(expr[1:]) if isinstance(expr, str) and expr.startswith("$") else expr
+
+
+class _Collection:
+    """In-memory collection with a $match + $group aggregate"""
+
+    _next_id = 0
+
+    def __init__(self, docs=None):
+        self.docs = []
+        for d in docs or []:
+            self._add(d)
+
+    def _add(self, doc):
+        _Collection._next_id += 1
+        self.docs.append({"_id": _Collection._next_id, **doc})
+
+    def find(self, query, projection=None):
+        return _Cursor([dict(d) for d in self.docs if _matches(d, query)])
+
+    async def find_one(self, query, projection=None):
+        return next((dict(d) for d in self.docs if _matches(d, query)), None)
+
+    async def insert_many(self, docs):
+        for d in docs:
+            self._add(d)
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            self.docs = [d for d in self.docs if not _matches(d, op._filter)]
+            self._add(op._doc)
+
+    async def insert_one(self, doc):
+        self._add(dict(doc))
+
+    async def update_one(self, query, update, upsert=False):
+        doc = next((d for d in self.docs if _matches(d, query)), None)
+        if doc is None:
+            self._add(dict(query))
+            doc = self.docs[-1]
+        doc.update(update.get("$set", {}))
+        for field, amount in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + amount
+        return doc
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=False):
+        return dict(await self.update_one(query, update, upsert))
+
+    async def delete_many(self, query):
+        before = len(self.docs)
+        self.docs = [d for d in self.docs if not _matches(d, query)]
+        return SimpleNamespace(deleted_count=before - len(self.docs))
+
+    def aggregate(self, pipeline):
+        docs = [d for d in self.docs if _matches(d, pipeline[0]["$match"])]
+        spec = pipeline[1]["$group"]
+        groups = {}
+        for d in docs:
+            key_doc = {k: _value(d, v) for k, v in spec["_id"].items()}
+            row = groups.setdefault(tuple(key_doc.values()), {"_id": key_doc})
+            for field, acc in spec.items():
+                if field == "_id":
+                    continue
+                op, expr = next(iter(acc.items()))
+                v = _value(d, expr)
+                if op == "$sum":
+                    row[field] = row.get(field, 0) + (v or 0)
+                elif op == "$first":
+                    row.setdefault(field, v)
+                elif op == "$addToSet":
+                    row.setdefault(field, [])
+                    if v not in row[field]:
+                        row[field].append(v)
+        return _Cursor(list(groups.values()))
+
+
+class _Db:
+    def __init__(self, **collections):
+        self._collections = collections
+
+    def __getattr__(self, name):
+        return self._collections.setdefault(name, _Collection())
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+@pytest.fixture(autouse=True)
+def _ready_cache():
+    gst_ledger.reset_ready_cache()
+    yield
+    gst_ledger.reset_ready_cache()
+
+
+def _month_db():
+    """March 2026 of a Maharashtra (27) workshop"""
+    b2b = {"invoice_id": "i1", "invoice_number": "INV-1", "organization_id": ORG, "status": "sent",
+           "invoice_date": "2026-03-05", "customer_name": "Fleet Co", "customer_gstin": _gstin("27"),
+           "sub_total": 1000, "tax_total": 180, "grand_total": 1180}
+    return _Db(
+        organization_settings=_Collection([{"organization_id": ORG, "place_of_supply": "27"}]),
+        invoices=_Collection([
+            b2b,
+            {"invoice_id": "i2", "invoice_number": "Z-2", "organization_id": ORG, "status": "paid",
+             "date": "2026-03-10", "customer_name": "Walk-in", "place_of_supply": "29",
+             "sub_total": 500, "total": 590,
+             "line_items": [{"hsn_or_sac": "9987", "quantity": 1, "rate": 500, "tax_percentage": 18}]},
+            {"invoice_id": "i3", "invoice_number": "INV-3", "organization_id": ORG, "status": "draft",
+             "invoice_date": "2026-03-11", "sub_total": 999, "tax_total": 99, "grand_total": 1098},
+        ]),
+        invoices_enhanced=_Collection([dict(b2b)]),
+        invoice_line_items=_Collection([
+            {"invoice_id": "i1", "hsn_sac_code": "8507", "quantity": 2, "unit": "PCS",
+             "taxable_amount": 600, "tax_amount": 108, "tax_rate": 18},
+            {"invoice_id": "i1", "hsn_sac_code": "9987", "quantity": 1,
+             "taxable_amount": 400, "tax_amount": 72, "tax_rate": 18},
+        ]),
+        credit_notes=_Collection([
+            {"credit_note_id": "cn1", "credit_note_number": "CN-1", "organization_id": ORG, "status": "issued",
+             "credit_note_date": "2026-03-20", "customer_name": "Walk-in", "original_invoice_number": "Z-2",
+             "subtotal": 100, "cgst_amount": 9, "sgst_amount": 9, "igst_amount": 0, "gst_amount": 18, "total": 118,
+             "line_items": [{"hsn_sac": "9987", "amount": 100, "tax_amount": 18, "tax_rate": 18}]},
+        ]),
+        bills=_Collection([
+            {"bill_id": "b1", "bill_number": "B-1", "organization_id": ORG, "status": "open",
+             "bill_date": "2026-03-03", "vendor_name": "Cells Ltd", "vendor_gstin": _gstin("29", "AABCC1234D"),
+             "reverse_charge": True, "sub_total": 1000, "tax_total": 180, "grand_total": 1180},
+            {"bill_id": "b2", "bill_number": "B-2", "organization_id": ORG, "status": "draft",
+             "bill_date": "2026-03-04", "sub_total": 5000, "tax_total": 900, "grand_total": 5900},
+        ]),
+        expenses=_Collection([
+            {"expense_id": "e1", "expense_number": "EXP-1", "organization_id": ORG, "status": "APPROVED",
+             "expense_date": "2026-03-04", "amount": 200, "cgst_amount": 18, "sgst_amount": 18, "igst_amount": 0},
+        ]),
+    )
+
+
+# ==================== LINES ====================
+
+class TestBuildTaxLines:
+
+    def test_lines_sum_back_to_document(self):
+        doc = {"invoice_id": "x", "organization_id": ORG, "invoice_date": "2026-03-01", "sub_total": 100,
+               "tax_total": 18, "grand_total": 118,
+               "line_items": [{"amount": 1}, {"amount": 1}, {"amount": 1, "hsn_code": "8507"}]}
+        lines = build_tax_lines("invoices", doc)
+        assert [l["taxable_value"] for l in lines] == [33.33, 33.33, 33.34]
+        assert round(sum(l["tax"] for l in lines), 2) == 18 and round(sum(l["value"] for l in lines), 2) == 118
+        assert [l["hsn_code"] for l in lines] == ["9987", "9987", "8507"]
+        assert lines[0]["gst_rate"] == 18.0 and lines[0]["period"] == "2026-03"
+        assert all(l["unsplit_tax"] == l["tax"] and l["cgst"] == 0 for l in lines)
+
+    def test_invoice_category(self):
+        base = {"invoice_id": "x", "organization_id": ORG, "invoice_date": "2026-03-01", "sub_total": 100}
+        assert build_tax_lines("invoices", {**base, "customer_gstin": _gstin("27")})[0]["category"] == "b2b"
+        assert build_tax_lines("invoices", {**base, "total": 300000})[0]["category"] == "b2cl"
+        line = build_tax_lines("invoices", {**base, "total": 118, "place_of_supply": "07"})[0]
+        assert (line["category"], line["place_of_supply"], line["registered"]) == ("b2cs", "07", False)
+
+    def test_credit_note_keeps_its_split(self):
+        doc = {"credit_note_id": "c", "organization_id": ORG, "created_at": "2026-03-09T10:00:00+00:00",
+               "subtotal": 200, "cgst_amount": 0, "sgst_amount": 0, "igst_amount": 36, "gst_amount": 36, "total": 236,
+               "line_items": [{"amount": 150, "tax_amount": 27}, {"amount": 50, "tax_amount": 9}]}
+        lines = build_tax_lines("credit_notes", doc)
+        assert [(l["igst"], l["unsplit_tax"]) for l in lines] == [(27.0, 0.0), (9.0, 0.0)]
+        assert lines[0]["doc_date"] == "2026-03-09" and lines[0]["category"] == "cdnur"
+
+    def test_legacy_expense_assumes_18_percent(self):
+        line, = build_tax_lines("expenses", {"expense_id": "e", "organization_id": ORG,
+                                             "expense_date": "2026-03-02", "amount": 100})
+        assert (line["tax"], line["unsplit_tax"], line["itc_category"]) == (18.0, 18.0, "other")
+
+
+# ==================== SYNC ====================
+
+class TestSync:
+
+    def test_lines_follow_status(self):
+        db = _month_db()
+        assert run(sync_gst_document(db, "invoices", "i3")) == 0
+        db.invoices.docs[2]["status"] = "sent"
+        assert run(sync_gst_document(db, "invoices", "i3")) == 1
+        assert run(sync_gst_document(db, "invoices", "i1")) == 2
+        db.invoices.docs[2]["status"] = "void"
+        run(sync_gst_document(db, "invoices", "i3"))
+        assert {l["source_id"] for l in db.gst_tax_lines.docs} == {"i1"}
+
+
+# ==================== REBUILD / VERIFY ====================
+
+class TestRebuild:
+
+    def test_rebuild_then_verify(self):
+        db = _month_db()
+        result = run(gst_ledger.rebuild_gst_ledger(db, ORG))
+        # i1 (2 lines, once despite the invoices_enhanced copy), i2, cn1, b1, e1; drafts skipped
+        assert (result["lines"], result["documents"]) == (6, 5)
+        assert run(gst_ledger.verify_gst_ledger(db, ORG))["ok"]
+
+        db.gst_tax_lines.docs = [l for l in db.gst_tax_lines.docs if l["source_id"] != "b1"]
+        report = run(gst_ledger.verify_gst_ledger(db, ORG))
+        assert report["mismatches"] == [{"source_type": "bill", "source_id": "b1",
+                                        "fields": ["taxable_value", "tax", "value", "lines", "period"]}]
+
+    def test_split_by_place_of_supply(self):
+        assert split_tax({"unsplit_tax": 18, "place_of_supply": ""}, "27") == {"cgst": 9, "sgst": 9, "igst": 0}
+        assert split_tax({"unsplit_tax": 18, "igst": 5, "place_of_supply": "29"}, "27")["igst"] == 23
+
+
+# ==================== RETURNS ====================
+
+def _request():
+    return SimpleNamespace(state=SimpleNamespace(tenant_org_id=ORG))
+
+
+class TestReturns:
+
+    def test_gstr1(self):
+        db = _month_db()
+        with patch.object(gst, "get_db", return_value=db):
+            report = run(gst.get_gstr1_report(_request(), month="2026-03", format="json"))
+        b2b = report["b2b"]["summary"]
+        assert (b2b["count"], b2b["taxable_value"], b2b["cgst"], b2b["sgst"], b2b["igst"]) == (1, 1000, 90, 90, 0)
+        assert report["b2b"]["invoices"][0]["invoice_date"] == "2026-03-05"
+        small = report["b2c_small"]
+        assert (small["summary"]["igst"], small["summary"]["invoice_value"]) == (90, 590)
+        assert small["by_state_rate"] == [{"state": "Karnataka", "gst_rate": 18.0, "taxable_value": 500.0,
+                                           "cgst": 0, "sgst": 0, "igst": 90.0, "total_tax": 90.0, "count": 1}]
+        assert report["cdnr_unregistered"]["summary"]["cgst"] == 9
+        hsn = {h["hsn_code"]: h for h in report["hsn_summary"]["by_code_rate"]}
+        assert (hsn["8507"]["cgst"], hsn["8507"]["uom"], hsn["8507"]["total_quantity"]) == (54, "PCS", 2)
+        assert (hsn["9987"]["taxable_value"], hsn["9987"]["igst"]) == (900, 90)
+        assert report["grand_total"]["taxable_value"] == 1400
+        assert report["grand_total"]["total_invoices"] == 2
+
+    def test_gstr3b(self):
+        db = _month_db()
+        with patch.object(gst, "get_db", return_value=db):
+            report = run(gst.get_gstr3b_report(_request(), month="2026-03", format="json"))
+        outward = report["section_3_1"]["a"]
+        assert (outward["gross_outward"], outward["cgst"], outward["igst"]) == (1500, 81, 90)
+        assert report["section_3_2"]["interstate"]["supplies"][0]["state_name"] == "Karnataka"
+        table_4a = report["section_4"]["table_4A"]
+        assert table_4a["(3)_inward_supplies_rcm"]["igst"] == 180
+        assert table_4a["(5)_all_other_itc"] == {"cgst": 18, "sgst": 18, "igst": 0}
+        rcm = report["section_3_1"]["d"]
+        assert (rcm["taxable_value"], rcm["igst"], rcm["bill_count"]) == (1000, 180, 1)
+        assert report["adjustments"]["credit_notes"]["count"] == 1
+
+    def test_hsn_summary(self):
+        db = _month_db()
+        with patch.object(gst, "get_db", return_value=db):
+            report = run(gst.get_hsn_summary(_request(), month="2026-03", format="json"))
+        assert [h["hsn_code"] for h in report["hsn_summary"]] == ["8507", "9987"]
+        assert report["total"]["taxable_value"] == 1500
+        assert (report["total"]["cgst"], report["total"]["igst"]) == (90, 90)
+
+
+# ==================== WRITES AFTER THE BUILD ====================
+
+class TestLateWrites:
+
+    def test_scheduler_recurring_invoice_reaches_gstr1(self):
+        db = _month_db()
+        month = datetime.now(timezone.utc).strftime("%Y-%m")
+        with patch.object(gst, "get_db", return_value=db):
+            before = run(gst.get_gstr1_report(_request(), month=month, format="json"))
+        assert before["grand_total"]["total_invoices"] == 0
+
+        db.recurring_invoices.docs.append({
+            "recurring_invoice_id": "ri1", "organization_id": ORG, "status": "active",
+            "next_invoice_date": "2026-01-01", "customer_id": "c1", "customer_name": "Walk-in",
+            "sub_total": 1000, "tax_total": 180, "total": 1180,
+        })
+        with patch.object(scheduler, "get_db", return_value=db):
+            assert run(scheduler.generate_recurring_invoices())["generated"] == 1
+        invoice_id = db.invoices.docs[-1]["invoice_id"]
+        # Written by the scheduler's own hook, before any poll
+        assert [l["taxable_value"] for l in db.gst_tax_lines.docs if l["source_id"] == invoice_id] == [1000]
+
+        with patch.object(gst, "get_db", return_value=db):
+            report = run(gst.get_gstr1_report(_request(), month=month, format="json"))
+        assert report["grand_total"]["total_invoices"] == 1
+        assert report["b2c_small"]["summary"]["invoice_value"] == 1180
+
+    def test_catch_up_syncs_writes_that_bypass_the_hook(self):
+        db = _month_db()
+        run(gst_ledger.ensure_gst_ledger(db, ORG))
+        now = datetime.now(timezone.utc)
+        base = {"organization_id": ORG, "status": "sent", "invoice_date": "2026-03-25", "sub_total": 100,
+                "tax_total": 18, "grand_total": 118}
+        db.invoices.docs += [
+            {**base, "invoice_id": "late-str", "created_time": now.isoformat()},
+            {**base, "invoice_id": "late-dt", "updated_at": now},
+            {**base, "invoice_id": "old", "created_at": (now - timedelta(days=2)).isoformat()},
+        ]
+        db.invoices.docs[0]["status"] = "void"
+        db.invoices.docs[0]["updated_time"] = now.isoformat()
+
+        run(gst_ledger.ensure_gst_ledger(db, ORG))
+        assert {l["source_id"] for l in db.gst_tax_lines.docs if l["source_type"] == "invoice"} == \
+            {"i2", "late-str", "late-dt"}
+        mark = db.gst_tax_lines_status.docs[0]["synced_through"]
+        assert mark >= now.isoformat()
+        assert run(gst_ledger.catch_up_gst_ledger(db, ORG)) == 3  # still inside the overlap window
+
+    def test_period_reconcile_notices_deletes_and_stampless_writes(self):
+        db = _month_db()
+        run(gst_ledger.ensure_gst_ledger(db, ORG))
+        # No stamps past the watermark: a direct delete, a stampless insert and a back-dated one
+        db.invoices.docs = [d for d in db.invoices.docs if d["invoice_id"] != "i2"]
+        db.bills.docs.append({"bill_id": "b3", "organization_id": ORG, "status": "open",
+                              "bill_date": datetime(2026, 3, 9, tzinfo=timezone.utc),
+                              "sub_total": 100, "tax_total": 18, "grand_total": 118})
+        db.credit_notes.docs.append({"credit_note_id": "cn2", "organization_id": ORG, "status": "issued",
+                                     "credit_note_date": "2026-03-21", "created_at": "2026-03-21T10:00:00",
+                                     "subtotal": 50, "gst_amount": 9, "total": 59})
+        db.expenses.docs.append({"expense_id": "e2", "organization_id": ORG, "status": "APPROVED",
+                                 "expense_date": "2026-04-02", "amount": 100})
+
+        assert run(gst_ledger.catch_up_gst_ledger(db, ORG)) == 0
+        assert run(gst_ledger.reconcile_gst_period(db, ORG, "2026-03")) == 3
+        ids = {l["source_id"] for l in db.gst_tax_lines.docs}
+        assert {"b3", "cn2"} <= ids and not {"i2", "e2"} & ids
+        assert run(gst_ledger.reconcile_gst_period(db, ORG, "2026-03")) == 0
+
+        with patch.object(gst, "get_db", return_value=db):
+            report = run(gst.get_gstr1_report(_request(), month="2026-04", format="json"))
+        assert "e2" in {l["source_id"] for l in db.gst_tax_lines.docs}
+        assert report["grand_total"]["total_invoices"] == 0
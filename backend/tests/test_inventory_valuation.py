@@ -0,0 +1,200 @@
+"""
+Tests for the Inventory Valuation Engine
+========================================
+Covers: unit price / weighted average / FIFO values from stock movement cost
+layers (newest layers on the shelf, fallback rate beyond them), string and
+empty rate coercion, stock from the org's item_stock_locations with
+per-warehouse totals (available_stock of 0 taken as is), grouping, batched cursor reads and unsupported methods.
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services import inventory_valuation as iv
+
+
+ORG = "org-iv"
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def _matches(doc, query):
+    for field, cond in query.items():
+        value = doc.get(field)
+        if isinstance(cond, dict):
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+            if "$gt" in cond and not (value is not None and value > cond["$gt"]):
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, docs, batches):
+        self._docs = docs
+        self._batches = batches
+
+    def batch_size(self, n):
+        self._batches.append(n)
+        return self
+
+    def __aiter__(self):
+        async def gen():
+            for d in self._docs:
+                yield d
+        return gen()
+
+
+class _Collection:
+    def __init__(self, docs=None):
+        self.docs = [dict(d) for d in docs or []]
+        self.batches = []
+        self.projections = []
+
+    def find(self, query, projection=None):
+        self.projections.append(projection)
+        keep = [k for k, v in (projection or {}).items() if v]
+        docs = [d for d in self.docs if _matches(d, query)]
+        if keep:
+            docs = [{k: d[k] for k in keep if k in d} for d in docs]
+        return _Cursor(docs, self.batches)
+
+
+class _Db:
+    def __init__(self, **collections):
+        self._collections = collections
+
+    def __getattr__(self, name):
+        return self._collections.setdefault(name, _Collection())
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+def _item(item_id, **fields):
+    return {"item_id": item_id, "organization_id": ORG, "name": item_id.upper(), **fields}
+
+
+def _layer(item_id, date, qty, cost):
+    return {"item_id": item_id, "organization_id": ORG, "movement_date": date, "quantity": qty,
+            "unit_cost": cost, "movement_type": "PURCHASE"}
+
+
+def _db():
+    return _Db(
+        items=_Collection([
+            _item("a", stock_on_hand=15, purchase_rate=130, notes="x" * 50),
+            _item("b", stock_on_hand="4", purchase_rate="", opening_stock_rate="50"),
+            _item("c", stock_on_hand=0, available_stock=25, purchase_rate=20),
+        ]),
+        stock_movements=_Collection([
+            _layer("a", "2026-02-01", 10, 120),
+            _layer("a", "2026-01-01", 10, 100),
+            _layer("c", "2026-01-05", 10, 10),
+            _layer("a", "2026-03-01", -8, 0),  # consumption, not a layer
+            {**_layer("a", "2026-03-02", 50, 1), "organization_id": "other"},
+        ]),
+    )
+
+
+def _values(valuation):
+    return {d["item_id"]: round(float(v), 2) for d, v in zip(valuation.docs, valuation.value)}
+
+
+# ==================== METHODS ====================
+
+class TestMethods:
+
+    def _value(self, db, method):
+        return run(iv.value_inventory(db, ORG, {"organization_id": ORG}, method=method,
+                                      rate_fields=("purchase_rate", "opening_stock_rate"), fields=("name",)))
+
+    def test_unit_price(self):
+        valuation = self._value(_db(), "unit_price")
+        assert _values(valuation) == {"a": 1950.0, "b": 200.0, "c": 500.0}
+        assert valuation.total_qty == 44.0
+
+    def test_weighted_average(self):
+        valuation = self._value(_db(), "weighted_average")
+        assert _values(valuation) == {"a": 1650.0, "b": 200.0, "c": 250.0}
+        assert float(valuation.unit_cost[0]) == 110.0
+
+    def test_fifo_keeps_newest_layers(self):
+        valuation = self._value(_db(), "fifo")
+        # a: 10 @ 120 (Feb) + 5 @ 100 (Jan); c: 10 @ 10 then 15 beyond the layers @ 20
+        assert _values(valuation) == {"a": 1700.0, "b": 200.0, "c": 400.0}
+
+    def test_fifo_matches_per_item_walk(self):
+        layers = [("2026-01-0%d" % d, q, c) for d, q, c in [(1, 4, 10.0), (2, 3, 12.0), (3, 6, 9.5)]]
+        db = _Db(items=_Collection([_item(f"i{n}", stock_on_hand=n, purchase_rate=7) for n in range(16)]),
+                 stock_movements=_Collection([_layer(f"i{n}", d, q, c) for n in range(16) for d, q, c in layers]))
+        valuation = run(iv.value_inventory(db, ORG, {"organization_id": ORG}, method="fifo"))
+        for doc, value in zip(valuation.docs, valuation.value):
+            remaining, expected = doc["stock_on_hand"], 0.0
+            for _, qty, cost in reversed(layers):
+                take = min(qty, remaining)
+                expected += take * cost
+                remaining -= take
+            expected += remaining * 7
+            assert float(value) == pytest.approx(expected)
+
+    def test_unsupported_method(self):
+        with pytest.raises(ValueError):
+            self._value(_db(), "lifo")
+
+
+# ==================== LOADING ====================
+
+class TestLoading:
+
+    def test_projection_and_batches(self):
+        db = _db()
+        valuation = run(iv.value_inventory(db, ORG, {"organization_id": ORG}, fields=("name",), batch_size=2))
+        assert "notes" not in valuation.docs[0]
+        assert db.items.projections[0]["_id"] == 0 and "notes" not in db.items.projections[0]
+        assert db.items.batches == [2]
+
+    def test_locations_and_warehouses(self):
+        db = _db()
+        db.item_stock_locations.docs = [
+            {"organization_id": ORG, "item_id": "a", "warehouse_id": "w1", "available_stock": 6,
+             "reserved_stock": 1},
+            {"organization_id": ORG, "item_id": "a", "warehouse_id": "w2", "stock": 9},
+            {"organization_id": ORG, "item_id": "c", "warehouse_id": "w1", "available_stock": 10},
+            # Sold out: available_stock 0 wins over the stale stock count
+            {"organization_id": ORG, "item_id": "c", "warehouse_id": "w2", "available_stock": 0, "stock": 7},
+            # Another org's row for the same item id
+            {"organization_id": "org-other", "item_id": "a", "warehouse_id": "w1", "available_stock": 50},
+        ]
+        valuation = run(iv.value_inventory(db, ORG, {"organization_id": ORG}, method="fifo",
+                                           stock_source="locations"))
+        assert [float(q) for q in valuation.qty] == [15.0, 0.0, 10.0]
+        assert [float(r) for r in valuation.reserved] == [1.0, 0.0, 0.0]
+        warehouses = {w["warehouse_id"]: w for w in valuation.warehouses}
+        assert warehouses["w1"]["total_units"] == 16.0 and warehouses["w2"]["total_units"] == 9.0
+        assert warehouses["w1"]["stock_value"] + warehouses["w2"]["stock_value"] == pytest.approx(
+            valuation.total_value)
+
+        only_w2 = run(iv.value_inventory(db, ORG, {"organization_id": ORG}, stock_source="locations",
+                                         warehouse_id="w2"))
+        assert only_w2.total_qty == 9.0 and len(only_w2.warehouses) == 1
+
+    def test_group_by(self):
+        db = _Db(items=_Collection([
+            _item("a", item_type="inventory", stock_on_hand=2, purchase_rate=5),
+            _item("b", item_type="service", stock_on_hand=1, purchase_rate=3),
+            _item("c", item_type="inventory", stock_on_hand=4, purchase_rate=1),
+        ]))
+        valuation = run(iv.value_inventory(db, ORG, {"organization_id": ORG}, fields=("item_type",)))
+        groups = {g["_id"]: g for g in valuation.group_by("item_type", purchase_value=valuation.value)}
+        assert groups["inventory"]["item_count"] == 2 and groups["inventory"]["purchase_value"] == 14.0
+        assert groups["service"]["purchase_value"] == 3.0
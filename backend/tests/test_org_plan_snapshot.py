@@ -0,0 +1,129 @@
+"""
+Tests for the Org Plan Snapshot Cache and record-limit counters
+===============================================================
+Covers: one organizations fetch shared across plan consumers, explicit
+invalidation, and check_record_limit using maintained per-org counters
+(seeded once, incremented after each successful create, re-counted at
+the limit).
+"""
+
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi import HTTPException
+
+from core.subscriptions.plan_snapshot import (
+    OrgPlanCache, get_org_plan_cache, get_org_plan_snapshot, invalidate_org_plan,
+)
+import utils.plan_limits as plan_limits
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def mock_db():
+    db = MagicMock()
+    db.organizations.find_one = AsyncMock(
+        return_value={"plan_type": "free_trial", "created_at": "2026-01-01T00:00:00+00:00"})
+    db.org_record_counters.find_one = AsyncMock(return_value=None)
+    db.org_record_counters.update_one = AsyncMock()
+    db.__getitem__.return_value.count_documents = AsyncMock(return_value=3)
+    get_org_plan_cache().clear()
+    yield db
+    get_org_plan_cache().clear()
+
+
+# ==================== SNAPSHOT CACHE ====================
+
+class TestOrgPlanSnapshot:
+
+    def test_consumers_share_one_fetch(self, mock_db):
+        from services import ai_token_service
+        ai_token_service.init_ai_token_service(mock_db)
+
+        snapshot = run(get_org_plan_snapshot(mock_db, "org-1"))
+        assert snapshot.plan_type == "free_trial"
+        info = run(ai_token_service._get_org_plan("org-1"))
+        assert info["plan"] == "free_trial"
+        assert mock_db.organizations.find_one.await_count == 1
+
+    def test_invalidate_forces_refetch(self, mock_db):
+        run(get_org_plan_snapshot(mock_db, "org-1"))
+        mock_db.organizations.find_one.return_value = {"plan_type": "professional"}
+        assert invalidate_org_plan("org-1") is True
+        assert run(get_org_plan_snapshot(mock_db, "org-1")).plan_type == "professional"
+        assert mock_db.organizations.find_one.await_count == 2
+
+    def test_missing_org_not_cached(self, mock_db):
+        mock_db.organizations.find_one.return_value = None
+        assert run(get_org_plan_snapshot(mock_db, "org-x")).exists is False
+        run(get_org_plan_snapshot(mock_db, "org-x"))
+        assert mock_db.organizations.find_one.await_count == 2
+
+    def test_ttl_expiry(self):
+        from core.subscriptions.plan_snapshot import OrgPlanSnapshot
+        import time
+        cache = OrgPlanCache(ttl_seconds=0.01, max_entries=10)
+        cache.set(OrgPlanSnapshot(org_id="org-1", exists=True, plan_type="starter"))
+        assert cache.get("org-1") is not None
+        time.sleep(0.02)
+        assert cache.get("org-1") is None
+
+
+# ==================== RECORD LIMITS ====================
+
+class TestRecordLimitCounters:
+
+    @pytest.fixture(autouse=True)
+    def _init(self, mock_db):
+        plan_limits.init_record_limits(mock_db)
+        yield
+        plan_limits.init_record_limits(None)
+
+    def _inc_calls(self, mock_db):
+        return [c for c in mock_db.org_record_counters.update_one.await_args_list if "$inc" in c.args[1]]
+
+    def test_seeds_counter_once_then_increments(self, mock_db):
+        run(plan_limits.check_record_limit("org-1", "contacts"))
+        count_documents = mock_db["contacts"].count_documents
+        assert count_documents.await_count == 1
+
+        # Subsequent creates read the counter, no collection count
+        mock_db.org_record_counters.find_one.return_value = {"count": 4}
+        run(plan_limits.check_record_limit("org-1", "contacts"))
+        assert count_documents.await_count == 1
+
+        # Only a create that went through is counted
+        assert self._inc_calls(mock_db) == []
+        run(plan_limits.record_created("org-1", "contacts"))
+        assert len(self._inc_calls(mock_db)) == 1
+        assert self._inc_calls(mock_db)[0].args[0] == {"organization_id": "org-1", "resource": "contacts"}
+
+    def test_recounts_at_limit_after_deletes(self, mock_db):
+        # Counter says the limit is hit, but records were deleted since
+        mock_db.org_record_counters.find_one.return_value = {"count": 10}
+        mock_db["contacts"].count_documents.return_value = 6
+        run(plan_limits.check_record_limit("org-1", "contacts"))
+
+    def test_raises_when_real_count_at_limit(self, mock_db):
+        mock_db.org_record_counters.find_one.return_value = {"count": 10}
+        mock_db["contacts"].count_documents.return_value = 10
+        with pytest.raises(HTTPException) as exc:
+            run(plan_limits.check_record_limit("org-1", "contacts"))
+        assert exc.value.status_code == 403
+        assert exc.value.detail["current_count"] == 10
+
+    def test_paid_plan_skips_counting(self, mock_db):
+        mock_db.organizations.find_one.return_value = {"plan_type": "professional"}
+        run(plan_limits.check_record_limit("org-1", "contacts"))
+        mock_db.org_record_counters.find_one.assert_not_awaited()
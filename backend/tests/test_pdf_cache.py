@@ -0,0 +1,110 @@
+"""
+Tests for the PDF Artifact Cache
+================================
+Covers: content-addressed keys (HTML + trial flag, "Generated on" stamps
+ignored), hits served from disk, LRU eviction by total bytes, files written
+by another worker, and render_pdf(cache=True) skipping the render pool on a
+repeat download.
+"""
+
+import asyncio
+import os
+import sys
+from unittest.mock import patch
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services import pdf_renderer
+from services.pdf_cache import PdfCache, generated_stamp
+from services.pdf_renderer import PdfRenderer
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def _doc(body):
+    return f"<html><body>{body}<p>Generated on {generated_stamp()}</p></body></html>"
+
+
+# ==================== KEYS ====================
+
+class TestKeys:
+
+    def test_stamp_ignored_but_content_and_trial_matter(self):
+        html = "<body>INV-1 ₹1,180.00<p>Generated on <!--generated-->March 01, 2026 at 10:00 AM<!--/generated--></p></body>"
+        later = html.replace("10:00 AM", "04:30 PM")
+        assert PdfCache.make_key(html) == PdfCache.make_key(later)
+        assert PdfCache.make_key(html) != PdfCache.make_key(html.replace("1,180", "1,190"))
+        assert PdfCache.make_key(html) != PdfCache.make_key(html, is_trial=True)
+
+
+# ==================== DISK CACHE ====================
+
+class TestPdfCache:
+
+    def test_put_then_hit(self, tmp_path):
+        cache = PdfCache(str(tmp_path), max_bytes=1024)
+        key = cache.make_key(_doc("INV-1"))
+        assert cache.get(key) is None
+        cache.put(key, b"%PDF-1")
+        assert cache.get(key) == b"%PDF-1"
+        assert (tmp_path / f"{key}.pdf").exists()
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"], stats["stores"], stats["bytes"]) == (1, 1, 1, 6)
+
+    def test_lru_eviction_by_total_bytes(self, tmp_path):
+        cache = PdfCache(str(tmp_path), max_bytes=250)
+        for name in ("a", "b", "c"):
+            cache.put(name, b"x" * 100)
+            if name == "b":
+                cache.get("a")  # a becomes most recently used
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+        stats = cache.get_stats()
+        assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 200, 1)
+        assert not (tmp_path / "b.pdf").exists()
+
+    def test_oversized_pdf_not_stored(self, tmp_path):
+        cache = PdfCache(str(tmp_path), max_bytes=10)
+        cache.put("big", b"x" * 11)
+        assert cache.get_stats()["entries"] == 0
+
+    def test_files_from_other_workers_are_indexed(self, tmp_path):
+        PdfCache(str(tmp_path), max_bytes=1024).put("k1", b"%PDF-a")
+        other = PdfCache(str(tmp_path), max_bytes=1024)
+        assert other.get("k1") == b"%PDF-a"
+        assert other.get_stats()["bytes"] == 6
+
+    def test_disabled(self, tmp_path):
+        cache = PdfCache(str(tmp_path), max_bytes=0)
+        cache.put("k", b"%PDF")
+        assert cache.get("k") is None and list(tmp_path.iterdir()) == []
+
+
+# ==================== RENDER INTEGRATION ====================
+
+def _counting_render(calls):
+    def render(html_content, is_trial):
+        calls.append(html_content)
+        return b"%PDF-" + str(len(calls)).encode()
+    return render
+
+
+class TestRenderPdfCached:
+
+    def test_repeat_download_skips_render(self, tmp_path):
+        calls = []
+        renderer = PdfRenderer(workers=0, render_fn=_counting_render(calls))
+        cache = PdfCache(str(tmp_path), max_bytes=1024)
+        with patch.object(pdf_renderer, "_pdf_renderer", renderer), \
+             patch.object(pdf_renderer, "get_pdf_cache", lambda: cache):
+            first = run(pdf_renderer.render_pdf(_doc("INV-1"), cache=True))
+            second = run(pdf_renderer.render_pdf(_doc("INV-1"), cache=True))
+            trial = run(pdf_renderer.render_pdf(_doc("INV-1"), is_trial=True, cache=True))
+            uncached = run(pdf_renderer.render_pdf(_doc("INV-1")))
+        assert first == second == b"%PDF-1"
+        assert trial == b"%PDF-2" and uncached == b"%PDF-3"
+        assert len(calls) == 3
+        renderer.shutdown()
@@ -0,0 +1,139 @@
+"""
+Tests for the PDF Render Pool
+=============================
+Covers: rendering off the event loop (thread and spawned process pools),
+the queue-depth limit, timeouts (with pool recycling for a stuck worker),
+render errors passing through unchanged, metrics, and the HTTP mapping of
+busy / timeout errors.
+"""
+
+import pytest
+import asyncio
+import time
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.pdf_renderer import (
+    PdfRenderer, PdfRenderBusy, PdfRenderError, PdfRenderTimeout, pdf_render_error_handler,
+)
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+# Module-level so spawned workers can unpickle them
+def _fake_render(html_content, is_trial):
+    return (("TRIAL:" if is_trial else "") + html_content).encode()
+
+
+def _slow_render(html_content, is_trial):
+    time.sleep(float(html_content))
+    return b"%PDF"
+
+
+def _broken_render(html_content, is_trial):
+    raise ValueError("bad html")
+
+
+# ==================== THREAD MODE ====================
+
+class TestThreadPool:
+
+    def test_renders_and_counts(self):
+        renderer = PdfRenderer(workers=0, render_fn=_fake_render)
+        assert run(renderer.render("<p>x</p>", is_trial=True)) == b"TRIAL:<p>x</p>"
+        stats = renderer.get_stats()
+        assert (stats["mode"], stats["rendered"], stats["in_flight"]) == ("thread", 1, 0)
+        renderer.shutdown()
+
+    def test_event_loop_keeps_running_during_render(self):
+        renderer = PdfRenderer(workers=0, render_fn=_slow_render)
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.02)
+
+        async def scenario():
+            await asyncio.gather(renderer.render("0.2"), ticker())
+        run(scenario())
+        assert len(ticks) == 5 and ticks[-1] - ticks[0] < 0.2
+        renderer.shutdown()
+
+    def test_queue_limit_rejects(self):
+        renderer = PdfRenderer(workers=0, max_queue=1, render_fn=_slow_render)
+
+        async def scenario():
+            return await asyncio.gather(*[renderer.render("0.1") for _ in range(3)], return_exceptions=True)
+        results = run(scenario())
+        assert sum(isinstance(r, PdfRenderBusy) for r in results) == 1
+        stats = renderer.get_stats()
+        assert (stats["rendered"], stats["rejected"], stats["peak_in_flight"]) == (2, 1, 2)
+        renderer.shutdown()
+
+    def test_render_error_passes_through(self):
+        renderer = PdfRenderer(workers=0, render_fn=_broken_render)
+        with pytest.raises(ValueError):
+            run(renderer.render("<p>"))
+        assert renderer.get_stats()["failed"] == 1
+        renderer.shutdown()
+
+    def test_timeout(self):
+        renderer = PdfRenderer(workers=0, timeout_seconds=0.05, render_fn=_slow_render)
+        with pytest.raises(PdfRenderTimeout):
+            run(renderer.render("0.3"))
+        assert renderer.get_stats()["timeouts"] == 1
+        renderer.shutdown()
+
+
+# ==================== PROCESS MODE ====================
+
+class TestProcessPool:
+
+    def test_renders_in_worker_and_recycles_after_timeout(self):
+        renderer = PdfRenderer(workers=1, timeout_seconds=10, render_fn=_fake_render)
+        try:
+            assert run(renderer.render("<p>a</p>")) == b"<p>a</p>"
+
+            renderer.render_fn = _slow_render
+            renderer.timeout_seconds = 0.5
+            with pytest.raises(PdfRenderTimeout):
+                run(renderer.render("30"))
+            assert renderer.get_stats()["recycles"] == 1
+
+            renderer.render_fn = _fake_render
+            renderer.timeout_seconds = 10
+            assert run(renderer.render("<p>b</p>")) == b"<p>b</p>"
+            assert renderer.get_stats()["mode"] == "process"
+        finally:
+            renderer.shutdown()
+
+
+# ==================== HTTP ====================
+
+class TestHttpMapping:
+
+    def test_busy_and_timeout_status_codes(self):
+        app = FastAPI()
+        app.add_exception_handler(PdfRenderError, pdf_render_error_handler)
+
+        @app.get("/busy")
+        async def busy():
+            raise PdfRenderBusy("busy")
+
+        @app.get("/slow")
+        async def slow():
+            raise PdfRenderTimeout("slow")
+
+        client = TestClient(app)
+        res = client.get("/busy")
+        assert res.status_code == 503 and res.headers["retry-after"]
+        assert client.get("/slow").status_code == 504
@@ -0,0 +1,146 @@
+"""
+Tests for Rate Limit Stores
+===========================
+Covers: GCRA burst/refill semantics, retry-after, LRU key bound,
+Mongo store result handling and in-process fallback, and
+RateLimitMiddleware returning 429 from the active store.
+"""
+
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from middleware.rate_limit_store import (
+    RateLimitRule, InMemoryRateLimitStore, MongoRateLimitStore,
+)
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+# ==================== IN-MEMORY STORE ====================
+
+class TestInMemoryStore:
+
+    def test_allows_burst_up_to_limit_then_denies(self):
+        store = InMemoryRateLimitStore()
+        rule = RateLimitRule(limit=5, window=60)
+        results = [store.hit("k", rule, now=1000.0) for _ in range(6)]
+        assert [r[0] for r in results] == [True] * 5 + [False]
+        # One token refills every 12s
+        assert results[-1][1] == 12
+
+    def test_refills_one_token_per_interval(self):
+        store = InMemoryRateLimitStore()
+        rule = RateLimitRule(limit=2, window=10)
+        assert store.hit("k", rule, now=0.0)[0]
+        assert store.hit("k", rule, now=0.0)[0]
+        assert not store.hit("k", rule, now=1.0)[0]
+        assert store.hit("k", rule, now=5.0)[0]
+        assert not store.hit("k", rule, now=5.0)[0]
+
+    def test_denied_requests_do_not_consume_tokens(self):
+        store = InMemoryRateLimitStore()
+        rule = RateLimitRule(limit=1, window=10)
+        assert store.hit("k", rule, now=0.0)[0]
+        for t in range(1, 10):
+            assert not store.hit("k", rule, now=float(t))[0]
+        assert store.hit("k", rule, now=10.0)[0]
+
+    def test_keys_are_independent(self):
+        store = InMemoryRateLimitStore()
+        rule = RateLimitRule(limit=1, window=60)
+        assert store.hit("a", rule, now=0.0)[0]
+        assert store.hit("b", rule, now=0.0)[0]
+        assert not store.hit("a", rule, now=0.0)[0]
+
+    def test_lru_bound_evicts_least_recent_key(self):
+        store = InMemoryRateLimitStore(max_keys=2)
+        rule = RateLimitRule(limit=10, window=60)
+        store.hit("a", rule, now=0.0)
+        store.hit("b", rule, now=0.0)
+        store.hit("a", rule, now=0.0)
+        store.hit("c", rule, now=0.0)
+        stats = store.get_stats()
+        assert stats["keys"] == 2
+        assert stats["evictions"] == 1
+        assert "b" not in store._tats
+
+
+# ==================== MONGO STORE ====================
+
+@pytest.fixture
+def mongo_db():
+    collection = MagicMock()
+    collection.create_index = AsyncMock()
+    collection.find_one_and_update = AsyncMock()
+    db = MagicMock()
+    db.__getitem__.return_value = collection
+    return db, collection
+
+
+class TestMongoStore:
+
+    def test_single_atomic_upsert_per_check(self, mongo_db):
+        db, collection = mongo_db
+        collection.find_one_and_update.return_value = {"_id": "k", "tat": 1.0, "allowed": True}
+        store = MongoRateLimitStore(db)
+        assert run(store.check("k", RateLimitRule(limit=5, window=60))) == (True, 0)
+        assert run(store.check("k", RateLimitRule(limit=5, window=60))) == (True, 0)
+        assert collection.find_one_and_update.await_count == 2
+        assert collection.create_index.await_count == 1
+        kwargs = collection.find_one_and_update.await_args.kwargs
+        assert kwargs["upsert"] is True
+
+    def test_denied_returns_retry_after(self, mongo_db):
+        db, collection = mongo_db
+        store = MongoRateLimitStore(db)
+        rule = RateLimitRule(limit=5, window=60)
+        with patch("middleware.rate_limit_store.time.time", return_value=1000.0):
+            # Bucket exhausted: TAT sits a full window ahead of now
+            collection.find_one_and_update.return_value = {"_id": "k", "tat": 1060.0, "allowed": False}
+            assert run(store.check("k", rule)) == (False, 12)
+
+    def test_falls_back_to_in_process_store_on_error(self, mongo_db):
+        db, collection = mongo_db
+        collection.find_one_and_update.side_effect = Exception("connection refused")
+        store = MongoRateLimitStore(db)
+        rule = RateLimitRule(limit=1, window=60)
+        assert run(store.check("k", rule))[0] is True
+        assert run(store.check("k", rule))[0] is False
+        assert store.get_stats()["errors"] == 2
+
+
+# ==================== MIDDLEWARE ====================
+
+class TestRateLimitMiddleware:
+
+    def test_returns_429_when_store_denies(self, monkeypatch):
+        from middleware.rate_limit import RateLimitMiddleware
+        from middleware.pipeline import resolve_route
+        import middleware.rate_limit as rate_limit
+
+        monkeypatch.delenv("TESTING", raising=False)
+        store = MagicMock()
+        store.check = AsyncMock(return_value=(False, 7))
+        monkeypatch.setattr(rate_limit, "get_rate_limit_store", lambda: store)
+
+        request = MagicMock()
+        request.method = "POST"
+        request.client.host = "10.0.0.1"
+        request.state = MagicMock(spec=[])
+        request.headers = {}
+
+        stage = RateLimitMiddleware(app=None)
+        response = run(stage.before(request, resolve_route("/api/auth/login")))
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "7"
+        key, rule = store.check.await_args.args
+        assert key.startswith("auth_login:")
+        assert (rule.limit, rule.window) == (10, 60)
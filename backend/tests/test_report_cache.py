@@ -0,0 +1,231 @@
+"""
+Tests for the Report Cache
+==========================
+Covers: fresh hits, financial-version invalidation served stale while one
+background task recomputes, inline recompute past the stale window, shared
+computation for concurrent misses, the cached_report endpoint decorator,
+and the pipeline stage that bumps the version on financial writes.
+"""
+
+import pytest
+import asyncio
+from unittest.mock import patch
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi import FastAPI, Request
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from middleware.pipeline import RequestPipelineMiddleware, PipelineStage, FinancialVersionStage
+from services import report_cache as rc
+from services.report_cache import ReportCache, cached_report, get_report_cache, is_financial_write
+
+
+ORG = "org-reports"
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    c = _Clock()
+    with patch.object(rc.time, "monotonic", new=c):
+        yield c
+
+
+async def _drain():
+    # Let background refresh tasks finish (the patched clock rules out timed sleeps)
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def _counter():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return {"value": len(calls)}
+    return compute, calls
+
+
+# ==================== CACHE ====================
+
+class TestReportCache:
+
+    def test_fresh_hit(self, clock):
+        cache = ReportCache(ttl_seconds=60, stale_seconds=600)
+        compute, calls = _counter()
+        assert run(cache.get_or_compute(ORG, "summary", {"period": "fy"}, compute)) == {"value": 1}
+        assert run(cache.get_or_compute(ORG, "summary", {"period": "fy"}, compute)) == {"value": 1}
+        assert len(calls) == 1
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+
+    def test_params_and_orgs_are_separate_keys(self, clock):
+        cache = ReportCache(ttl_seconds=60)
+        compute, calls = _counter()
+        run(cache.get_or_compute(ORG, "summary", {"period": "fy"}, compute))
+        run(cache.get_or_compute(ORG, "summary", {"period": "month"}, compute))
+        run(cache.get_or_compute("org-other", "summary", {"period": "fy"}, compute))
+        assert len(calls) == 3
+
+    def test_version_bump_serves_stale_and_refreshes_once(self, clock):
+        cache = ReportCache(ttl_seconds=60, stale_seconds=600)
+        compute, calls = _counter()
+
+        async def scenario():
+            await cache.get_or_compute(ORG, "summary", None, compute)
+            cache.bump_version(ORG)
+            first = await cache.get_or_compute(ORG, "summary", None, compute)
+            second = await cache.get_or_compute(ORG, "summary", None, compute)
+            await _drain()
+            third = await cache.get_or_compute(ORG, "summary", None, compute)
+            return first, second, third
+
+        first, second, third = run(scenario())
+        assert first == second == {"value": 1}
+        assert third == {"value": 2}
+        assert len(calls) == 2
+        stats = cache.get_stats()
+        assert (stats["stale_hits"], stats["refreshes"], stats["hits"]) == (2, 1, 1)
+
+    def test_ttl_expiry_is_stale_then_beyond_window_blocks(self, clock):
+        cache = ReportCache(ttl_seconds=60, stale_seconds=600)
+        compute, calls = _counter()
+        run(cache.get_or_compute(ORG, "summary", None, compute))
+
+        clock.now += 61
+        assert run(cache.get_or_compute(ORG, "summary", None, compute)) == {"value": 1}
+
+        run(_drain())
+        clock.now += 601
+        assert run(cache.get_or_compute(ORG, "summary", None, compute)) == {"value": 3}
+        assert cache.get_stats()["misses"] == 2
+
+    def test_refresh_error_keeps_stale_value(self, clock):
+        cache = ReportCache(ttl_seconds=60, stale_seconds=600)
+
+        async def ok():
+            return "v1"
+
+        async def boom():
+            raise RuntimeError("db down")
+
+        async def scenario():
+            await cache.get_or_compute(ORG, "summary", None, ok)
+            cache.bump_version(ORG)
+            stale = await cache.get_or_compute(ORG, "summary", None, boom)
+            await _drain()
+            return stale, await cache.get_or_compute(ORG, "summary", None, boom)
+
+        assert run(scenario()) == ("v1", "v1")
+        assert cache.get_stats()["refresh_errors"] >= 1
+
+    def test_concurrent_misses_share_one_computation(self, clock):
+        cache = ReportCache(ttl_seconds=60)
+        compute, calls = _counter()
+
+        async def scenario():
+            return await asyncio.gather(*[cache.get_or_compute(ORG, "summary", None, compute) for _ in range(5)])
+
+        assert run(scenario()) == [{"value": 1}] * 5
+        assert len(calls) == 1
+
+    def test_lru_bound(self, clock):
+        cache = ReportCache(ttl_seconds=60, max_entries=2)
+        compute, _ = _counter()
+        for endpoint in ("a", "b", "c"):
+            run(cache.get_or_compute(ORG, endpoint, None, compute))
+        stats = cache.get_stats()
+        assert stats["entries"] == 2 and stats["evictions"] == 1
+
+    def test_disabled_or_no_org_always_computes(self, clock):
+        compute, calls = _counter()
+        run(ReportCache(ttl_seconds=0).get_or_compute(ORG, "summary", None, compute))
+        run(ReportCache(ttl_seconds=60).get_or_compute(None, "summary", None, compute))
+        assert len(calls) == 2
+
+
+# ==================== ENDPOINTS ====================
+
+class TestCachedReportDecorator:
+
+    def test_query_params_preserved_and_cached(self):
+        get_report_cache().clear()
+        calls = []
+        app = FastAPI()
+
+        def org_of(request):
+            return request.headers.get("x-org")
+
+        @app.get("/report")
+        @cached_report("test.report", org_of)
+        async def report(request: Request, period: str = "fiscal_year"):
+            calls.append(period)
+            return {"period": period, "n": len(calls)}
+
+        client = TestClient(app)
+        assert client.get("/report?period=month", headers={"x-org": ORG}).json() == {"period": "month", "n": 1}
+        assert client.get("/report?period=month", headers={"x-org": ORG}).json() == {"period": "month", "n": 1}
+        assert client.get("/report", headers={"x-org": ORG}).json() == {"period": "fiscal_year", "n": 2}
+        # No org → never cached
+        client.get("/report")
+        client.get("/report")
+        assert len(calls) == 4
+        get_report_cache().clear()
+
+
+# ==================== INVALIDATION ====================
+
+class _SetOrg(PipelineStage):
+    async def before(self, request, route):
+        request.state.tenant_org_id = ORG
+        return None
+
+
+async def _ok(request):
+    return JSONResponse({"ok": True})
+
+
+class TestFinancialVersionStage:
+
+    def test_write_paths(self):
+        assert is_financial_write("POST", "/api/v1/invoices-enhanced/inv_1/payments")
+        assert is_financial_write("DELETE", "/api/v1/bills-enhanced/b1")
+        assert is_financial_write("PUT", "/api/v1/payments-received/p1")
+        assert not is_financial_write("GET", "/api/v1/invoices-enhanced")
+        assert not is_financial_write("POST", "/api/v1/tickets")
+
+    def test_financial_write_bumps_org_version(self):
+        app = Starlette(routes=[
+            Route("/api/v1/invoices-enhanced", _ok, methods=["GET", "POST"]),
+            Route("/api/v1/tickets", _ok, methods=["POST"]),
+        ])
+        app.add_middleware(RequestPipelineMiddleware, stages=[_SetOrg(), FinancialVersionStage()])
+        client = TestClient(app)
+        cache = get_report_cache()
+        before = cache.version(ORG)
+
+        client.get("/api/v1/invoices-enhanced")
+        client.post("/api/v1/tickets", json={})
+        assert cache.version(ORG) == before
+
+        client.post("/api/v1/invoices-enhanced", json={})
+        assert cache.version(ORG) == before + 1
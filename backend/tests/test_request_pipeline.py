@@ -0,0 +1,208 @@
+"""
+Tests for the pure-ASGI Request Pipeline
+========================================
+Covers: route-trie resolution matches the legacy per-middleware regex
+lookups for every table, and the pipeline preserves stage ordering
+semantics (security headers, CSRF, tenant guard, /efi rewrite, body replay).
+"""
+
+import pytest
+import re
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from middleware.pipeline import (
+    RouteTrie, ANY, FIRST, LONGEST, EXACT, PREFIX,
+    compile_route_pattern, resolve_route,
+    RequestPipelineMiddleware, SecurityHeadersStage,
+)
+from core.tenant.guard import TenantGuardMiddleware
+from middleware.rbac import RBACMiddleware, ROUTE_PERMISSIONS
+from middleware.rate_limit import RateLimitMiddleware
+from middleware.csrf import CSRFMiddleware, CSRF_EXEMPT_PATHS, CSRF_EXEMPT_PREFIXES
+from middleware.plan_enforcement import PLAN_GATED_ROUTES, SKIP_PREFIXES
+from middleware.sanitization import SanitizationMiddleware, EXEMPT_PATHS as SANITIZE_EXEMPT
+
+
+# ==================== LEGACY REFERENCE LOOKUPS ====================
+# The regex/startswith logic each middleware used before the shared trie.
+
+def _legacy_tenant_public(path):
+    if path in TenantGuardMiddleware.PUBLIC_ENDPOINTS:
+        return True
+    return any(re.match(p, path) for p in TenantGuardMiddleware.PUBLIC_PATTERNS)
+
+
+def _legacy_rbac_public(path):
+    if path in RBACMiddleware.PUBLIC_ENDPOINTS:
+        return True
+    return any(re.match(p, path) for p in RBACMiddleware.PUBLIC_PATTERNS)
+
+
+def _legacy_allowed_roles(path):
+    normalized = re.sub(r'^/api/v1/', '/api/', path)
+    for pattern, roles in ROUTE_PERMISSIONS.items():
+        if re.match(pattern, normalized):
+            return roles
+    return None
+
+
+def _legacy_rate_category(path):
+    if path in RateLimitMiddleware.EXEMPT_PATHS:
+        return "exempt"
+    for pattern, category in RateLimitMiddleware.AUTH_PATTERNS:
+        if re.match(pattern, path):
+            return category
+    for pattern in RateLimitMiddleware.AI_PATTERNS:
+        if re.match(pattern, path):
+            return "ai"
+    for pattern in RateLimitMiddleware.PUBLIC_PATTERNS:
+        if re.match(pattern, path):
+            return "public"
+    return "standard"
+
+
+def _legacy_min_plan(path):
+    matched, plan = None, None
+    for prefix, required in PLAN_GATED_ROUTES.items():
+        if path.startswith(prefix) and (matched is None or len(prefix) > len(matched)):
+            matched, plan = prefix, required
+    return plan
+
+
+def _corpus():
+    """Paths derived from every table literal plus common suffix variations"""
+    literals = set(TenantGuardMiddleware.PUBLIC_ENDPOINTS) | set(RBACMiddleware.PUBLIC_ENDPOINTS)
+    literals |= set(CSRF_EXEMPT_PATHS) | set(CSRF_EXEMPT_PREFIXES) | set(PLAN_GATED_ROUTES)
+    literals |= set(SKIP_PREFIXES) | set(SANITIZE_EXEMPT)
+    patterns = list(TenantGuardMiddleware.PUBLIC_PATTERNS) + list(RBACMiddleware.PUBLIC_PATTERNS)
+    patterns += list(ROUTE_PERMISSIONS) + [p for p, _ in RateLimitMiddleware.AUTH_PATTERNS]
+    patterns += RateLimitMiddleware.AI_PATTERNS + RateLimitMiddleware.PUBLIC_PATTERNS
+    for pattern in patterns:
+        for _, literal in compile_route_pattern(pattern):
+            literals.add(literal)
+
+    paths = set()
+    for lit in literals:
+        base = lit.rstrip("/")
+        variants = {lit, base, base + "/", base + "/x", base + "x", base + "/x/y", base + "-enhanced/1"}
+        if base.startswith("/api/") and not base.startswith("/api/v1/"):
+            variants |= {"/api/v1/" + v[len("/api/"):] for v in list(variants) if v.startswith("/api/")}
+        paths |= variants
+    paths |= {"/", "/api", "/api/", "/api/v1", "/api/v1/", "/api/v1/unknown/route", "/static/app.js"}
+    return sorted(p for p in paths if p)
+
+
+# ==================== TRIE ====================
+
+class TestRouteTrie:
+
+    def test_pattern_compilation_forms(self):
+        assert compile_route_pattern(r"^/api/x$") == [(EXACT, "/api/x")]
+        assert compile_route_pattern(r"^/api/x.*$") == [(PREFIX, "/api/x")]
+        assert compile_route_pattern(r"^/api/x/.*") == [(PREFIX, "/api/x/")]
+        assert compile_route_pattern(r"^/api/x(/.*)?$") == [(EXACT, "/api/x"), (PREFIX, "/api/x/")]
+        assert sorted(lit for _, lit in compile_route_pattern(r"^/api/e?v?fi$")) == [
+            "/api/efi", "/api/evfi", "/api/fi", "/api/vfi"]
+
+    def test_unsupported_pattern_fails_loudly(self):
+        with pytest.raises(ValueError):
+            compile_route_pattern(r"^/api/(a|b)$")
+        with pytest.raises(ValueError):
+            compile_route_pattern(r"/api/unanchored")
+
+    def test_table_modes(self):
+        trie = RouteTrie()
+        trie.add_table("first", FIRST, "default")
+        trie.add_table("longest", LONGEST)
+        trie.add_table("any", ANY, False)
+        trie.add_pattern("first", r"^/api/hr/payroll.*$", "payroll")
+        trie.add_pattern("first", r"^/api/hr(/.*)?$", "hr")
+        trie.add("longest", PREFIX, "/api/v1/recurring", "professional")
+        trie.add("longest", PREFIX, "/api/v1/recurring-expenses", "enterprise")
+        trie.add("any", PREFIX, "/api/public/")
+
+        assert trie.match("/api/hr/payroll/run")["first"] == "payroll"
+        assert trie.match("/api/hr/employees")["first"] == "hr"
+        assert trie.match("/api/hrx")["first"] == "default"
+        assert trie.match("/api/v1/recurring-expenses/1")["longest"] == "enterprise"
+        assert trie.match("/api/v1/recurring-invoices")["longest"] == "professional"
+        assert trie.match("/api/public/track")["any"] is True
+
+
+class TestRouteResolutionParity:
+    """The single trie walk must agree with every legacy lookup"""
+
+    @pytest.mark.parametrize("path", _corpus())
+    def test_matches_legacy_lookups(self, path):
+        route = resolve_route(path)
+        assert route.tenant_public == _legacy_tenant_public(path)
+        assert route.rbac_public == _legacy_rbac_public(path)
+        assert route.allowed_roles == _legacy_allowed_roles(path)
+        assert route.rate_category == _legacy_rate_category(path)
+        assert route.csrf_exempt == (
+            path in CSRF_EXEMPT_PATHS or any(path.startswith(p) for p in CSRF_EXEMPT_PREFIXES))
+        assert route.plan_skip == any(path.startswith(p) for p in SKIP_PREFIXES)
+        assert route.min_plan == _legacy_min_plan(path)
+        assert route.sanitize_exempt == any(path.startswith(p) for p in SANITIZE_EXEMPT)
+
+
+# ==================== PIPELINE ====================
+
+async def _echo(request):
+    body = await request.body()
+    return JSONResponse({"path": request.url.path, "body": body.decode() or None})
+
+
+def _client(stages):
+    app = Starlette(routes=[
+        Route("/api/v1/health", _echo),
+        Route("/api/v1/evfi/match", _echo),
+        Route("/api/v1/tickets", _echo, methods=["GET", "POST"]),
+        Route("/api/v1/contact", _echo, methods=["POST"]),
+    ])
+    app.add_middleware(RequestPipelineMiddleware, stages=stages)
+    return TestClient(app)
+
+
+class TestRequestPipeline:
+
+    def test_security_headers_and_csrf_cookie_on_public_get(self):
+        client = _client([SecurityHeadersStage(), CSRFMiddleware(app=None)])
+        resp = client.get("/api/v1/health")
+        assert resp.status_code == 200
+        assert resp.headers["X-Frame-Options"] == "DENY"
+        assert "csrftoken" in resp.headers.get("set-cookie", "")
+
+    def test_legacy_efi_path_rewritten_before_routing(self):
+        client = _client([SecurityHeadersStage()])
+        resp = client.get("/api/v1/efi/match")
+        assert resp.status_code == 200
+        assert resp.json()["path"] == "/api/v1/evfi/match"
+
+    def test_csrf_short_circuit_still_gets_outer_headers(self):
+        client = _client([SecurityHeadersStage(), CSRFMiddleware(app=None)])
+        resp = client.post("/api/v1/tickets", json={"a": 1})
+        assert resp.status_code == 403
+        assert "CSRF" in resp.json()["detail"]
+        assert resp.headers["X-Content-Type-Options"] == "nosniff"
+
+    def test_tenant_guard_blocks_unauthenticated(self):
+        client = _client([SecurityHeadersStage(), TenantGuardMiddleware(app=None)])
+        resp = client.get("/api/v1/tickets")
+        assert resp.status_code == 401
+        assert resp.json()["code"] == "AUTH_REQUIRED"
+
+    def test_sanitized_body_replayed_to_route(self):
+        client = _client([SanitizationMiddleware(app=None)])
+        resp = client.post("/api/v1/contact", json={"name": "<b>Ravi</b>"})
+        assert resp.status_code == 200
+        assert '"Ravi"' in resp.json()["body"]
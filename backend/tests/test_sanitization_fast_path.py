@@ -0,0 +1,105 @@
+"""
+Tests for the Sanitization Fast Paths
+=====================================
+Covers: plain-text strings skip bleach, output stays identical to
+bleach.clean for every mode, the raw-body pre-scan never skips a body
+that needs cleaning, and the middleware leaves clean bodies untouched.
+"""
+
+import asyncio
+import json
+import random
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+import bleach
+import pytest
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from middleware.sanitization import (
+    SanitizationMiddleware,
+    _sanitize_string,
+    _sanitize_value,
+    _BODY_NEEDS_CLEAN,
+    SAFE_TAGS,
+    SAFE_ATTRS,
+)
+from middleware.pipeline import resolve_route
+
+
+ALPHABET = list("ab1 .-<>&;/\"'=\t\n\r\x00\x0b\x1f\x7fé€") + [
+    "<b>", "</p>", "&amp;", "<script>", "<p>", "<a href='x'>", "&#60;",
+]
+
+
+def _bleach(value, safe_html):
+    if safe_html:
+        return bleach.clean(value, tags=SAFE_TAGS, attributes=SAFE_ATTRS, strip=True)
+    return bleach.clean(value, tags=[], attributes={}, strip=True)
+
+
+def _random_strings(n, seed=7):
+    rng = random.Random(seed)
+    for _ in range(n):
+        yield "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 10)))
+
+
+class TestFastPath:
+
+    def test_plain_text_skips_bleach(self):
+        with patch("middleware.sanitization.bleach.clean") as clean:
+            payload = {"invoice_date": "2026-03-31", "rate": "1499.00",
+                       "item_id": "ITM-00042", "notes": "Replace BMS\ncheck wiring"}
+            result, count = _sanitize_value(payload)
+        clean.assert_not_called()
+        assert result == payload
+        assert count == 0
+
+    @pytest.mark.parametrize("safe_html", [False, True])
+    def test_identical_to_bleach(self, safe_html):
+        for value in _random_strings(3000):
+            assert _sanitize_string(value, safe_html) == _bleach(value, safe_html), value
+
+    def test_body_prescan_never_skips_dirty_body(self):
+        for value in _random_strings(3000, seed=11):
+            for ensure_ascii in (True, False):
+                body = json.dumps({"name": value}, ensure_ascii=ensure_ascii).encode()
+                if not _BODY_NEEDS_CLEAN.search(body):
+                    assert _sanitize_value(json.loads(body))[1] == 0, value
+
+    def test_escaped_markup_is_not_skipped(self):
+        assert _BODY_NEEDS_CLEAN.search(b'{"name": "\\u003cb\\u003eX"}')
+
+
+class TestMiddlewareBodyHandling:
+
+    def _request(self, body):
+        request = MagicMock()
+        request.method = "POST"
+        request.headers = {"content-type": "application/json"}
+
+        async def read_body():
+            return body
+        request.body = read_body
+        request._body = body
+        return request
+
+    def test_clean_body_passed_through_unchanged(self):
+        body = b'{"customer_id": "C-1", "line_items": [{"rate": 10}]}'
+        request = self._request(body)
+        stage = SanitizationMiddleware(app=None)
+        with patch("middleware.sanitization.json.loads") as loads:
+            asyncio.get_event_loop().run_until_complete(
+                stage.before(request, resolve_route("/api/v1/invoices")))
+        loads.assert_not_called()
+        assert request._body is body
+
+    def test_dirty_body_rewritten(self):
+        request = self._request(b'{"name": "<b>Ravi</b>", "city": "Pune"}')
+        stage = SanitizationMiddleware(app=None)
+        asyncio.get_event_loop().run_until_complete(
+            stage.before(request, resolve_route("/api/v1/customers")))
+        assert json.loads(request._body) == {"name": "Ravi", "city": "Pune"}
@@ -0,0 +1,134 @@
+"""
+Tests for Streaming CSV / Excel Exports
+=======================================
+Covers: CSV chunking and quoting, write-only workbooks that round-trip
+through openpyxl, no temp file left behind (even for a response that is
+never read), and the bulk export endpoints streaming every org-scoped
+document from the cursor.
+"""
+
+import pytest
+import asyncio
+import csv
+import io
+import os
+import sys
+from unittest.mock import MagicMock
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import openpyxl
+
+from utils import streaming_export
+from utils.streaming_export import (
+    SheetWriter, csv_response, iter_csv, new_workbook, workbook_response,
+)
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+async def _body(response):
+    chunks = [chunk async for chunk in response.body_iterator]
+    return chunks
+
+
+async def _arows(rows):
+    for row in rows:
+        yield row
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def __aiter__(self):
+        return _arows(self._docs)
+
+
+# ==================== CSV ====================
+
+class TestCsv:
+
+    def test_chunks_every_flush_rows(self):
+        async def collect():
+            return [c async for c in iter_csv(["a", "b"], ([i, i * 2] for i in range(5)), flush_rows=2)]
+        chunks = run(collect())
+        assert len(chunks) == 3
+        rows = list(csv.reader(io.StringIO("".join(chunks))))
+        assert rows[0] == ["a", "b"] and rows[-1] == ["4", "8"] and len(rows) == 6
+
+    def test_commas_quoted_not_stripped(self):
+        response = csv_response("x.csv", ["Customer"], _arows([["Acme, Pvt Ltd"]]))
+        text = "".join(run(_body(response)))
+        assert list(csv.reader(io.StringIO(text)))[1] == ["Acme, Pvt Ltd"]
+        assert response.media_type == "text/csv"
+        assert 'filename="x.csv"' in response.headers["content-disposition"]
+
+
+# ==================== EXCEL ====================
+
+class TestWorkbook:
+
+    def _workbook(self):
+        wb = new_workbook()
+        sheet = SheetWriter(wb, "Report", widths={"A": 20})
+        sheet.title("Title")
+        sheet.line()
+        sheet.header(["Name", "Amount"])
+        sheet.row(["a", 10.5], money_cols=(1,))
+        sheet.total(["Total", 10.5], money_cols=(1,))
+        return wb, sheet
+
+    def test_rows_round_trip_and_temp_file_removed(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(streaming_export.tempfile, "tempdir", str(tmp_path))
+        wb, sheet = self._workbook()
+        assert sheet.rows_written == 5
+        response = run(workbook_response(wb, "r.xlsx"))
+        assert list(tmp_path.iterdir()) == []  # unlinked before the body starts
+        data = b"".join(run(_body(response)))
+
+        ws = openpyxl.load_workbook(io.BytesIO(data))["Report"]
+        assert ws["A1"].value == "Title" and ws["A1"].font.bold
+        assert ws["A3"].value == "Name" and ws["A3"].fill.start_color.rgb.endswith("22EDA9")
+        assert ws["B4"].value == 10.5 and ws["B4"].number_format == "₹#,##0.00"
+        assert ws.column_dimensions["A"].width == 20
+
+    def test_unread_response_leaks_nothing(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(streaming_export.tempfile, "tempdir", str(tmp_path))
+        wb, _ = self._workbook()
+        response = run(workbook_response(wb, "r.xlsx"))
+        assert list(tmp_path.iterdir()) == []
+        # Client gone before the body started: only the background task runs
+        run(response.background())
+        assert response.background.func.__self__.closed
+
+    def test_save_failure_removes_temp_file(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(streaming_export.tempfile, "tempdir", str(tmp_path))
+        wb = MagicMock()
+        wb.save.side_effect = OSError("disk full")
+        with pytest.raises(OSError):
+            run(workbook_response(wb, "r.xlsx"))
+        assert list(tmp_path.iterdir()) == []
+
+
+# ==================== BULK EXPORT ====================
+
+class TestBulkExport:
+
+    def test_invoices_csv_streams_org_scoped_cursor(self, monkeypatch):
+        from routes import export
+
+        docs = [{"invoice_number": f"INV-{i}", "customer_name": "A, B", "total": i} for i in range(1200)]
+        db = MagicMock()
+        db.invoices.find = MagicMock(return_value=_Cursor(docs))
+        monkeypatch.setattr(export, "get_db", lambda: db)
+        monkeypatch.setattr(export, "require_org_id", lambda request: "org-1")
+
+        response = run(export.bulk_export_invoices(MagicMock(), format="csv", end_date="2026-03-31"))
+        rows = list(csv.reader(io.StringIO("".join(run(_body(response))))))
+        assert db.invoices.find.call_args.args[0] == {"organization_id": "org-1", "date": {"$lte": "2026-03-31"}}
+        assert rows[0] == export.BULK_INVOICE_HEADER
+        assert len(rows) == 1201 and rows[1][2] == "A, B"
@@ -0,0 +1,258 @@
+"""
+Tests for Technician Daily Stats Rollups
+========================================
+Covers: close / complete-work counter deltas (resolved counted once, SLA
+outcome, response and resolution times), incremental updates from the
+ticket lifecycle matching a rebuild from raw tickets, range reads summing
+day rows with merged breakdowns, lazy first build, and the technician
+portal completion and SLA auto-reassign hooks.
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services import technician_daily_stats as tds
+from routes import sla, technician_portal
+
+
+ORG = "org-tds"
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def to_list(self, n):
+        return self._docs
+
+    def __aiter__(self):
+        async def gen():
+            for d in self._docs:
+                yield d
+        return gen()
+
+
+def _matches(doc, query):
+    for field, cond in query.items():
+        if field == "$or":
+            if not any(_matches(doc, q) for q in cond):
+                return False
+        elif isinstance(cond, dict):
+            value = doc.get(field)
+            if "$gte" in cond and not (value is not None and value >= cond["$gte"]):
+                return False
+            if "$lte" in cond and not (value is not None and value <= cond["$lte"]):
+                return False
+            if "$nin" in cond and value in cond["$nin"]:
+                return False
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+        elif doc.get(field) != cond:
+            return False
+    return True
+
+
+class _Collection:
+    """In-memory collection: find / find_one / upserting $inc-$set update_one"""
+
+    def __init__(self, docs=None):
+        self.docs = [dict(d) for d in docs or []]
+
+    def find(self, query, projection=None):
+        return _Cursor([dict(d) for d in self.docs if _matches(d, query)])
+
+    async def find_one(self, query, projection=None):
+        return next((dict(d) for d in self.docs if _matches(d, query)), None)
+
+    async def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+    async def count_documents(self, query):
+        return sum(1 for d in self.docs if _matches(d, query))
+
+    async def update_one(self, query, update, upsert=False):
+        doc = next((d for d in self.docs if _matches(d, query)), None)
+        if doc is None:
+            doc = dict(query)
+            self.docs.append(doc)
+        for field, value in update.get("$inc", {}).items():
+            if "." in field:
+                group, key = field.split(".", 1)
+                bucket = doc.setdefault(group, {})
+                bucket[key] = bucket.get(key, 0) + value
+            else:
+                doc[field] = doc.get(field, 0) + value
+        doc.update(update.get("$set", {}))
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            self.docs = [d for d in self.docs if not _matches(d, op._filter)]
+            self.docs.append(dict(op._doc))
+
+    async def delete_many(self, query):
+        class _Result:
+            deleted_count = 0
+        self.docs = [d for d in self.docs if not _matches(d, query)]
+        return _Result()
+
+
+class _Db:
+    def __init__(self, **collections):
+        self._collections = collections
+
+    def __getattr__(self, name):
+        return self._collections.setdefault(name, _Collection())
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+@pytest.fixture(autouse=True)
+def _ready_cache():
+    tds.reset_ready_cache()
+    yield
+    tds.reset_ready_cache()
+
+
+def _ticket(ticket_id, **fields):
+    return {"ticket_id": ticket_id, "organization_id": ORG, "assigned_technician_id": "tech_a",
+            "assigned_technician_name": "Asha Rao", "priority": "high", "vehicle_type": "2w",
+            "created_at": "2026-03-02T10:00:00+00:00", **fields}
+
+
+# ==================== DELTAS ====================
+
+class TestDeltas:
+
+    def test_close_without_completed_work_resolves(self):
+        ticket = _ticket("t1", first_response_at="2026-03-02T10:30:00+00:00",
+                         sla_resolution_due_at="2026-03-02T18:00:00+00:00")
+        deltas = tds.close_deltas(ticket, "2026-03-02T20:00:00+00:00", revenue=1000.0)
+        assert deltas["closed"] == deltas["resolved"] == 1
+        assert deltas["resolution_minutes"] == 600 and deltas["response_minutes"] == 30
+        assert (deltas["sla_tracked"], deltas["sla_breached"]) == (1, 1)
+        assert deltas["by_priority.high"] == 1 and deltas["by_vehicle_type.2w"] == 1
+        assert deltas["revenue"] == 1000.0
+
+    def test_close_after_completed_work_not_resolved_twice(self):
+        ticket = _ticket("t1", work_completed_at="2026-03-02T12:00:00+00:00")
+        deltas = tds.close_deltas(ticket, "2026-03-02T13:00:00+00:00")
+        assert "resolved" not in deltas and "sla_tracked" not in deltas
+        assert tds.complete_deltas(ticket)["resolved"] == 1
+
+    def test_estimate_revenue_is_pre_tax(self):
+        assert tds.estimate_revenue({"grand_total": 1180, "tax_total": 180}) == 1000.0
+        assert tds.estimate_revenue(None) == 0.0
+
+
+# ==================== INCREMENTAL vs REBUILD ====================
+
+class TestIncrementalMatchesRebuild:
+
+    def test_lifecycle_then_verify(self):
+        t1 = _ticket("t1")
+        t2 = _ticket("t2", assigned_technician_id="tech_b", assigned_technician_name="Ravi", priority="low",
+                     sla_resolution_due_at="2026-03-09T00:00:00+00:00")
+        db = _Db(ticket_estimates=_Collection([{"ticket_id": "t1", "organization_id": ORG,
+                                                 "grand_total": 1180, "tax_total": 180}]))
+
+        async def lifecycle():
+            await tds.record_assignment(db, t1, "tech_a", "Asha Rao", "2026-03-02T10:05:00+00:00")
+            await tds.record_assignment(db, t2, "tech_b", "Ravi", "2026-03-02T11:00:00+00:00")
+            await tds.record_work_completed(db, t1, "2026-03-03T09:00:00+00:00")
+            await tds.record_ticket_closed(db, {**t1, "work_completed_at": "2026-03-03T09:00:00+00:00"},
+                                           "2026-03-03T10:00:00+00:00")
+            await tds.record_ticket_closed(db, t2, "2026-03-05T10:00:00+00:00")
+            await tds.record_rating(db, {"ticket_id": "t1", "organization_id": ORG}, 4, "2026-03-06T08:00:00+00:00")
+        db.tickets.docs = [dict(t1), dict(t2)]
+        run(lifecycle())
+
+        # The same history as stored tickets / reviews
+        db.tickets.docs = [
+            {**t1, "status": "closed", "work_completed_at": "2026-03-03T09:00:00+00:00",
+             "closed_at": "2026-03-03T10:00:00+00:00",
+             "status_history": [{"status": "assigned", "timestamp": "2026-03-02T10:05:00+00:00"}]},
+            {**t2, "status": "closed", "closed_at": "2026-03-05T10:00:00+00:00",
+             "status_history": [{"status": "assigned", "timestamp": "2026-03-02T11:00:00+00:00"}]},
+        ]
+        db.ticket_reviews.docs = [{"ticket_id": "t1", "organization_id": ORG, "completed": True,
+                                   "rating": 4, "completed_at": "2026-03-06T08:00:00+00:00"}]
+        report = run(tds.verify_technician_stats(db, ORG))
+        assert report["ok"], report["mismatches"]
+
+        db.technician_daily_stats_status.docs = [{"organization_id": ORG}]
+        totals = run(tds.get_technician_totals(db, ORG, "2026-03-01", "2026-03-31"))
+        a, b = totals["tech_a"], totals["tech_b"]
+        assert (a["assigned"], a["completed"], a["closed"], a["resolved"]) == (1, 1, 1, 1)
+        assert a["revenue"] == 1000.0 and tds.averages(a)["avg_rating"] == 4.0
+        assert a["by_priority"] == {"high": 1}
+        assert (b["resolved"], b["sla_tracked"], b["sla_breached"]) == (1, 1, 0)
+        assert tds.averages(b)["sla_compliance_pct"] == 100.0
+
+        only_first_week = run(tds.get_technician_totals(db, ORG, "2026-03-01", "2026-03-04"))
+        assert only_first_week["tech_b"]["closed"] == 0
+
+
+# ==================== LAZY BUILD ====================
+
+class TestEnsure:
+
+    def test_first_read_builds_from_tickets(self):
+        db = _Db(tickets=_Collection([
+            {**_ticket("t9"), "status": "closed", "closed_at": "2026-04-01T12:00:00+00:00"},
+        ]))
+        totals = run(tds.get_technician_totals(db, ORG, "2026-04-01", "2026-04-30"))
+        assert totals["tech_a"]["closed"] == 1
+        assert db.technician_daily_stats_status.docs[0]["rows"] == 2  # assigned day + closed day
+
+
+# ==================== ROUTE HOOKS ====================
+
+class TestRouteHooks:
+
+    def test_portal_complete_work_counts_resolved(self):
+        db = _Db(tickets=_Collection([_ticket("t1", assigned_to="tech_a", status="work_in_progress")]))
+        request = SimpleNamespace(state=SimpleNamespace(tenant_org_id=ORG))
+        technician = {"user_id": "tech_a", "name": "Asha Rao"}
+        data = technician_portal.CompleteWorkRequest(work_summary="Replaced cells", labor_hours=2)
+        with patch.object(technician_portal, "get_db", return_value=db), \
+                patch.object(technician_portal, "get_current_technician", AsyncMock(return_value=technician)):
+            run(technician_portal.complete_work(request, "t1", data))
+
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        row = db.technician_daily_stats.docs[0]
+        assert (row["technician_id"], row["date"]) == ("tech_a", today)
+        assert (row["completed"], row["resolved"]) == (1, 1)
+
+    def test_sla_auto_reassign_counts_assignment(self):
+        now = datetime.now(timezone.utc)
+        ticket = _ticket("t1", status="in_progress",
+                         sla_resolution_breached_at=(now - timedelta(hours=1)).isoformat())
+        db = _Db(
+            tickets=_Collection([ticket]),
+            users=_Collection([
+                {"organization_id": ORG, "role": "technician", "is_active": True, "user_id": "tech_a", "name": "Asha Rao"},
+                {"organization_id": ORG, "role": "technician", "is_active": True, "user_id": "tech_b", "name": "Ravi"},
+            ]),
+        )
+        config = {"auto_reassign_on_breach": True, "reassignment_delay_minutes": 30}
+        with patch.object(sla, "get_db", return_value=db), \
+                patch.object(sla, "get_sla_config_for_org", AsyncMock(return_value=config)), \
+                patch.object(sla, "_send_reassignment_notifications", AsyncMock()):
+            assert run(sla._maybe_auto_reassign(ticket, now, ORG)) is True
+
+        row = db.technician_daily_stats.docs[0]
+        assert (row["technician_id"], row["date"], row["assigned"]) == ("tech_b", now.strftime("%Y-%m-%d"), 1)
+        assert row["technician_name"] == "Ravi"
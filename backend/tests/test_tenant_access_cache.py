@@ -0,0 +1,122 @@
+"""
+Tests for Tenant Access Cache
+=============================
+Covers: hit/miss counting, TTL expiry, LRU bound, explicit invalidation,
+and TenantGuardMiddleware._check_access skipping MongoDB on a warm cache.
+"""
+
+import pytest
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from core.tenant.access_cache import TenantAccessCache, get_tenant_access_cache
+from core.tenant.guard import TenantGuardMiddleware
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def mock_db():
+    """Mock MongoDB with an active membership in an active org."""
+    db = MagicMock()
+    db.organization_users = AsyncMock()
+    db.organizations = AsyncMock()
+    db.organization_users.find_one = AsyncMock(return_value={"_id": "m1"})
+    db.organizations.find_one = AsyncMock(return_value={"is_active": True})
+    return db
+
+
+@pytest.fixture
+def guard(mock_db):
+    get_tenant_access_cache().clear()
+    TenantGuardMiddleware.set_db(mock_db)
+    yield TenantGuardMiddleware(app=MagicMock())
+    get_tenant_access_cache().clear()
+
+
+# ==================== TESTS ====================
+
+class TestTenantAccessCache:
+
+    def test_miss_then_hit(self):
+        cache = TenantAccessCache(ttl_seconds=60, max_entries=10)
+        assert cache.get("u1", "org-1") is None
+        cache.set("u1", "org-1", is_member=True, org_active=True)
+        entry = cache.get("u1", "org-1")
+        assert entry is not None and entry.is_member and entry.org_active
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+
+    def test_negative_membership_not_cached(self):
+        cache = TenantAccessCache(ttl_seconds=60, max_entries=10)
+        cache.set("u1", "org-1", is_member=False, org_active=True)
+        assert cache.get("u1", "org-1") is None
+
+    def test_entries_expire_after_ttl(self):
+        cache = TenantAccessCache(ttl_seconds=0.01, max_entries=10)
+        cache.set("u1", "org-1", is_member=True, org_active=True)
+        time.sleep(0.02)
+        assert cache.get("u1", "org-1") is None
+        assert cache.get_stats()["size"] == 0
+
+    def test_lru_bound_evicts_oldest(self):
+        cache = TenantAccessCache(ttl_seconds=60, max_entries=2)
+        cache.set("u1", "org-1", is_member=True, org_active=True)
+        cache.set("u2", "org-1", is_member=True, org_active=True)
+        cache.get("u1", "org-1")  # u1 becomes most recent
+        cache.set("u3", "org-1", is_member=True, org_active=True)
+        assert cache.get("u2", "org-1") is None
+        assert cache.get("u1", "org-1") is not None
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_invalidate_membership_and_org(self):
+        cache = TenantAccessCache(ttl_seconds=60, max_entries=10)
+        cache.set("u1", "org-1", is_member=True, org_active=True)
+        cache.set("u1", "org-2", is_member=True, org_active=True)
+        cache.set("u2", "org-1", is_member=True, org_active=True)
+
+        assert cache.invalidate_membership("u1", "org-2") == 1
+        assert cache.get("u1", "org-2") is None
+
+        assert cache.invalidate_org("org-1") == 2
+        assert cache.get_stats()["size"] == 0
+
+    def test_disabled_when_ttl_zero(self):
+        cache = TenantAccessCache(ttl_seconds=0, max_entries=10)
+        cache.set("u1", "org-1", is_member=True, org_active=True)
+        assert cache.get("u1", "org-1") is None
+
+
+class TestTenantGuardAccessCheck:
+
+    def test_warm_cache_skips_mongo(self, guard, mock_db):
+        run = asyncio.get_event_loop().run_until_complete
+        assert run(guard._check_access("u1", "org-1")) == (True, True)
+        assert run(guard._check_access("u1", "org-1")) == (True, True)
+        assert mock_db.organization_users.find_one.await_count == 1
+        assert mock_db.organizations.find_one.await_count == 1
+
+    def test_non_member_always_rechecked(self, guard, mock_db):
+        mock_db.organization_users.find_one = AsyncMock(return_value=None)
+        run = asyncio.get_event_loop().run_until_complete
+        assert run(guard._check_access("u1", "org-1"))[0] is False
+        assert run(guard._check_access("u1", "org-1"))[0] is False
+        assert mock_db.organization_users.find_one.await_count == 2
+        mock_db.organizations.find_one.assert_not_awaited()
+
+    def test_suspension_visible_after_invalidate_org(self, guard, mock_db):
+        from core.tenant.access_cache import invalidate_org
+        run = asyncio.get_event_loop().run_until_complete
+        assert run(guard._check_access("u1", "org-1")) == (True, True)
+
+        mock_db.organizations.find_one = AsyncMock(return_value={"is_active": False})
+        invalidate_org("org-1")
+        assert run(guard._check_access("u1", "org-1")) == (True, False)
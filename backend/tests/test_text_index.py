@@ -0,0 +1,281 @@
+"""
+Tests for the Inverted Text Index
+=================================
+Covers: postings with true document frequencies, BM25F field boosts and
+length normalization, re-indexing / removal keeping postings and vocabulary
+consistent, fuzzy expansion against the vocabulary, in-memory filters,
+version-poll sync and write hooks, atomic single-flight reloads, and
+AdvancedSearchService.text_search
+ranking from postings (when its dependencies are installed).
+"""
+
+import pytest
+import asyncio
+import re
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services import text_index as ti
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def _tokenize(text):
+    return [t for t in re.sub(r"[^a-z0-9\s]", " ", (text or "").lower()).split() if len(t) > 2]
+
+
+def _fuzzy(token, target):
+    if token.startswith(target) or target.startswith(token):
+        return True
+    row = list(range(len(target) + 1))
+    for i, a in enumerate(token, 1):
+        prev, row[0] = row[0], i
+        for j, b in enumerate(target, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (a != b))
+    return row[-1] / max(len(token), len(target)) <= 0.3
+
+
+def _matches(doc, query):
+    for field, cond in query.items():
+        if field == "$or":
+            if not any(_matches(doc, q) for q in cond):
+                return False
+            continue
+        value = doc.get(field)
+        if isinstance(cond, dict):
+            if "$exists" in cond and (field in doc) != cond["$exists"]:
+                return False
+            if "$nin" in cond and value in cond["$nin"]:
+                return False
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+            if "$gte" in cond and not (value is not None and value >= cond["$gte"]):
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def batch_size(self, n):
+        return self
+
+    async def to_list(self, n):
+        return self._docs
+
+    def __aiter__(self):
+        async def gen():
+            for d in self._docs:
+                yield d
+        return gen()
+
+
+class _Collection:
+    def __init__(self, docs=None):
+        self.docs = [dict(d) for d in docs or []]
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        docs = [dict(d) for d in self.docs if _matches(d, query)]
+        for field, keep in (projection or {}).items():
+            if not keep:
+                for d in docs:
+                    d.pop(field, None)
+        return _Cursor(docs)
+
+    async def find_one(self, query, projection=None):
+        return next((dict(d) for d in self.docs if _matches(d, query)), None)
+
+    async def count_documents(self, query):
+        return sum(1 for d in self.docs if _matches(d, query))
+
+
+class _SlowCursor(_Cursor):
+    """Yields to the event loop between documents, like a cursor fetching batches"""
+
+    def __aiter__(self):
+        async def gen():
+            for d in self._docs:
+                await asyncio.sleep(0)
+                yield d
+        return gen()
+
+
+class _SlowCollection(_Collection):
+    def __init__(self, docs=None):
+        super().__init__(docs)
+        self.finds = 0
+
+    def find(self, query, projection=None):
+        self.finds += 1
+        return _SlowCursor(super().find(query, projection)._docs)
+
+
+class _Db:
+    def __init__(self, **collections):
+        self._collections = collections
+
+    def __getattr__(self, name):
+        return self._collections.setdefault(name, _Collection())
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+def _card(failure_id, title="", **fields):
+    return {"failure_id": failure_id, "title": title, "status": "approved",
+            "updated_at": "2026-01-01T00:00:00", **fields}
+
+
+CARDS = [
+    _card("fc1", "Battery not charging", symptom_text="charger LED blinks, battery stuck at 40%",
+          keywords=["battery", "charger"], subsystem_category="battery"),
+    _card("fc2", "Motor overheating", description="hub motor gets hot on long rides; battery fine",
+          keywords=["motor", "thermal"], subsystem_category="motor"),
+    _card("fc3", "Display blank", description="dashboard screen dead after rain", status="draft",
+          subsystem_category="display"),
+    _card("fc4", "Controller fault", root_cause="controller firmware crash", status="deprecated"),
+]
+
+
+def _index(cards=CARDS, **kwargs):
+    db = _Db(failure_cards=_Collection(cards))
+    index = ti.InvertedIndex(db, "failure_cards", _tokenize, _fuzzy, **kwargs)
+    run(index.load())
+    return db, index
+
+
+# ==================== POSTINGS / SCORING ====================
+
+class TestPostings:
+
+    def test_document_frequencies_and_fields(self):
+        _, index = _index()
+        assert len(index) == 4
+        assert set(index.postings["battery"]) == {"fc1", "fc2"}
+        title, symptom, keywords = (index.fields.index(f) for f in ("title", "symptom_text", "keywords"))
+        tfs = index.postings["battery"]["fc1"]
+        assert (tfs[title], tfs[symptom], tfs[keywords]) == (1, 1, 1)
+        assert index.idf("battery") < index.idf("firmware")
+
+    def test_title_boost_outranks_body_mention(self):
+        _, index = _index()
+        scores = index.score({"battery": 1.0})
+        assert scores["fc1"] > scores["fc2"] > 0
+        assert "fc3" not in scores
+
+    def test_reindex_and_remove(self):
+        _, index = _index()
+        index.add(_card("fc2", "Motor noise", description="bearing whine"))
+        assert "fc2" not in index.postings["battery"]
+        assert "overheating" not in index.postings and "overheating" not in index.vocabulary
+        assert "bearing" in index.vocabulary
+        index.remove("fc3")
+        assert "dashboard" not in index.postings and len(index) == 3
+        assert sum(index.length_totals) == sum(sum(d["lengths"]) for d in index.docs.values())
+
+
+# ==================== VOCABULARY ====================
+
+class TestVocabulary:
+
+    def test_fuzzy_terms_from_vocabulary(self):
+        _, index = _index()
+        assert "charging" in index.fuzzy_terms("charg")       # token is a prefix
+        assert "charger" in index.fuzzy_terms("chargers")     # term is a prefix
+        assert "controler" not in index.vocabulary
+        assert "controller" in index.fuzzy_terms("controler")
+        assert "firmwire" not in index.fuzzy_terms("firmwire") and "firmware" in index.fuzzy_terms("firmwire")
+        assert index.fuzzy_terms("xyzzy") == []
+
+    def test_filters(self):
+        _, index = _index()
+        assert index.supports_filter({"status": {"$in": ["approved", "draft"]}, "subsystem_category": "motor"})
+        assert not index.supports_filter({"keywords": {"$in": ["bms"]}})
+        assert not index.supports_filter({"status": {"$regex": "app"}})
+        assert ti.filter_matches(index.meta("fc3"), {"status": {"$in": ["approved", "draft"]}})
+        assert not ti.filter_matches(index.meta("fc4"), {"status": {"$in": ["approved", "draft"]}})
+
+
+# ==================== SYNC ====================
+
+class TestSync:
+
+    def test_poll_and_hooks(self):
+        db, index = _index(refresh_seconds=0)
+        ti._indexes["failure_cards"] = index
+        try:
+            db.failure_cards.docs.append(_card("fc5", "BMS error code", updated_at="2026-02-01T00:00:00"))
+            run(index.refresh())
+            assert "fc5" in index.postings["bms"]
+
+            db.failure_cards.docs[0]["title"] = "Charger port loose"
+            run(ti.sync_document("failure_cards", "fc1"))
+            assert "fc1" in index.postings["port"] and "fc1" in index.postings["battery"]  # still in symptoms
+
+            db.failure_cards.docs.pop(1)
+            run(index.refresh())
+            assert "fc2" not in index.docs
+        finally:
+            ti._indexes.pop("failure_cards", None)
+
+    def test_reload_is_atomic_and_single_flight(self):
+        cards = _SlowCollection(CARDS)
+        db = _Db(failure_cards=cards)
+        index = ti.InvertedIndex(db, "failure_cards", _tokenize, _fuzzy, refresh_seconds=0, full_reload_seconds=0)
+        run(index.load())
+        cards.docs.append(_card("fc5", "BMS error code"))
+        cards.finds = 0
+
+        async def scenario():
+            reloads = [asyncio.ensure_future(index.refresh()) for _ in range(5)]
+            during = []
+            for _ in range(3):
+                await asyncio.sleep(0)
+                during.append((len(index), sorted(index.score({"battery": 1.0}))))
+            # A write hook landing mid-reload survives the swap
+            cards.docs[0]["title"] = "Charger port loose"
+            await index.sync("fc1")
+            await asyncio.gather(*reloads)
+            return during
+
+        assert run(scenario()) == [(4, ["fc1", "fc2"])] * 3  # never a half-built index
+        assert cards.finds == 1  # five concurrent refreshes, one collection scan
+        assert len(index) == 5 and "fc5" in index.postings["bms"]
+        assert "fc1" in index.postings["port"]
+
+    def test_hook_is_noop_before_first_use(self):
+        run(ti.sync_document("failure_cards", "fc1"))
+        assert "failure_cards" not in ti._indexes
+
+
+# ==================== TEXT SEARCH ====================
+
+class TestTextSearch:
+
+    @pytest.fixture
+    def service(self):
+        pytest.importorskip("openai")
+        from services.search_service import AdvancedSearchService
+        ti._indexes.pop("failure_cards", None)
+        yield AdvancedSearchService(_Db(failure_cards=_Collection(CARDS)))
+        ti._indexes.pop("failure_cards", None)
+
+    def test_ranked_from_postings_with_filter(self, service):
+        results = run(service.text_search("battery charging problem"))
+        assert [r["failure_id"] for r in results][:2] == ["fc1", "fc2"]
+        assert results[0]["text_score"] > results[1]["text_score"]
+        assert all("$regex" not in str(q) for q in service.db.failure_cards.queries)
+
+        assert run(service.text_search("firmware crash")) == []  # deprecated card filtered
+        draft = run(service.text_search("dashbord screen", fuzzy=True))
+        assert [r["failure_id"] for r in draft] == ["fc3"]
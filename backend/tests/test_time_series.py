@@ -0,0 +1,128 @@
+"""
+Tests for the Time-Series Aggregation Helper
+============================================
+Covers: bucket arithmetic for day / month / quarter / year, one `$group` on
+the truncated date per series, the date range matched as ISO string or
+BSON date, zero-filled buckets, and running totals that include documents
+dated before the window.
+"""
+
+import pytest
+import asyncio
+from datetime import date, datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+import sys
+import os
+
+# Ensure backend is on path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.time_series import bucket_range, bucket_start, shift_months, time_series
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def _collection(rows):
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=rows)
+    collection = MagicMock()
+    collection.aggregate = MagicMock(return_value=cursor)
+    return collection
+
+
+# ==================== BUCKETS ====================
+
+class TestBuckets:
+
+    def test_bucket_start(self):
+        assert bucket_start(date(2026, 8, 19), "month") == date(2026, 8, 1)
+        assert bucket_start(date(2026, 8, 19), "quarter") == date(2026, 7, 1)
+        assert bucket_start(date(2026, 8, 19), "year") == date(2026, 1, 1)
+        assert bucket_start(date(2026, 8, 19), "day") == date(2026, 8, 19)
+
+    def test_month_range_crosses_year(self):
+        assert bucket_range(date(2025, 11, 15), date(2026, 2, 28), "month") == [
+            date(2025, 11, 1), date(2025, 12, 1), date(2026, 1, 1), date(2026, 2, 1)]
+
+    def test_quarter_range(self):
+        assert bucket_range(date(2026, 1, 1), date(2026, 12, 31), "quarter") == [
+            date(2026, 1, 1), date(2026, 4, 1), date(2026, 7, 1), date(2026, 10, 1)]
+
+    def test_shift_months(self):
+        assert shift_months(date(2026, 3, 31), -11) == date(2025, 4, 1)
+        assert shift_months(date(2026, 12, 5), 1) == date(2027, 1, 1)
+
+    def test_unknown_unit(self):
+        with pytest.raises(ValueError):
+            bucket_start(date(2026, 1, 1), "week")
+
+
+# ==================== SERIES ====================
+
+class TestTimeSeries:
+
+    def test_single_group_and_zero_fill(self):
+        collection = _collection([
+            {"_id": datetime(2026, 1, 1), "invoiced": 100.0, "count": 2},
+            {"_id": datetime(2026, 3, 1), "invoiced": 50.0, "count": 1},
+            {"_id": None, "invoiced": 7.0, "count": 1},
+        ])
+        series = run(time_series(
+            collection, {"organization_id": "org-ts"}, date_field="invoice_date", unit="month",
+            start=date(2025, 12, 1), end=date(2026, 3, 31),
+            accumulators={"invoiced": {"$sum": "$grand_total"}, "count": {"$sum": 1}},
+        ))
+        assert collection.aggregate.call_count == 1
+        assert series == [
+            {"bucket": date(2025, 12, 1), "invoiced": 0, "count": 0},
+            {"bucket": date(2026, 1, 1), "invoiced": 100.0, "count": 2},
+            {"bucket": date(2026, 2, 1), "invoiced": 0, "count": 0},
+            {"bucket": date(2026, 3, 1), "invoiced": 50.0, "count": 1},
+        ]
+
+        match, group = (stage for stage in collection.aggregate.call_args.args[0])
+        assert match["$match"]["$or"] == [
+            {"invoice_date": {"$gte": "2025-12-01", "$lt": "2026-04-01"}},
+            {"invoice_date": {"$gte": datetime(2025, 12, 1, tzinfo=timezone.utc),
+                              "$lt": datetime(2026, 4, 1, tzinfo=timezone.utc)}},
+        ]
+        assert match["$match"]["organization_id"] == "org-ts"
+        assert group["$group"]["_id"]["$dateTrunc"]["unit"] == "month"
+
+    def test_cumulative_includes_earlier_documents(self):
+        collection = _collection([
+            {"_id": datetime(2025, 6, 1), "outstanding": 300.0},
+            {"_id": datetime(2026, 2, 1), "outstanding": 20.0},
+        ])
+        series = run(time_series(
+            collection, {}, date_field="invoice_date", unit="month",
+            start=date(2026, 1, 1), end=date(2026, 3, 31),
+            accumulators={"outstanding": {"$sum": "$balance_due"}}, cumulative=True,
+        ))
+        assert [s["outstanding"] for s in series] == [300.0, 320.0, 320.0]
+        match = collection.aggregate.call_args.args[0][0]["$match"]
+        assert match["$or"] == [
+            {"invoice_date": {"$lt": "2026-04-01"}},
+            {"invoice_date": {"$lt": datetime(2026, 4, 1, tzinfo=timezone.utc)}},
+        ]
+
+    def test_string_dates_truncated_on_calendar_prefix(self):
+        collection = _collection([])
+        run(time_series(collection, {}, date_field="created_time", unit="year",
+                        start=date(2024, 1, 1), end=date(2026, 12, 31),
+                        accumulators={"n": {"$sum": 1}}))
+        trunc = collection.aggregate.call_args.args[0][1]["$group"]["_id"]["$dateTrunc"]
+        parsed = trunc["date"]["$cond"][2]["$dateFromString"]
+        assert parsed["dateString"]["$substrBytes"][1:] == [0, 10]
+        assert parsed["onError"] is None
+
+    def test_range_keeps_callers_or(self):
+        collection = _collection([])
+        caller_or = [{"status": "paid"}, {"balance_due": 0}]
+        run(time_series(collection, {"$or": caller_or}, date_field="date", unit="month",
+                        start=date(2026, 1, 1), end=date(2026, 1, 31), accumulators={"n": {"$sum": 1}}))
+        match = collection.aggregate.call_args.args[0][0]["$match"]
+        assert match["$or"] == caller_or
+        assert [list(c["date"]) for c in match["$and"][0]["$or"]] == [["$lt", "$gte"], ["$lt", "$gte"]]
@@ -44,6 +44,31 @@ async def ensure_compound_indexes(db):
             "source_document_id": {"$type": "string", "$gt": ""}
         },
         background=True)
+    # Seeds per-month reference sequences from the highest issued number
+    await db.journal_entries.create_index(
+        [("organization_id", 1), ("reference_number", 1)],
+        name="journal_entries_org_reference", background=True)
+    # Account ledger keyset pages: (entry_date, entry_id) per account
+    await db.journal_entries.create_index(
+        [("organization_id", 1), ("lines.account_id", 1), ("entry_date", 1), ("entry_id", 1)],
+        name="journal_entries_org_account_date", background=True)
+    await db.journal_entries.create_index(
+        [("organization_id", 1), ("entry_date", 1)],
+        name="journal_entries_org_entry_date", background=True)
+    await db.account_balance_sync_state.create_index(
+        [("organization_id", 1)],
+        unique=True, name="account_balance_sync_state_org_unique", background=True)
+    # Monthly account rollups (services/account_period_balances.py)
+    await db.account_period_balances.create_index(
+        [("organization_id", 1), ("period", 1), ("account_id", 1),
+         ("account_name", 1), ("account_code", 1), ("account_type", 1)],
+        unique=True, name="account_period_balances_key_unique", background=True)
+    await db.account_period_balances.create_index(
+        [("organization_id", 1), ("account_id", 1), ("period", 1)],
+        name="account_period_balances_org_account_period", background=True)
+    await db.account_period_balances_status.create_index(
+        [("organization_id", 1)],
+        unique=True, name="account_period_balances_status_org_unique", background=True)
 
     await db.contacts.create_index(
         [("organization_id", 1), ("name", 1)],
@@ -120,4 +145,85 @@ async def ensure_compound_indexes(db):
         unique=True,
         name="credit_notes_org_number_unique", background=True)
 
-    logger.info("Compound indexes ensured (26 total)")
+    # Free-trial record limit counters (utils/plan_limits.py)
+    await db.org_record_counters.create_index(
+        [("organization_id", 1), ("resource", 1)],
+        unique=True, name="org_record_counters_org_resource_unique", background=True)
+
+    # Bulk PDF jobs (services/bulk_pdf_jobs.py)
+    await db.pdf_jobs.create_index(
+        [("organization_id", 1), ("created_at", -1)],
+        name="pdf_jobs_org_date", background=True)
+
+    # Technician daily stats rollups (services/technician_daily_stats.py)
+    await db.technician_daily_stats.create_index(
+        [("organization_id", 1), ("technician_id", 1), ("date", 1)],
+        unique=True, name="technician_daily_stats_org_tech_date_unique", background=True)
+    await db.technician_daily_stats.create_index(
+        [("organization_id", 1), ("date", 1)],
+        name="technician_daily_stats_org_date", background=True)
+
+    # GST tax line ledger (services/gst_ledger.py)
+    await db.gst_tax_lines.create_index(
+        [("source_type", 1), ("source_id", 1), ("line_no", 1)],
+        unique=True, name="gst_tax_lines_source_line_unique", background=True)
+    await db.gst_tax_lines.create_index(
+        [("organization_id", 1), ("period", 1), ("source_type", 1)],
+        name="gst_tax_lines_org_period_type", background=True)
+    # GST ledger catch-up poll on created / updated stamps (gst_ledger.catch_up_gst_ledger);
+    # credit_notes created_at is covered by credit_notes_org_date
+    for collection, stamps in (
+        ("invoices", ("created_at", "updated_at", "created_time", "updated_time")),
+        ("invoices_enhanced", ("created_at", "updated_at", "created_time", "updated_time")),
+        ("credit_notes", ("updated_at",)),
+        ("bills", ("created_time", "updated_time")),
+        ("expenses", ("created_at", "updated_at", "created_time")),
+    ):
+        for stamp in stamps:
+            await db[collection].create_index(
+                [("organization_id", 1), (stamp, 1)], name=f"{collection}_org_{stamp}", background=True)
+
+    # GST ledger period reconcile on document dates (gst_ledger.reconcile_gst_period);
+    # credit_notes created_at is covered by credit_notes_org_date
+    for collection, dates in (
+        ("invoices", ("invoice_date", "date")),
+        ("invoices_enhanced", ("invoice_date",)),
+        ("credit_notes", ("credit_note_date",)),
+        ("bills", ("bill_date", "date")),
+        ("expenses", ("expense_date",)),
+    ):
+        for field in dates:
+            await db[collection].create_index(
+                [("organization_id", 1), (field, 1)], name=f"{collection}_org_{field}", background=True)
+
+    # Inventory valuation cost layers and warehouse stock (services/inventory_valuation.py)
+    await db.stock_movements.create_index(
+        [("organization_id", 1), ("item_id", 1), ("movement_date", 1)],
+        name="stock_movements_org_item_date", background=True)
+    await db.item_stock_locations.create_index(
+        [("organization_id", 1), ("item_id", 1), ("warehouse_id", 1)],
+        name="item_stock_locations_org_item_warehouse", background=True)
+
+    # Failure card vector index version poll (services/failure_card_index.py)
+    await db.failure_cards.create_index(
+        [("updated_at", 1)], name="failure_cards_updated_at", background=True)
+    await db.failure_cards.create_index(
+        [("embedding_updated_at", 1)], name="failure_cards_embedding_updated_at", background=True)
+
+    # Embedding pipeline cache lookups and job checkpoints (services/embedding_pipeline.py)
+    await db.embedding_cache.create_index(
+        [("text_hash", 1), ("model", 1)], name="embedding_cache_hash_model", background=True)
+    await db.embedding_jobs.create_index(
+        [("job_id", 1)], unique=True, name="embedding_jobs_job_id_unique", background=True)
+
+    # Failure match candidate prefetch $or clauses (FailureMatchEngine)
+    await db.failure_cards.create_index(
+        [("signature_hash", 1)], name="failure_cards_signature_hash", background=True)
+    await db.failure_cards.create_index(
+        [("subsystem_category", 1), ("status", 1)], name="failure_cards_subsystem_status", background=True)
+    await db.failure_cards.create_index(
+        [("error_codes", 1)], name="failure_cards_error_codes", background=True)
+    await db.failure_cards.create_index(
+        [("keywords", 1)], name="failure_cards_keywords", background=True)
+
+    logger.info("Compound indexes ensured (70 total)")
@@ -2,11 +2,21 @@
 Plan Record Limit Enforcement
 ==============================
 Utility to check record limits based on the organization's subscription plan.
-Called from route handlers before creating new records.
+Route handlers call check_record_limit before creating a record and
+record_created once the insert has succeeded.
+
+Counts come from a per-org counter document in `org_record_counters`
+(seeded once with count_documents, then $inc'd by record_created) instead
+of counting the whole collection on each create. Creates that fail after
+the check never touch it. Deletes do not decrement it, so the counter is an
+upper bound: when it reaches the limit the real count is taken once and the
+counter is re-seeded before refusing.
 """
 import logging
 from fastapi import HTTPException
 
+from core.subscriptions.plan_snapshot import get_org_plan_snapshot
+
 logger = logging.getLogger(__name__)
 
 # Record limits by plan — only free_trial has limits
@@ -26,6 +36,15 @@ PLAN_HIERARCHY = {
     "enterprise": 3,
 }
 
+# Resource → collection holding its records
+COLLECTION_MAP = {
+    "tickets": "tickets",
+    "contacts": "contacts",
+    "estimates": "estimates",
+    "invoices": "invoices",
+    "items": "items",
+}
+
 _db = None
 
 def init_record_limits(db):
@@ -42,11 +61,8 @@ async def check_record_limit(org_id: str, resource: str):
         return
 
     try:
-        org = await _db.organizations.find_one(
-            {"organization_id": org_id},
-            {"_id": 0, "plan_type": 1}
-        )
-        plan_type = (org.get("plan_type", "free_trial") if org else "free_trial").lower()
+        snapshot = await get_org_plan_snapshot(_db, org_id)
+        plan_type = (snapshot.plan_type or "free_trial").lower()
     except Exception:
         return
 
@@ -58,22 +74,15 @@ async def check_record_limit(org_id: str, resource: str):
     if not limit:
         return
 
-    # Map resource to collection name
-    collection_map = {
-        "tickets": "tickets",
-        "contacts": "contacts",
-        "estimates": "estimates",
-        "invoices": "invoices",
-        "items": "items",
-    }
-
-    collection_name = collection_map.get(resource)
+    collection_name = COLLECTION_MAP.get(resource)
     if not collection_name:
         return
 
     try:
-        collection = _db[collection_name]
-        count = await collection.count_documents({"organization_id": org_id})
+        count = await _get_record_count(org_id, resource)
+        if count >= limit:
+            # Counter may include deleted records — confirm with a real count
+            count = await _reseed_record_count(org_id, resource)
 
         if count >= limit:
             raise HTTPException(
@@ -91,3 +100,41 @@ async def check_record_limit(org_id: str, resource: str):
         raise
     except Exception as e:
         logger.warning(f"Record limit check failed for {resource}: {e}")
+
+
+async def record_created(org_id: str, resource: str):
+    """
+    Count a successfully created record. Only orgs with a seeded counter are
+    touched; an org without one is seeded from the collection on its next check.
+    """
+    if _db is None or not org_id or resource not in COLLECTION_MAP:
+        return
+    try:
+        await _db.org_record_counters.update_one(
+            {"organization_id": org_id, "resource": resource},
+            {"$inc": {"count": 1}},
+        )
+    except Exception as e:
+        logger.warning(f"Record counter update failed for {resource}: {e}")
+
+
+async def _get_record_count(org_id: str, resource: str) -> int:
+    """Maintained count for (org, resource), seeded from the collection on first use"""
+    doc = await _db.org_record_counters.find_one(
+        {"organization_id": org_id, "resource": resource},
+        {"_id": 0, "count": 1}
+    )
+    if doc is not None:
+        return doc.get("count", 0)
+    return await _reseed_record_count(org_id, resource)
+
+
+async def _reseed_record_count(org_id: str, resource: str) -> int:
+    """Recount the collection and store the result as the counter"""
+    count = await _db[COLLECTION_MAP[resource]].count_documents({"organization_id": org_id})
+    await _db.org_record_counters.update_one(
+        {"organization_id": org_id, "resource": resource},
+        {"$set": {"count": count}},
+        upsert=True,
+    )
+    return count
@@ -0,0 +1,186 @@
+"""
+Streaming CSV / Excel exports
+=============================
+
+Export endpoints feed rows from a MongoDB cursor (or any iterable) straight
+into the output instead of loading every document and building the file in
+memory:
+
+- CSV:   rows are written through csv.writer into a small buffer that is
+         flushed to the client every CSV_FLUSH_ROWS rows.
+- Excel: openpyxl write_only workbooks spill each appended row to a
+         temporary XML part, so memory stays flat however many rows are
+         written. The finished .xlsx is saved to a temp file, which is
+         opened and unlinked at once, then streamed back from the open
+         handle in FILE_CHUNK_BYTES chunks. Nothing is left on disk even
+         if the client disconnects before the body starts.
+
+Usage:
+    rows = ([d["invoice_number"], d["total"]] async for d in db.invoices.find(query))
+    return csv_response("invoices.csv", ["Invoice Number", "Total"], rows)
+
+    wb = new_workbook()
+    sheet = SheetWriter(wb, "Invoices", widths={"A": 18, "B": 20})
+    sheet.header(["Invoice Number", "Total"])
+    async for d in db.invoices.find(query):
+        sheet.row([d["invoice_number"], d["total"]], money_cols=(1,))
+    return await workbook_response(wb, "invoices.xlsx")
+"""
+
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Optional, Sequence, Union
+import asyncio
+import csv
+import io
+import os
+import tempfile
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+CSV_FLUSH_ROWS = 500
+FILE_CHUNK_BYTES = 64 * 1024
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MONEY_FORMAT = "₹#,##0.00"
+
+# Report styles (same look as the former in-memory workbooks)
+TITLE_FONT = Font(bold=True, size=14)
+BOLD_FONT = Font(bold=True)
+HEADER_FILL = PatternFill(start_color="22EDA9", end_color="22EDA9", fill_type="solid")
+HEADER_FONT = Font(bold=True, color="000000")
+HEADER_BORDER = Border(bottom=Side(style="medium", color="000000"))
+TOTAL_FILL = PatternFill(start_color="F0F0F0", end_color="F0F0F0", fill_type="solid")
+
+Rows = Union[Iterable[Sequence[Any]], AsyncIterable[Sequence[Any]]]
+
+
+async def _iterate(rows: Rows) -> AsyncIterator[Sequence[Any]]:
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            yield row
+    else:
+        for row in rows:
+            yield row
+
+
+def _attachment(filename: str) -> Dict[str, str]:
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+# ==================== CSV ====================
+
+async def iter_csv(header: Sequence[str], rows: Rows, flush_rows: int = CSV_FLUSH_ROWS) -> AsyncIterator[str]:
+    """CSV text in chunks of `flush_rows` rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    pending = 0
+    async for row in _iterate(rows):
+        writer.writerow(row)
+        pending += 1
+        if pending >= flush_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def csv_response(filename: str, header: Sequence[str], rows: Rows) -> StreamingResponse:
+    """Streamed CSV download"""
+    return StreamingResponse(iter_csv(header, rows), media_type="text/csv", headers=_attachment(filename))
+
+
+# ==================== EXCEL ====================
+
+def new_workbook() -> openpyxl.Workbook:
+    """Write-only workbook; add sheets with SheetWriter"""
+    return openpyxl.Workbook(write_only=True)
+
+
+class SheetWriter:
+    """Appends report-styled rows to a write-only worksheet (rows are final once written)"""
+
+    def __init__(self, wb: openpyxl.Workbook, title: str, widths: Optional[Dict[str, float]] = None):
+        self.ws = wb.create_sheet(title=title)
+        # Column widths must be set before the first row is written
+        for column, width in (widths or {}).items():
+            self.ws.column_dimensions[column].width = width
+        self.rows_written = 0
+
+    def _cell(self, value: Any, font=None, fill=None, border=None, alignment=None, number_format=None):
+        cell = WriteOnlyCell(self.ws, value=value)
+        if font is not None:
+            cell.font = font
+        if fill is not None:
+            cell.fill = fill
+        if border is not None:
+            cell.border = border
+        if alignment is not None:
+            cell.alignment = alignment
+        if number_format and isinstance(value, (int, float)) and not isinstance(value, bool):
+            cell.number_format = number_format
+        return cell
+
+    def _append(self, cells) -> None:
+        self.ws.append(cells)
+        self.rows_written += 1
+
+    def title(self, text: str) -> None:
+        self._append([self._cell(text, font=TITLE_FONT)])
+
+    def line(self, *values: Any) -> None:
+        """Plain row (no values → blank row)"""
+        self._append(list(values))
+
+    def section(self, text: str, *values: Any) -> None:
+        self._append([self._cell(text, font=BOLD_FONT), *values])
+
+    def header(self, values: Sequence[Any]) -> None:
+        self._append([
+            self._cell(v, font=HEADER_FONT, fill=HEADER_FILL, border=HEADER_BORDER,
+                       alignment=Alignment(horizontal="center"))
+            for v in values
+        ])
+
+    def row(self, values: Sequence[Any], money_cols: Iterable[int] = ()) -> None:
+        money_cols = set(money_cols)
+        self._append([
+            self._cell(v, number_format=MONEY_FORMAT) if i in money_cols else v
+            for i, v in enumerate(values)
+        ])
+
+    def total(self, values: Sequence[Any], money_cols: Iterable[int] = (), font=BOLD_FONT, fill=TOTAL_FILL) -> None:
+        money_cols = set(money_cols)
+        self._append([
+            self._cell(v, font=font, fill=fill, number_format=MONEY_FORMAT if i in money_cols else None)
+            for i, v in enumerate(values)
+        ])
+
+
+async def workbook_response(wb: openpyxl.Workbook, filename: str) -> StreamingResponse:
+    """Save a write-only workbook to a temp file and stream it back"""
+    fd, path = tempfile.mkstemp(prefix="export_", suffix=".xlsx")
+    os.close(fd)
+    try:
+        await asyncio.to_thread(wb.save, path)
+        f = open(path, "rb")
+    finally:
+        # The open handle keeps the data readable; the name is gone either way
+        os.unlink(path)
+
+    async def body():
+        try:
+            while True:
+                chunk = await asyncio.to_thread(f.read, FILE_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            f.close()
+
+    # Closes the handle when the body never ran (close is idempotent)
+    return StreamingResponse(body(), media_type=XLSX_MEDIA_TYPE, headers=_attachment(filename),
+                             background=BackgroundTask(f.close))
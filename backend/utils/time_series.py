@@ -0,0 +1,170 @@
+"""
+Time-series aggregation helper for report charts.
+
+One `$group` on the date truncated to the bucket unit (`$dateTrunc`) replaces
+the per-month / per-quarter loop of aggregations the chart endpoints used to
+run; buckets with no documents are zero-filled in Python.
+
+Usage:
+    from utils.time_series import time_series
+
+    series = await time_series(
+        db.invoices, {"organization_id": org_id, "status": {"$nin": ["draft", "void"]}},
+        date_field="invoice_date", unit="month",
+        start=date(2025, 4, 1), end=date(2026, 3, 31),
+        accumulators={"invoiced": {"$sum": "$grand_total"}, "count": {"$sum": 1}},
+    )
+    # [{"bucket": date(2025, 4, 1), "invoiced": 0, "count": 0}, ...]
+
+Date fields may hold ISO strings ("2026-03-14", "2026-03-14T10:00:00+05:30")
+or BSON dates. Mongo only compares values of the same type, so the `$match`
+range is an `$or` of a lexicographic string range and a date range
+(date_range_clauses). Strings are bucketed on their calendar date prefix so
+the buckets agree with the string range.
+"""
+
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional
+
+UNITS = ("day", "month", "quarter", "year")
+
+
+def bucket_start(value: date, unit: str) -> date:
+    """First day of the bucket containing `value`"""
+    if unit == "day":
+        return value
+    if unit == "month":
+        return value.replace(day=1)
+    if unit == "quarter":
+        return date(value.year, 3 * ((value.month - 1) // 3) + 1, 1)
+    if unit == "year":
+        return date(value.year, 1, 1)
+    raise ValueError(f"Unsupported time-series unit: {unit}")
+
+
+def next_bucket(value: date, unit: str) -> date:
+    """First day of the bucket after the one starting at `value`"""
+    if unit == "day":
+        return date.fromordinal(value.toordinal() + 1)
+    if unit == "year":
+        return date(value.year + 1, 1, 1)
+    step = 1 if unit == "month" else 3
+    month = value.month - 1 + step
+    return date(value.year + month // 12, month % 12 + 1, 1)
+
+
+def bucket_range(start: date, end: date, unit: str) -> List[date]:
+    """Bucket starts covering [start, end], in order"""
+    buckets = []
+    current = bucket_start(start, unit)
+    while current <= end:
+        buckets.append(current)
+        current = next_bucket(current, unit)
+    return buckets
+
+
+def shift_months(value: date, months: int) -> date:
+    """First of the month `months` away from `value` (negative goes back)"""
+    month = value.year * 12 + value.month - 1 + months
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def date_range_clauses(date_field: str, start: Optional[date], end: date) -> List[dict]:
+    """`$or` clauses for start <= date_field <= end (whole days), as ISO string or BSON date"""
+    until = end + timedelta(days=1)
+    as_string = {"$lt": until.isoformat()}
+    as_date = {"$lt": datetime.combine(until, time(), tzinfo=timezone.utc)}
+    if start:
+        as_string["$gte"] = start.isoformat()
+        as_date["$gte"] = datetime.combine(start, time(), tzinfo=timezone.utc)
+    return [{date_field: as_string}, {date_field: as_date}]
+
+
+def truncated_date_expr(date_field: str, unit: str) -> dict:
+    """`$dateTrunc` of a string-or-date field; null when the value does not parse"""
+    field = f"${date_field}"
+    as_date = {"$cond": [
+        {"$eq": [{"$type": field}, "date"]},
+        field,
+        {"$dateFromString": {
+            "dateString": {"$substrBytes": [{"$ifNull": [field, ""]}, 0, 10]},
+            "format": "%Y-%m-%d",
+            "onError": None,
+            "onNull": None,
+        }},
+    ]}
+    return {"$dateTrunc": {"date": as_date, "unit": unit}}
+
+
+async def time_series(
+    collection,
+    match: dict,
+    date_field: str,
+    unit: str,
+    start: Optional[date],
+    end: date,
+    accumulators: Dict[str, dict],
+    cumulative: bool = False,
+) -> List[dict]:
+    """
+    Bucketed totals for documents matching `match`, one row per bucket from
+    `start` to `end` (zero-filled), each {"bucket": date, <accumulator>: value}.
+
+    The date range filter on `date_field` is added here. With `cumulative`,
+    every row holds the running total up to the end of its bucket, including
+    documents dated before `start` (e.g. outstanding receivables as of each
+    month end); `start` still sets the first row returned.
+    """
+    if unit not in UNITS:
+        raise ValueError(f"Unsupported time-series unit: {unit}")
+    start = _as_date(start) if start else None
+    end = _as_date(end)
+
+    since = bucket_start(start, unit) if start and not cumulative else None
+    clauses = date_range_clauses(date_field, since, end)
+    match = dict(match)
+    if "$or" in match:
+        match["$and"] = list(match.get("$and", [])) + [{"$or": clauses}]
+    else:
+        match["$or"] = clauses
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": truncated_date_expr(date_field, unit), **accumulators}},
+    ]
+    rows = await collection.aggregate(pipeline).to_list(None)
+
+    by_bucket = {}
+    for row in rows:
+        if row.get("_id") is None:
+            continue
+        by_bucket[_as_date(row["_id"])] = row
+
+    first = bucket_start(start, unit) if start else min(by_bucket, default=bucket_start(end, unit))
+    buckets = bucket_range(first, end, unit)
+
+    running = {name: 0 for name in accumulators}
+    if cumulative:
+        for key, row in by_bucket.items():
+            if key < first:
+                for name in accumulators:
+                    running[name] += row.get(name) or 0
+
+    series = []
+    for key in buckets:
+        row = by_bucket.get(key, {})
+        values = {name: row.get(name) or 0 for name in accumulators}
+        if cumulative:
+            for name in accumulators:
+                running[name] += values[name]
+            values = dict(running)
+        series.append({"bucket": key, **values})
+    return series
@@ -761,9 +761,9 @@ export default function Reports() {
                         ))}
                       </TableBody>
                     </Table>
-                    {arAging.invoices?.length > 20 && (
+                    {arAging.invoice_count > 20 && (
                       <div className="p-3 bg-bw-panel text-center text-sm text-bw-white/[0.45] border-t border-white/[0.07]">
-                        Showing 20 of {arAging.invoices.length} invoices. Export to see all.
+                        Showing 20 of {arAging.invoice_count} invoices. Export to see all.
                       </div>
                     )}
                   </div>
@@ -864,9 +864,9 @@ export default function Reports() {
                         ))}
                       </TableBody>
                     </Table>
-                    {apAging.bills?.length > 20 && (
+                    {apAging.bill_count > 20 && (
                       <div className="p-3 bg-bw-panel text-center text-sm text-bw-white/[0.45] border-t border-white/[0.07]">
-                        Showing 20 of {apAging.bills.length} bills. Export to see all.
+                        Showing 20 of {apAging.bill_count} bills. Export to see all.
                       </div>
                     )}
                   </div>